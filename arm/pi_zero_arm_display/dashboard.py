@@ -0,0 +1,553 @@
+"""
+Arm dashboard - Update-coalescing touchscreen renderer
+
+MQTT handlers only store the raw payload of each topic (latest wins), so
+a message flood costs one dict assignment per message. Once per frame:
+1. touch events are handled first: input never queues behind data
+2. pending payloads are swapped out and decoded, once per topic
+3. only widgets whose text, colour or sparkline changed are redrawn,
+   and only their rectangles are sent to the display (dirty rects)
+
+Event topics (system/alerts) are queued instead of coalesced, in a
+bounded deque. Sparklines are fixed-size ring buffers sampled every
+spark_interval, staggered across tiles so they do not all redraw in the
+same frame.
+"""
+
+import json
+import logging
+import time
+from array import array
+from collections import deque
+
+import pygame
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND = (8, 12, 16)
+PANEL = (22, 30, 38)
+TEXT = (220, 230, 235)
+DIM = (110, 120, 128)
+STALE = (70, 76, 82)
+ACCENT = (80, 200, 255)
+SEVERITY_COLOURS = {'critical': (200, 40, 35), 'warning': (210, 140, 20)}
+
+STATUS_HEIGHT = 28
+ALERT_HEIGHT = 36
+TABS_HEIGHT = 48
+TILE_MARGIN = 3
+
+
+class SparkRing:
+    """Fixed-size ring of float samples (sparkline history)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = array('f', bytes(4 * capacity))
+        self.index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def values(self):
+        """Samples, oldest first"""
+        if self.count < self.capacity:
+            return self.data[:self.count]
+        return self.data[self.index:] + self.data[:self.index]
+
+
+class TopicState:
+    """
+    Latest decoded payload of every topic
+
+    Args:
+        events: Topics whose every message matters (queued, not coalesced)
+        max_events: Queue bound (oldest events dropped first)
+        wanted: Topics worth decoding (None = all); others are only counted
+    """
+
+    def __init__(self, events=(), max_events=64, wanted=None):
+        self.values = {}
+        self.updated = {}
+        self.events = deque(maxlen=max_events)
+        self.event_topics = frozenset(events)
+        self.wanted = wanted
+        self._pending = {}
+        self.received = 0
+        self.ignored = 0
+        self.coalesced = 0
+        self.decoded = 0
+        self.errors = 0
+
+    def on_message(self, topic, payload):
+        """MQTT handler: no decoding here, it waits for the next frame"""
+        self.received += 1
+        if self.wanted is not None and topic not in self.wanted:
+            # Frames, YOLO results, binary telemetry...: nothing shows them
+            self.ignored += 1
+            return
+        if topic in self.event_topics:
+            self.events.append((topic, payload))
+            return
+        if topic in self._pending:
+            self.coalesced += 1
+        self._pending[topic] = payload
+
+    def collect(self, now):
+        """
+        Decode what arrived since the last frame
+
+        Returns:
+            (updated topics, decoded events as (topic, value))
+        """
+        updated = []
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            for topic, payload in pending.items():
+                value = self._decode(payload)
+                if value is not None:
+                    self.values[topic] = value
+                    self.updated[topic] = now
+                    updated.append(topic)
+        events = []
+        while self.events:
+            topic, payload = self.events.popleft()
+            value = self._decode(payload)
+            if value is not None:
+                events.append((topic, value))
+        return updated, events
+
+    def _decode(self, payload):
+        try:
+            value = json.loads(payload)
+        except (ValueError, UnicodeDecodeError):
+            self.errors += 1
+            return None
+        self.decoded += 1
+        return value
+
+
+class Widget:
+    """
+    Screen area redrawn only when dirty
+
+    Subclasses set `topics` (routed updates) and implement draw().
+    """
+
+    topics = ()
+
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)
+        self.dirty = True
+
+    def update(self, topic, value, now):
+        """New value on one of self.topics"""
+
+    def tick(self, now):
+        """Time-driven changes (sparkline samples, staleness, clock)"""
+
+    def touch(self, pos):
+        """Tap inside self.rect; returns True if handled"""
+        return False
+
+    def draw(self, surface, fonts):
+        raise NotImplementedError
+
+
+class Tile(Widget):
+    """
+    One value with its sparkline
+
+    Args:
+        rect: Tile area
+        spec: Layout entry (title, topic, field, unit, format)
+        spark_points: Sparkline ring size
+        spark_interval: Seconds between sparkline samples
+        stale: Seconds without data before the tile greys out
+        first_sample: Time of the first sparkline sample (staggering)
+        max_refresh: Value redraws per second at most (heading at 20 Hz...)
+    """
+
+    def __init__(self, rect, spec, spark_points, spark_interval, stale, first_sample, max_refresh=10.0):
+        super().__init__(rect)
+        self.title = spec['title']
+        self.topic = spec['topic']
+        self.topics = (self.topic,)
+        self.field = spec.get('field', 'value')
+        self.unit = spec.get('unit', '')
+        self.format = spec.get('format', '.1f')
+        self.spark = SparkRing(spark_points)
+        self.spark_interval = spark_interval
+        self.stale_after = stale
+        self.next_sample = first_sample
+        self.refresh_interval = 1.0 / max_refresh
+        self.next_refresh = 0.0
+
+        self.value = None
+        self.updated = None
+        self.changed = False
+        self.stale = True
+        self.text = '--'
+        self._title_surface = None
+        self._value_surface = None
+
+    def update(self, topic, value, now):
+        if isinstance(value, dict):
+            value = value.get(self.field)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return
+        self.value = float(value)
+        self.updated = now
+        self.changed = True
+
+    def tick(self, now):
+        if self.changed and now >= self.next_refresh:
+            self.changed = False
+            text = format(self.value, self.format)
+            if text != self.text or self.stale:
+                self.text = text
+                self.stale = False
+                self._value_surface = None
+                self.dirty = True
+                self.next_refresh = now + self.refresh_interval
+        if now >= self.next_sample:
+            while self.next_sample <= now:
+                self.next_sample += self.spark_interval
+            if self.value is not None and not self.stale:
+                self.spark.append(self.value)
+                self.dirty = True
+        if not self.stale and now - self.updated > self.stale_after:
+            self.stale = True
+            self._value_surface = None
+            self.dirty = True
+
+    def draw(self, surface, fonts):
+        area = self.rect.inflate(-2 * TILE_MARGIN, -2 * TILE_MARGIN)
+        surface.fill(BACKGROUND, self.rect)
+        surface.fill(PANEL, area)
+        if self._title_surface is None:
+            self._title_surface = fonts['small'].render(self.title, True, DIM)
+        if self._value_surface is None:
+            text = self.text + (' ' + self.unit if self.unit else '')
+            self._value_surface = fonts['large'].render(text, True, STALE if self.stale else TEXT)
+        surface.blit(self._title_surface, (area.x + 6, area.y + 4))
+        surface.blit(self._value_surface, (area.x + 6, area.y + 22))
+
+        values = self.spark.values()
+        if len(values) >= 2:
+            box = pygame.Rect(area.x + 6, area.y + area.height * 3 // 5, area.width - 12, area.height * 2 // 5 - 6)
+            low, high = min(values), max(values)
+            span = (high - low) or 1.0
+            step = box.width / (self.spark.capacity - 1)
+            x0 = box.right - step * (len(values) - 1)
+            points = [(x0 + i * step, box.bottom - (v - low) / span * box.height) for i, v in enumerate(values)]
+            pygame.draw.lines(surface, STALE if self.stale else ACCENT, False, points)
+
+
+class AlertBanner(Widget):
+    """
+    Most severe active alert (system/alerts); a tap acknowledges it
+    until the rule is raised again
+    """
+
+    topics = ('system/alerts',)
+
+    def __init__(self, rect):
+        super().__init__(rect)
+        self.active = {}
+        self.acknowledged = set()
+        self.shown = None
+
+    def update(self, topic, alert, now):
+        if not isinstance(alert, dict) or 'id' not in alert:
+            return
+        if alert.get('state') == 'cleared':
+            self.active.pop(alert['id'], None)
+            self.acknowledged.discard(alert['id'])
+        else:
+            if alert.get('state') == 'raised':
+                self.acknowledged.discard(alert['id'])
+            self.active[alert['id']] = alert
+        self._select()
+
+    def _select(self):
+        visible = [a for a in self.active.values() if a['id'] not in self.acknowledged]
+        visible.sort(key=lambda a: (a.get('severity') != 'critical', -(a.get('ts') or 0)))
+        shown = visible[0] if visible else None
+        if shown != self.shown:
+            self.shown = shown
+            self.dirty = True
+
+    def touch(self, pos):
+        if self.shown is None:
+            return False
+        self.acknowledged.add(self.shown['id'])
+        self._select()
+        return True
+
+    def draw(self, surface, fonts):
+        if self.shown is None:
+            surface.fill(BACKGROUND, self.rect)
+            return
+        surface.fill(SEVERITY_COLOURS.get(self.shown.get('severity'), PANEL), self.rect)
+        others = sum(1 for a in self.active if a not in self.acknowledged) - 1
+        text = self.shown['message'] + (f"  (+{others})" if others > 0 else '')
+        label = fonts['medium'].render(text, True, TEXT)
+        surface.blit(label, (self.rect.x + 10, self.rect.centery - label.get_height() // 2))
+
+
+class StatusBar(Widget):
+    """Clock, link state and renderer load, refreshed once per second"""
+
+    def __init__(self, rect, dashboard):
+        super().__init__(rect)
+        self.dashboard = dashboard
+        self.next_refresh = 0.0
+        self.text = ''
+
+    def tick(self, now):
+        if now < self.next_refresh:
+            return
+        self.next_refresh = now + 1.0
+        stats = self.dashboard.stats()
+        text = (f"{time.strftime('%H:%M:%S')}   MQTT {'ok' if self.dashboard.connected() else '--'}   "
+                f"{stats['fps']:.0f} fps   {stats['frame_ms']:.1f} ms   {stats['messages_per_s']:.0f} msg/s")
+        if text != self.text:
+            self.text = text
+            self.dirty = True
+
+    def draw(self, surface, fonts):
+        surface.fill(PANEL, self.rect)
+        label = fonts['small'].render(self.text, True, DIM)
+        surface.blit(label, (self.rect.x + 8, self.rect.centery - label.get_height() // 2))
+
+
+class TabBar(Widget):
+    """Page selector"""
+
+    def __init__(self, rect, names, select):
+        super().__init__(rect)
+        self.names = names
+        self.select = select
+        self.current = 0
+
+    def _tab(self, index):
+        width = self.rect.width // len(self.names)
+        return pygame.Rect(self.rect.x + index * width, self.rect.y, width, self.rect.height)
+
+    def touch(self, pos):
+        index = min(len(self.names) - 1, (pos[0] - self.rect.x) * len(self.names) // self.rect.width)
+        if index != self.current:
+            self.current = index
+            self.dirty = True
+            self.select(index)
+        return True
+
+    def draw(self, surface, fonts):
+        surface.fill(BACKGROUND, self.rect)
+        for index, name in enumerate(self.names):
+            tab = self._tab(index).inflate(-2 * TILE_MARGIN, -2 * TILE_MARGIN)
+            selected = index == self.current
+            surface.fill(ACCENT if selected else PANEL, tab)
+            label = fonts['medium'].render(name, True, BACKGROUND if selected else TEXT)
+            surface.blit(label, label.get_rect(center=tab.center))
+
+
+class Dashboard:
+    """
+    Paged tile dashboard driven by MQTT topics
+
+    Args:
+        display: 'display' section of config.yaml (size, fullscreen)
+        config: 'dashboard' section (grid, sparklines, pages of tiles)
+        connected: Callable returning the MQTT link state
+    """
+
+    def __init__(self, display, config, connected=lambda: True):
+        self.display = display
+        self.config = config
+        self.connected = connected
+        self.size = (display['width'], display['height'])
+        self.state = TopicState(events=AlertBanner.topics, max_events=config.get('max_events', 64))
+        self.screen = None
+        self.fonts = None
+
+        width, height = self.size
+        self.status = StatusBar((0, 0, width, STATUS_HEIGHT), self)
+        self.alerts = AlertBanner((0, STATUS_HEIGHT, width, ALERT_HEIGHT))
+        pages = config['pages']
+        self.tabs = TabBar((0, height - TABS_HEIGHT, width, TABS_HEIGHT), [p['name'] for p in pages], self.show)
+        self.pages = self._layout(pages, pygame.Rect(0, STATUS_HEIGHT + ALERT_HEIGHT, width,
+                                                     height - STATUS_HEIGHT - ALERT_HEIGHT - TABS_HEIGHT))
+        self.page = 0
+        self.chrome = [self.status, self.alerts, self.tabs]
+
+        # Every tile gets its data, visible or not (sparklines keep filling)
+        self.widgets = self.chrome + [tile for page in self.pages for tile in page]
+        self.routes = {}
+        for widget in self.widgets:
+            for topic in widget.topics:
+                self.routes.setdefault(topic, []).append(widget)
+        self.state.wanted = frozenset(self.routes)
+
+        self.frames = 0
+        self.frame_ms = 0.0
+        self.max_frame_ms = 0.0
+        self.touch_ms = 0.0
+        self.touches = 0
+        self.redrawn = 0
+        self.redrawn_area = 0
+        self._rate = (time.monotonic(), 0, 0)
+        self.fps = 0.0
+        self.messages_per_s = 0.0
+
+    def _layout(self, pages, content):
+        """Tiles of every page on a columns x rows grid"""
+        columns = self.config.get('columns', 4)
+        rows = self.config.get('rows', 3)
+        width, height = content.width // columns, content.height // rows
+        spark_interval = self.config.get('spark_interval', 1.0)
+        count = sum(len(p['tiles']) for p in pages)
+        start = time.monotonic()
+        layout = []
+        index = 0
+        for page in pages:
+            tiles = []
+            for slot, spec in enumerate(page['tiles'][:columns * rows]):
+                rect = (content.x + (slot % columns) * width, content.y + (slot // columns) * height, width, height)
+                # Staggered sampling: one sparkline redraw at a time
+                first = start + spark_interval * index / max(1, count)
+                tiles.append(Tile(rect, spec, self.config.get('spark_points', 60), spark_interval,
+                                  self.config.get('stale', 10.0), first, self.config.get('max_refresh', 10.0)))
+                index += 1
+            if len(page['tiles']) > columns * rows:
+                logger.warning(f"Page {page['name']}: {len(page['tiles']) - columns * rows} tiles do not fit")
+            layout.append(tiles)
+        return layout
+
+    def open(self):
+        """Create the window / framebuffer display"""
+        pygame.init()
+        flags = pygame.FULLSCREEN if self.display.get('fullscreen') else 0
+        self.screen = pygame.display.set_mode(self.size, flags)
+        pygame.display.set_caption('Casqueclone')
+        if self.display.get('fullscreen'):
+            pygame.mouse.set_visible(False)
+        self.fonts = {
+            'small': pygame.font.Font(None, 20),
+            'medium': pygame.font.Font(None, 26),
+            'large': pygame.font.Font(None, 40),
+        }
+        self.screen.fill(BACKGROUND)
+        pygame.display.flip()
+
+    def close(self):
+        pygame.quit()
+
+    def visible(self):
+        return self.chrome + self.pages[self.page]
+
+    def show(self, index):
+        """Switch page: every widget on screen is redrawn"""
+        self.page = index
+        self.screen.fill(BACKGROUND, pygame.Rect(0, 0, *self.size))
+        for widget in self.visible():
+            widget.dirty = True
+
+    def _touch(self, pos):
+        for widget in self.visible():
+            if widget.rect.collidepoint(pos) and widget.touch(pos):
+                return
+
+    def _events(self):
+        """Handle input; returns (running, touched)"""
+        touched = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False, touched
+            if event.type == pygame.FINGERDOWN:
+                self._touch((int(event.x * self.size[0]), int(event.y * self.size[1])))
+                touched = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and not getattr(event, 'touch', False):
+                # Touches also arrive as emulated mouse clicks: handled once
+                self._touch(event.pos)
+                touched = True
+        return True, touched
+
+    def frame(self, now=None):
+        """
+        One frame: input, coalesced data, dirty widgets
+
+        Returns:
+            False once the window was closed
+        """
+        start = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        running, touched = self._events()
+        if not running:
+            return False
+
+        updated, events = self.state.collect(now)
+        for topic in updated:
+            value = self.state.values[topic]
+            for widget in self.routes.get(topic, ()):
+                widget.update(topic, value, now)
+        for topic, value in events:
+            for widget in self.routes.get(topic, ()):
+                widget.update(topic, value, now)
+        for widget in self.widgets:
+            widget.tick(now)
+
+        rects = []
+        for widget in self.visible():
+            if widget.dirty:
+                widget.draw(self.screen, self.fonts)
+                widget.dirty = False
+                rects.append(widget.rect)
+                self.redrawn_area += widget.rect.width * widget.rect.height
+        if rects:
+            pygame.display.update(rects)
+        self.redrawn += len(rects)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        if touched:
+            self.touches += 1
+            self.touch_ms = elapsed
+        self.frames += 1
+        self.frame_ms += 0.1 * (elapsed - self.frame_ms)
+        self.max_frame_ms = max(self.max_frame_ms, elapsed)
+        self._measure_rates(now)
+        return True
+
+    def _measure_rates(self, now):
+        since, frames, received = self._rate
+        if now - since >= 1.0:
+            self.fps = (self.frames - frames) / (now - since)
+            self.messages_per_s = (self.state.received - received) / (now - since)
+            self._rate = (now, self.frames, self.state.received)
+
+    def stats(self):
+        screen_area = self.size[0] * self.size[1]
+        return {
+            'frames': self.frames,
+            'fps': round(self.fps, 1),
+            'frame_ms': round(self.frame_ms, 2),
+            'max_frame_ms': round(self.max_frame_ms, 2),
+            'touches': self.touches,
+            'touch_ms': round(self.touch_ms, 2),
+            'redrawn': self.redrawn,
+            'redrawn_ratio': round(self.redrawn_area / (screen_area * self.frames), 3) if self.frames else 0.0,
+            'messages_per_s': round(self.messages_per_s, 1),
+            'received': self.state.received,
+            'coalesced': self.state.coalesced,
+            'ignored': self.state.ignored,
+            'decoded': self.state.decoded,
+            'errors': self.state.errors,
+        }
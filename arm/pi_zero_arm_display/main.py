@@ -3,38 +3,92 @@
 Arm Display - Touchscreen control interface
 """
 
+import asyncio
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'shared'))
 
-import yaml
+from node_config import startup, load_node_config, prefetch_imports, NUMBER
 from logger import setup_logger
+from mqtt_async import AsyncMQTTClient
+from mqtt_topics import SYSTEM_STATUS
+from metrics import Metrics, now_us, report
 
 logger = setup_logger(__name__, 'logs/arm_display.log')
+startup.mark('imports')
+
+CONFIG_SCHEMA = {
+    'mqtt.broker': str, 'mqtt.port': int, 'mqtt.client_id': str,
+    'display.width': int, 'display.height': int, 'display.fps': NUMBER,
+    'dashboard.pages': list,
+    'metrics.interval': NUMBER,
+}
 
 def load_config():
-    config_path = Path(__file__).parent / 'config.yaml'
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+    """Load configuration (config/example.yaml + config.yaml + config/local.yaml, validated, cached)"""
+    return load_node_config(Path(__file__).parent, CONFIG_SCHEMA)
 
-def main():
-    logger.info("Arm Display Interface - Starting")
+async def gui_loop(dashboard, fps, metrics):
+    """GUI refresh on a fixed frame deadline (late frames are not made up)"""
+    loop = asyncio.get_running_loop()
+    frame_interval = 1.0 / fps
+    frame_timing = metrics.histogram('frame_ms')
+    late = metrics.counter('frames_late')
+    deadline = loop.time()
+    while True:
+        start = now_us()
+        if not dashboard.frame():
+            break
+        frame_timing.since(start)
+        deadline += frame_interval
+        delay = deadline - loop.time()
+        if delay < 0:
+            late.inc()
+            deadline = loop.time()
+            delay = 0
+        await asyncio.sleep(delay)
+
+async def run(config):
+    """Event-driven arm display"""
+    from dashboard import Dashboard
     
-    config = load_config()
+    mqtt_config = config['mqtt']
+    metrics = Metrics(mqtt_config['client_id'])
+    client = AsyncMQTTClient(mqtt_config['client_id'], mqtt_config['broker'], mqtt_config['port'],
+                             metrics=metrics)
+    dashboard = Dashboard(config['display'], config['dashboard'], client.connected.is_set)
+    # Raw payloads are only stored here, decoded once per frame
+    for topic in ('helmet/#', 'backpack/#', 'energy/#', 'system/#'):
+        client.subscribe(topic, dashboard.state.on_message)
+    await client.start()
     
-    # TODO: Initialize
-    # - Pygame display
-    # - MQTT client
-    # - Touch handlers
+    dashboard.open()
+    metrics.collect(lambda m: m.set_gauges('dashboard', dashboard.stats()))
+    reporter = asyncio.create_task(report(client.publish, SYSTEM_STATUS, metrics, config['metrics']['interval']))
     
+    startup.mark('ready')
+    logger.info(f"Startup: {startup.summary()}")
     logger.info("Interface ready")
     
     try:
-        import time
-        while True:
-            # TODO: Main GUI loop
-            time.sleep(0.033)  # ~30 FPS
+        await gui_loop(dashboard, config['display']['fps'], metrics)
+    finally:
+        reporter.cancel()
+        logger.info(f"Dashboard stats: {dashboard.stats()}")
+        dashboard.close()
+        await client.stop()
+
+def main():
+    # pygame (SDL) import overlaps with config loading
+    prefetch_imports('pygame')
+    logger.info("Arm Display Interface - Starting")
+    
+    config = load_config()
+    startup.mark('config')
+    
+    try:
+        asyncio.run(run(config))
     except KeyboardInterrupt:
         logger.info("Shutdown")
 
@@ -8,7 +8,7 @@ import time
 from config import WIFI_SSID, WIFI_PASSWORD
 
 def connect_wifi():
-    \"\"\"Connect to WiFi network\"\"\"
+    """Connect to WiFi network"""
     wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
     
@@ -9,12 +9,26 @@ WIFI_PASSWORD = 'Order66Execute'
 # MQTT
 MQTT_BROKER = '192.168.4.1'
 MQTT_PORT = 1883
+MQTT_CONNECT_TIMEOUT = 2    # secondes : connect() bloque la boucle uasyncio (umqtt.simple >= 1.4)
 MQTT_CLIENT_ID = 'esp32_backpack'
 
+# Hors ligne : store-and-forward (store_forward.py)
+# Les trames lues sans broker vont dans un ring RAM préalloué, débordent
+# par moitiés dans un fichier flash borné, puis partent par lots au retour
+RECONNECT_MIN_MS = 5000     # backoff de reconnexion (doublé à chaque échec, > LINK_INTERVAL)
+RECONNECT_MAX_MS = 30000
+BACKLOG_RAM_BYTES = 16384   # ring RAM
+BACKLOG_SPILL_PATH = 'backlog.bin'  # None = RAM seule
+BACKLOG_SPILL_BYTES = 262144  # taille max du fichier flash
+BACKLOG_BATCH_BYTES = 2048  # taille max d'un lot de rattrapage
+
+# Métriques (metrics.py) : instantané publié sur system/status
+METRICS_INTERVAL = 10  # secondes
+
 # I2C
 I2C_SDA = 21
 I2C_SCL = 22
-I2C_FREQ = 100000
+I2C_FREQ = 100000  # 400000 possible : tous les capteurs gèrent le fast mode
 
 # Sensors I2C addresses
 BME280_INT_ADDR = 0x76  # Intérieur
@@ -33,9 +47,59 @@ MQ2_EXT_PIN = 35  # ADC1_CH7
 MQ7_INT_PIN = 32  # ADC1_CH4
 MQ7_EXT_PIN = 33  # ADC1_CH5
 
+# Lecture MQ (gas_sensor.py) : rafale d'échantillons ADC, médiane + EMA,
+# ppm par table précalculée depuis Rs/R0 (pas de pow/log par lecture)
+MQ_SAMPLES = 16             # échantillons ADC par lecture
+MQ_EMA_SHIFT = 2            # poids d'une nouvelle médiane = 1/4
+MQ_RL = 10.0                # résistance de charge des modules (kOhm)
+MQ_VC = 5.0                 # tension du circuit capteur (V)
+MQ_ADC_DIVIDER = 1.0        # pont diviseur : V capteur / V entrée ADC
+MQ2_R0 = 10.0               # R0 par défaut (kOhm) tant que non calibré
+MQ7_R0 = 4.0
+MQ_R0_PATH = 'mq_r0.json'   # R0 calibrés, gardés en flash
+MQ_CALIBRATION_READS = 40   # lectures moyennées en air propre
+
+# Chauffe MQ-7 : 60 s à 5 V (nettoyage) puis 90 s à 1,4 V,
+# le CO est lu dans la fenêtre de fin de phase basse
+MQ7_HEATER_PIN = 26
+MQ7_HEATER_PWM_FREQ = 1000
+MQ7_HIGH_MS = 60000
+MQ7_LOW_MS = 90000
+MQ7_LOW_DUTY = 286          # 1,4 V / 5 V * 1023
+MQ7_WINDOW_MS = 5000
+
 # Ventilateur
 FAN_PIN = 25
 FAN_PWM_FREQ = 25000
 
 # Timing
-SENSOR_READ_INTERVAL = 2  # secondes (plus de capteurs = plus lent)
+SENSOR_READ_INTERVAL = 2  # secondes (ancienne boucle read_all)
+
+# Cadence par capteur (ms) - scheduler uasyncio
+BME280_PERIOD_MS = 2000
+ENS160_PERIOD_MS = 2000
+MQ_PERIOD_MS = 250        # gaz : cadence moyenne (alertes rapides)
+
+# Alertes gaz locales (system/alerts) : publiées à la levée et à la fin seulement,
+# relâchées sous ALERT_CLEAR_RATIO * seuil (hystérésis)
+CO_ALERT_PPM = 50
+SMOKE_ALERT_PPM = 300
+ALERT_CLEAR_RATIO = 0.8
+
+# Capteurs extérieurs derrière le PCA9548A extérieur
+BME280_EXT_CHANNEL = 0
+ENS160_EXT_CHANNEL = 1
+
+# Publication par bande morte (deadband.py)
+# Un bloc n'est publié que si un champ bouge de plus que son delta ;
+# instantané complet toutes les HEARTBEAT_MS
+HEARTBEAT_MS = 15000
+DEADBANDS = {
+    'temperature': 0.2,  # °C
+    'humidity': 1.0,     # %
+    'pressure': 0.5,     # hPa
+    'aqi': 0, 'tvoc': 10, 'eco2': 20,
+    'raw': 50,           # ADC brut
+    'ppm': 5,            # fumée
+    'co_ppm': 2,
+}
@@ -3,10 +3,113 @@ ESP32 Backpack - Main Program
 Environmental monitoring with multiple sensors
 """
 
-import time
+import gc
+import json
+import uasyncio as asyncio
 from sensors import SensorManager
-from mqtt_client import MQTTHandler
-from config import SENSOR_READ_INTERVAL
+from mqtt_client import MQTTHandler, BUDGET_TOPIC, COMMAND_TOPIC, STATUS_TOPIC
+from power_budget import LEVEL_NAMES, budget_rate, parse_budget
+from deadband import DeadbandFilter
+from metrics import Metrics, report
+from config import DEADBANDS, HEARTBEAT_MS, METRICS_INTERVAL, MQTT_CLIENT_ID
+
+STATS_INTERVAL = 30  # secondes
+MQTT_POLL_INTERVAL = 0.5  # secondes (messages entrants : budget d'énergie)
+LINK_INTERVAL = 1  # secondes (reconnexion, vidage du backlog hors ligne)
+
+def update_fan(sensors, bme_int):
+    """Fan control based on interior temp"""
+    if bme_int['temperature'] > 35:
+        sensors.set_fan_speed(100)
+    elif bme_int['temperature'] > 30:
+        sensors.set_fan_speed(70)
+    elif bme_int['temperature'] > 25:
+        sensors.set_fan_speed(40)
+    else:
+        sensors.set_fan_speed(0)
+
+async def report_stats(scheduler, deadband, mqtt):
+    """Print scheduler and publish counters periodically"""
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        print('Scheduler stats:', scheduler.stats())
+        print('Deadband stats:', deadband.stats())
+        print('Backlog stats:', mqtt.stats())
+
+def collect_stats(sensors, scheduler, deadband, mqtt):
+    """Metrics collector: counters kept by the scheduler, deadband, backlog and gas sensors"""
+    def collect(metrics):
+        metrics.set_gauges('backlog', mqtt.stats())
+        metrics.set_gauges('deadband', deadband.stats())
+        for key, stats in scheduler.stats()['sensors'].items():
+            metrics.set_gauges('sensor', stats, {'sensor': key})
+        for key, gas in sensors.gas.items():
+            metrics.gauge('gas_r0_kohm', {'sensor': key}).set(round(gas.r0, 3))
+        metrics.set_gauges('mq7_heater', sensors.mq7_heater.stats())
+        if hasattr(gc, 'mem_free'):
+            metrics.gauge('mem_free').set(gc.mem_free())
+    return collect
+
+async def poll_mqtt(mqtt):
+    """Deliver incoming MQTT messages (umqtt has no receive thread)"""
+    while True:
+        mqtt.check_msg()
+        await asyncio.sleep(MQTT_POLL_INTERVAL)
+
+async def maintain_link(mqtt):
+    """Reconnect in the background and flush the offline backlog in bulk"""
+    while True:
+        if mqtt.maintain():
+            # One batch per pass: sensor reads keep running in between
+            while mqtt.flush_backlog():
+                await asyncio.sleep(0)
+        await asyncio.sleep(LINK_INTERVAL)
+
+async def run(sensors, mqtt, metrics):
+    """Each sensor at its own cadence, published as soon as it is read"""
+    deadband = DeadbandFilter(DEADBANDS, HEARTBEAT_MS)
+    
+    def on_ready(readings):
+        # Gas alerts: published when raised or cleared only
+        for alert in sensors.check_alerts(readings):
+            print('Alert', alert['id'], alert['state'], alert['value'])
+            mqtt.publish('system/alerts', alert)
+        
+        # Publish data
+        changed = deadband.filter(readings)
+        if changed:
+            mqtt.publish_sensor_data(changed)
+        
+        bme_int = readings.get('bme280_int')
+        if bme_int:
+            update_fan(sensors, bme_int)
+    
+    scheduler = sensors.create_scheduler(on_ready, metrics)
+    metrics.collect(collect_stats(sensors, scheduler, deadband, mqtt))
+    
+    def on_budget(topic, payload):
+        # Slower reads when the battery runs low (energy node)
+        level = parse_budget(payload)
+        if level is not None and budget_rate(level) != scheduler.rate:
+            scheduler.set_rate(budget_rate(level))
+            print('Power budget:', LEVEL_NAMES[level])
+    
+    def on_command(topic, payload):
+        # R0 calibration in clean air, saved to flash when done
+        try:
+            command = json.loads(payload)
+        except ValueError:
+            return
+        if isinstance(command, dict) and command.get('command') == 'calibrate_gas':
+            sensors.calibrate_gas(command.get('sensors'))
+    
+    mqtt.subscribe(BUDGET_TOPIC, on_budget)
+    mqtt.subscribe(COMMAND_TOPIC, on_command)
+    asyncio.create_task(poll_mqtt(mqtt))
+    asyncio.create_task(maintain_link(mqtt))
+    asyncio.create_task(report_stats(scheduler, deadband, mqtt))
+    asyncio.create_task(report(mqtt.publish, STATUS_TOPIC, metrics, METRICS_INTERVAL))
+    await scheduler.run()
 
 def main():
     print('=' * 40)
@@ -15,49 +118,17 @@ def main():
     
     # Initialize
     sensors = SensorManager()
-    mqtt = MQTTHandler()
+    metrics = Metrics(MQTT_CLIENT_ID)
+    mqtt = MQTTHandler(metrics)
     
-    # Connect MQTT
+    # Connect MQTT (retried in the background, readings kept meanwhile)
     if not mqtt.connect():
-        print('MQTT connection failed. Retrying...')
-        time.sleep(5)
-        return
+        print('MQTT not available, buffering readings offline')
     
     print('System ready')
     
-    loop_count = 0
-    
     try:
-        while True:
-            loop_count += 1
-            print(f'\n--- Loop {loop_count} ---')
-            
-            # Read all sensors
-            sensor_data = sensors.read_all()
-            
-            # Check for alerts
-            alerts = sensors.check_alerts(sensor_data)
-            if alerts:
-                for alert in alerts:
-                    print(alert)
-                    mqtt.publish('system/alerts', {'message': alert})
-            
-            # Publish data
-            mqtt.publish_sensor_data(sensor_data)
-            
-            # Fan control based on interior temp
-            bme_int = sensor_data.get('bme280_int')
-            if bme_int and bme_int['temperature'] > 35:
-                sensors.set_fan_speed(100)
-            elif bme_int and bme_int['temperature'] > 30:
-                sensors.set_fan_speed(70)
-            elif bme_int and bme_int['temperature'] > 25:
-                sensors.set_fan_speed(40)
-            else:
-                sensors.set_fan_speed(0)
-            
-            time.sleep(SENSOR_READ_INTERVAL)
-    
+        asyncio.run(run(sensors, mqtt, metrics))
     except KeyboardInterrupt:
         print('\nShutdown')
     except Exception as e:
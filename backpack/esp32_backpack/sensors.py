@@ -1,11 +1,20 @@
 ﻿"""
 Sensor management for ESP32 Backpack
-Handles all I2C sensors + MQ gas sensors
+Handles all I2C sensors (burst-read drivers of sensor_drivers.py) + MQ gas sensors (gas_sensor.py)
 """
 
 from machine import I2C, Pin, PWM, ADC
-import time
 from config import *
+from sensor_scheduler import Pca9548a, SensorScheduler
+from sensor_drivers import Bme280, Ens160
+from gas_sensor import MQ2_SMOKE, MQ7_CO, MqSensor, Mq7Heater, load_r0, save_r0
+
+# (alert id, reading, field, limit, message): ids of the Pi 5 alert rules
+# (backpack/pi5_server/alerts.py), so the arm display merges both sources
+GAS_ALERTS = (
+    ('co_interior', 'mq7_int', 'co_ppm', CO_ALERT_PPM, 'High CO inside the suit'),
+    ('smoke_interior', 'mq2_int', 'ppm', SMOKE_ALERT_PPM, 'Smoke inside the suit'),
+)
 
 class SensorManager:
     def __init__(self):
@@ -16,23 +25,29 @@ class SensorManager:
         self.fan = PWM(Pin(FAN_PIN), freq=FAN_PWM_FREQ)
         self.fan.duty(0)
         
-        # MQ sensors (analog)
-        self.mq2_int = ADC(Pin(MQ2_INT_PIN))
-        self.mq2_ext = ADC(Pin(MQ2_EXT_PIN))
-        self.mq7_int = ADC(Pin(MQ7_INT_PIN))
-        self.mq7_ext = ADC(Pin(MQ7_EXT_PIN))
+        # MQ sensors (analog): burst sampling + filter + ppm table, R0 from flash
+        self.r0 = load_r0(MQ_R0_PATH)
+        self.mq2_int = self._mq_sensor('mq2_int', MQ2_INT_PIN, MQ2_SMOKE, MQ2_R0)
+        self.mq2_ext = self._mq_sensor('mq2_ext', MQ2_EXT_PIN, MQ2_SMOKE, MQ2_R0)
+        self.mq7_int = self._mq_sensor('mq7_int', MQ7_INT_PIN, MQ7_CO, MQ7_R0)
+        self.mq7_ext = self._mq_sensor('mq7_ext', MQ7_EXT_PIN, MQ7_CO, MQ7_R0)
+        self.gas = {
+            'mq2_int': self.mq2_int, 'mq2_ext': self.mq2_ext,
+            'mq7_int': self.mq7_int, 'mq7_ext': self.mq7_ext,
+        }
+        self.calibrating = set()
+        self.alerts_active = set()
         
-        # Configure ADC
-        self.mq2_int.atten(ADC.ATTN_11DB)  # 0-3.3V range
-        self.mq2_ext.atten(ADC.ATTN_11DB)
-        self.mq7_int.atten(ADC.ATTN_11DB)
-        self.mq7_ext.atten(ADC.ATTN_11DB)
+        # MQ-7 heater cycle (both MQ-7 heaters on one MOSFET)
+        heater = PWM(Pin(MQ7_HEATER_PIN), freq=MQ7_HEATER_PWM_FREQ)
+        self.mq7_heater = Mq7Heater(heater, MQ7_HIGH_MS, MQ7_LOW_MS, MQ7_LOW_DUTY, MQ7_WINDOW_MS)
         
-        # Detect sensors
+        # Detect sensors, then load calibration / set modes once
         self.scan_sensors()
+        self.init_drivers()
     
     def scan_sensors(self):
-        \"\"\"Scan I2C bus\"\"\"
+        """Scan I2C bus"""
         devices = self.i2c.scan()
         print('I2C devices found:', [hex(d) for d in devices])
         
@@ -41,73 +56,113 @@ class SensorManager:
         self.has_aht21_int = AHT21_INT_ADDR in devices
         self.has_ina219 = INA219_ADDR in devices
         self.has_pca9548a_int = PCA9548A_INT_ADDR in devices
+        self.has_pca9548a_ext = PCA9548A_EXT_ADDR in devices
+        self.mux_ext = Pca9548a(self.i2c, PCA9548A_EXT_ADDR) if self.has_pca9548a_ext else None
     
-    def read_bme280(self, interior=True):
-        \"\"\"Read BME280 (interior or exterior)\"\"\"
-        # TODO: Implement with proper library
+    def _driver(self, name, cls, address, channel=None):
+        """Driver of one sensor (channel = exterior mux channel), None when absent or failing"""
+        if channel is not None:
+            if not self.mux_ext:
+                return None
+            self.mux_ext.select(channel)
         try:
-            return {
-                'temperature': 25.0,
-                'humidity': 50.0,
-                'pressure': 1013.25,
-                'location': 'interior' if interior else 'exterior'
-            }
+            return cls(self.i2c, address)
         except Exception as e:
-            print(f'Error reading BME280: {e}')
+            print(f'Error initialising {name}: {e}')
+            return None
+    
+    def init_drivers(self):
+        """Create the burst-read drivers (interior on the main bus, exterior behind mux_ext)"""
+        self.bme280_int = self._driver('BME280 int', Bme280, BME280_INT_ADDR) if self.has_bme280_int else None
+        self.ens160_int = self._driver('ENS160 int', Ens160, ENS160_INT_ADDR) if self.has_ens160_int else None
+        self.bme280_ext = self._driver('BME280 ext', Bme280, BME280_EXT_ADDR, BME280_EXT_CHANNEL)
+        self.ens160_ext = self._driver('ENS160 ext', Ens160, ENS160_EXT_ADDR, ENS160_EXT_CHANNEL)
+        if self.mux_ext:
+            self.mux_ext.select(None)
+    
+    def read_bme280(self, interior=True):
+        """Read BME280 (interior or exterior), one 8-byte burst"""
+        sensor = self.bme280_int if interior else self.bme280_ext
+        if sensor is None:
             return None
+        data = sensor.read()
+        ens160 = self.ens160_int if interior else self.ens160_ext
+        if ens160:
+            ens160.ambient(data['temperature'], data['humidity'])
+        data['location'] = 'interior' if interior else 'exterior'
+        return data
     
     def read_ens160(self, interior=True):
-        \"\"\"Read ENS160 air quality\"\"\"
-        # TODO: Implement
-        try:
-            return {
-                'aqi': 1,
-                'tvoc': 0,
-                'eco2': 400,
-                'location': 'interior' if interior else 'exterior'
-            }
-        except Exception as e:
-            print(f'Error reading ENS160: {e}')
+        """Read ENS160 air quality (None until a new result is flagged)"""
+        sensor = self.ens160_int if interior else self.ens160_ext
+        if sensor is None:
             return None
+        data = sensor.read()
+        if data:
+            data['location'] = 'interior' if interior else 'exterior'
+        return data
+    
+    def _mq_sensor(self, key, pin, curve, default_r0):
+        """MQ sensor on an ADC pin (0-3.3V range), calibrated R0 if saved"""
+        adc = ADC(Pin(pin))
+        adc.atten(ADC.ATTN_11DB)
+        return MqSensor(adc, curve, self.r0.get(key, default_r0), MQ_SAMPLES, MQ_EMA_SHIFT,
+                        MQ_RL, MQ_VC, divider=MQ_ADC_DIVIDER)
+    
+    def calibrate_gas(self, keys=None, reads=MQ_CALIBRATION_READS):
+        """
+        Start the R0 calibration of MQ sensors (clean air, sensors warmed up)
+        
+        Args:
+            keys: Sensor keys ('mq2_int'...), None = all
+            reads: Reads averaged (MQ-7: reads of the measurement window)
+        """
+        for key in keys or self.gas:
+            sensor = self.gas.get(key)
+            if sensor:
+                sensor.calibrate(reads)
+                self.calibrating.add(key)
+                print(f'Calibrating {key} R0 over {reads} reads')
+    
+    def _calibration_done(self, key, sensor):
+        """Save R0 to flash once a sensor finished its calibration"""
+        if key in self.calibrating and not sensor.calibrating:
+            self.calibrating.discard(key)
+            self.r0[key] = sensor.r0
+            save_r0(MQ_R0_PATH, self.r0)
     
     def read_mq2(self, interior=True):
-        \"\"\"Read MQ-2 smoke/gas sensor\"\"\"
-        try:
-            adc = self.mq2_int if interior else self.mq2_ext
-            raw = adc.read()
-            
-            # Convert to approximate ppm (calibration needed)
-            ppm = (raw / 4095) * 1000  # Placeholder formula
-            
-            return {
-                'raw': raw,
-                'ppm': ppm,
-                'location': 'interior' if interior else 'exterior'
-            }
-        except Exception as e:
-            print(f'Error reading MQ-2: {e}')
-            return None
+        """Read MQ-2 smoke/gas sensor (burst median + EMA, ppm from table)"""
+        key = 'mq2_int' if interior else 'mq2_ext'
+        sensor = self.gas[key]
+        raw, ppm = sensor.read()
+        if self.calibrating:
+            self._calibration_done(key, sensor)
+        return {
+            'raw': raw,
+            'ppm': ppm,
+            'location': 'interior' if interior else 'exterior'
+        }
     
     def read_mq7(self, interior=True):
-        \"\"\"Read MQ-7 CO sensor\"\"\"
-        try:
-            adc = self.mq7_int if interior else self.mq7_ext
-            raw = adc.read()
-            
-            # Convert to CO ppm (calibration needed)
-            co_ppm = (raw / 4095) * 200  # Placeholder formula
-            
-            return {
-                'raw': raw,
-                'co_ppm': co_ppm,
-                'location': 'interior' if interior else 'exterior'
-            }
-        except Exception as e:
-            print(f'Error reading MQ-7: {e}')
+        """Read MQ-7 CO sensor, only in the measurement window of the heater cycle"""
+        key = 'mq7_int' if interior else 'mq7_ext'
+        sensor = self.gas[key]
+        if not self.mq7_heater.poll():
+            # Heating / settling: the next window starts a fresh filter
+            sensor.reset()
             return None
+        raw, co_ppm = sensor.read()
+        if self.calibrating:
+            self._calibration_done(key, sensor)
+        return {
+            'raw': raw,
+            'co_ppm': co_ppm,
+            'location': 'interior' if interior else 'exterior'
+        }
     
     def read_all(self):
-        \"\"\"Read all sensors\"\"\"
+        """Read all sensors"""
         return {
             'bme280_int': self.read_bme280(interior=True),
             'bme280_ext': self.read_bme280(interior=False),
@@ -119,24 +174,69 @@ class SensorManager:
             'mq7_ext': self.read_mq7(interior=False)
         }
     
+    def create_scheduler(self, on_ready, metrics=None):
+        """
+        Build the per-sensor scheduler (cadences and channels from config)
+        
+        Exterior I2C sensors sit behind the exterior PCA9548A; the
+        scheduler groups their reads so the channel is switched as
+        rarely as possible. MQ sensors are ADC bursts (no bus).
+        
+        Args:
+            on_ready: Callback(readings) called after each pass with new data
+            metrics: Metrics registry timing each sensor read (optional)
+        """
+        scheduler = SensorScheduler(on_ready, metrics=metrics)
+        mux = self.mux_ext
+        if self.bme280_int:
+            scheduler.add('bme280_int', lambda: self.read_bme280(interior=True), BME280_PERIOD_MS)
+        if self.ens160_int:
+            scheduler.add('ens160_int', lambda: self.read_ens160(interior=True), ENS160_PERIOD_MS)
+        if self.bme280_ext:
+            scheduler.add('bme280_ext', lambda: self.read_bme280(interior=False),
+                          BME280_PERIOD_MS, mux, BME280_EXT_CHANNEL)
+        if self.ens160_ext:
+            scheduler.add('ens160_ext', lambda: self.read_ens160(interior=False),
+                          ENS160_PERIOD_MS, mux, ENS160_EXT_CHANNEL)
+        # Gas sensors keep their cadence whatever the power budget (safety)
+        scheduler.add('mq2_int', lambda: self.read_mq2(interior=True), MQ_PERIOD_MS, scalable=False)
+        scheduler.add('mq2_ext', lambda: self.read_mq2(interior=False), MQ_PERIOD_MS, scalable=False)
+        scheduler.add('mq7_int', lambda: self.read_mq7(interior=True), MQ_PERIOD_MS, scalable=False)
+        scheduler.add('mq7_ext', lambda: self.read_mq7(interior=False), MQ_PERIOD_MS, scalable=False)
+        return scheduler
+    
     def set_fan_speed(self, speed):
-        \"\"\"Set fan speed (0-100%)\"\"\"
+        """Set fan speed (0-100%)"""
         duty = int((speed / 100) * 1023)
         self.fan.duty(duty)
         print(f'Fan speed set to {speed}%')
     
     def check_alerts(self, sensor_data):
-        \"\"\"Check for dangerous gas levels\"\"\"
-        alerts = []
-        
-        # Check CO levels (interior)
-        mq7_int = sensor_data.get('mq7_int')
-        if mq7_int and mq7_int['co_ppm'] > 50:
-            alerts.append('⚠️  HIGH CO DETECTED INTERIOR!')
+        """
+        Gas alert transitions, latched with hysteresis
         
-        # Check smoke (interior)
-        mq2_int = sensor_data.get('mq2_int')
-        if mq2_int and mq2_int['ppm'] > 300:
-            alerts.append('⚠️  SMOKE DETECTED INTERIOR!')
+        An alert is returned once when raised and once when cleared,
+        not on every read while the gas level stays high.
         
+        Returns:
+            List of alert dicts for system/alerts (Pi 5 alert payload)
+        """
+        alerts = []
+        for alert_id, key, field, limit, message in GAS_ALERTS:
+            reading = sensor_data.get(key)
+            if not reading:
+                continue
+            value = reading[field]
+            if alert_id not in self.alerts_active:
+                if value <= limit:
+                    continue
+                self.alerts_active.add(alert_id)
+                state = 'raised'
+            else:
+                if value >= limit * ALERT_CLEAR_RATIO:
+                    continue
+                self.alerts_active.discard(alert_id)
+                state = 'cleared'
+            alerts.append({'id': alert_id, 'state': state, 'severity': 'critical', 'message': message,
+                           'value': round(value, 2), 'threshold': limit, 'source': 'esp32'})
         return alerts
@@ -0,0 +1,284 @@
+"""
+Alert rules engine
+Declarative rules compiled into NumPy arrays, evaluated in one pass per tick
+
+Rule kinds:
+    threshold : value of (topic, field) above / below a limit
+    rate      : change of (topic, field) per second over `window` seconds
+    delta     : (topic, field) minus (ref_topic, ref_field), e.g. interior - exterior
+
+Every rule supports hysteresis (`clear`: the level at which an active
+alert is released) and a minimum duration (`for`: seconds the condition
+must hold before the alert is raised). Alerts are published on
+SYSTEM_ALERTS only when they are raised or cleared, plus a reminder
+every `repeat` seconds while they stay active.
+"""
+
+import json
+import logging
+import math
+import time
+
+import numpy as np
+
+from constants import TEMP_MAX_WARNING, CO_MAX_WARNING, SMOKE_MAX_WARNING, BATTERY_LOW_WARNING
+from mqtt_topics import (
+    HELMET_TEMP, BACKPACK_TEMP_INT, BACKPACK_GAS_CO_INT, BACKPACK_GAS_CO_EXT,
+    BACKPACK_GAS_SMOKE_INT, BACKPACK_GAS_SMOKE_EXT, ENERGY_BATTERY_LEVEL,
+)
+
+logger = logging.getLogger(__name__)
+
+KIND_THRESHOLD = 0
+KIND_RATE = 1
+KIND_DELTA = 2
+KINDS = {'threshold': KIND_THRESHOLD, 'rate': KIND_RATE, 'delta': KIND_DELTA}
+
+DEFAULT_RULES = (
+    {'id': 'co_interior', 'topic': BACKPACK_GAS_CO_INT, 'field': 'co_ppm',
+     'above': CO_MAX_WARNING, 'clear': CO_MAX_WARNING * 0.8, 'for': 2,
+     'severity': 'critical', 'message': 'High CO inside the suit'},
+    {'id': 'co_exterior', 'topic': BACKPACK_GAS_CO_EXT, 'field': 'co_ppm',
+     'above': CO_MAX_WARNING, 'clear': CO_MAX_WARNING * 0.8, 'for': 2,
+     'severity': 'warning', 'message': 'High CO outside'},
+    {'id': 'co_rising', 'kind': 'rate', 'topic': BACKPACK_GAS_CO_INT, 'field': 'co_ppm',
+     'above': 2.0, 'clear': 0.5, 'window': 10,
+     'severity': 'warning', 'message': 'CO rising fast inside the suit'},
+    {'id': 'co_leak', 'kind': 'delta', 'topic': BACKPACK_GAS_CO_INT, 'field': 'co_ppm',
+     'ref_topic': BACKPACK_GAS_CO_EXT, 'ref_field': 'co_ppm',
+     'above': 20, 'clear': 10, 'for': 5,
+     'severity': 'warning', 'message': 'More CO inside than outside'},
+    {'id': 'smoke_interior', 'topic': BACKPACK_GAS_SMOKE_INT, 'field': 'ppm',
+     'above': SMOKE_MAX_WARNING, 'clear': SMOKE_MAX_WARNING * 0.8, 'for': 2,
+     'severity': 'critical', 'message': 'Smoke inside the suit'},
+    {'id': 'smoke_exterior', 'topic': BACKPACK_GAS_SMOKE_EXT, 'field': 'ppm',
+     'above': SMOKE_MAX_WARNING, 'clear': SMOKE_MAX_WARNING * 0.8, 'for': 2,
+     'severity': 'warning', 'message': 'Smoke outside'},
+    {'id': 'helmet_temp', 'topic': HELMET_TEMP, 'field': 'value',
+     'above': TEMP_MAX_WARNING, 'clear': TEMP_MAX_WARNING - 1, 'for': 10,
+     'severity': 'warning', 'message': 'Helmet temperature high'},
+    {'id': 'backpack_temp', 'topic': BACKPACK_TEMP_INT, 'field': 'temperature',
+     'above': TEMP_MAX_WARNING, 'clear': TEMP_MAX_WARNING - 1, 'for': 10,
+     'severity': 'warning', 'message': 'Backpack temperature high'},
+    {'id': 'battery_low', 'topic': ENERGY_BATTERY_LEVEL, 'field': 'value',
+     'below': BATTERY_LOW_WARNING, 'clear': BATTERY_LOW_WARNING + 5,
+     'severity': 'warning', 'message': 'Battery low'},
+)
+
+
+class AlertEngine:
+    """
+    Compiles rules and evaluates them against the latest sensor values
+
+    Args:
+        rules: Iterable of rule dictionaries (see DEFAULT_RULES)
+        publish: Callable(topic, payload) used to publish alerts
+        topic: Alert topic (SYSTEM_ALERTS)
+        interval: Tick period in seconds (sizes the rate-of-change history)
+        stale: Inputs older than this (seconds) freeze their rules
+        repeat: Reminder period for active alerts (0 = transitions only)
+    """
+
+    def __init__(self, rules, publish, topic, interval=0.5, stale=30.0, repeat=60.0):
+        self.publish = publish
+        self.topic = topic
+        self.interval = interval
+        self.stale = stale
+        self.repeat = repeat
+        self.ticks = 0
+        self.published = 0
+        self._compile(list(rules))
+
+    def _slot(self, topic, field):
+        key = (topic, field)
+        if key not in self._slots:
+            self._slots[key] = len(self._slots)
+            self._inputs.setdefault(topic, []).append((field, self._slots[key]))
+        return self._slots[key]
+
+    def _compile(self, rules):
+        self._slots = {}
+        self._inputs = {}  # topic -> [(field, slot)]
+        self.rules = []
+
+        kind, a, b, sign, on, off, hold, lag = ([] for _ in range(8))
+        for rule in rules:
+            if ('above' in rule) == ('below' in rule):
+                raise ValueError(f"Alert rule {rule.get('id')} needs either 'above' or 'below'")
+            if 'above' in rule:
+                direction, limit = 1.0, float(rule['above'])
+            else:
+                direction, limit = -1.0, float(rule['below'])
+            rule_kind = KINDS[rule.get('kind', 'threshold')]
+            slot = self._slot(rule['topic'], rule.get('field', 'value'))
+            ref = slot
+            if rule_kind == KIND_DELTA:
+                ref = self._slot(rule['ref_topic'], rule.get('ref_field', 'value'))
+
+            kind.append(rule_kind)
+            a.append(slot)
+            b.append(ref)
+            # Compare everything as "greater than": below-rules are negated
+            sign.append(direction)
+            on.append(direction * limit)
+            off.append(direction * float(rule.get('clear', limit)))
+            hold.append(float(rule.get('for', 0)))
+            lag.append(max(1, round(float(rule.get('window', 10)) / self.interval)))
+            self.rules.append(rule)
+
+        self._kind = np.array(kind, dtype=np.int8)
+        self._a = np.array(a, dtype=np.intp)
+        self._b = np.array(b, dtype=np.intp)
+        self._sign = np.array(sign)
+        self._on = np.array(on)
+        self._off = np.array(off)
+        self._hold = np.array(hold)
+        self._lag = np.array(lag, dtype=np.intp)
+
+        count = len(self.rules)
+        self._active = np.zeros(count, dtype=bool)
+        self._pending = np.full(count, np.nan)   # condition start time
+        self._since = np.full(count, np.nan)     # raise time
+        self._notified = np.full(count, np.nan)  # last publish time
+
+        slots = len(self._slots)
+        self.values = np.full(slots, np.nan)
+        self.updated = np.full(slots, -np.inf)
+        # Per-tick snapshots of every input for rate rules
+        depth = int(self._lag.max()) + 1 if count else 1
+        self._history = np.full((depth, slots), np.nan)
+        self._history_ts = np.full(depth, np.nan)
+
+    @property
+    def topics(self):
+        """Topics the engine must be subscribed to"""
+        return list(self._inputs)
+
+    def on_message(self, topic, payload):
+        """Store the latest value of every field used by a rule"""
+        fields = self._inputs.get(topic)
+        if fields is None:
+            return
+        try:
+            data = json.loads(payload)
+        except (ValueError, UnicodeDecodeError):
+            return
+        now = time.time()
+        for field, slot in fields:
+            value = data.get(field) if isinstance(data, dict) else data if field == 'value' else None
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.values[slot] = value
+                self.updated[slot] = now
+
+    def evaluate(self, now=None):
+        """
+        Evaluate every rule once
+
+        Returns:
+            List of alert payloads published during this tick
+        """
+        now = time.time() if now is None else now
+        if not len(self.rules):
+            return []
+        depth = len(self._history_ts)
+        row = self.ticks % depth
+        self._history[row] = self.values
+        self._history_ts[row] = now
+        self.ticks += 1
+
+        fresh = np.where(now - self.updated <= self.stale, self.values, np.nan)
+        va = fresh[self._a]
+
+        # Rate over each rule's window (NaN until the history is long enough)
+        past = (row - self._lag) % depth
+        elapsed = now - self._history_ts[past]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate = (va - self._history[past, self._a]) / elapsed
+
+        signal = np.select(
+            [self._kind == KIND_RATE, self._kind == KIND_DELTA],
+            [rate, va - fresh[self._b]],
+            va,
+        )
+        level = signal * self._sign
+        valid = ~np.isnan(level)
+
+        with np.errstate(invalid='ignore'):
+            raw = np.where(self._active, level > self._off, level > self._on)
+        # Missing / stale inputs keep the current state
+        condition = np.where(valid, raw, self._active)
+
+        self._pending = np.where(condition, np.where(np.isnan(self._pending), now, self._pending), np.nan)
+        held = now - self._pending >= self._hold
+
+        raised = condition & held & ~self._active
+        cleared = ~condition & self._active
+        self._active = (self._active | raised) & ~cleared
+        self._since = np.where(raised, now, np.where(cleared, np.nan, self._since))
+
+        remind = np.zeros_like(raised)
+        if self.repeat:
+            with np.errstate(invalid='ignore'):
+                remind = self._active & ~raised & (now - self._notified >= self.repeat)
+
+        alerts = []
+        for index in np.flatnonzero(raised | cleared | remind):
+            state = 'raised' if raised[index] else 'cleared' if cleared[index] else 'active'
+            alerts.append(self._notify(index, state, signal[index], now))
+        return alerts
+
+    def _notify(self, index, state, value, now):
+        rule = self.rules[index]
+        since = self._since[index]
+        alert = {
+            'id': rule['id'],
+            'state': state,
+            'severity': rule.get('severity', 'warning'),
+            'message': rule.get('message', rule['id']),
+            'value': None if math.isnan(value) else round(float(value), 2),
+            'threshold': rule.get('above', rule.get('below')),
+            'since': None if math.isnan(since) else round(float(since), 3),
+            'ts': round(now, 3),
+        }
+        self._notified[index] = now if state != 'cleared' else np.nan
+        self.publish(self.topic, json.dumps(alert))
+        self.published += 1
+        if state == 'raised':
+            logger.warning(f"Alert {rule['id']}: {alert['message']} ({alert['value']})")
+        elif state == 'cleared':
+            logger.info(f"Alert {rule['id']} cleared ({alert['value']})")
+        return alert
+
+    def active(self):
+        """Ids of the currently active alerts"""
+        return [self.rules[i]['id'] for i in np.flatnonzero(self._active)]
+
+    def stats(self):
+        return {
+            'rules': len(self.rules),
+            'inputs': len(self._slots),
+            'ticks': self.ticks,
+            'published': self.published,
+            'active': self.active(),
+        }
+
+
+def load_rules(config):
+    """
+    Rules from the 'alerts' config section
+
+    DEFAULT_RULES (built from shared/constants.py) are used unless
+    'defaults' is false; 'rules' adds rules or overrides defaults by id.
+    An override setting 'above' replaces the default's 'below' (and
+    its 'clear' level), and the reverse.
+    """
+    rules = {rule['id']: dict(rule) for rule in DEFAULT_RULES} if config.get('defaults', True) else {}
+    for rule in config.get('rules') or ():
+        merged = dict(rules.get(rule['id'], {}))
+        for key, opposite in (('above', 'below'), ('below', 'above')):
+            if key in rule and opposite in merged:
+                del merged[opposite]
+                merged.pop('clear', None)
+        merged.update(rule)
+        rules[rule['id']] = merged
+    return list(rules.values())
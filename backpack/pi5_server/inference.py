@@ -0,0 +1,497 @@
+"""
+Stereo YOLO inference stage
+Runs the latest left + right frames as one batch on the Pi 5 CPU
+
+The eyes gate frames on motion (see motion_gate.py): skipped frames
+never arrive and the last detections stay valid, ROI frames only
+refresh the detections inside their region.
+
+With a StereoDepth stage, paired full frames also get a disparity map
+(computed in the decode pool while the model runs) and every new
+detection a distance.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from frame_transport import EYE_LEFT, EYE_RIGHT, EYE_NAMES, CODEC_JPEG, CODEC_MASK, FLAG_KEYFRAME, split_roi
+
+logger = logging.getLogger(__name__)
+
+EYES = (EYE_LEFT, EYE_RIGHT)
+PAD_VALUE = 114
+CANVAS_STRIDE = 32  # YOLO input sizes are multiples of the largest stride
+EYE_IDS = {name: eye for eye, name in EYE_NAMES.items()}
+
+
+class _PendingFrame:
+    __slots__ = ('seq', 'capture_ts', 'received', 'flags', 'roi', 'data', 'pyramid')
+
+    def __init__(self, seq, capture_ts, received, flags, roi, data):
+        self.seq = seq
+        self.capture_ts = capture_ts
+        self.received = received
+        self.flags = flags
+        self.roi = roi
+        self.data = data
+        self.pyramid = None
+
+
+def _inside(box, roi):
+    """Whether a detection box centre lies in a ROI (x, y, width, height, ...)"""
+    x, y, w, h = roi[:4]
+    cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    return x <= cx < x + w and y <= cy < y + h
+
+
+class EyeStats:
+    """Throughput and latency window for one eye"""
+
+    def __init__(self, window=512):
+        self.latencies = deque(maxlen=window)
+        self.done = deque(maxlen=window)
+        self.processed = 0
+        self.replaced = 0
+        self.stale = 0
+        self.unsupported = 0  # codec not decoded here (H.264 eyes)
+        self.keyframes = 0
+        self.roi = 0
+        self.reused = 0
+        self.pixels = 0.0  # decoded fraction of a full frame, summed
+        self.eye_captured = 0  # reported by the eye (frame metadata)
+        self.eye_skipped = 0
+
+    def record(self, latency, now):
+        self.latencies.append(latency)
+        self.done.append(now)
+        self.processed += 1
+
+    def fps(self):
+        if len(self.done) < 2:
+            return 0.0
+        span = self.done[-1] - self.done[0]
+        return (len(self.done) - 1) / span if span > 0 else 0.0
+
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        return float(np.percentile(np.fromiter(self.latencies, dtype=np.float64), q))
+
+    def snapshot(self):
+        p50 = self.percentile(50)
+        p99 = self.percentile(99)
+        return {
+            'fps': round(self.fps(), 2),
+            'p50_ms': None if p50 is None else round(p50 * 1000, 1),
+            'p99_ms': None if p99 is None else round(p99 * 1000, 1),
+            'processed': self.processed,
+            'replaced': self.replaced,
+            'stale': self.stale,
+            'unsupported': self.unsupported,
+            'keyframes': self.keyframes,
+            'roi': self.roi,
+            'reused': self.reused,
+            'pixel_ratio': round(self.pixels / self.processed, 3) if self.processed else None,
+            'eye_skipped': self.eye_skipped,
+            'saved': round(self.eye_skipped / self.eye_captured, 3) if self.eye_captured else 0.0,
+        }
+
+
+class StereoInference:
+    """
+    Latest-frame-wins stereo YOLO stage
+
+    Frames are never queued: a new frame replaces the pending one of
+    the same eye, and frames older than max_frame_age are dropped.
+    Batches made only of small ROI crops run at a reduced input size.
+
+    Args:
+        config: 'yolo' section of config.yaml
+        publish: Callable(topic, payload) for results
+        topic: Results topic (BACKPACK_YOLO_RESULTS)
+        stereo: Optional StereoDepth adding distances to the detections
+        metrics: Metrics registry of the node (optional): batch stage
+            times and capture-to-result latency per eye
+    """
+
+    # Codecs _prepare() decodes; H.264 frames from an eye are counted and dropped
+    CODECS = (CODEC_JPEG,)
+
+    def __init__(self, config, publish, topic, stereo=None, metrics=None):
+        self.config = config
+        self.publish = publish
+        self.topic = topic
+        self.stereo = stereo
+        self.imgsz = config.get('imgsz', 640)
+        self.max_frame_age = config.get('max_frame_age', 0.5)
+        self.pair_wait = config.get('pair_wait', 0.03)
+        self.max_rate = config.get('max_rate', 10.0)
+        self.rate = 1.0
+
+        self.model = None
+        self.names = {}
+        self._pool = ThreadPoolExecutor(max_workers=config.get('decode_threads', 2),
+                                        thread_name_prefix='yolo-decode')
+
+        # Preallocated buffers: letterboxed RGB batch + per-eye resize buffer
+        self._batch = np.full((len(EYES), self.imgsz, self.imgsz, 3), PAD_VALUE, dtype=np.uint8)
+        self._resized = {}
+        self._layout = {}
+        self._tensors = {}
+        self._last_detections = {}
+
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.stats_by_eye = {eye: EyeStats() for eye in EYES}
+        self.batches = 0
+        self.small_batches = 0
+        self.busy = 0.0
+        self._load_mark = (time.monotonic(), 0.0)
+
+        self.timings = None
+        if metrics is not None:
+            self.timings = {stage: metrics.histogram('yolo_ms', {'stage': stage})
+                            for stage in ('preprocess', 'inference', 'postprocess', 'total')}
+            self.latency = {eye: metrics.histogram('frame_latency_ms', {'eye': EYE_NAMES[eye]}) for eye in EYES}
+            metrics.collect(self._collect)
+
+    def start(self):
+        """Load the model and start the inference thread"""
+        import torch
+        from ultralytics import YOLO
+
+        torch.set_num_threads(self.config.get('threads', 4))
+        self.model = YOLO(self.config['model'])
+        self.names = self.model.names
+        self._torch = torch
+
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='yolo', daemon=True)
+        self._thread.start()
+        logger.info(f"YOLO inference started ({self.config['model']}, imgsz={self.imgsz})")
+
+    def stop(self):
+        """Stop the inference thread"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self._pool.shutdown(wait=False)
+
+    def set_rate(self, rate):
+        """
+        Scale the batch rate cap (power budget)
+
+        Args:
+            rate: Fraction of max_rate, 1.0 = config value
+        """
+        self.rate = rate
+        logger.info(f"Inference capped at {self.max_rate * rate:.1f} batches/s")
+
+    def _throttle(self, started):
+        """Wait out the rest of the batch period (frames keep replacing each other meanwhile)"""
+        if not self.max_rate:
+            return
+        deadline = started + 1.0 / (self.max_rate * self.rate)
+        with self._cond:
+            while self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+    def submit(self, eye, seq, timestamp, flags, data):
+        """FrameReceiver callback: replace the pending frame of this eye"""
+        if eye not in self.stats_by_eye:
+            logger.warning(f"Frame {seq} from unknown eye {eye} dropped")
+            return
+        if flags & CODEC_MASK not in self.CODECS:
+            self.stats_by_eye[eye].unsupported += 1
+            return
+        roi, data = split_roi(flags, data)
+        frame = _PendingFrame(seq, timestamp, time.time(), flags, roi, data)
+        with self._cond:
+            if eye in self._pending:
+                self.stats_by_eye[eye].replaced += 1
+            self._pending[eye] = frame
+            self._cond.notify()
+
+    def on_frame_metadata(self, topic, payload):
+        """helmet/<eye>/frame handler: frames the eye's motion gate did not ship"""
+        data = json.loads(payload)
+        eye = EYE_IDS.get(data.get('eye'))
+        if eye is not None and 'captured' in data:
+            self.stats_by_eye[eye].eye_captured = data['captured']
+            self.stats_by_eye[eye].eye_skipped = data['skipped']
+
+    def _take_batch(self):
+        """Wait for frames, give the other eye a short chance to catch up"""
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait(0.5)
+            if not self._running:
+                return None
+
+            deadline = time.monotonic() + self.pair_wait
+            while self._running and len(self._pending) < len(EYES):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            frames = self._pending
+            self._pending = {}
+
+        now = time.time()
+        fresh = {}
+        for eye, frame in frames.items():
+            if now - frame.received > self.max_frame_age:
+                self.stats_by_eye[eye].stale += 1
+            else:
+                fresh[eye] = frame
+        return fresh
+
+    def _scale(self, frame, width, height):
+        """Letterbox scale of the full frame (ROI crops keep it, objects keep their size)"""
+        if frame.roi is not None:
+            width, height = frame.roi[4:]
+        return min(self.imgsz / width, self.imgsz / height)
+
+    def _canvas(self, frames):
+        """Square input size of a batch: imgsz, less when every frame is a small ROI crop"""
+        size = 0
+        for frame in frames:
+            if frame.roi is None:
+                return self.imgsz
+            scale = self._scale(frame, 0, 0)
+            size = max(size, int(round(frame.roi[2] * scale)), int(round(frame.roi[3] * scale)))
+        return min(self.imgsz, max(1, -(-size // CANVAS_STRIDE)) * CANVAS_STRIDE)
+
+    def _input(self, canvas):
+        """Preallocated input tensor for a canvas size"""
+        tensor = self._tensors.get(canvas)
+        if tensor is None:
+            tensor = self._torch.empty((len(EYES), 3, canvas, canvas), dtype=self._torch.float32)
+            self._tensors[canvas] = tensor
+        return tensor
+
+    def _prepare(self, index, eye, frame, canvas):
+        """Decode one JPEG and letterbox it into its batch slot (runs in the pool)"""
+        import cv2
+
+        image = cv2.imdecode(np.frombuffer(frame.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Cannot decode frame {frame.seq} from {EYE_NAMES[eye]} eye")
+        if self.stereo is not None and frame.roi is None:
+            frame.pyramid = self.stereo.prepare(image)
+
+        h, w = image.shape[:2]
+        scale = self._scale(frame, w, h)
+        nw, nh = min(canvas, int(round(w * scale))), min(canvas, int(round(h * scale)))
+        left, top = (canvas - nw) // 2, (canvas - nh) // 2
+
+        # Repaint the padding whenever the image lands somewhere else in the slot
+        layout = (canvas, nw, nh)
+        if self._layout.get(index) != layout:
+            self._batch[index].fill(PAD_VALUE)
+            self._layout[index] = layout
+
+        if frame.roi is None:
+            resized = self._resized.get(eye)
+            if resized is None or resized.shape[:2] != (nh, nw):
+                # Camera resolution changed: reallocate
+                resized = np.empty((nh, nw, 3), dtype=np.uint8)
+                self._resized[eye] = resized
+            cv2.resize(image, (nw, nh), dst=resized, interpolation=cv2.INTER_LINEAR)
+        else:
+            resized = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+
+        # BGR -> RGB while copying into the batch
+        self._batch[index, top:top + nh, left:left + nw] = resized[:, :, ::-1]
+
+        # Offsets mapping model boxes back to full frame pixels
+        x, y = (frame.roi[0], frame.roi[1]) if frame.roi is not None else (0, 0)
+        return scale, left - x * scale, top - y * scale
+
+    def _stereo_pair(self, frames):
+        """Pyramids of a left / right pair close enough in time for depth, or None"""
+        if self.stereo is None:
+            return None
+        left, right = frames.get(EYE_LEFT), frames.get(EYE_RIGHT)
+        if (left is None or right is None or left.pyramid is None or right.pyramid is None
+                or abs(left.capture_ts - right.capture_ts) > self.stereo.max_skew):
+            self.stereo.skipped += 1
+            return None
+        return left.pyramid, right.pyramid
+
+    def _loop(self):
+        while self._running:
+            frames = self._take_batch()
+            if not frames:
+                continue
+            started = time.monotonic()
+            try:
+                self._run_batch(frames)
+            except Exception as e:
+                logger.error(f"Inference batch failed: {e}", exc_info=True)
+            self.busy += time.monotonic() - started
+            self._throttle(started)
+
+    def _run_batch(self, frames):
+        t0 = time.perf_counter()
+        eyes = [eye for eye in EYES if eye in frames]
+
+        # Each eye owns a fixed batch slot; a lone eye runs as a batch of one
+        slots = [EYES.index(eye) for eye in eyes]
+        canvas = self._canvas([frames[eye] for eye in eyes])
+        futures = [self._pool.submit(self._prepare, i, eye, frames[eye], canvas) for i, eye in zip(slots, eyes)]
+        letterbox = [f.result() for f in futures]
+        pair = self._stereo_pair(frames)
+        depth = self._pool.submit(self.stereo.disparity, *pair) if pair else None
+        t1 = time.perf_counter()
+
+        rows = slice(slots[0], slots[-1] + 1)
+        batch = self._torch.from_numpy(self._batch[rows, :canvas, :canvas]).permute(0, 3, 1, 2)
+        tensor = self._input(canvas)[rows]
+        tensor.copy_(batch).div_(255.0)
+        results = self.model.predict(tensor, imgsz=canvas, conf=self.config['confidence'],
+                                     classes=self.config.get('classes'), device=self.config['device'],
+                                     verbose=False)
+        if canvas < self.imgsz:
+            self.small_batches += 1
+        t2 = time.perf_counter()
+
+        found = {eye: self._detections(result, scale, left, top)
+                 for eye, result, (scale, left, top) in zip(eyes, results, letterbox)}
+        if depth is not None:
+            disparity, factor = depth.result()
+            self.stereo.distances(disparity, factor, found[EYE_LEFT])
+            self.stereo.match_right(found[EYE_LEFT], found[EYE_RIGHT])
+
+        payload = {'ts': time.time(), 'eyes': {}}
+        for eye in eyes:
+            frame = frames[eye]
+            detections, reused = self._merge(eye, frame, found[eye])
+            payload['eyes'][EYE_NAMES[eye]] = {
+                'seq': frame.seq,
+                'capture_ts': frame.capture_ts,
+                'received_ts': frame.received,
+                'keyframe': bool(frame.flags & FLAG_KEYFRAME),
+                'roi': self._roi_box(frame),
+                'reused': reused,
+                'detections': detections,
+            }
+        t3 = time.perf_counter()
+
+        payload['timings_ms'] = {
+            'preprocess': round((t1 - t0) * 1000, 2),
+            'inference': round((t2 - t1) * 1000, 2),
+            'postprocess': round((t3 - t2) * 1000, 2),
+            'total': round((t3 - t0) * 1000, 2),
+        }
+        if depth is not None:
+            payload['timings_ms']['stereo'] = round(self.stereo.last_ms, 2)
+        if self.timings is not None:
+            for stage, ms in payload['timings_ms'].items():
+                if stage in self.timings:
+                    self.timings[stage].observe(ms)
+        self.publish(self.topic, json.dumps(payload))
+        self.batches += 1
+
+        now = time.time()
+        for eye in eyes:
+            self._record(eye, frames[eye], now)
+
+    def _record(self, eye, frame, now):
+        stats = self.stats_by_eye[eye]
+        stats.record(now - frame.capture_ts, now)
+        if self.timings is not None:
+            self.latency[eye].observe((now - frame.capture_ts) * 1000)
+        if frame.flags & FLAG_KEYFRAME:
+            stats.keyframes += 1
+        if frame.roi is None:
+            stats.pixels += 1.0
+        else:
+            stats.roi += 1
+            stats.pixels += frame.roi[2] * frame.roi[3] / (frame.roi[4] * frame.roi[5])
+
+    @staticmethod
+    def _roi_box(frame):
+        if frame.roi is None:
+            return None
+        x, y, w, h = frame.roi[:4]
+        return [x, y, x + w, y + h]
+
+    def _merge(self, eye, frame, detections):
+        """
+        Detections of the whole view after this frame
+
+        A full frame replaces everything; a ROI frame replaces the
+        detections whose centre lies in its region and keeps the others
+        (unchanged parts of the scene, not re-inferred).
+
+        Returns:
+            (detections, number reused from previous frames)
+        """
+        if frame.roi is None:
+            self._last_detections[eye] = detections
+            return detections, 0
+        kept = [d for d in self._last_detections.get(eye, ()) if not _inside(d['box'], frame.roi)]
+        merged = kept + detections
+        self._last_detections[eye] = merged
+        self.stats_by_eye[eye].reused += len(kept)
+        return merged, len(kept)
+
+    def _detections(self, result, scale, left, top):
+        """Convert boxes back to camera pixel coordinates"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return []
+        xyxy = boxes.xyxy.cpu().numpy()
+        xyxy[:, [0, 2]] -= left
+        xyxy[:, [1, 3]] -= top
+        xyxy /= scale
+        classes = boxes.cls.cpu().numpy().astype(int)
+        confs = boxes.conf.cpu().numpy()
+        return [
+            {
+                'cls': int(c),
+                'label': self.names.get(int(c), str(c)),
+                'conf': round(float(p), 3),
+                'box': [round(float(v), 1) for v in box],
+            }
+            for c, p, box in zip(classes, confs, xyxy)
+        ]
+
+    def _collect(self, metrics):
+        metrics.counter('yolo_batches').set(self.batches)
+        metrics.gauge('yolo_pending').set(len(self._pending))
+        for eye, stats in self.stats_by_eye.items():
+            labels = {'eye': EYE_NAMES[eye]}
+            metrics.counter('frames_processed', labels).set(stats.processed)
+            metrics.counter('frames_replaced', labels).set(stats.replaced)
+            metrics.counter('frames_stale', labels).set(stats.stale)
+            metrics.counter('frames_unsupported', labels).set(stats.unsupported)
+
+    def stats(self):
+        """Throughput and latency per eye, inference load since the previous call"""
+        now = time.monotonic()
+        since, busy = self._load_mark
+        self._load_mark = (now, self.busy)
+        return {
+            'batches': self.batches,
+            'small_batches': self.small_batches,
+            'load': round((self.busy - busy) / (now - since), 3) if now > since else 0.0,
+            'max_rate': self.max_rate * self.rate,
+            'eyes': {EYE_NAMES[eye]: s.snapshot() for eye, s in self.stats_by_eye.items()},
+            'stereo': self.stereo.stats() if self.stereo is not None else None,
+        }
@@ -4,40 +4,224 @@ Backpack Pi 5 Server - Main entry point
 Central server managing MQTT broker, YOLO detection, and WiFi AP
 """
 
+import asyncio
 import sys
+import time
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'shared'))
 
-import yaml
+from node_config import startup, load_node_config, prefetch_imports, NUMBER
 from logger import setup_logger
+from mqtt_async import AsyncMQTTClient
+from telemetry_bridge import TelemetryBridge
+from frame_transport import FrameReceiver
+from inference import StereoInference
+from tracker import Tracker
+from stereo import StereoDepth
+from timeseries import TimeSeriesStore, HistoryService
+from bus_log import BusLogWriter
+from metrics import Metrics, report
+from metrics_exporter import MetricsExporter
+from alerts import AlertEngine, load_rules
+from power_budget import LEVEL_NAMES, budget_rate, parse_budget
+from mqtt_topics import (
+    BACKPACK_YOLO_RESULTS, BACKPACK_YOLO_STATS,
+    BACKPACK_HISTORY_REQUEST, BACKPACK_HISTORY_RESPONSE,
+    SYSTEM_ALERTS, SYSTEM_STATUS, ENERGY_POWER_BUDGET, HELMET_LEFT_FRAME, HELMET_RIGHT_FRAME,
+)
 
 logger = setup_logger(__name__, 'logs/pi5_server.log')
+startup.mark('imports')
+
+CONFIG_SCHEMA = {
+    'mqtt.port': int, 'mqtt.keepalive': int,
+    'frames.listen': str, 'frames.port': int, 'frames.max_frame_size': int,
+    'yolo.model': str, 'yolo.confidence': NUMBER, 'yolo.device': str, 'yolo.imgsz': int,
+    'yolo.max_rate': NUMBER, 'yolo.stats_interval': NUMBER,
+    'tracking.enabled': bool, 'tracking.rate': NUMBER,
+    'stereo.enabled': bool,
+    'history.topics': list, 'history.exclude': list, 'history.data_dir': str, 'history.flush_interval': NUMBER,
+    'recorder.enabled': bool, 'recorder.directory': str, 'recorder.segment_bytes': int,
+    'recorder.segment_seconds': NUMBER, 'recorder.index_interval': NUMBER, 'recorder.flush_bytes': int,
+    'recorder.flush_interval': NUMBER, 'recorder.max_bytes': int,
+    'alerts.interval': NUMBER, 'alerts.stale': NUMBER, 'alerts.repeat': NUMBER, 'alerts.defaults': bool,
+    'alerts.rules': list,
+    'metrics.interval': NUMBER, 'metrics.listen': str, 'metrics.port': int, 'metrics.stale': NUMBER,
+}
 
 def load_config():
-    config_path = Path(__file__).parent / 'config.yaml'
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+    """Load configuration (config/example.yaml + config.yaml + config/local.yaml, validated, cached)"""
+    return load_node_config(Path(__file__).parent, CONFIG_SCHEMA)
+
+async def publish_stats(client, inference, tracker, interval):
+    """Periodic YOLO throughput / latency report"""
+    while True:
+        await asyncio.sleep(interval)
+        stats = inference.stats()
+        if tracker is not None:
+            stats['tracking'] = tracker.stats()
+        client.publish(BACKPACK_YOLO_STATS, stats)
+
+async def emit_tracks(tracker):
+    """Extrapolated track boxes at the HUD rate, between YOLO results"""
+    if tracker is None:
+        return
+    interval = 1.0 / tracker.rate
+    while True:
+        await asyncio.sleep(interval)
+        if tracker.due():
+            tracker.emit()
+
+async def flush_history(store, interval):
+    """Periodic flush of the memory-mapped history tiers"""
+    while True:
+        await asyncio.sleep(interval)
+        store.flush()
+
+async def flush_recorder(recorder, interval):
+    """Periodic write of the buffered bus records"""
+    if recorder is None:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        recorder.flush()
+
+async def evaluate_alerts(engine, interval):
+    """Periodic evaluation of every alert rule"""
+    while True:
+        await asyncio.sleep(interval)
+        engine.evaluate()
+
+async def run(config):
+    """Event-driven server: MQTT handlers + worker threads"""
+    # MQTT client (Mosquitto runs locally as a system service)
+    metrics = Metrics('pi5_server')
+    client = AsyncMQTTClient('pi5_server', 'localhost', config['mqtt']['port'], config['mqtt']['keepalive'],
+                             metrics=metrics)
+    
+    # Metrics of every node (system/status snapshots) as a Prometheus endpoint
+    metrics_config = config['metrics']
+    exporter = MetricsExporter(metrics, metrics_config['stale'])
+    client.subscribe(SYSTEM_STATUS, exporter.on_status)
+    
+    # Full bus recording (every topic, replayed with sim/replay.py)
+    recorder_config = config['recorder']
+    recorder = None
+    if recorder_config['enabled']:
+        recorder = BusLogWriter(Path(recorder_config['directory']) / time.strftime('%Y%m%d-%H%M%S'),
+                                recorder_config['segment_bytes'], recorder_config['segment_seconds'],
+                                recorder_config['index_interval'], recorder_config['flush_bytes'],
+                                recorder_config['max_bytes'])
+        client.subscribe('#', recorder.on_message)
+    
+    # Sensor history (queried in-process or over MQTT)
+    history_config = config['history']
+    store = TimeSeriesStore(history_config)
+    history = HistoryService(store, client.publish, BACKPACK_HISTORY_RESPONSE, history_config['exclude'])
+    client.subscribe(BACKPACK_HISTORY_REQUEST, history.on_request)
+    for topic in history_config['topics']:
+        client.subscribe(topic, history.on_message)
+    
+    # ESP32 telemetry: live frames are republished, offline backlogs go to the history
+    bridge = TelemetryBridge(client.publish, history.ingest)
+    for topic in bridge.TOPICS:
+        client.subscribe(topic, bridge.on_frame)
+    for topic in bridge.BATCH_TOPICS:
+        client.subscribe(topic, bridge.on_batch)
+    
+    # Alert rules over the latest sensor values
+    alerts_config = config['alerts']
+    alerts = AlertEngine(load_rules(alerts_config), client.publish, SYSTEM_ALERTS,
+                         alerts_config['interval'], alerts_config['stale'], alerts_config['repeat'])
+    for topic in alerts.topics:
+        client.subscribe(topic, alerts.on_message)
+    
+    # YOLO on the latest frame of both eyes (runs in its own thread),
+    # results go through the tracker when enabled
+    tracking_config = config['tracking']
+    tracker = None
+    publish_results = client.publish_threadsafe
+    if tracking_config['enabled']:
+        tracker = Tracker(tracking_config, client.publish_threadsafe, BACKPACK_YOLO_RESULTS)
+        publish_results = tracker.on_results
+    stereo = StereoDepth(config['stereo']) if config['stereo']['enabled'] else None
+    inference = StereoInference(config['yolo'], publish_results, BACKPACK_YOLO_RESULTS, stereo, metrics=metrics)
+    frames_config = config['frames']
+    receiver = FrameReceiver(inference.submit, frames_config['listen'], frames_config['port'],
+                             frames_config['max_frame_size'])
+    # Frames saved by the eyes' motion gates (frame metadata)
+    client.subscribe(HELMET_LEFT_FRAME, inference.on_frame_metadata)
+    client.subscribe(HELMET_RIGHT_FRAME, inference.on_frame_metadata)
+    
+    def on_power_budget(topic, payload):
+        # Fewer YOLO batches as the battery drops (energy node)
+        level = parse_budget(payload)
+        if level is not None and budget_rate(level) != inference.rate:
+            logger.info(f"Power budget: {LEVEL_NAMES[level]}")
+            inference.set_rate(budget_rate(level))
+    
+    client.subscribe(ENERGY_POWER_BUDGET, on_power_budget)
+    
+    def collect(metrics):
+        metrics.set_gauges('bridge', bridge.stats())
+        metrics.set_gauges('alerts', alerts.stats())
+        for eye, stats in receiver.stats().items():
+            metrics.set_gauges('frames', stats, {'eye': eye})
+        if recorder is not None:
+            metrics.set_gauges('recorder', recorder.stats())
+        if tracker is not None:
+            metrics.gauge('tracker_update_ms').set(tracker.stats()['update_ms'])
+    
+    metrics.collect(collect)
+    
+    # TODO: Initialize
+    # - WiFi AP (via hostapd/dnsmasq scripts)
+    
+    await client.start()
+    await exporter.start(metrics_config['listen'], metrics_config['port'])
+    inference.start()
+    receiver.start()
+    startup.mark('ready')
+    logger.info(f"Startup: {startup.summary()}")
+    logger.info("Server ready - Press Ctrl+C to stop")
+    
+    try:
+        await asyncio.gather(
+            publish_stats(client, inference, tracker, config['yolo']['stats_interval']),
+            emit_tracks(tracker),
+            flush_history(store, history_config['flush_interval']),
+            flush_recorder(recorder, recorder_config['flush_interval']),
+            evaluate_alerts(alerts, alerts_config['interval']),
+            report(client.publish, SYSTEM_STATUS, metrics, metrics_config['interval']),
+        )
+    finally:
+        await exporter.stop()
+        receiver.stop()
+        inference.stop()
+        await client.stop()
+        store.flush()
+        if recorder is not None:
+            recorder.close()
+            logger.info(f"Recorder stats: {recorder.stats()}")
+        logger.info(f"Telemetry bridge stats: {bridge.stats()}")
+        logger.info(f"Frame receiver stats: {receiver.stats()}")
+        logger.info(f"Alert stats: {alerts.stats()}")
+        logger.info(f"MQTT stats: {client.stats}")
 
 def main():
+    # YOLO stack imports overlap with config loading and MQTT startup
+    prefetch_imports('cv2', 'torch', 'ultralytics')
     logger.info("=" * 50)
     logger.info("Backpack Pi 5 Server - Starting")
     logger.info("=" * 50)
     
     config = load_config()
+    startup.mark('config')
     logger.info(f"Configuration loaded")
     
-    # TODO: Initialize
-    # - MQTT broker (Mosquitto via subprocess or paho)
-    # - YOLO model
-    # - WiFi AP (via hostapd/dnsmasq scripts)
-    
-    logger.info("Server ready - Press Ctrl+C to stop")
-    
     try:
-        import time
-        while True:
-            time.sleep(1)
+        asyncio.run(run(config))
     except KeyboardInterrupt:
         logger.info("Shutdown requested")
     finally:
@@ -0,0 +1,158 @@
+"""
+Prometheus text endpoint for the metrics of every node
+
+Nodes publish their Metrics snapshot on system/status (see
+shared/metrics.py). The latest snapshot of each node is kept and, with
+the Pi 5's own registry read live, rendered in the Prometheus text
+exposition format on http://<listen>:<port>/metrics. Every sample gets
+a node label; a node silent for `stale` seconds is reported with
+armor_node_up 0 and its last values are no longer exported.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'armor_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+REQUEST_TIMEOUT = 5.0
+
+
+def split_key(key):
+    """'name{a="b"}' -> ('name', 'a="b"')"""
+    name, _, labels = key.partition('{')
+    return name, labels[:-1]
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, float):
+        return repr(value) if value == value else 'NaN'
+    return str(value)
+
+
+class MetricsExporter:
+    """
+    Latest snapshot per node, rendered on demand
+
+    Args:
+        local: Metrics registry of the Pi 5 server
+        stale: Seconds without snapshot before a node is reported down
+    """
+
+    def __init__(self, local, stale=30.0):
+        self.local = local
+        self.stale = stale
+        self.nodes = {}  # node -> (received monotonic time, snapshot)
+        self._server = None
+        self.received = 0
+        self.errors = 0
+        self.scrapes = 0
+
+    def on_status(self, topic, payload):
+        """system/status handler"""
+        try:
+            snapshot = json.loads(payload)
+            node = snapshot['node']
+        except (ValueError, TypeError, KeyError) as e:
+            self.errors += 1
+            logger.debug(f"Invalid status snapshot: {e}")
+            return
+        if node == self.local.node:
+            return
+        self.nodes[node] = (time.monotonic(), snapshot)
+        self.received += 1
+
+    def render(self):
+        """Prometheus text exposition of every node"""
+        now = time.monotonic()
+        families = {}
+
+        def add(name, kind, node, labels, value, suffix='', extra=None):
+            family = families.get(name)
+            if family is None:
+                family = families[name] = (kind, [])
+            parts = [f'node="{node}"']
+            if labels:
+                parts.append(labels)
+            if extra:
+                parts.append(extra)
+            family[1].append(f"{name}{suffix}{{{','.join(parts)}}} {format_value(value)}")
+
+        snapshots = [(self.local.node, 0.0, self.local.snapshot())]
+        snapshots += [(node, now - received, snapshot)
+                      for node, (received, snapshot) in sorted(self.nodes.items())]
+        for node, age, snapshot in snapshots:
+            up = age <= self.stale
+            add(PREFIX + 'node_up', 'gauge', node, None, int(up))
+            add(PREFIX + 'node_last_seen_seconds', 'gauge', node, None, round(age, 1))
+            if not up:
+                continue
+            add(PREFIX + 'node_uptime_seconds', 'gauge', node, None, snapshot.get('up', 0))
+            for key, value in snapshot.get('c', {}).items():
+                name, labels = split_key(key)
+                add(PREFIX + name + '_total', 'counter', node, labels, value)
+            for key, value in snapshot.get('g', {}).items():
+                if isinstance(value, (int, float)):
+                    name, labels = split_key(key)
+                    add(PREFIX + name, 'gauge', node, labels, value)
+            for key, (bounds, counts, total) in snapshot.get('h', {}).items():
+                name, labels = split_key(key)
+                name = PREFIX + name
+                cumulative = 0
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    add(name, 'histogram', node, labels, cumulative, '_bucket', f'le="{format_value(bound)}"')
+                cumulative += counts[-1]
+                add(name, 'histogram', node, labels, cumulative, '_bucket', 'le="+Inf"')
+                add(name, 'histogram', node, labels, total, '_sum')
+                add(name, 'histogram', node, labels, cumulative, '_count')
+
+        lines = []
+        for name, (kind, samples) in families.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    # HTTP endpoint
+
+    async def start(self, listen, port):
+        self._server = await asyncio.start_server(self._handle, listen, port)
+        logger.info(f"Metrics endpoint on http://{listen}:{port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+            while (await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)).strip():
+                pass  # headers
+            method, path = (request.decode('latin-1').split() + ['', ''])[:2]
+            if method == 'GET' and path.split('?')[0] in ('/metrics', '/'):
+                status, body = '200 OK', self.render().encode()
+                self.scrapes += 1
+            else:
+                status, body = '404 Not Found', b'Not found\n'
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Metrics request dropped: {e}")
+        finally:
+            writer.close()
+
+    def stats(self):
+        return {
+            'nodes': len(self.nodes),
+            'received': self.received,
+            'errors': self.errors,
+            'scrapes': self.scrapes,
+        }
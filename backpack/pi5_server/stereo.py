@@ -0,0 +1,316 @@
+"""
+Stereo depth from the two helmet cameras
+
+Coarse disparity for the paired left / right frames of a YOLO batch:
+1. prepare(): green channel block-averaged into a small pyramid
+   (runs in the decode pool, right after each JPEG decode)
+2. rectification of every level with precomputed lookup tables
+   (from the stereo calibration, identity without one)
+3. SAD block matching, vectorized over the image: full disparity search
+   on the coarsest level, then +/- refine_radius around the upsampled
+   result on each finer level, sub-pixel fit on the output level
+4. distances(): median disparity inside each detection box -> metres
+
+The cameras are not hardware-synchronized: pairs further apart than
+max_skew, and ROI frames, get no depth.
+"""
+
+import logging
+import math
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PENALTY = 255  # SAD of pixels with no match (left of the right image)
+
+
+def box_sum(volume, radius):
+    """
+    Sum over (2r+1)x(2r+1) windows of the last two axes, edges replicated
+
+    Separable shifted adds: cheaper than an integral image for the
+    small windows used here.
+
+    Args:
+        volume: (..., H, W) integer array
+    """
+    height, width = volume.shape[-2:]
+    size = 2 * radius + 1
+    dtype = np.int16 if PENALTY * size * size <= np.iinfo(np.int16).max else np.int32
+    pad = [(0, 0)] * (volume.ndim - 2) + [(radius, radius), (radius, radius)]
+    padded = np.pad(volume, pad, mode='edge').astype(dtype, copy=False)
+    rows = padded[..., :height, :].copy()
+    for i in range(1, size):
+        rows += padded[..., i:i + height, :]
+    out = rows[..., :width].copy()
+    for j in range(1, size):
+        out += rows[..., j:j + width]
+    return out
+
+
+def downscale(plane, factor):
+    """Block mean of a 2D plane (trailing rows / columns dropped)"""
+    h, w = plane.shape[0] // factor, plane.shape[1] // factor
+    return plane[:h * factor, :w * factor].reshape(h, factor, w, factor).mean(axis=(1, 3), dtype=np.float32)
+
+
+class StereoDepth:
+    """
+    Disparity and distances for rectified left / right pairs
+
+    Args:
+        config: 'stereo' section of config.yaml
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.min_distance = config.get('min_distance', 0.5)
+        self.window = config.get('window', 5)
+        self.refine_radius = config.get('refine_radius', 2)
+        self.texture = config.get('texture', 3.0)
+        self.output_width = config.get('output_width', 320)
+        self.coarse_width = config.get('coarse_width', 80)
+        self.max_skew = config.get('max_skew', 0.05)
+        self.min_valid = config.get('min_valid', 0.2)
+
+        self.resolution = None
+        self.levels = None
+        self.focal = None
+        self.baseline = None
+        self.max_disparity = None
+        self._tables = None
+
+        self.pairs = 0
+        self.skipped = 0
+        self.last_ms = 0.0
+
+    # Setup (once per camera resolution)
+
+    def _setup(self, width, height):
+        """Pyramid levels, focal length, baseline and rectification tables"""
+        self.resolution = (width, height)
+        output = max(0, round(math.log2(max(1, width / self.output_width))))
+        coarse = max(output, round(math.log2(max(1, width / self.coarse_width))))
+        self.levels = (output, coarse)
+
+        maps = None
+        calibration = self.config.get('calibration')
+        if calibration:
+            maps, self.focal, self.baseline = self._rectify_maps(calibration, width, height)
+        else:
+            fov = self.config.get('fov', (62.2, 48.8))
+            self.focal = (width / 2) / math.tan(math.radians(fov[0]) / 2)
+            self.baseline = self.config.get('baseline', 0.065)
+        # Search range covers everything further than min_distance
+        self.max_disparity = math.ceil(self.focal * self.baseline / self.min_distance)
+
+        # Per level nearest-pixel lookup tables, built from the full resolution maps
+        self._tables = None
+        if maps is not None:
+            self._tables = {}
+            for level in range(output, coarse + 1):
+                factor = 2 ** level
+                h, w = height // factor, width // factor
+                self._tables[level] = tuple(self._level_table(map_x, map_y, factor, w, h)
+                                            for map_x, map_y in maps)
+        logger.info(f"Stereo {width}x{height}: levels {output}-{coarse}, f={self.focal:.1f} px, "
+                    f"B={self.baseline:.3f} m, disparity <= {self.max_disparity} px, "
+                    f"{'rectified' if maps else 'no calibration'}")
+
+    @staticmethod
+    def _level_table(map_x, map_y, factor, width, height):
+        centre = factor // 2
+        mx = map_x[centre::factor, centre::factor][:height, :width] / factor
+        my = map_y[centre::factor, centre::factor][:height, :width] / factor
+        ix = np.clip(mx.astype(np.int32), 0, width - 1)
+        iy = np.clip(my.astype(np.int32), 0, height - 1)
+        return (iy * width + ix).ravel()
+
+    @staticmethod
+    def _rectify_maps(path, width, height):
+        """
+        Rectification maps from an OpenCV stereo calibration (.npz with
+        K1, D1, K2, D2, R, T, size), scaled to the camera resolution
+
+        Returns:
+            ((left map_x, map_y), (right map_x, map_y)), focal (px), baseline (T units)
+        """
+        import cv2
+
+        calib = np.load(path)
+        sx, sy = width / calib['size'][0], height / calib['size'][1]
+        K1, K2 = calib['K1'].copy(), calib['K2'].copy()
+        for K in (K1, K2):
+            K[0] *= sx
+            K[1] *= sy
+        R1, R2, P1, P2, _, _, _ = cv2.stereoRectify(K1, calib['D1'], K2, calib['D2'], (width, height),
+                                                    calib['R'], calib['T'], alpha=0)
+        maps = (cv2.initUndistortRectifyMap(K1, calib['D1'], R1, P1, (width, height), cv2.CV_32FC1),
+                cv2.initUndistortRectifyMap(K2, calib['D2'], R2, P2, (width, height), cv2.CV_32FC1))
+        return maps, float(P1[0, 0]), float(abs(P2[0, 3] / P2[0, 0]))
+
+    # Per frame
+
+    def prepare(self, image):
+        """
+        Pyramid of one decoded frame (runs in the decode pool)
+
+        Args:
+            image: HxWx3 uint8 (BGR or RGB, only green is used)
+
+        Returns:
+            Dict level -> int16 plane, finest to coarsest
+        """
+        height, width = image.shape[:2]
+        if self.resolution != (width, height):
+            self._setup(width, height)
+        output, coarse = self.levels
+
+        plane = downscale(image[:, :, 1], 2 ** output) if output else image[:, :, 1].astype(np.float32)
+        pyramid = {}
+        for level in range(output, coarse + 1):
+            if level > output:
+                plane = downscale(plane, 2)
+            pyramid[level] = np.rint(plane).astype(np.int16)
+        return pyramid
+
+    def _rectified(self, pyramid, eye):
+        if self._tables is None:
+            return pyramid
+        return {level: plane.ravel()[self._tables[level][eye]].reshape(plane.shape)
+                for level, plane in pyramid.items()}
+
+    def _match(self, left, right, candidates):
+        """
+        SAD cost of every candidate disparity
+
+        Args:
+            candidates: (K,) disparities, or (K, H, W) per pixel
+
+        Returns:
+            (K, H, W) window costs
+        """
+        height, width = left.shape
+        diff = np.empty((len(candidates), height, width), dtype=np.int16)
+        cols = np.arange(width)
+        for k, d in enumerate(candidates):
+            if np.ndim(d) == 0:
+                d = int(d)
+                diff[k, :, :d] = PENALTY
+                diff[k, :, d:] = np.abs(left[:, d:] - right[:, :width - d])
+            else:
+                src = cols[None, :] - d
+                shifted = np.take_along_axis(right, np.clip(src, 0, width - 1), axis=1)
+                diff[k] = np.where(src >= 0, np.abs(left - shifted), PENALTY)
+        return box_sum(diff, self.window // 2)
+
+    def disparity(self, left_pyramid, right_pyramid):
+        """
+        Coarse-to-fine disparity of the left view
+
+        Returns:
+            (disparity, factor): float32 map at the output level in
+            output-level pixels (NaN = no match / no texture), and the
+            downscale factor of that level
+        """
+        start = time.perf_counter()
+        output, coarse = self.levels
+        left = self._rectified(left_pyramid, 0)
+        right = self._rectified(right_pyramid, 1)
+
+        # Full search on the coarsest level
+        candidates = np.arange(0, max(2, math.ceil(self.max_disparity / 2 ** coarse) + 1))
+        costs = self._match(left[coarse], right[coarse], candidates)
+        best = costs.argmin(axis=0)
+        disparity = candidates[best]
+
+        # Refine around the upsampled estimate on each finer level
+        offsets = np.arange(-self.refine_radius, self.refine_radius + 1)
+        for level in range(coarse - 1, output - 1, -1):
+            height, width = left[level].shape
+            up = np.repeat(np.repeat(disparity * 2, 2, axis=0), 2, axis=1)
+            up = np.pad(up, ((0, max(0, height - up.shape[0])), (0, max(0, width - up.shape[1]))),
+                        mode='edge')[:height, :width]
+            candidates = np.clip(up[None] + offsets[:, None, None], 0, self.max_disparity // 2 ** level)
+            costs = self._match(left[level], right[level], candidates)
+            best = costs.argmin(axis=0)
+            disparity = np.take_along_axis(candidates, best[None], axis=0)[0]
+
+        # Sub-pixel: parabola through the best cost and its neighbours
+        result = disparity.astype(np.float32)
+        if len(costs) >= 3:
+            inner = (best > 0) & (best < len(costs) - 1)
+            lo = np.take_along_axis(costs, np.clip(best - 1, 0, None)[None], axis=0)[0].astype(np.float32)
+            mid = np.take_along_axis(costs, best[None], axis=0)[0].astype(np.float32)
+            hi = np.take_along_axis(costs, np.clip(best + 1, None, len(costs) - 1)[None], axis=0)[0].astype(np.float32)
+            curvature = lo - 2 * mid + hi
+            ok = inner & (curvature > 0)
+            result[ok] += 0.5 * (lo[ok] - hi[ok]) / curvature[ok]
+
+        # No texture (flat walls, sky) or no disparity: no distance
+        plane = left[output]
+        gradient = np.zeros_like(plane)
+        gradient[:, 1:] = np.abs(np.diff(plane, axis=1))
+        area = self.window ** 2
+        flat = box_sum(gradient, self.window // 2) < self.texture * area
+        result[flat | (result <= 0)] = np.nan
+
+        self.pairs += 1
+        self.last_ms = (time.perf_counter() - start) * 1000
+        return result, 2 ** output
+
+    def distances(self, disparity, factor, detections):
+        """
+        Add 'distance' (metres) to detections of the left view
+
+        The median disparity of the central half of each box is used;
+        boxes with too few valid pixels get None.
+        """
+        height, width = disparity.shape
+        focal = self.focal / factor
+        for detection in detections:
+            x0, y0, x1, y1 = (v / factor for v in detection['box'])
+            cx, cy, hw, hh = (x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 4, (y1 - y0) / 4
+            rows = slice(max(0, int(cy - hh)), min(height, int(cy + hh) + 1))
+            cols = slice(max(0, int(cx - hw)), min(width, int(cx + hw) + 1))
+            values = disparity[rows, cols]
+            valid = values[~np.isnan(values)]
+            if values.size and valid.size >= self.min_valid * values.size:
+                detection['distance'] = round(float(focal * self.baseline / np.median(valid)), 2)
+            else:
+                detection['distance'] = None
+
+    def match_right(self, left, right):
+        """
+        Copy distances to the right view detections
+
+        A right box matches a left box of the same class once shifted by
+        the left box's disparity (best IoU, at least 0.3).
+        """
+        for detection in right:
+            best, overlap = None, 0.3
+            for candidate in left:
+                if candidate['cls'] != detection['cls'] or not candidate.get('distance'):
+                    continue
+                shift = self.focal * self.baseline / candidate['distance']
+                a = candidate['box']
+                b = detection['box']
+                ix = min(a[2] - shift, b[2]) - max(a[0] - shift, b[0])
+                iy = min(a[3], b[3]) - max(a[1], b[1])
+                if ix <= 0 or iy <= 0:
+                    continue
+                inter = ix * iy
+                union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+                if inter / union > overlap:
+                    best, overlap = candidate, inter / union
+            detection['distance'] = best['distance'] if best else None
+
+    def stats(self):
+        return {
+            'pairs': self.pairs,
+            'skipped': self.skipped,
+            'last_ms': round(self.last_ms, 2),
+            'levels': self.levels,
+        }
@@ -0,0 +1,133 @@
+"""
+Telemetry bridge - Decodes packed ESP32 frames
+Republishes them on the legacy per-sensor JSON topics
+
+Backlog batches (frames an ESP32 stored while offline, see
+store_forward.py) are not republished: live consumers (HUD, alerts)
+would take them for current values. Their samples go straight to the
+sensor history instead, dated from their capture time.
+"""
+
+import json
+import logging
+import time
+
+from mqtt_topics import HELMET_TELEMETRY, BACKPACK_TELEMETRY, HELMET_TELEMETRY_BATCH, BACKPACK_TELEMETRY_BATCH
+from telemetry_schema import decode_batch, decode_frame, fanout, ticks_diff_ms
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryBridge:
+    """
+    Fans packed telemetry frames out to per-sensor topics
+
+    Args:
+        publish: Callable(topic, payload) used to republish JSON strings
+        history: Callable(topic, payload dict, ts) receiving backlog samples
+    """
+
+    TOPICS = (HELMET_TELEMETRY, BACKPACK_TELEMETRY)
+    BATCH_TOPICS = (HELMET_TELEMETRY_BATCH, BACKPACK_TELEMETRY_BATCH)
+
+    def __init__(self, publish, history=None):
+        self.publish = publish
+        self.history = history
+        self.frames = 0
+        self.errors = 0
+        self.lost = 0
+        self.batches = 0
+        self.backlog_frames = 0
+        self.dropped = {}
+        self._last_seq = {}
+
+    def on_frame(self, topic, payload):
+        """
+        Handle one packed frame
+
+        Args:
+            topic: Topic the frame was received on
+            payload: Raw frame bytes
+
+        Returns:
+            Decoded sensor data dictionary, or None if the frame is invalid
+        """
+        try:
+            header, data = decode_frame(payload)
+        except (ValueError, KeyError) as e:
+            self.errors += 1
+            logger.warning(f"Invalid telemetry frame on {topic}: {e}")
+            return None
+
+        self.frames += 1
+        self._track_seq(header['node'], header['seq'])
+
+        for legacy_topic, message in fanout(header, data):
+            self.publish(legacy_topic, json.dumps(message))
+
+        return data
+
+    def on_batch(self, topic, payload):
+        """
+        Handle one backlog batch
+
+        Args:
+            topic: Topic the batch was received on
+            payload: Raw batch bytes
+
+        Returns:
+            Number of frames ingested
+        """
+        now = time.time()
+        try:
+            batch, frames = decode_batch(payload)
+        except ValueError as e:
+            self.errors += 1
+            logger.warning(f"Invalid telemetry batch on {topic}: {e}")
+            return 0
+
+        self.batches += 1
+        # Samples the ESP32 had to drop (ring and flash full), running total
+        self.dropped[batch['node']] = batch['dropped']
+        count = 0
+        for frame in frames:
+            try:
+                header, data = decode_frame(frame)
+            except (ValueError, KeyError) as e:
+                self.errors += 1
+                logger.warning(f"Invalid frame in telemetry batch on {topic}: {e}")
+                continue
+            count += 1
+            self._track_seq(header['node'], header['seq'])
+            if self.history is None:
+                continue
+            age = max(0, ticks_diff_ms(batch['now_ms'], header['ts_ms'])) / 1000.0
+            for legacy_topic, message in fanout(header, data):
+                self.history(legacy_topic, message, now - age)
+
+        self.frames += count
+        self.backlog_frames += count
+        logger.debug(f"Telemetry backlog from node {batch['node']}: {count} frames, "
+                    f"{batch['dropped']} dropped on the device")
+        return count
+
+    def _track_seq(self, node, seq):
+        """Count frames lost between two consecutive sequence numbers"""
+        last = self._last_seq.get(node)
+        if last is not None:
+            gap = (seq - last - 1) & 0xFFFF
+            # A large gap means the ESP32 rebooted, not that frames were lost
+            if gap < 0x8000:
+                self.lost += gap
+        self._last_seq[node] = seq
+
+    def stats(self):
+        """Return bridge counters"""
+        return {
+            'frames': self.frames,
+            'errors': self.errors,
+            'lost': self.lost,
+            'batches': self.batches,
+            'backlog_frames': self.backlog_frames,
+            'device_dropped': dict(self.dropped),
+        }
@@ -0,0 +1,455 @@
+"""
+In-memory time-series store for every sensor topic
+Fixed-size NumPy ring buffers per (topic, field), with downsampling tiers
+
+Tiers:
+    raw  : every sample (RAM only)
+    10s  : 10 second buckets (memory-mapped file)
+    1min : 1 minute buckets (memory-mapped file)
+
+Closed buckets are written straight into the memory-mapped rings, so
+history survives a restart of the server. Each series also gets a
+<name>.json file with its topic and field (file names are sanitized),
+from which the store reopens every series on startup.
+
+The ESP32 nodes only publish values that moved past their deadband (plus
+a periodic heartbeat), so series are sparse; resample() rebuilds a
+regular series by holding the last value for up to `hold` seconds.
+"""
+
+import json
+import logging
+import math
+import re
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RAW_DTYPE = np.dtype([('ts', '<f8'), ('value', '<f4')])
+BUCKET_DTYPE = np.dtype([('ts', '<f8'), ('mean', '<f4'), ('min', '<f4'), ('max', '<f4'), ('count', '<u4')])
+
+_HEADER_SIZE = 64
+_MAGIC = 0x43545331  # 'CTS1'
+
+TIERS = ('raw', '10s', '1min')
+TIER_WIDTH = {'10s': 10.0, '1min': 60.0}
+
+# Largest resample() grid: one request must not exhaust the Pi 5 memory
+MAX_RESAMPLE_POINTS = 10000
+
+
+class Ring:
+    """
+    Fixed-capacity ring of structured records, optionally file-backed
+
+    Args:
+        dtype: Record dtype
+        capacity: Number of records
+        path: Memory-mapped file (None = RAM only)
+    """
+
+    def __init__(self, dtype, capacity, path=None):
+        self.dtype = dtype
+        self.capacity = capacity
+        self.path = path
+        self._mmap = None
+
+        if path is None:
+            self.data = np.zeros(capacity, dtype=dtype)
+            self._header = np.zeros(4, dtype='<u8')
+        else:
+            self._open(Path(path))
+
+    def _open(self, path):
+        size = _HEADER_SIZE + self.capacity * self.dtype.itemsize
+        fresh = not path.exists() or path.stat().st_size != size
+        if fresh:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.truncate(size)
+
+        self._mmap = np.memmap(path, dtype=np.uint8, mode='r+', shape=size)
+        self._header = np.ndarray(4, dtype='<u8', buffer=self._mmap, offset=0)
+        self.data = np.ndarray(self.capacity, dtype=self.dtype, buffer=self._mmap, offset=_HEADER_SIZE)
+
+        if fresh or self._header[0] != _MAGIC or self._header[1] != self.capacity:
+            self._header[:] = (_MAGIC, self.capacity, 0, 0)
+
+    @property
+    def count(self):
+        """Total number of records ever appended"""
+        return int(self._header[2])
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, record):
+        count = int(self._header[2])
+        self.data[count % self.capacity] = record
+        self._header[2] = count + 1
+
+    def ordered(self):
+        """Records in chronological order (a copy once the ring has wrapped)"""
+        count = self.count
+        if count <= self.capacity:
+            return self.data[:count]
+        head = count % self.capacity
+        return np.concatenate((self.data[head:], self.data[:head]))
+
+    def first(self):
+        count = self.count
+        if not count:
+            return None
+        return self.data[count % self.capacity if count > self.capacity else 0]
+
+    def last(self):
+        count = self.count
+        if not count:
+            return None
+        return self.data[(count - 1) % self.capacity]
+
+    def flush(self):
+        if self._mmap is not None:
+            self._mmap.flush()
+
+
+class _Bucket:
+    """Running aggregate of the bucket being filled"""
+
+    __slots__ = ('start', 'total', 'low', 'high', 'count')
+
+    def __init__(self, start):
+        self.start = start
+        self.total = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+        self.count = 0
+
+    def add(self, mean, low, high, count):
+        self.total += mean * count
+        self.low = min(self.low, low)
+        self.high = max(self.high, high)
+        self.count += count
+
+    def record(self):
+        return (self.start, self.total / self.count, self.low, self.high, self.count)
+
+
+class Series:
+    """One (topic, field) series: raw ring + 10s and 1min tiers"""
+
+    def __init__(self, capacities, base_path=None):
+        self.raw = Ring(RAW_DTYPE, capacities['raw'])
+        self.tiers = {}
+        for tier in ('10s', '1min'):
+            path = None if base_path is None else f'{base_path}.{tier}.ring'
+            self.tiers[tier] = Ring(BUCKET_DTYPE, capacities[tier], path)
+        self._open = {}
+
+    def append(self, ts, value):
+        self.raw.append((ts, value))
+        self._feed('10s', ts, value, value, value, 1)
+
+    def _feed(self, tier, ts, mean, low, high, count):
+        width = TIER_WIDTH[tier]
+        start = ts - (ts % width)
+        bucket = self._open.get(tier)
+
+        if bucket is not None and bucket.start != start:
+            record = bucket.record()
+            self.tiers[tier].append(record)
+            if tier == '10s':
+                self._feed('1min', *record)
+            bucket = None
+
+        if bucket is None:
+            bucket = _Bucket(start)
+            self._open[tier] = bucket
+        bucket.add(mean, low, high, count)
+
+    def flush(self):
+        for ring in self.tiers.values():
+            ring.flush()
+
+
+def _safe_name(topic, field):
+    # Sanitizing is lossy ('/' and '#' both give '_'): the CRC keeps names apart
+    key = f'{topic}__{field}'
+    return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', key)}-{zlib.crc32(key.encode()):08x}"
+
+
+class TimeSeriesStore:
+    """
+    History for every numeric field of every JSON sensor topic
+
+    Args:
+        config: 'history' section of config.yaml
+    """
+
+    def __init__(self, config):
+        self.capacities = {
+            'raw': config.get('raw_capacity', 3600),
+            '10s': config.get('capacity_10s', 8640),    # 24 h
+            '1min': config.get('capacity_1min', 10080),  # 7 days
+        }
+        self.max_series = config.get('max_series', 256)
+        self.hold = config.get('hold', 40.0)
+        data_dir = config.get('data_dir')
+        self.data_dir = Path(data_dir) if data_dir else None
+        self.series = {}
+        self.rejected = 0
+        self._load()
+
+    def _load(self):
+        """Reopen the series persisted in data_dir, quiet ones included"""
+        if self.data_dir is None or not self.data_dir.is_dir():
+            return
+        for path in sorted(self.data_dir.glob('*.json')):
+            try:
+                meta = json.loads(path.read_text())
+                key = (meta['topic'], meta['field'])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Skipping history series {path.name}: {e}")
+                continue
+            if self._get(*key) is None:
+                logger.warning(f"History has more than {self.max_series} series, the rest is not loaded")
+                break
+        logger.info(f"History: {len(self.series)} series loaded from {self.data_dir}")
+
+    def _get(self, topic, field, create=True):
+        key = (topic, field)
+        series = self.series.get(key)
+        if series is None and create:
+            if len(self.series) >= self.max_series:
+                self.rejected += 1
+                return None
+            base = None if self.data_dir is None else self.data_dir / _safe_name(topic, field)
+            series = Series(self.capacities, base)
+            if base is not None:
+                meta = Path(f'{base}.json')
+                if not meta.exists():
+                    meta.write_text(json.dumps({'topic': topic, 'field': field}))
+            self.series[key] = series
+        return series
+
+    def append(self, topic, field, value, ts=None):
+        """Append one sample"""
+        series = self._get(topic, field)
+        if series is not None:
+            series.append(time.time() if ts is None else ts, value)
+
+    def ingest(self, topic, payload, ts=None):
+        """
+        Append every numeric field of a decoded JSON payload
+
+        Args:
+            topic: MQTT topic
+            payload: Decoded JSON (dict of fields or a bare number)
+            ts: Sample time (defaults to now)
+        """
+        ts = time.time() if ts is None else ts
+        if isinstance(payload, (int, float)) and not isinstance(payload, bool):
+            self.append(topic, 'value', payload, ts)
+            return
+        if not isinstance(payload, dict):
+            return
+        for field, value in payload.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.append(topic, field, value, ts)
+
+    def keys(self):
+        """List of (topic, field) with history"""
+        return list(self.series)
+
+    def _pick_tier(self, series, start):
+        """Finest tier whose oldest sample still covers start"""
+        for tier, ring in (('raw', series.raw), ('10s', series.tiers['10s']), ('1min', series.tiers['1min'])):
+            if len(ring) and ring.first()['ts'] <= start:
+                return tier
+        return '1min' if len(series.tiers['1min']) else '10s' if len(series.tiers['10s']) else 'raw'
+
+    def range(self, topic, field, start, end=None, tier='auto'):
+        """
+        Samples between start and end
+
+        Returns:
+            (tier, records) with records a structured array (RAW_DTYPE or BUCKET_DTYPE)
+        """
+        series = self._get(topic, field, create=False)
+        if series is None:
+            return tier, np.zeros(0, dtype=RAW_DTYPE)
+        if tier == 'auto':
+            tier = self._pick_tier(series, start)
+        ring = series.raw if tier == 'raw' else series.tiers[tier]
+
+        records = ring.ordered()
+        ts = records['ts']
+        lo = np.searchsorted(ts, start, side='left')
+        hi = len(ts) if end is None else np.searchsorted(ts, end, side='right')
+        return tier, records[lo:hi]
+
+    def aggregate(self, topic, field, start, end=None, tier='auto'):
+        """
+        min / max / mean / count / last over a time range
+
+        Returns:
+            Dictionary, values are None when the range is empty
+        """
+        tier, records = self.range(topic, field, start, end, tier)
+        if not len(records):
+            return {'tier': tier, 'count': 0, 'min': None, 'max': None, 'mean': None, 'last': None}
+
+        if tier == 'raw':
+            values = records['value']
+            return {
+                'tier': tier,
+                'count': int(len(values)),
+                'min': float(values.min()),
+                'max': float(values.max()),
+                'mean': float(values.mean()),
+                'last': float(values[-1]),
+            }
+
+        counts = records['count'].astype(np.float64)
+        return {
+            'tier': tier,
+            'count': int(counts.sum()),
+            'min': float(records['min'].min()),
+            'max': float(records['max'].max()),
+            'mean': float((records['mean'] * counts).sum() / counts.sum()),
+            'last': float(records['mean'][-1]),
+        }
+
+    def resample(self, topic, field, start, end=None, step=1.0, tier='auto', hold=None):
+        """
+        Regular series rebuilt from sparse (deadband) updates
+
+        Each grid point takes the last sample at or before it, if that
+        sample is at most `hold` seconds old (NaN otherwise: the node
+        stopped sending, heartbeats included).
+
+        Returns:
+            (tier, grid timestamps, values)
+
+        Raises:
+            ValueError: step not > 0, or more than MAX_RESAMPLE_POINTS points
+        """
+        end = time.time() if end is None else end
+        hold = self.hold if hold is None else hold
+        if not step > 0 or not math.isfinite(step):
+            raise ValueError(f"step must be a positive number of seconds, got {step}")
+        points = (end - start) / step
+        if not points <= MAX_RESAMPLE_POINTS:
+            raise ValueError(f"{points:.0f} points of {step} s requested, at most {MAX_RESAMPLE_POINTS}")
+        tier, records = self.range(topic, field, start - hold, end, tier)
+        grid = np.arange(start, end + step * 1e-6, step)
+        if not len(records):
+            return tier, grid, np.full(len(grid), np.nan)
+
+        ts = records['ts']
+        values = records['value' if tier == 'raw' else 'mean'].astype(np.float64)
+        index = np.searchsorted(ts, grid, side='right') - 1
+        clipped = np.maximum(index, 0)
+        held = np.where((index >= 0) & (grid - ts[clipped] <= hold), values[clipped], np.nan)
+        return tier, grid, held
+
+    def query(self, request):
+        """
+        Serve a query dictionary (used for MQTT request/response)
+
+        Request keys:
+            topic, field (default 'value')
+            window (seconds back from now) or start / end (epoch seconds)
+            tier: 'auto' | 'raw' | '10s' | '1min'
+            agg: true for aggregate only, false for the samples
+            step: with agg false, samples resampled every `step` seconds
+                  (> 0, at most MAX_RESAMPLE_POINTS points)
+        """
+        topic = request['topic']
+        field = request.get('field', 'value')
+        end = request.get('end')
+        if 'window' in request:
+            start = (end or time.time()) - float(request['window'])
+        else:
+            start = float(request.get('start', 0))
+        tier = request.get('tier', 'auto')
+
+        if request.get('agg', True):
+            result = self.aggregate(topic, field, start, end, tier)
+        elif 'step' in request:
+            tier, grid, values = self.resample(topic, field, start, end, float(request['step']), tier)
+            result = {
+                'tier': tier,
+                'ts': grid.tolist(),
+                'values': [None if math.isnan(v) else v for v in values.tolist()],
+            }
+        else:
+            tier, records = self.range(topic, field, start, end, tier)
+            value_key = 'value' if tier == 'raw' else 'mean'
+            result = {
+                'tier': tier,
+                'ts': records['ts'].tolist(),
+                'values': records[value_key].tolist() if len(records) else [],
+            }
+        result.update({'topic': topic, 'field': field})
+        return result
+
+    def flush(self):
+        """Flush memory-mapped tiers to disk"""
+        for series in self.series.values():
+            series.flush()
+
+    def stats(self):
+        return {'series': len(self.series), 'rejected': self.rejected}
+
+
+class HistoryService:
+    """
+    MQTT front-end of the store
+
+    Ingests every JSON message it is given, and answers requests on
+    BACKPACK_HISTORY_REQUEST on the request's 'reply_to' topic
+    (default BACKPACK_HISTORY_RESPONSE/<id>).
+    """
+
+    def __init__(self, store, publish, response_topic, exclude=()):
+        self.store = store
+        self.publish = publish
+        self.response_topic = response_topic
+        self.exclude = tuple(exclude)
+
+    def on_message(self, topic, payload):
+        """Ingest a sensor message (non-JSON payloads are ignored)"""
+        if topic.startswith(self.exclude):
+            return
+        try:
+            data = json.loads(payload)
+        except (ValueError, UnicodeDecodeError):
+            return
+        self.ingest(topic, data)
+
+    def ingest(self, topic, data, ts=None):
+        """Ingest a decoded sample, dated ts (defaults to now)"""
+        if topic.startswith(self.exclude):
+            return
+        self.store.ingest(topic, data, ts)
+
+    def on_request(self, topic, payload):
+        """Answer a history request"""
+        try:
+            request = json.loads(payload)
+            reply_to = request.get('reply_to') or f"{self.response_topic}/{request.get('id', 'anonymous')}"
+        except (ValueError, UnicodeDecodeError, AttributeError) as e:
+            logger.warning(f"Invalid history request: {e}")
+            return
+
+        try:
+            response = self.store.query(request)
+        except (KeyError, ValueError, TypeError, ArithmeticError) as e:
+            response = {'error': str(e)}
+        response['id'] = request.get('id')
+        self.publish(reply_to, json.dumps(response))
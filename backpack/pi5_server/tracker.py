@@ -0,0 +1,331 @@
+"""
+Object tracking between YOLO runs
+
+Sits between StereoInference and BACKPACK_YOLO_RESULTS: detections are
+associated with tracks (IoU on the Kalman-predicted boxes, greedy,
+same class only), every track keeps a stable id, and the boxes are
+re-published at the HUD rate, extrapolated to the publish time. YOLO
+can then run at a few batches/s while the overlay stays smooth and
+labels stop flickering.
+
+Per eye, tracks live in a TrackSet: one constant-velocity Kalman
+filter per track on (cx, cy, w, h), all tracks predicted and updated
+at once as (N, 8) / (N, 8, 8) arrays.
+
+Published boxes are predictions for the publish time, so their
+capture_ts is that time (the eyes late-latch from there, see
+hud_reprojection.py); measured_ts is the capture time of the last
+frame that updated the tracks.
+"""
+
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+
+from frame_transport import EYE_NAMES
+
+logger = logging.getLogger(__name__)
+
+STATE_SIZE = 8  # cx, cy, w, h and their velocities
+MEASUREMENT_STD = 8.0  # pixels
+ACCELERATION_STD = 300.0  # pixels/s², process noise
+INITIAL_VELOCITY_STD = 200.0  # pixels/s
+MIN_SIZE = 2.0  # pixels
+
+_H = np.eye(4, STATE_SIZE)
+_R = np.eye(4) * MEASUREMENT_STD ** 2
+
+
+def boxes_to_state(boxes):
+    """(N, 4) x0, y0, x1, y1 -> (N, 4) cx, cy, w, h"""
+    return np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                            boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]))
+
+
+def state_to_boxes(state):
+    """(N, 4+) cx, cy, w, h -> (N, 4) x0, y0, x1, y1"""
+    half_w = np.maximum(state[:, 2], MIN_SIZE) / 2
+    half_h = np.maximum(state[:, 3], MIN_SIZE) / 2
+    return np.column_stack((state[:, 0] - half_w, state[:, 1] - half_h,
+                            state[:, 0] + half_w, state[:, 1] + half_h))
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU of (N, 4) and (M, 4) boxes -> (N, M)"""
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+def greedy_match(scores, threshold):
+    """
+    Pairs (row, col) by decreasing score, each row / column used once
+
+    Returns:
+        (rows, cols) index arrays of the matched pairs
+    """
+    rows, cols = [], []
+    if scores.size == 0:
+        return np.array(rows, dtype=int), np.array(cols, dtype=int)
+    order = np.argsort(scores, axis=None)[::-1]
+    used_rows = np.zeros(scores.shape[0], dtype=bool)
+    used_cols = np.zeros(scores.shape[1], dtype=bool)
+    for flat in order:
+        row, col = divmod(int(flat), scores.shape[1])
+        if scores[row, col] < threshold:
+            break
+        if used_rows[row] or used_cols[col]:
+            continue
+        used_rows[row] = used_cols[col] = True
+        rows.append(row)
+        cols.append(col)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+
+class TrackSet:
+    """
+    Tracks of one eye
+
+    Args:
+        iou: Minimum IoU to associate a detection with a track
+        min_hits: Matches before a track is published
+        max_misses: Consecutive results without a match before a track is dropped
+        max_age: Seconds without a match before a track is dropped
+    """
+
+    def __init__(self, iou=0.3, min_hits=2, max_misses=3, max_age=5.0):
+        self.iou = iou
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.max_age = max_age
+
+        self.x = np.zeros((0, STATE_SIZE))
+        self.P = np.zeros((0, STATE_SIZE, STATE_SIZE))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.conf = np.zeros(0)
+        self.distance = np.zeros(0)  # metres, NaN = unknown
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+        self.matched_ts = np.zeros(0)
+        self.time = None
+        self.next_id = 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _predict(self, ts):
+        """Advance every track to ts (state + covariance)"""
+        if self.time is None or not len(self):
+            self.time = ts
+            return
+        dt = ts - self.time
+        if dt <= 0:
+            return
+        F = np.eye(STATE_SIZE)
+        F[:4, 4:] = np.eye(4) * dt
+        # White-noise acceleration, per axis [[dt⁴/4, dt³/2], [dt³/2, dt²]]
+        q = ACCELERATION_STD ** 2
+        Q = np.zeros((STATE_SIZE, STATE_SIZE))
+        Q[:4, :4] = np.eye(4) * q * dt ** 4 / 4
+        Q[:4, 4:] = Q[4:, :4] = np.eye(4) * q * dt ** 3 / 2
+        Q[4:, 4:] = np.eye(4) * q * dt ** 2
+
+        self.x = self.x @ F.T
+        self.P = F @ self.P @ F.T + Q
+        self.time = ts
+
+    def update(self, detections, ts):
+        """
+        Fold one inference result into the tracks
+
+        Args:
+            detections: List of {'cls', 'conf', 'box'} (camera pixels),
+                optionally 'distance' (stereo.py)
+            ts: Capture time of the frame
+        """
+        self._predict(ts)
+        boxes = np.array([d['box'] for d in detections], dtype=np.float64).reshape(-1, 4)
+        cls = np.array([d['cls'] for d in detections], dtype=np.int64)
+        conf = np.array([d['conf'] for d in detections], dtype=np.float64)
+        distance = np.array([d.get('distance') for d in detections], dtype=np.float64)
+
+        # Associate on predicted boxes, never across classes
+        scores = iou_matrix(state_to_boxes(self.x), boxes)
+        scores[self.cls[:, None] != cls[None, :]] = 0.0
+        rows, cols = greedy_match(scores, self.iou)
+
+        if len(rows):
+            self._correct(rows, boxes_to_state(boxes[cols]))
+            self.conf[rows] = 0.5 * self.conf[rows] + 0.5 * conf[cols]
+            # A match without depth (ROI frame, unpaired eye) keeps the last distance
+            measured = ~np.isnan(distance[cols])
+            self.distance[rows[measured]] = distance[cols][measured]
+            self.hits[rows] += 1
+            self.misses[rows] = 0
+            self.matched_ts[rows] = ts
+        unmatched = np.ones(len(self), dtype=bool)
+        unmatched[rows] = False
+        self.misses[unmatched] += 1
+
+        keep = (self.misses <= self.max_misses) & (ts - self.matched_ts <= self.max_age)
+        if not keep.all():
+            self._select(keep)
+
+        new = np.ones(len(boxes), dtype=bool)
+        new[cols] = False
+        if new.any():
+            self._spawn(boxes[new], cls[new], conf[new], distance[new], ts)
+
+    def _correct(self, rows, z):
+        """Kalman update of the matched tracks with measurements z (K, 4)"""
+        P = self.P[rows]
+        S = P[:, :4, :4] + _R
+        K = P[:, :, :4] @ np.linalg.inv(S)
+        innovation = z - self.x[rows, :4]
+        self.x[rows] += (K @ innovation[:, :, None])[:, :, 0]
+        self.P[rows] = P - K @ (_H @ P)
+
+    def _spawn(self, boxes, cls, conf, distance, ts):
+        n = len(boxes)
+        x = np.zeros((n, STATE_SIZE))
+        x[:, :4] = boxes_to_state(boxes)
+        P = np.zeros((n, STATE_SIZE, STATE_SIZE))
+        P[:, :4, :4] = _R
+        P[:, 4:, 4:] = np.eye(4) * INITIAL_VELOCITY_STD ** 2
+
+        self.x = np.concatenate((self.x, x))
+        self.P = np.concatenate((self.P, P))
+        self.ids = np.concatenate((self.ids, np.arange(self.next_id, self.next_id + n)))
+        self.cls = np.concatenate((self.cls, cls))
+        self.conf = np.concatenate((self.conf, conf))
+        self.distance = np.concatenate((self.distance, distance))
+        self.hits = np.concatenate((self.hits, np.ones(n, dtype=np.int64)))
+        self.misses = np.concatenate((self.misses, np.zeros(n, dtype=np.int64)))
+        self.matched_ts = np.concatenate((self.matched_ts, np.full(n, ts)))
+        self.next_id += n
+        if self.time is None:
+            self.time = ts
+
+    def _select(self, mask):
+        for name in ('x', 'P', 'ids', 'cls', 'conf', 'distance', 'hits', 'misses', 'matched_ts'):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def predict_boxes(self, ts, max_extrapolation=0.5):
+        """
+        Boxes of the confirmed tracks extrapolated to ts (state untouched)
+
+        Extrapolation stops max_extrapolation seconds after a track's
+        last match: a lost object is held, not thrown across the view.
+
+        Returns:
+            (boxes (K, 4), ids, cls, conf, distance) of the confirmed tracks
+        """
+        confirmed = self.hits >= self.min_hits
+        x = self.x[confirmed]
+        ahead = np.clip(ts - self.matched_ts[confirmed], 0.0, max_extrapolation)
+        behind = (self.matched_ts[confirmed] - self.time) if self.time is not None else 0.0
+        state = x[:, :4] + x[:, 4:] * (ahead + behind)[:, None]
+        return (state_to_boxes(state), self.ids[confirmed], self.cls[confirmed], self.conf[confirmed],
+                self.distance[confirmed])
+
+
+class Tracker:
+    """
+    Tracks for both eyes, published at a fixed rate
+
+    Args:
+        config: 'tracking' section of config.yaml
+        publish: Callable(topic, payload), thread-safe
+        topic: Results topic (BACKPACK_YOLO_RESULTS)
+    """
+
+    def __init__(self, config, publish, topic):
+        self.publish = publish
+        self.topic = topic
+        self.rate = config.get('rate', 20.0)
+        self.max_extrapolation = config.get('max_extrapolation', 0.5)
+        self.tracks = {
+            name: TrackSet(config.get('iou', 0.3), config.get('min_hits', 2),
+                           config.get('max_misses', 3), config.get('max_age', 5.0))
+            for name in EYE_NAMES.values()
+        }
+        self.labels = {}
+        self.sources = {}
+        self._lock = threading.Lock()
+        self._last_emit = 0.0
+        self.results = 0
+        self.emitted = 0
+        self.update_ms = 0.0
+
+    def on_results(self, topic, payload):
+        """StereoInference publish target: update the tracks, publish right away"""
+        results = json.loads(payload)
+        start = time.perf_counter()
+        with self._lock:
+            for name, eye in results['eyes'].items():
+                for detection in eye['detections']:
+                    self.labels[detection['cls']] = detection['label']
+                self.tracks[name].update(eye['detections'], eye['capture_ts'])
+                self.sources[name] = eye
+            self.results += 1
+            self.update_ms = (time.perf_counter() - start) * 1000
+        self.emit(results.get('timings_ms'))
+
+    def emit(self, timings=None):
+        """Publish every eye's confirmed tracks, extrapolated to now"""
+        now = time.time()
+        payload = {'ts': now, 'tracked': True, 'eyes': {}}
+        with self._lock:
+            for name, tracks in self.tracks.items():
+                source = self.sources.get(name)
+                if source is None:
+                    continue
+                boxes, ids, cls, conf, distance = tracks.predict_boxes(now, self.max_extrapolation)
+                payload['eyes'][name] = {
+                    'seq': source['seq'],
+                    'capture_ts': now,
+                    'measured_ts': source['capture_ts'],
+                    'received_ts': source.get('received_ts'),
+                    'detections': [
+                        {
+                            'track': int(track),
+                            'cls': int(c),
+                            'label': self.labels.get(int(c), str(c)),
+                            'conf': round(float(p), 3),
+                            'box': [round(float(v), 1) for v in box],
+                            'distance': None if np.isnan(z) else round(float(z), 2),
+                        }
+                        for track, c, p, box, z in zip(ids, cls, conf, boxes, distance)
+                    ],
+                }
+            self._last_emit = time.monotonic()
+        if not payload['eyes']:
+            return
+        if timings is not None:
+            payload['timings_ms'] = timings
+        self.publish(self.topic, json.dumps(payload))
+        self.emitted += 1
+
+    def due(self):
+        """Whether a periodic emit is needed (none in the last half period)"""
+        return time.monotonic() - self._last_emit >= 0.5 / self.rate
+
+    def stats(self):
+        """Track counts and update cost"""
+        return {
+            'rate': self.rate,
+            'results': self.results,
+            'emitted': self.emitted,
+            'update_ms': round(self.update_ms, 3),
+            'tracks': {name: len(tracks) for name, tracks in self.tracks.items()},
+        }
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Arm dashboard benchmark - Frame cost under an MQTT message flood
+
+Feeds the arm dashboard (arm/pi_zero_arm_display/dashboard.py) with
+--rate messages/s spread over every topic of its layout plus --extra
+undisplayed topics (YOLO results, frame metadata...), and renders
+--fps frames per simulated second with the SDL dummy video driver.
+A tap on the tab bar is injected every second.
+
+Compared renderers:
+- naive: every message decoded in the MQTT handler, every widget of
+  the page redrawn and the whole screen flipped each frame
+- coalesced: latest payload per topic decoded once per frame, only
+  dirty widgets redrawn and pushed as dirty rectangles
+
+Reports the CPU time per frame against the frame budget, the share of
+the screen pushed to the display (what the Pi framebuffer pays for) and
+the tap-to-display time.
+
+Usage:
+    python benchmarks/arm_dashboard_bench.py [--rate 3000] [--fps 30]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / 'shared'))
+sys.path.insert(0, str(ROOT / 'arm' / 'pi_zero_arm_display'))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+from dashboard import Dashboard, TABS_HEIGHT
+from node_config import load_node_config
+
+
+class NaiveDashboard(Dashboard):
+    """Decode on receive, redraw and flip everything every frame"""
+
+    def on_message(self, topic, payload):
+        self.state.received += 1
+        if topic in self.state.event_topics:
+            self.state.events.append((topic, payload))
+            return
+        try:
+            value = json.loads(payload)
+        except (ValueError, UnicodeDecodeError):
+            self.state.errors += 1
+            return
+        now = time.monotonic()
+        for widget in self.routes.get(topic, ()):
+            widget.update(topic, value, now)
+
+    def frame(self, now=None):
+        for widget in self.visible():
+            widget.dirty = True
+        running = super().frame(now)
+        pygame.display.flip()
+        return running
+
+
+def messages(dashboard, extra, rng):
+    """(topic, payload factory) for every displayed topic + extra noise topics"""
+    fields = {}
+    for page in dashboard.pages:
+        for tile in page:
+            fields.setdefault(tile.topic, set()).add(tile.field)
+    sources = []
+    for topic, names in sorted(fields.items()):
+        # Sensor-like random walk: most messages do not change the shown text
+        state = {name: rng.uniform(10, 90) for name in names}
+
+        def payload(state=state):
+            for name in state:
+                state[name] += rng.gauss(0, 0.05)
+            return json.dumps({name: round(value, 3) for name, value in state.items()})
+        sources.append((topic, payload))
+    big = json.dumps({'eye': 'left', 'detections': [
+        {'cls': 0, 'conf': 0.9, 'box': [10, 20, 110, 220], 'track': i} for i in range(20)]})
+    for i in range(extra):
+        sources.append((f"backpack/extra/{i}", lambda: big))
+    return sources
+
+
+def run_renderer(cls, args, display, layout):
+    rng = random.Random(args.seed)
+    dashboard = cls(display, layout)
+    dashboard.open()
+    handler = dashboard.on_message if cls is NaiveDashboard else dashboard.state.on_message
+    sources = messages(dashboard, args.extra, rng)
+    alerts = [json.dumps({'id': f"rule{i}", 'state': 'raised', 'severity': 'warning',
+                          'message': f"Alert {i}", 'ts': i}) for i in range(4)]
+
+    frame_interval = 1.0 / args.fps
+    per_frame = args.rate / args.fps
+    budget = 0.0
+    frame_times = []
+    handler_time = 0.0
+    touch_times = []
+    now = time.monotonic()
+    for index in range(int(args.duration * args.fps)):
+        # Messages that arrived during the previous frame interval
+        budget += per_frame
+        batch = []
+        while budget >= 1:
+            topic, payload = rng.choice(sources)
+            batch.append((topic, payload()))
+            budget -= 1
+        if index % args.fps == args.fps // 2:
+            batch.append(('system/alerts', rng.choice(alerts)))
+        start = time.perf_counter()
+        for topic, payload in batch:
+            handler(topic, payload)
+        handler_time += time.perf_counter() - start
+
+        if index % args.fps == 0:
+            tab = (index // args.fps) % len(dashboard.pages)
+            x = (tab + 0.5) / len(dashboard.pages)
+            y = 1.0 - TABS_HEIGHT / 2 / display['height']
+            pygame.event.post(pygame.event.Event(pygame.FINGERDOWN, x=x, y=y, dx=0, dy=0, finger_id=0,
+                                                 touch_id=0, pressure=1.0))
+        touches = dashboard.touches
+        start = time.perf_counter()
+        dashboard.frame(now)
+        elapsed = (time.perf_counter() - start) * 1000
+        frame_times.append(elapsed)
+        if dashboard.touches != touches:
+            touch_times.append(elapsed)
+        now += frame_interval
+
+    stats = dashboard.stats()
+    dashboard.close()
+    frames = np.array(frame_times)
+    return {
+        'frame_p50': float(np.percentile(frames, 50)),
+        'frame_p99': float(np.percentile(frames, 99)),
+        'handler_us': handler_time / max(1, stats['received']) * 1e6,
+        'redrawn_ratio': 1.0 if cls is NaiveDashboard else stats['redrawn_ratio'],
+        'touch_ms': float(np.max(touch_times)) if touch_times else float('nan'),
+        'received': stats['received'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=3000, help='Messages per second (all topics)')
+    parser.add_argument('--extra', type=int, default=40, help='Undisplayed topics in the flood')
+    parser.add_argument('--fps', type=int, default=30, help='Dashboard frame rate')
+    parser.add_argument('--duration', type=float, default=10.0, help='Simulated seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    config = load_node_config(ROOT / 'arm' / 'pi_zero_arm_display', cache=False)
+    display = dict(config['display'], fullscreen=False)
+    layout = config['dashboard']
+    topics = len({t['topic'] for p in layout['pages'] for t in p['tiles']}) + args.extra
+
+    print(f"{topics} topics, {args.rate:.0f} msg/s, {args.fps} FPS "
+          f"(budget {1000 / args.fps:.1f} ms/frame), {display['width']}x{display['height']}")
+    print(f"{'renderer':>10} {'p50 ms':>8} {'p99 ms':>8} {'handler us':>11} {'screen pushed':>14} {'tap ms':>8}")
+    for name, cls in (('naive', NaiveDashboard), ('coalesced', Dashboard)):
+        result = run_renderer(cls, args, display, layout)
+        print(f"{name:>10} {result['frame_p50']:8.2f} {result['frame_p99']:8.2f} {result['handler_us']:11.1f} "
+              f"{result['redrawn_ratio']:13.1%} {result['touch_ms']:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
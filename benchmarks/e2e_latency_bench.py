@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark - armor pipelines against a local broker
+
+Runs the real pipeline components on simulated inputs and stamps every
+probe at each stage boundary:
+
+camera : capture -> encoded -> received -> batch_start -> inferred -> delivered -> rendered
+         (eye capture + JPEG, ring + TCP transport, latest-wins wait,
+         YOLO batch, MQTT to the eye, HUD redraw + I2C flush)
+gas    : read -> checked -> published -> delivered
+         (MQ ADC read, check_alerts(), umqtt publish, arm display receipt)
+
+Reports p50/p95/p99 per hop and end to end, as a table and as JSON.
+A previous report can be passed with --compare to flag regressions.
+
+Inference: --inference yolo uses StereoInference (torch + ultralytics +
+OpenCV); --inference synthetic keeps the same latest-wins stage but
+replaces decode + model by a fixed delay and ground-truth boxes.
+
+Usage:
+    python benchmarks/e2e_latency_bench.py --broker 127.0.0.1:1883 --json report.json
+    python benchmarks/e2e_latency_bench.py --compare report.json --threshold 20
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(1, str(REPO_ROOT / 'shared'))
+sys.path.insert(2, str(REPO_ROOT / 'backpack' / 'pi5_server'))
+
+import sim
+from sim.run import prepare_esp32
+from sim.world import SyntheticScene, encode_jpeg
+from constants import HUD_UPDATE_INTERVAL
+from mqtt_async import AsyncMQTTClient
+from mqtt_topics import BACKPACK_YOLO_RESULTS, SYSTEM_ALERTS
+from frame_ring import FrameRing
+from frame_transport import FrameSender, FrameReceiver, EYE_NAMES, CODEC_RAW, CODEC_JPEG
+from hud_renderer import HudRenderer, StatusHud, CountingBus
+from inference import StereoInference, EYES
+
+CAMERA_STAGES = ('capture', 'encoded', 'received', 'batch_start', 'inferred', 'delivered', 'rendered')
+GAS_STAGES = ('read', 'checked', 'published', 'delivered')
+I2C_BITS_PER_BYTE = 9
+
+
+def summarize(values):
+    if not values:
+        return {'n': 0}
+    a = np.asarray(values, dtype=np.float64)
+    return {
+        'n': int(a.size),
+        'p50': round(float(np.percentile(a, 50)), 3),
+        'p95': round(float(np.percentile(a, 95)), 3),
+        'p99': round(float(np.percentile(a, 99)), 3),
+        'mean': round(float(a.mean()), 3),
+        'max': round(float(a.max()), 3),
+    }
+
+
+class ProbeLog:
+    """
+    Stage timestamps per probe (epoch seconds, any thread)
+
+    Args:
+        stages: Ordered stage names of the pipeline
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, probe, stage, ts=None):
+        """Record a stage (first mark wins)"""
+        with self._lock:
+            self.marks.setdefault(probe, {}).setdefault(stage, time.time() if ts is None else ts)
+
+    def report(self):
+        complete = [m for m in self.marks.values() if all(s in m for s in self.stages)]
+        hops = {}
+        for a, b in zip(self.stages, self.stages[1:]):
+            hops[f'{a}->{b}'] = summarize([(m[b] - m[a]) * 1000 for m in complete])
+        first, last = self.stages[0], self.stages[-1]
+        return {
+            'probes': len(self.marks),
+            'complete': len(complete),
+            'hops_ms': hops,
+            'end_to_end_ms': summarize([(m[last] - m[first]) * 1000 for m in complete]),
+        }
+
+
+class SyntheticInference(StereoInference):
+    """
+    StereoInference with decode + model replaced by a fixed delay
+
+    Keeps the real latest-wins / pairing / staleness logic; detections
+    are the scene ground truth at capture time.
+    """
+
+    CODECS = (CODEC_JPEG, CODEC_RAW)  # nothing is decoded
+
+    def __init__(self, config, publish, topic, scenes, model_ms):
+        super().__init__(config, publish, topic)
+        self.scenes = scenes
+        self.model_ms = model_ms
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='yolo', daemon=True)
+        self._thread.start()
+
+    def _run_batch(self, frames):
+        t0 = time.perf_counter()
+        time.sleep(self.model_ms / 1000)
+        t1 = time.perf_counter()
+        payload = {'ts': time.time(), 'eyes': {}}
+        for eye in EYES:
+            if eye not in frames:
+                continue
+            scene = self.scenes[eye]
+            boxes = scene.boxes(frames[eye].capture_ts - scene.epoch)
+            payload['eyes'][EYE_NAMES[eye]] = {
+                'seq': frames[eye].seq,
+                'capture_ts': frames[eye].capture_ts,
+                'received_ts': frames[eye].received,
+                'detections': [{'cls': 0, 'label': 'person', 'conf': 0.9, 'box': list(b)} for b in boxes],
+            }
+        payload['timings_ms'] = {
+            'preprocess': 0.0,
+            'inference': round((t1 - t0) * 1000, 2),
+            'postprocess': 0.0,
+            'total': round((time.perf_counter() - t0) * 1000, 2),
+        }
+        self.publish(self.topic, json.dumps(payload))
+        self.batches += 1
+        now = time.time()
+        for eye in frames:
+            self.stats_by_eye[eye].record(now - frames[eye].capture_ts, now)
+
+
+def pick_encoder(resolution):
+    """JPEG when an encoder is installed, zlib-packed raw frames otherwise"""
+    try:
+        encode_jpeg(np.zeros((8, 8, 3), dtype=np.uint8))
+        return 'jpeg', CODEC_JPEG, lambda frame: encode_jpeg(frame, 80)
+    except ImportError:
+        return 'raw+zlib', CODEC_RAW, lambda frame: zlib.compress(frame.tobytes(), 1)
+
+
+def pick_inference(mode):
+    if mode != 'auto':
+        return mode
+    try:
+        import cv2, torch, ultralytics  # noqa: F401
+        return 'yolo'
+    except ImportError:
+        return 'synthetic'
+
+
+async def camera_pipeline(args, log, stop):
+    """Two eyes -> Pi 5 receiver + inference -> eye HUDs"""
+    loop = asyncio.get_running_loop()
+    codec_name, codec, encode = pick_encoder(args.resolution)
+    width, height = args.resolution
+    scenes = {}
+    for eye in EYES:
+        scene = SyntheticScene(width, height, seed=args.seed + eye)
+        scene.epoch = time.time()
+        scene.t0 = time.monotonic()
+        scenes[eye] = scene
+
+    # Pi 5 side
+    server = AsyncMQTTClient('bench_pi5_server', args.host, args.port)
+    yolo_config = {'model': args.model, 'confidence': 0.5, 'device': 'cpu', 'imgsz': args.imgsz,
+                   'threads': 4, 'decode_threads': 2, 'max_frame_age': 0.5, 'pair_wait': 0.03,
+                   'max_rate': 0}  # no power-budget cap: measure the pipeline itself
+    mode = pick_inference(args.inference)
+    if mode == 'yolo':
+        inference = StereoInference(yolo_config, server.publish_threadsafe, BACKPACK_YOLO_RESULTS)
+    else:
+        inference = SyntheticInference(yolo_config, server.publish_threadsafe, BACKPACK_YOLO_RESULTS,
+                                       scenes, args.model_ms)
+
+    def on_frame(eye, seq, timestamp, flags, data):
+        log.mark((eye, seq), 'received')
+        inference.submit(eye, seq, timestamp, flags, data)
+
+    receiver = FrameReceiver(on_frame, '127.0.0.1', args.frames_port, 16 * 1024 * 1024)
+
+    # Eye side: HUD per eye, fed by the YOLO results
+    eye_client = AsyncMQTTClient('bench_eye', args.host, args.port)
+    huds = {}
+    for eye in EYES:
+        renderer = HudRenderer(CountingBus())
+        huds[eye] = {'renderer': renderer, 'hud': StatusHud(renderer, args.resolution),
+                     'state': {'temperature': 24.0, 'humidity': 50, 'aqi': 1, 'battery': 80, 'boxes': ()},
+                     'pending': []}
+
+    def on_results(topic, payload):
+        now = time.time()
+        result = json.loads(payload)
+        start = result['ts'] - result['timings_ms']['total'] / 1000
+        for eye in EYES:
+            entry = result['eyes'].get(EYE_NAMES[eye])
+            if entry is None:
+                continue
+            probe = (eye, entry['seq'])
+            log.mark(probe, 'batch_start', start)
+            log.mark(probe, 'inferred', result['ts'])
+            log.mark(probe, 'delivered', now)
+            huds[eye]['state']['boxes'] = [d['box'] for d in entry['detections']]
+            huds[eye]['pending'].append(probe)
+
+    eye_client.subscribe(BACKPACK_YOLO_RESULTS, on_results)
+
+    await server.start()
+    await eye_client.start()
+    await server.wait_connected(10.0)
+    await eye_client.wait_connected(10.0)
+    inference.start()
+    receiver.start()
+
+    # Eye capture -> ring -> sender thread (a process on the real eye)
+    rings, senders, threads = [], [], []
+    stop_event = threading.Event()
+    slot_size = width * height * 3 + 1024
+    for eye in EYES:
+        ring = FrameRing.create(f'bench_ring_{EYE_NAMES[eye]}_{args.frames_port}', 4, slot_size)
+        reader = FrameRing.attach(ring.name)
+        sender = FrameSender('127.0.0.1', args.frames_port, eye)
+        thread = threading.Thread(target=sender.run, args=(reader, stop_event), daemon=True)
+        thread.start()
+        rings.append((ring, reader))
+        threads.append(thread)
+
+    async def capture(eye, ring):
+        interval = 1.0 / args.fps
+        next_time = loop.time()
+        scene = scenes[eye]
+        while not stop.is_set():
+            capture_ts = time.time()
+            frame = scene.render(capture_ts - scene.epoch)
+            data = await loop.run_in_executor(None, encode, frame)
+            seq = ring.write(data, capture_ts, codec)
+            log.mark((eye, seq), 'capture', capture_ts)
+            log.mark((eye, seq), 'encoded')
+            next_time = max(next_time + interval, loop.time())
+            await asyncio.sleep(next_time - loop.time())
+
+    async def hud(eye):
+        h = huds[eye]
+        while not stop.is_set():
+            start = loop.time()
+            pending, h['pending'] = h['pending'], []
+            h['hud'].draw(h['state'])
+            nbytes = h['renderer'].flush()
+            # Modelled I2C wire time of the flushed bands
+            await asyncio.sleep(nbytes * I2C_BITS_PER_BYTE / args.i2c_freq)
+            for probe in pending:
+                log.mark(probe, 'rendered')
+            await asyncio.sleep(max(0.0, HUD_UPDATE_INTERVAL - (loop.time() - start)))
+
+    try:
+        await asyncio.gather(*(capture(eye, ring) for eye, (ring, _) in zip(EYES, rings)),
+                             *(hud(eye) for eye in EYES))
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=2.0)
+        receiver.stop()
+        inference.stop()
+        for ring, reader in rings:
+            reader.close()
+            ring.close()
+        await eye_client.stop()
+        await server.stop()
+
+    return {'codec': codec_name, 'inference': mode, 'inference_stats': inference.stats(),
+            'receiver': receiver.stats()}
+
+
+async def gas_pipeline(args, log, stop):
+    """Backpack MQ reading -> check_alerts -> system/alerts -> arm display"""
+    loop = asyncio.get_running_loop()
+    node_dir = REPO_ROOT / 'backpack' / 'esp32_backpack'
+    config, world = prepare_esp32(node_dir, f'{args.host}:{args.port}', args.seed)
+    from sensors import SensorManager
+    from mqtt_client import MQTTHandler
+
+    # Gas level driven by the benchmark: high during a probe
+    level = {'volts': 0.3}
+    for pin in ('MQ2_INT_PIN', 'MQ7_INT_PIN'):
+        sim.settings['adc'][config[pin]] = lambda: level['volts']
+
+    sensors = SensorManager()
+    mqtt = MQTTHandler()
+    if not mqtt.connect():
+        raise RuntimeError('Backpack MQTT connection failed')
+
+    # Arm display side (same handler shape as arm/pi_zero_arm_display)
+    arm = AsyncMQTTClient('bench_arm_display', args.host, args.port)
+    state = {'topics': {}}
+
+    def on_alert(topic, payload):
+        now = time.time()
+        message = json.loads(payload)
+        state['topics'][topic] = message
+        if 'probe' in message:
+            log.mark(message['probe'], 'delivered', now)
+
+    arm.subscribe(SYSTEM_ALERTS, on_alert)
+    await arm.start()
+    await arm.wait_connected(10.0)
+
+    def esp32_loop():
+        probe = 0
+        def read():
+            # Fresh filters: one read follows the driven level
+            for gas in sensors.gas.values():
+                gas.reset()
+            return {'mq2_int': sensors.read_mq2(interior=True),
+                    'mq7_int': sensors.read_mq7(interior=True)}
+
+        while not stop.is_set():
+            probe += 1
+            level['volts'] = 2.5
+            log.mark(probe, 'read')
+            readings = read()
+            alerts = sensors.check_alerts(readings)
+            log.mark(probe, 'checked')
+            for alert in alerts:
+                mqtt.publish(SYSTEM_ALERTS, dict(alert, probe=probe))
+            log.mark(probe, 'published')
+            # Alerts are latched: clear them before the next probe
+            level['volts'] = 0.3
+            for alert in sensors.check_alerts(read()):
+                mqtt.publish(SYSTEM_ALERTS, alert)
+            stop.wait(1.0 / args.gas_rate)
+
+    try:
+        await loop.run_in_executor(None, esp32_loop)
+        await asyncio.sleep(0.5)  # let the last alerts arrive
+    finally:
+        mqtt.disconnect()
+        await arm.stop()
+    return {}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_pipeline(name, report):
+    print(f"\n{name}: {report['complete']}/{report['probes']} complete probes")
+    print(f"  {'hop':<26} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9}  (ms)")
+    rows = list(report['hops_ms'].items()) + [('end to end', report['end_to_end_ms'])]
+    for hop, s in rows:
+        if s['n'] == 0:
+            print(f"  {hop:<26} {0:>6} {'-':>9} {'-':>9} {'-':>9}")
+        else:
+            print(f"  {hop:<26} {s['n']:>6} {s['p50']:>9.2f} {s['p95']:>9.2f} {s['p99']:>9.2f}")
+
+
+def compare(report, baseline, threshold):
+    """
+    Compare p95 per hop with a previous report
+
+    Returns:
+        List of (pipeline, hop, old p95, new p95) regressions
+    """
+    regressions = []
+    print(f"\nComparison with {baseline.get('commit')} (p95, threshold {threshold}%)")
+    for pipeline, current in report['pipelines'].items():
+        previous = baseline.get('pipelines', {}).get(pipeline)
+        if not previous:
+            continue
+        rows = list(current['hops_ms'].items()) + [('end to end', current['end_to_end_ms'])]
+        old_rows = dict(previous['hops_ms'], **{'end to end': previous['end_to_end_ms']})
+        for hop, s in rows:
+            old = old_rows.get(hop, {})
+            if not s.get('n') or not old.get('n'):
+                continue
+            change = (s['p95'] - old['p95']) / old['p95'] * 100 if old['p95'] else 0.0
+            flag = ' REGRESSION' if change > threshold else ''
+            print(f"  {pipeline:<7} {hop:<26} {old['p95']:>9.2f} -> {s['p95']:>9.2f} ({change:+.0f}%){flag}")
+            if flag:
+                regressions.append((pipeline, hop, old['p95'], s['p95']))
+    return regressions
+
+
+async def run(args):
+    stop = threading.Event()
+    logs = {'camera': ProbeLog(CAMERA_STAGES), 'gas': ProbeLog(GAS_STAGES)}
+    tasks = {}
+    if 'camera' in args.pipelines:
+        tasks['camera'] = asyncio.create_task(camera_pipeline(args, logs['camera'], stop))
+    if 'gas' in args.pipelines:
+        tasks['gas'] = asyncio.create_task(gas_pipeline(args, logs['gas'], stop))
+
+    await asyncio.sleep(args.duration)
+    stop.set()
+    details = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+
+    pipelines = {}
+    for name in tasks:
+        pipelines[name] = dict(logs[name].report(), **details[name])
+    return pipelines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--broker', default='127.0.0.1:1883', help='MQTT broker host[:port]')
+    parser.add_argument('--pipelines', default='camera,gas')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of probes')
+    parser.add_argument('--fps', type=float, default=10.0, help='Camera rate per eye')
+    parser.add_argument('--resolution', default='640x480')
+    parser.add_argument('--inference', choices=('auto', 'yolo', 'synthetic'), default='auto')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--model-ms', type=float, default=80.0, help='Synthetic inference time')
+    parser.add_argument('--frames-port', type=int, default=5601)
+    parser.add_argument('--i2c-freq', type=int, default=100000, help='HUD I2C clock for the wire-time model')
+    parser.add_argument('--gas-rate', type=float, default=5.0, help='Gas probes per second')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=Path, help='Write the report to this file')
+    parser.add_argument('--compare', type=Path, help='Previous report to compare with')
+    parser.add_argument('--threshold', type=float, default=20.0, help='p95 regression threshold (%%)')
+    args = parser.parse_args()
+
+    host, _, port = args.broker.partition(':')
+    args.host, args.port = host, int(port or 1883)
+    args.resolution = tuple(int(v) for v in args.resolution.split('x'))
+    args.pipelines = args.pipelines.split(',')
+
+    pipelines = asyncio.run(run(args))
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(),
+                 'machine': platform.machine()},
+        'config': {k: v for k, v in vars(args).items() if k not in ('json', 'compare')},
+        'pipelines': pipelines,
+    }
+    for name, pipeline in pipelines.items():
+        print_pipeline(name, pipeline)
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, default=str))
+        print(f"\nReport written to {args.json}")
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
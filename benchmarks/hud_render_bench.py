@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+HUD renderer benchmark - Dirty-band flushing vs full-frame refresh
+
+Renders typical eye HUD scenes on a CountingBus and reports, per scene:
+- bytes on the I2C bus per frame (dirty bands vs full 1 KB frame)
+- render + diff CPU time per frame
+- achievable FPS: min(CPU bound, I2C bound at 100 / 400 kHz)
+
+Usage:
+    python benchmarks/hud_render_bench.py [frames]
+"""
+
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shared'))
+
+from hud_renderer import HudRenderer, StatusHud, CountingBus
+
+I2C_BITS_PER_BYTE = 9  # 8 data bits + ACK
+
+
+def scene_static(i):
+    """Sensor values refresh once per second (every 20 frames), nothing detected"""
+    tick = i // 20
+    return {
+        'temperature': 24.0 + (tick % 10) / 10,
+        'humidity': 48 + tick % 3,
+        'aqi': 1,
+        'battery': 87,
+        'boxes': (),
+    }
+
+
+def scene_tracking(i):
+    """Two detections drifting a few pixels per frame"""
+    state = scene_static(i)
+    dx = 40 * math.sin(i / 15)
+    state['boxes'] = (
+        (200 + dx, 150, 320 + dx, 400),
+        (420 - dx, 200, 520 - dx, 330),
+    )
+    return state
+
+
+def scene_busy(i):
+    """Every value changes every frame (worst realistic case)"""
+    state = scene_tracking(i)
+    state['temperature'] = 20 + (i % 100) / 10
+    state['humidity'] = i % 100
+    state['battery'] = 100 - (i % 100)
+    return state
+
+
+def bench(name, scene, frames):
+    bus = CountingBus()
+    renderer = HudRenderer(bus)
+    hud = StatusHud(renderer)
+
+    hud.draw(scene(0))
+    renderer.flush()  # first frame is always full
+    start_bytes = bus.bytes_sent
+
+    start = time.perf_counter()
+    for i in range(1, frames + 1):
+        hud.draw(scene(i))
+        renderer.flush()
+    cpu = (time.perf_counter() - start) / frames
+
+    per_frame = (bus.bytes_sent - start_bytes) / frames
+    full = renderer.full_frame_bytes()
+
+    print(f"\n{name}")
+    print(f"  bytes/frame       dirty {per_frame:8.1f}   full {full:6d}   ({100 * per_frame / full:.1f}%)")
+    print(f"  CPU/frame         {cpu * 1000:.3f} ms   (CPU bound {1 / cpu:.0f} FPS)")
+    for khz in (100, 400):
+        rate = khz * 1000 / I2C_BITS_PER_BYTE
+        dirty_fps = rate / per_frame if per_frame else float('inf')
+        fps = min(1 / cpu, dirty_fps)
+        print(f"  {khz} kHz I2C      dirty {fps:7.1f} FPS   full {min(1 / cpu, rate / full):6.1f} FPS")
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"HUD renderer benchmark ({frames} frames per scene, 20 FPS target)")
+    bench('Static HUD (values change at 1 Hz)', scene_static, frames)
+    bench('HUD + 2 moving detections', scene_tracking, frames)
+    bench('Everything changing every frame', scene_busy, frames)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+HUD late-latching benchmark - Overlay error with and without reprojection
+
+A static object is tracked while the head turns (yaw sweep + pitch nod).
+Boxes come back from inference `--delay` ms after their capture; the
+HUD loop runs at HUD_UPDATE_INTERVAL with orientation samples every
+BNO055 period. Reports, per HUD frame, the distance between the drawn
+box and where the object really is:
+- raw: boxes drawn as received (error grows with the inference delay)
+- late-latched: boxes shifted by the head rotation since capture
+
+Usage:
+    python benchmarks/hud_reprojection_bench.py [--delay 150] [--speed 60]
+"""
+
+import argparse
+import math
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shared'))
+
+import numpy as np
+
+from constants import CAMERA_RESOLUTION, CAMERA_FPS, HUD_UPDATE_INTERVAL
+from hud_reprojection import OrientationHistory, Reprojector, DEFAULT_FOV
+
+IMU_INTERVAL = 0.05  # BNO055_PERIOD_MS
+
+
+def head(t, speed):
+    """Heading / roll / pitch (degrees) at time t: yaw sweep, nod, slight roll"""
+    heading = (speed * 0.5 * math.sin(t * 2.0 * math.pi / 2.0) * 2.0 / math.pi) % 360.0
+    pitch = 8.0 * math.sin(t * 2.0 * math.pi / 1.5)
+    roll = 3.0 * math.sin(t * 2.0 * math.pi / 3.0)
+    return heading, roll, pitch
+
+
+def true_box(t, speed, size=80):
+    """Where a fixed object straight ahead at t=0 appears in the camera at time t"""
+    width, height = CAMERA_RESOLUTION
+    heading, roll, pitch = head(t, speed)
+    yaw = (heading + 180.0) % 360.0 - 180.0
+    cx = width / 2 - yaw * width / DEFAULT_FOV[0]
+    cy = height / 2 + pitch * height / DEFAULT_FOV[1]
+    # Roll around the image centre
+    angle = math.radians(-roll)
+    bx, by = cx - width / 2, cy - height / 2
+    cx = width / 2 + bx * math.cos(angle) - by * math.sin(angle)
+    cy = height / 2 + bx * math.sin(angle) + by * math.cos(angle)
+    return (cx - size / 2, cy - size / 2, cx + size / 2, cy + size / 2)
+
+
+def centre(box):
+    return (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+
+
+def run(args):
+    history = OrientationHistory()
+    reprojector = Reprojector(CAMERA_RESOLUTION, DEFAULT_FOV, max_age=1.0)
+    delay = args.delay / 1000.0
+    frame_interval = 1.0 / CAMERA_FPS
+
+    errors = {'raw': [], 'late-latched': []}
+    shifts = []
+    next_imu = next_frame = 0.0
+    in_flight = []          # (ready time, capture time, boxes)
+    current = None          # (capture time, boxes) last result received
+    t = 0.0
+    while t < args.duration:
+        while next_imu <= t:
+            history.add(*head(next_imu, args.speed), ts=next_imu)
+            next_imu += IMU_INTERVAL
+        while next_frame <= t:
+            in_flight.append((next_frame + delay, next_frame, [true_box(next_frame, args.speed)]))
+            next_frame += frame_interval
+        while in_flight and in_flight[0][0] <= t:
+            _, capture, boxes = in_flight.pop(0)
+            current = (capture, boxes)
+
+        if current is not None and t > 1.0:
+            capture, boxes = current
+            truth = centre(true_box(t, args.speed))
+            correction = reprojector.correction(history, capture, now=t)
+            for name, drawn in (('raw', boxes), ('late-latched', reprojector.apply(boxes, correction))):
+                if drawn:
+                    x, y = centre(drawn[0])
+                    errors[name].append(math.hypot(x - truth[0], y - truth[1]))
+            if correction:
+                shifts.append(math.hypot(correction['dx'], correction['dy']))
+        t += HUD_UPDATE_INTERVAL
+
+    px_per_panel = 128 / CAMERA_RESOLUTION[0]
+    print(f"Head sweep {args.speed:.0f} deg/s peak, inference delay {args.delay:.0f} ms, "
+          f"HUD {1 / HUD_UPDATE_INTERVAL:.0f} FPS, camera {CAMERA_FPS} FPS")
+    print(f"{'overlay':>14} {'mean px':>9} {'p95 px':>9} {'OLED px p95':>12}")
+    for name, values in errors.items():
+        values = np.array(values)
+        p95 = np.percentile(values, 95)
+        print(f"{name:>14} {values.mean():9.1f} {p95:9.1f} {p95 * px_per_panel:12.1f}")
+    print(f"Correction applied on {len(shifts)} frames, mean shift {np.mean(shifts):.1f} px")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay', type=float, default=150.0, help='Capture to HUD result delay (ms)')
+    parser.add_argument('--speed', type=float, default=60.0, help='Peak head yaw speed (deg/s)')
+    parser.add_argument('--duration', type=float, default=20.0, help='Simulated seconds')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
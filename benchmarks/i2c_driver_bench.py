@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+I2C driver benchmark - Burst reads vs register-by-register drivers
+
+Runs each sensor driver of shared/sensor_drivers.py against the
+simulated devices of sim/devices.py, next to a baseline written the
+way the usual MicroPython examples do it: one read per value, float
+compensation, forced-mode / trigger-then-sleep conversions.
+
+Per driver and bus clock (I2C_FREQ 100 kHz and 400 kHz), reports for
+one read:
+- I2C transactions and bytes on the wire (address bytes included)
+- modelled wire time (9 clocks per byte + START / STOP)
+- time spent blocked waiting for a conversion
+- host CPU time of the driver alone, bus replaced by a static register
+  image (CPython here, scale ~50-100x for MicroPython on ESP32)
+
+Usage:
+    python benchmarks/i2c_driver_bench.py [--reads 200] [--freqs 100000 400000]
+"""
+
+import argparse
+import struct
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'shared'))
+
+import sim
+sim.install_micropython()
+
+from sim.devices import SimBus, Bme280Device, Ens160Device, Aht21Device, Bno055Device
+from sim.world import SensorWorld
+from sensor_drivers import Aht21, Bme280, Bno055, Ens160
+
+
+class ManualClock:
+    """World clock advanced by the benchmark (read periods, conversion waits)"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class BusI2C:
+    """machine.I2C over a SimBus (same calls as sim/micropython/machine.py)"""
+
+    def __init__(self, bus):
+        self.bus = bus
+
+    def writeto(self, addr, buf, stop=True):
+        self.bus.write(addr, buf)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self.bus.write(addr, bytes((memaddr,)) + bytes(buf))
+
+    def readfrom_into(self, addr, buf):
+        buf[:] = self.bus.read(addr, len(buf))
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        self.bus.write(addr, bytes((memaddr,)))
+        return self.bus.read(addr, nbytes)
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        self.bus.write(addr, bytes((memaddr,)))
+        buf[:] = self.bus.read(addr, len(buf))
+
+
+class StaticI2C:
+    """Bus answering from a frozen register image: times the driver code alone"""
+
+    def __init__(self, image):
+        self.image = image
+
+    def writeto(self, addr, buf, stop=True):
+        pass
+
+    def writeto_mem(self, addr, memaddr, buf):
+        pass
+
+    def readfrom_into(self, addr, buf):
+        buf[:] = self.image[:len(buf)]
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        return bytes(self.image[memaddr:memaddr + nbytes])
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        buf[:] = self.image[memaddr:memaddr + len(buf)]
+
+
+# Baselines: one transaction per value, float math, blocking conversions
+
+class NaiveBme280:
+    def __init__(self, i2c, address, wait):
+        self.i2c, self.address, self.wait = i2c, address, wait
+        self.cal = struct.unpack('<HhhHhhhhhhhh', i2c.readfrom_mem(address, 0x88, 24))
+        self.h1 = i2c.readfrom_mem(address, 0xA1, 1)[0]
+        e = i2c.readfrom_mem(address, 0xE1, 7)
+        self.h2 = struct.unpack('<h', e[0:2])[0]
+        self.h3 = e[2]
+        self.h4 = (struct.unpack('b', e[3:4])[0] << 4) | (e[4] & 0x0F)
+        self.h5 = (struct.unpack('b', e[5:6])[0] << 4) | (e[4] >> 4)
+        self.h6 = struct.unpack('b', e[6:7])[0]
+
+    def read(self):
+        i2c, address = self.i2c, self.address
+        i2c.writeto_mem(address, 0xF2, b'\x01')
+        i2c.writeto_mem(address, 0xF4, b'\x25')  # forced mode
+        self.wait(10)                            # conversion time, x1 oversampling
+        t = i2c.readfrom_mem(address, 0xFA, 3)
+        p = i2c.readfrom_mem(address, 0xF7, 3)
+        h = i2c.readfrom_mem(address, 0xFD, 2)
+        adc_t = (t[0] << 12) | (t[1] << 4) | (t[2] >> 4)
+        adc_p = (p[0] << 12) | (p[1] << 4) | (p[2] >> 4)
+        adc_h = (h[0] << 8) | h[1]
+        t1, t2, t3, p1, p2, p3, p4, p5, p6, p7, p8, p9 = self.cal
+        t_fine = (adc_t / 16384.0 - t1 / 1024.0) * t2 + (adc_t / 131072.0 - t1 / 8192.0) ** 2 * t3
+        var1 = t_fine / 2.0 - 64000.0
+        var2 = var1 * var1 * p6 / 32768.0 + var1 * p5 * 2.0
+        var2 = var2 / 4.0 + p4 * 65536.0
+        var1 = (1.0 + (p3 * var1 * var1 / 524288.0 + p2 * var1) / 524288.0 / 32768.0) * p1
+        pressure = (1048576.0 - adc_p - var2 / 4096.0) * 6250.0 / var1
+        pressure += (p9 * pressure * pressure / 2147483648.0 + pressure * p8 / 32768.0 + p7) / 16.0
+        hum = t_fine - 76800.0
+        hum = (adc_h - (self.h4 * 64.0 + self.h5 / 16384.0 * hum)) * (
+            self.h2 / 65536.0 * (1.0 + self.h6 / 67108864.0 * hum * (1.0 + self.h3 / 67108864.0 * hum)))
+        hum = hum * (1.0 - self.h1 * hum / 524288.0)
+        return {'temperature': t_fine / 5120.0, 'humidity': min(100.0, max(0.0, hum)),
+                'pressure': pressure / 100.0}
+
+
+class NaiveEns160:
+    def __init__(self, i2c, address, wait):
+        self.i2c, self.address = i2c, address
+        i2c.writeto_mem(address, 0x10, b'\x02')
+
+    def read(self):
+        i2c, address = self.i2c, self.address
+        i2c.writeto_mem(address, 0x13, struct.pack('<H', int((25.0 + 273.15) * 64)))
+        i2c.writeto_mem(address, 0x15, struct.pack('<H', int(50.0 * 512)))
+        if not i2c.readfrom_mem(address, 0x20, 1)[0] & 0x02:
+            return None
+        return {
+            'aqi': i2c.readfrom_mem(address, 0x21, 1)[0] & 0x07,
+            'tvoc': struct.unpack('<H', i2c.readfrom_mem(address, 0x22, 2))[0],
+            'eco2': struct.unpack('<H', i2c.readfrom_mem(address, 0x24, 2))[0],
+        }
+
+
+class NaiveAht21:
+    def __init__(self, i2c, address, wait):
+        self.i2c, self.address, self.wait = i2c, address, wait
+        i2c.writeto(address, b'\xbe\x08\x00')
+
+    def read(self):
+        self.i2c.writeto(self.address, b'\xac\x33\x00')
+        self.wait(80)
+        data = bytearray(7)
+        self.i2c.readfrom_into(self.address, data)
+        raw_h = (data[1] << 12) | (data[2] << 4) | (data[3] >> 4)
+        raw_t = ((data[3] & 0x0F) << 16) | (data[4] << 8) | data[5]
+        return {'temperature': raw_t / 1048576 * 200 - 50, 'humidity': raw_h / 1048576 * 100}
+
+
+class NaiveBno055:
+    def __init__(self, i2c, address, wait):
+        self.i2c, self.address = i2c, address
+        i2c.writeto_mem(address, 0x3D, b'\x0c')
+
+    def read(self):
+        i2c, address = self.i2c, self.address
+        return {name: struct.unpack('<h', i2c.readfrom_mem(address, reg, 2))[0] / 16
+                for name, reg in (('heading', 0x1A), ('roll', 0x1C), ('pitch', 0x1E))}
+
+
+# name, device factory, address, burst driver, baseline, read period (s)
+SENSORS = (
+    ('BME280', lambda world: Bme280Device('BME280', world), 0x76, Bme280, NaiveBme280, 2.0),
+    ('ENS160', lambda world: Ens160Device('ENS160', world), 0x53, Ens160, NaiveEns160, 2.0),
+    ('AHT21', lambda world: Aht21Device('AHT21', world), 0x38, Aht21, NaiveAht21, 2.0),
+    ('BNO055', lambda world: Bno055Device('BNO055', world), 0x28, Bno055, NaiveBno055, 0.05),
+)
+
+
+def run_bus(make_device, address, make_driver, period, freq, reads):
+    """Transactions, bytes, wire and wait time per read on the simulated bus"""
+    clock = ManualClock()
+    world = SensorWorld(0, clock=clock)
+    bus = SimBus(freq, timing=False)
+    device = bus.add(address, make_device(world))
+    waited = [0.0]
+
+    def wait(ms):
+        waited[0] += ms
+        clock.advance(ms / 1000)
+
+    driver = make_driver(BusI2C(bus), address, wait)
+    driver.read()  # AHT21 burst driver: first call only triggers
+    clock.advance(period)
+    bus.transactions = bus.bytes = 0
+    bus.wire_time = 0.0
+    waited[0] = 0.0
+    values = 0
+    for _ in range(reads):
+        if driver.read() is not None:
+            values += 1
+        clock.advance(period)
+    return {
+        'transactions': bus.transactions / reads,
+        'bytes': bus.bytes / reads,
+        'wire_ms': bus.wire_time * 1000 / reads,
+        'wait_ms': waited[0] / reads,
+        'values': values,
+        'device': device,
+    }
+
+
+def register_image(device):
+    """Frozen bytes a read returns, taken from the device model"""
+    if isinstance(device, Aht21Device):
+        device.ready_at = None
+        return bytearray(device.read(7))
+    for pointer in (0x20, 0x1A, 0xF7):
+        device.pointer = pointer
+        device.refresh()
+    image = bytearray(device.registers)
+    if isinstance(device, Ens160Device):
+        image[0x20] |= 0x02
+    return image
+
+
+def run_cpu(image, address, make_driver, reads):
+    """Host µs per read, driver code alone"""
+    driver = make_driver(StaticI2C(image), address, lambda ms: None)
+    if isinstance(driver, Aht21):
+        driver.triggered = True
+    start = time.perf_counter()
+    for _ in range(reads):
+        driver.read()
+    return (time.perf_counter() - start) / reads * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reads', type=int, default=200, help='Reads per driver and bus clock')
+    parser.add_argument('--freqs', type=int, nargs='+', default=[100000, 400000], help='Bus clocks (Hz)')
+    args = parser.parse_args()
+
+    print(f"{'sensor':<8} {'driver':<9} {'kHz':>4} {'xfers':>6} {'bytes':>6} {'wire ms':>8} "
+          f"{'wait ms':>8} {'bus+wait':>9} {'cpu us':>7}")
+    for name, make_device, address, burst, naive, period in SENSORS:
+        drivers = (('burst', lambda i2c, addr, wait, cls=burst: cls(i2c, addr)), ('baseline', naive))
+        for label, make_driver in drivers:
+            for freq in args.freqs:
+                result = run_bus(make_device, address, make_driver, period, freq, args.reads)
+                image = register_image(result['device'])
+                cpu = run_cpu(image, address, make_driver, args.reads)
+                blocked = result['wire_ms'] + result['wait_ms']
+                print(f"{name:<8} {label:<9} {freq // 1000:>4} {result['transactions']:6.1f} "
+                      f"{result['bytes']:6.1f} {result['wire_ms']:8.3f} {result['wait_ms']:8.1f} "
+                      f"{blocked:9.3f} {cpu:7.1f}")
+
+
+if __name__ == '__main__':
+    main()
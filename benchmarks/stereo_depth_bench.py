@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Stereo depth benchmark - Disparity time and distance error per resolution
+
+Synthetic rectified pair: a textured wall far away and textured boxes
+at known distances, the right view shifted by f * B / Z. For each camera
+resolution, runs the Pi 5 StereoDepth pipeline (pyramid, block matching,
+per-box distance) and reports:
+- prepare (both eyes) / disparity / distances time, pairs per second
+  and whether it keeps up with the camera frame rate
+- distance error of every box
+
+JPEG decoding is not included (it is shared with YOLO).
+
+Usage:
+    python benchmarks/stereo_depth_bench.py [--resolutions 320x240,640x480,1280x720]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shared'))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backpack' / 'pi5_server'))
+
+import numpy as np
+
+from constants import CAMERA_FPS
+from stereo import StereoDepth
+
+WALL_DISTANCE = 12.0
+# (x0, y0, x1, y1) as fractions of the frame, distance in metres
+OBJECTS = [
+    ((0.10, 0.30, 0.30, 0.90), 1.5),
+    ((0.45, 0.25, 0.60, 0.75), 3.0),
+    ((0.70, 0.40, 0.80, 0.70), 6.0),
+]
+
+
+def texture(rng, height, width):
+    """Multi-scale noise, like a cluttered scene"""
+    out = np.zeros((height, width), dtype=np.float32)
+    for scale, weight in ((16, 60), (4, 40), (1, 20)):
+        noise = rng.normal(0, 1, (height // scale + 1, width // scale + 1)).astype(np.float32)
+        out += weight * np.repeat(np.repeat(noise, scale, 0), scale, 1)[:height, :width]
+    return out
+
+
+def render_pair(width, height, focal, baseline, seed=0):
+    """Left / right RGB frames and the ground truth boxes (left view)"""
+    rng = np.random.default_rng(seed)
+    pad = int(focal * baseline / 0.5) + 2
+    wall = texture(rng, height, width + pad)
+    d = int(round(focal * baseline / WALL_DISTANCE))
+    left = wall[:, pad:pad + width].copy()
+    right = wall[:, pad - d:pad - d + width].copy()
+
+    boxes = []
+    for (fx0, fy0, fx1, fy1), distance in OBJECTS:
+        x0, y0, x1, y1 = int(fx0 * width), int(fy0 * height), int(fx1 * width), int(fy1 * height)
+        patch = texture(rng, y1 - y0, x1 - x0) + 128
+        d = int(round(focal * baseline / distance))
+        left[y0:y1, x0:x1] = patch
+        right[y0:y1, max(0, x0 - d):x1 - d] = patch[:, max(0, d - x0):]
+        boxes.append(({'cls': 0, 'box': [x0, y0, x1, y1]}, distance))
+
+    to_rgb = lambda plane: np.repeat(np.clip(plane + 128, 0, 255).astype(np.uint8)[:, :, None], 3, axis=2)
+    return to_rgb(left), to_rgb(right), boxes
+
+
+def run(width, height, repeat):
+    stereo = StereoDepth({})
+    stereo.prepare(np.zeros((height, width, 3), dtype=np.uint8))  # setup (focal, levels)
+    left, right, boxes = render_pair(width, height, stereo.focal, stereo.baseline)
+
+    timings = {'prepare': [], 'disparity': [], 'distances': []}
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        pyramids = stereo.prepare(left), stereo.prepare(right)
+        t1 = time.perf_counter()
+        disparity, factor = stereo.disparity(*pyramids)
+        t2 = time.perf_counter()
+        detections = [dict(d) for d, _ in boxes]
+        stereo.distances(disparity, factor, detections)
+        t3 = time.perf_counter()
+        timings['prepare'].append(t1 - t0)
+        timings['disparity'].append(t2 - t1)
+        timings['distances'].append(t3 - t2)
+
+    ms = {name: np.median(values) * 1000 for name, values in timings.items()}
+    total = sum(ms.values())
+    errors = []
+    for detection, (_, truth) in zip(detections, boxes):
+        measured = detection['distance']
+        errors.append(f"{truth:.1f}m->{measured:.2f}" if measured else f"{truth:.1f}m->none")
+    output, coarse = stereo.levels
+    print(f"{width}x{height:<6} {width >> output}x{height >> output:<5} {coarse:>2} "
+          f"{stereo.max_disparity:>5} {ms['prepare']:9.2f} {ms['disparity']:9.2f} {ms['distances']:9.2f} "
+          f"{1000 / total:8.1f} {'yes' if 1000 / total >= CAMERA_FPS else 'NO':>4}  {' '.join(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', default='320x240,640x480,1280x720,1920x1080')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Camera rate target: {CAMERA_FPS} FPS")
+    print(f"{'camera':<11} {'output':<9} {'top':>3} {'max d':>5} {'prep ms':>9} {'disp ms':>9} "
+          f"{'dist ms':>9} {'pairs/s':>8} {'ok':>4}  distances")
+    for resolution in args.resolutions.split(','):
+        width, height = (int(v) for v in resolution.split('x'))
+        run(width, height, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
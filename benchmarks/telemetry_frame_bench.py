@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Telemetry frame benchmark - Packed frame vs per-sensor JSON publishes
+
+Compares, for one ESP32 loop:
+- number of MQTT PUBLISH packets
+- bytes on the wire (payload + topic + MQTT fixed header)
+- CPU time to encode (CPython here, scale ~50-100x for MicroPython on ESP32)
+
+Usage:
+    python benchmarks/telemetry_frame_bench.py [iterations]
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shared'))
+
+from telemetry_schema import (
+    FrameEncoder, NODE_HELMET, NODE_BACKPACK, decode_frame, fanout,
+)
+
+HELMET_SAMPLE = {
+    'orientation': {'heading': 127.5, 'roll': -3.25, 'pitch': 12.0},
+    'environment': {'temperature': 25.0, 'humidity': 50.0, 'pressure': 1013.25},
+    'air_quality': {'aqi': 1, 'tvoc': 0, 'eco2': 400},
+    'aht21': {'temperature': 25.0, 'humidity': 50.0},
+    'power': {'voltage': 3.7, 'current': 0.5, 'power': 1.85},
+}
+
+BACKPACK_SAMPLE = {
+    'bme280_int': {'temperature': 25.0, 'humidity': 50.0, 'pressure': 1013.25, 'location': 'interior'},
+    'bme280_ext': {'temperature': 18.4, 'humidity': 61.0, 'pressure': 1012.80, 'location': 'exterior'},
+    'ens160_int': {'aqi': 1, 'tvoc': 0, 'eco2': 400, 'location': 'interior'},
+    'ens160_ext': {'aqi': 2, 'tvoc': 35, 'eco2': 450, 'location': 'exterior'},
+    'mq2_int': {'raw': 812, 'ppm': 198.3, 'location': 'interior'},
+    'mq2_ext': {'raw': 640, 'ppm': 156.3, 'location': 'exterior'},
+    'mq7_int': {'raw': 512, 'co_ppm': 25.0, 'location': 'interior'},
+    'mq7_ext': {'raw': 401, 'co_ppm': 19.6, 'location': 'exterior'},
+}
+
+
+def mqtt_packet_size(topic, payload_len):
+    """Size of a QoS 0 PUBLISH packet"""
+    remaining = 2 + len(topic) + payload_len
+    length_bytes = 1 if remaining < 128 else 2
+    return 1 + length_bytes + remaining
+
+
+def json_messages(node, sample):
+    """Reproduce the legacy per-sensor JSON publishes"""
+    encoder = FrameEncoder(node)
+    header, data = decode_frame(bytes(encoder.encode(sample, 0)))
+    return fanout(header, data)
+
+
+def bench(name, node, sample, topic, iterations):
+    """Run both paths and print a comparison"""
+    encoder = FrameEncoder(node)
+    legacy = json_messages(node, sample)
+    messages = [(t, json.dumps(p)) for t, p in legacy]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for t, payload in legacy:
+            json.dumps(payload)
+    json_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        frame = encoder.encode(sample, i)
+    packed_us = (time.perf_counter() - start) / iterations * 1e6
+
+    frame = bytes(frame)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fanout(*decode_frame(frame))
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    json_bytes = sum(mqtt_packet_size(t, len(p)) for t, p in messages)
+    packed_bytes = mqtt_packet_size(topic, len(frame))
+
+    print(f"\n{name}")
+    print(f"  {'':<18}{'JSON':>10}{'packed':>10}")
+    print(f"  {'publishes/loop':<18}{len(messages):>10}{1:>10}")
+    print(f"  {'payload bytes':<18}{sum(len(p) for _, p in messages):>10}{len(frame):>10}")
+    print(f"  {'wire bytes':<18}{json_bytes:>10}{packed_bytes:>10}")
+    print(f"  {'encode us':<18}{json_us:>10.1f}{packed_us:>10.1f}")
+    print(f"  Pi 5 decode + fan-out: {decode_us:.1f} us/frame")
+    print(f"  Wire reduction: {100 * (1 - packed_bytes / json_bytes):.0f}%")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"Telemetry frame benchmark ({iterations} iterations)")
+    bench('Helmet ESP32', NODE_HELMET, HELMET_SAMPLE, 'helmet/telemetry', iterations)
+    bench('Backpack ESP32', NODE_BACKPACK, BACKPACK_SAMPLE, 'backpack/telemetry', iterations)
+
+
+if __name__ == '__main__':
+    main()
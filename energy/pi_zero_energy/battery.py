@@ -0,0 +1,168 @@
+"""
+Battery monitoring: INA219 driver and state-of-charge estimator
+"""
+
+import bisect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# INA219 registers
+REG_CONFIG = 0x00
+REG_SHUNT_VOLTAGE = 0x01
+REG_BUS_VOLTAGE = 0x02
+
+# 32 V bus range, +/-320 mV shunt range, 12-bit, 128-sample averaging, continuous
+CONFIG_CONTINUOUS = 0x3FFF
+
+SHUNT_LSB = 10e-6  # V
+BUS_LSB = 4e-3     # V
+
+# Open-circuit voltage -> state of charge (%) of a Li-ion cell, 3.0 V .. 4.2 V
+OCV_CURVE = (
+    (3.00, 0), (3.30, 5), (3.50, 10), (3.60, 20), (3.70, 40),
+    (3.80, 60), (3.90, 75), (4.00, 85), (4.10, 95), (4.20, 100),
+)
+
+
+class Ina219:
+    """
+    INA219 current / voltage monitor over smbus2
+
+    Args:
+        bus: I2C bus number
+        address: I2C address
+        shunt_ohms: Shunt resistor value
+    """
+
+    def __init__(self, bus, address, shunt_ohms=0.1):
+        from smbus2 import SMBus
+
+        self.bus = SMBus(bus)
+        self.address = address
+        self.shunt_ohms = shunt_ohms
+        self.bus.write_i2c_block_data(address, REG_CONFIG, [CONFIG_CONTINUOUS >> 8, CONFIG_CONTINUOUS & 0xFF])
+
+    def _read(self, register):
+        high, low = self.bus.read_i2c_block_data(self.address, register, 2)
+        return (high << 8) | low
+
+    def read(self):
+        """
+        One sample
+
+        Returns:
+            (bus voltage V, current mA) - positive current = discharging
+        """
+        shunt = self._read(REG_SHUNT_VOLTAGE)
+        if shunt & 0x8000:
+            shunt -= 0x10000
+        voltage = (self._read(REG_BUS_VOLTAGE) >> 3) * BUS_LSB
+        current_ma = shunt * SHUNT_LSB / self.shunt_ohms * 1000.0
+        return voltage, current_ma
+
+    def close(self):
+        self.bus.close()
+
+
+def ocv_soc(voltage, voltage_min=3.0, voltage_max=4.2):
+    """
+    State of charge (%) from a resting cell voltage
+
+    The reference curve is stretched to the configured voltage window.
+    """
+    lo, hi = OCV_CURVE[0][0], OCV_CURVE[-1][0]
+    v = lo + (voltage - voltage_min) * (hi - lo) / (voltage_max - voltage_min)
+    volts = [p[0] for p in OCV_CURVE]
+    i = bisect.bisect_left(volts, v)
+    if i <= 0:
+        return 0.0
+    if i >= len(OCV_CURVE):
+        return 100.0
+    (v0, s0), (v1, s1) = OCV_CURVE[i - 1], OCV_CURVE[i]
+    return s0 + (s1 - s0) * (v - v0) / (v1 - v0)
+
+
+class BatteryEstimator:
+    """
+    Streaming state of charge and remaining runtime
+
+    Coulomb counting on every sample; while the pack is at rest (current
+    below rest_current_ma) the estimate is pulled toward the open-circuit
+    voltage curve, which corrects the drift of the integration.
+
+    Args:
+        config: 'battery' section of config.yaml
+    """
+
+    def __init__(self, config):
+        self.capacity_mah = config['capacity_mah']
+        self.voltage_min = config.get('voltage_min', 3.0)
+        self.voltage_max = config.get('voltage_max', 4.2)
+        self.rest_current_ma = config.get('rest_current_ma', 50.0)
+        self.ocv_gain = config.get('ocv_gain', 0.01)
+        self.current_tau = config.get('current_tau', 60.0)
+
+        self.soc = None
+        self.voltage = None
+        self.current_ma = 0.0
+        self.average_ma = None
+        self.used_mah = 0.0
+        self.samples = 0
+        self._last_ts = None
+
+    def update(self, voltage, current_ma, ts=None):
+        """Feed one INA219 sample"""
+        ts = time.monotonic() if ts is None else ts
+        self.samples += 1
+        self.voltage = voltage
+
+        if self.soc is None:
+            self.soc = ocv_soc(voltage, self.voltage_min, self.voltage_max)
+            self.current_ma = self.average_ma = current_ma
+            self._last_ts = ts
+            return self.soc
+
+        dt = ts - self._last_ts
+        self._last_ts = ts
+        if dt <= 0:
+            return self.soc
+
+        # Trapezoidal integration of the charge drawn
+        mah = (self.current_ma + current_ma) / 2.0 * dt / 3600.0
+        self.current_ma = current_ma
+        self.used_mah += mah
+        self.soc -= mah / self.capacity_mah * 100.0
+
+        if abs(current_ma) < self.rest_current_ma:
+            target = ocv_soc(voltage, self.voltage_min, self.voltage_max)
+            self.soc += (target - self.soc) * min(1.0, self.ocv_gain * dt)
+        self.soc = min(100.0, max(0.0, self.soc))
+
+        alpha = min(1.0, dt / self.current_tau)
+        self.average_ma += (current_ma - self.average_ma) * alpha
+        return self.soc
+
+    def runtime(self):
+        """
+        Remaining runtime at the average current
+
+        Returns:
+            Seconds, or None while charging / idle
+        """
+        if self.soc is None or self.average_ma is None or self.average_ma <= 1.0:
+            return None
+        remaining_mah = self.soc / 100.0 * self.capacity_mah
+        return remaining_mah / self.average_ma * 3600.0
+
+    def snapshot(self):
+        return {
+            'soc': None if self.soc is None else round(self.soc, 1),
+            'voltage': None if self.voltage is None else round(self.voltage, 3),
+            'current_ma': round(self.current_ma, 1),
+            'average_ma': None if self.average_ma is None else round(self.average_ma, 1),
+            'used_mah': round(self.used_mah, 2),
+            'runtime_s': None if self.runtime() is None else int(self.runtime()),
+            'samples': self.samples,
+        }
@@ -1,44 +1,128 @@
 ﻿#!/usr/bin/env python3
 """
 Energy Monitor - Battery management and monitoring
+Publishes the battery state and the power budget level of the armor
 """
 
+import asyncio
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'shared'))
 
-import yaml
+from node_config import startup, load_node_config, NUMBER
 from logger import setup_logger
+from mqtt_async import AsyncMQTTClient
+from mqtt_topics import (
+    ENERGY_BATTERY_LEVEL, ENERGY_BATTERY_VOLTAGE, ENERGY_BATTERY_CURRENT,
+    ENERGY_POWER_CONSUMPTION, ENERGY_POWER_BUDGET, SYSTEM_STATUS,
+)
+from metrics import Metrics, now_us, report
+from power_budget import LEVEL_NAMES, level_for_soc, encode_budget
+from battery import Ina219, BatteryEstimator
 
 logger = setup_logger(__name__, 'logs/energy.log')
+startup.mark('imports')
+
+CONFIG_SCHEMA = {
+    'mqtt.broker': str, 'mqtt.port': int, 'mqtt.client_id': str,
+    'battery.i2c_bus': int, 'battery.ina219_address': int, 'battery.shunt_ohms': NUMBER,
+    'battery.capacity_mah': NUMBER,
+    'monitoring.sample_interval': NUMBER, 'monitoring.interval': NUMBER,
+    'metrics.interval': NUMBER,
+}
 
 def load_config():
-    config_path = Path(__file__).parent / 'config.yaml'
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+    """Load configuration (config/example.yaml + config.yaml + config/local.yaml, validated, cached)"""
+    return load_node_config(Path(__file__).parent, CONFIG_SCHEMA)
 
-def main():
-    logger.info("Energy Monitor - Starting")
+async def monitor_loop(client, sensor, estimator, config, metrics):
+    """
+    Battery sampling and publishing
     
-    config = load_config()
+    The INA219 is sampled every sample_interval for the charge count;
+    battery topics and the power budget go out every interval.
+    """
+    loop = asyncio.get_running_loop()
+    sample_interval = config['sample_interval']
+    every = max(1, round(config['interval'] / sample_interval))
+    level = None
+    samples = 0
+    power = 0.0
+    read_timing = metrics.histogram('i2c_read_ms', {'sensor': 'ina219'})
+    loop_timing = metrics.histogram('loop_ms')
+    read_errors = metrics.counter('i2c_errors', {'sensor': 'ina219'})
     
-    # TODO: Initialize
-    # - INA219 sensor
-    # - MQTT client
+    while True:
+        start = loop.time()
+        started = now_us()
+        try:
+            voltage, current_ma = sensor.read()
+        except OSError as e:
+            read_errors.inc()
+            logger.warning(f"INA219 read failed: {e}")
+        else:
+            estimator.update(voltage, current_ma)
+            power += voltage * current_ma / 1000.0
+            samples += 1
+        read_timing.since(started)
+        
+        if samples >= every:
+            soc = estimator.soc
+            runtime = estimator.runtime()
+            client.publish(ENERGY_BATTERY_LEVEL, {'value': round(soc, 1), 'runtime_s': runtime and int(runtime)})
+            client.publish(ENERGY_BATTERY_VOLTAGE, {'value': round(estimator.voltage, 3)})
+            client.publish(ENERGY_BATTERY_CURRENT, {'value': round(estimator.average_ma / 1000.0, 3)})
+            client.publish(ENERGY_POWER_CONSUMPTION, {'value': round(power / samples, 3)})
+            samples = 0
+            power = 0.0
+            
+            new_level = level_for_soc(soc, level or 0)
+            if new_level != level:
+                logger.info(f"Power budget: {LEVEL_NAMES[new_level]} (SoC {soc:.1f}%, "
+                            f"runtime {'-' if runtime is None else f'{runtime / 60:.0f} min'})")
+                level = new_level
+            # Retained: nodes that (re)connect get the level in force
+            client.publish(ENERGY_POWER_BUDGET, encode_budget(level, soc, runtime), qos=1, retain=True)
+        
+        loop_timing.since(started)
+        await asyncio.sleep(max(0.0, sample_interval - (loop.time() - start)))
+
+async def run(config):
+    """Event-driven energy monitor"""
+    mqtt_config = config['mqtt']
+    metrics = Metrics(mqtt_config['client_id'])
+    client = AsyncMQTTClient(mqtt_config['client_id'], mqtt_config['broker'], mqtt_config['port'],
+                             metrics=metrics)
+    await client.start()
     
+    battery = config['battery']
+    sensor = Ina219(battery['i2c_bus'], battery['ina219_address'], battery['shunt_ohms'])
+    estimator = BatteryEstimator(battery)
+    metrics.collect(lambda m: m.set_gauges('battery', estimator.snapshot()))
+    
+    startup.mark('ready')
+    logger.info(f"Startup: {startup.summary()}")
     logger.info("Monitoring started")
     
     try:
-        import time
-        while True:
-            # TODO: Read battery metrics
-            # - Voltage
-            # - Current
-            # - Power
-            # - Calculate %
-            
-            time.sleep(config['monitoring']['interval'])
+        await asyncio.gather(
+            monitor_loop(client, sensor, estimator, config['monitoring'], metrics),
+            report(client.publish, SYSTEM_STATUS, metrics, config['metrics']['interval']),
+        )
+    finally:
+        logger.info(f"Battery: {estimator.snapshot()}")
+        sensor.close()
+        await client.stop()
+
+def main():
+    logger.info("Energy Monitor - Starting")
+    
+    config = load_config()
+    startup.mark('config')
+    
+    try:
+        asyncio.run(run(config))
     except KeyboardInterrupt:
         logger.info("Shutdown")
 
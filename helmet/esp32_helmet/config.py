@@ -9,12 +9,26 @@ WIFI_PASSWORD = 'Order66Execute'
 # MQTT
 MQTT_BROKER = '192.168.4.1'
 MQTT_PORT = 1883
+MQTT_CONNECT_TIMEOUT = 2    # secondes : connect() bloque la boucle uasyncio (umqtt.simple >= 1.4)
 MQTT_CLIENT_ID = 'esp32_helmet'
 
+# Hors ligne : store-and-forward (store_forward.py)
+# Les trames lues sans broker vont dans un ring RAM préalloué, débordent
+# par moitiés dans un fichier flash borné, puis partent par lots au retour
+RECONNECT_MIN_MS = 5000     # backoff de reconnexion (doublé à chaque échec, > LINK_INTERVAL)
+RECONNECT_MAX_MS = 30000
+BACKLOG_RAM_BYTES = 16384   # ring RAM
+BACKLOG_SPILL_PATH = 'backlog.bin'  # None = RAM seule
+BACKLOG_SPILL_BYTES = 262144  # taille max du fichier flash
+BACKLOG_BATCH_BYTES = 2048  # taille max d'un lot de rattrapage
+
+# Métriques (metrics.py) : instantané publié sur system/status
+METRICS_INTERVAL = 10  # secondes
+
 # I2C
 I2C_SDA = 21
 I2C_SCL = 22
-I2C_FREQ = 100000
+I2C_FREQ = 100000  # 400000 possible : tous les capteurs gèrent le fast mode
 
 # Sensors I2C addresses
 BNO055_ADDR = 0x28
@@ -29,4 +43,31 @@ FAN_PIN = 25
 FAN_PWM_FREQ = 25000
 
 # Timing
-SENSOR_READ_INTERVAL = 1  # secondes
+SENSOR_READ_INTERVAL = 1  # secondes (ancienne boucle read_all)
+
+# Cadence par capteur (ms) - scheduler uasyncio
+BNO055_PERIOD_MS = 50     # orientation, rapide pour le HUD
+INA219_PERIOD_MS = 1000
+BME280_PERIOD_MS = 2000
+ENS160_PERIOD_MS = 2000
+AHT21_PERIOD_MS = 2000
+
+# Canal PCA9548A de chaque capteur (None = bus principal)
+BNO055_CHANNEL = None
+BME280_CHANNEL = None
+ENS160_CHANNEL = None
+AHT21_CHANNEL = None
+INA219_CHANNEL = None
+
+# Publication par bande morte (deadband.py)
+# Un bloc n'est publié que si un champ bouge de plus que son delta ;
+# instantané complet toutes les HEARTBEAT_MS
+HEARTBEAT_MS = 15000
+DEADBANDS = {
+    'heading': 1.0, 'roll': 1.0, 'pitch': 1.0,  # degrés
+    'temperature': 0.2,  # °C
+    'humidity': 1.0,     # %
+    'pressure': 0.5,     # hPa
+    'aqi': 0, 'tvoc': 10, 'eco2': 20,
+    'voltage': 0.05, 'current': 0.02, 'power': 0.1,
+}
@@ -3,10 +3,90 @@ ESP32 Helmet - Main Program
 Reads sensors and publishes to MQTT
 """
 
-import time
+import gc
+import uasyncio as asyncio
 from sensors import SensorManager
-from mqtt_client import MQTTHandler
-from config import SENSOR_READ_INTERVAL
+from mqtt_client import MQTTHandler, BUDGET_TOPIC, STATUS_TOPIC
+from power_budget import LEVEL_NAMES, budget_rate, parse_budget
+from deadband import DeadbandFilter
+from metrics import Metrics, report
+from config import DEADBANDS, HEARTBEAT_MS, METRICS_INTERVAL, MQTT_CLIENT_ID
+
+STATS_INTERVAL = 30  # secondes
+MQTT_POLL_INTERVAL = 0.5  # secondes (messages entrants : budget d'énergie)
+LINK_INTERVAL = 1  # secondes (reconnexion, vidage du backlog hors ligne)
+
+def update_fan(sensors, env):
+    """Fan control based on temperature"""
+    if env['temperature'] > 30:
+        sensors.set_fan_speed(100)  # Full speed
+    elif env['temperature'] > 25:
+        sensors.set_fan_speed(50)   # Half speed
+    else:
+        sensors.set_fan_speed(0)    # Off
+
+async def report_stats(scheduler, deadband, mqtt):
+    """Print scheduler and publish counters periodically"""
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        print('Scheduler stats:', scheduler.stats())
+        print('Deadband stats:', deadband.stats())
+        print('Backlog stats:', mqtt.stats())
+
+def collect_stats(scheduler, deadband, mqtt):
+    """Metrics collector: counters kept by the scheduler, deadband and backlog"""
+    def collect(metrics):
+        metrics.set_gauges('backlog', mqtt.stats())
+        metrics.set_gauges('deadband', deadband.stats())
+        for key, stats in scheduler.stats()['sensors'].items():
+            metrics.set_gauges('sensor', stats, {'sensor': key})
+        if hasattr(gc, 'mem_free'):
+            metrics.gauge('mem_free').set(gc.mem_free())
+    return collect
+
+async def poll_mqtt(mqtt):
+    """Deliver incoming MQTT messages (umqtt has no receive thread)"""
+    while True:
+        mqtt.check_msg()
+        await asyncio.sleep(MQTT_POLL_INTERVAL)
+
+async def maintain_link(mqtt):
+    """Reconnect in the background and flush the offline backlog in bulk"""
+    while True:
+        if mqtt.maintain():
+            # One batch per pass: sensor reads keep running in between
+            while mqtt.flush_backlog():
+                await asyncio.sleep(0)
+        await asyncio.sleep(LINK_INTERVAL)
+
+async def run(sensors, mqtt, metrics):
+    """Each sensor at its own cadence, published as soon as it is read"""
+    deadband = DeadbandFilter(DEADBANDS, HEARTBEAT_MS)
+    
+    def on_ready(readings):
+        changed = deadband.filter(readings)
+        if changed:
+            mqtt.publish_sensor_data(changed)
+        env = readings.get('environment')
+        if env:
+            update_fan(sensors, env)
+    
+    scheduler = sensors.create_scheduler(on_ready, metrics)
+    metrics.collect(collect_stats(scheduler, deadband, mqtt))
+    
+    def on_budget(topic, payload):
+        # Slower reads when the battery runs low (energy node)
+        level = parse_budget(payload)
+        if level is not None and budget_rate(level) != scheduler.rate:
+            scheduler.set_rate(budget_rate(level))
+            print('Power budget:', LEVEL_NAMES[level])
+    
+    mqtt.subscribe(BUDGET_TOPIC, on_budget)
+    asyncio.create_task(poll_mqtt(mqtt))
+    asyncio.create_task(maintain_link(mqtt))
+    asyncio.create_task(report_stats(scheduler, deadband, mqtt))
+    asyncio.create_task(report(mqtt.publish, STATUS_TOPIC, metrics, METRICS_INTERVAL))
+    await scheduler.run()
 
 def main():
     print('=' * 40)
@@ -15,41 +95,17 @@ def main():
     
     # Initialize components
     sensors = SensorManager()
-    mqtt = MQTTHandler()
+    metrics = Metrics(MQTT_CLIENT_ID)
+    mqtt = MQTTHandler(metrics)
     
-    # Connect to MQTT
+    # Connect to MQTT (retried in the background, readings kept meanwhile)
     if not mqtt.connect():
-        print('Failed to connect to MQTT. Retrying in 5s...')
-        time.sleep(5)
-        return
+        print('MQTT not available, buffering readings offline')
     
     print('System ready. Entering main loop...')
     
-    loop_count = 0
-    
     try:
-        while True:
-            loop_count += 1
-            print(f'\n--- Loop {loop_count} ---')
-            
-            # Read all sensors
-            sensor_data = sensors.read_all()
-            
-            # Publish to MQTT
-            mqtt.publish_sensor_data(sensor_data)
-            
-            # Fan control based on temperature
-            env = sensor_data.get('environment')
-            if env and env['temperature'] > 30:
-                sensors.set_fan_speed(100)  # Full speed
-            elif env and env['temperature'] > 25:
-                sensors.set_fan_speed(50)   # Half speed
-            else:
-                sensors.set_fan_speed(0)    # Off
-            
-            # Wait
-            time.sleep(SENSOR_READ_INTERVAL)
-    
+        asyncio.run(run(sensors, mqtt, metrics))
     except KeyboardInterrupt:
         print('\nShutdown requested')
     except Exception as e:
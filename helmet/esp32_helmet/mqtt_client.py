@@ -5,28 +5,96 @@ Handles connection and publishing sensor data
 
 from umqtt.simple import MQTTClient
 import json
+import network
 import time
-from config import MQTT_BROKER, MQTT_PORT, MQTT_CLIENT_ID
+from config import (
+    WIFI_SSID, WIFI_PASSWORD, MQTT_BROKER, MQTT_PORT, MQTT_CLIENT_ID, MQTT_CONNECT_TIMEOUT,
+    RECONNECT_MIN_MS, RECONNECT_MAX_MS,
+    BACKLOG_RAM_BYTES, BACKLOG_SPILL_PATH, BACKLOG_SPILL_BYTES, BACKLOG_BATCH_BYTES,
+)
+from telemetry_schema import FrameEncoder, NODE_HELMET
+from store_forward import FrameBacklog
+from metrics import now_us
+
+TELEMETRY_TOPIC = 'helmet/telemetry'
+BATCH_TOPIC = 'helmet/telemetry/batch'  # Offline backlog, see store_forward.py
+BUDGET_TOPIC = 'energy/power/budget'  # Retained, see power_budget.py
+STATUS_TOPIC = 'system/status'  # Metrics snapshots, see metrics.py
 
 class MQTTHandler:
-    def __init__(self):
+    def __init__(self, metrics=None):
         self.client = MQTTClient(MQTT_CLIENT_ID, MQTT_BROKER, MQTT_PORT)
         self.connected = False
+        self.handlers = {}
+        self.client.set_callback(self._dispatch)
+        self.encoder = FrameEncoder(NODE_HELMET)
+        self.wlan = network.WLAN(network.STA_IF)
+        self.backlog = FrameBacklog(BACKLOG_RAM_BYTES, BACKLOG_SPILL_PATH, BACKLOG_SPILL_BYTES)
+        self.batch_buffer = bytearray(BACKLOG_BATCH_BYTES)
+        self.retry_ms = RECONNECT_MIN_MS
+        self.next_retry = time.ticks_ms()
+        self.reconnects = 0
+        self.publish_timing = metrics.histogram('mqtt_publish_ms') if metrics else None
     
     def connect(self):
-        \"\"\"Connect to MQTT broker\"\"\"
+        """Connect to MQTT broker"""
         try:
-            self.client.connect()
+            # Bounded: a dead broker must not stall the sensor tasks
+            self.client.connect(timeout=MQTT_CONNECT_TIMEOUT)
             self.connected = True
+            for topic in self.handlers:
+                self.client.subscribe(topic)
             print('MQTT connected to', MQTT_BROKER)
             return True
         except Exception as e:
             print(f'MQTT connection failed: {e}')
             self.connected = False
+            self.next_retry = time.ticks_add(time.ticks_ms(), self.retry_ms)
+            return False
+    
+    def maintain(self):
+        """
+        Keep the link up (call periodically)
+        
+        Reconnects with exponential backoff. While the WiFi link is down
+        only the non-blocking wlan.connect() is issued, so sensor reads
+        are never held up by a dead access point. The broker
+        connect() is bounded by MQTT_CONNECT_TIMEOUT.
+        
+        Returns:
+            True when connected to the broker
+        """
+        if self.connected and self.wlan.isconnected():
+            return True
+        if self.connected:
+            self._lost('WiFi link down')
+        
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.next_retry) < 0:
             return False
+        if not self.wlan.isconnected():
+            if self.wlan.status() != network.STAT_CONNECTING:
+                self.wlan.connect(WIFI_SSID, WIFI_PASSWORD)
+            ok = False
+        else:
+            ok = self.connect()
+        if ok:
+            self.reconnects += 1
+            self.retry_ms = RECONNECT_MIN_MS
+        else:
+            self.next_retry = time.ticks_add(now, self.retry_ms)
+            self.retry_ms = min(self.retry_ms * 2, RECONNECT_MAX_MS)
+        return ok
+    
+    def _lost(self, reason):
+        """Mark the connection dead (maintain() reconnects)"""
+        print(f'MQTT connection lost: {reason}')
+        self.disconnect()
+        self.connected = False
+        self.next_retry = time.ticks_ms()
     
     def disconnect(self):
-        \"\"\"Disconnect from broker\"\"\"
+        """Disconnect from broker"""
         try:
             self.client.disconnect()
             self.connected = False
@@ -35,44 +103,101 @@ class MQTTHandler:
             pass
     
     def publish(self, topic, data):
-        \"\"\"
+        """
         Publish data to MQTT topic
         
         Args:
             topic: MQTT topic string
             data: Dictionary to publish (will be JSON encoded)
-        \"\"\"
+        """
         if not self.connected:
-            print('Not connected to MQTT')
             return False
         
         try:
             payload = json.dumps(data)
             self.client.publish(topic, payload)
-            print(f'Published to {topic}: {payload[:50]}...')
             return True
         except Exception as e:
-            print(f'Publish error: {e}')
+            self._lost(e)
             return False
     
-    def publish_sensor_data(self, sensor_data):
-        \"\"\"Publish all sensor data to appropriate topics\"\"\"
+    def publish_frame(self, topic, frame):
+        """
+        Publish a raw binary frame
         
-        # Orientation
-        if sensor_data.get('orientation'):
-            self.publish('helmet/orientation', sensor_data['orientation'])
+        Args:
+            topic: MQTT topic string
+            frame: bytes-like packed payload
+        """
+        if not self.connected:
+            return False
         
-        # Environment (BME280)
-        if sensor_data.get('environment'):
-            env = sensor_data['environment']
-            self.publish('helmet/temp', {'value': env['temperature']})
-            self.publish('helmet/humidity', {'value': env['humidity']})
-            self.publish('helmet/pressure', {'value': env['pressure']})
+        try:
+            start = now_us()
+            self.client.publish(topic, frame)
+            if self.publish_timing is not None:
+                self.publish_timing.since(start)
+            return True
+        except Exception as e:
+            self._lost(e)
+            return False
+    
+    def publish_sensor_data(self, sensor_data):
+        """
+        Publish all sensor data as one packed frame
         
-        # Air quality
-        if sensor_data.get('air_quality'):
-            self.publish('helmet/air_quality', sensor_data['air_quality'])
+        The Pi 5 telemetry bridge fans it back out to the
+        per-sensor topics (helmet/orientation, helmet/temp, ...)
+        """
+        frame = self.encoder.encode(sensor_data, time.ticks_ms())
+        # Frames stay in order: nothing goes out live while a backlog is pending
+        if self.connected and not len(self.backlog) and self.publish_frame(TELEMETRY_TOPIC, frame):
+            return True
+        self.backlog.push(frame)
+        return False
+    
+    def flush_backlog(self):
+        """
+        Send the oldest backlog frames as one batch message
         
-        # Power
-        if sensor_data.get('power'):
-            self.publish('helmet/power', sensor_data['power'])
+        Returns:
+            Number of frames sent (0 if empty, offline or failed)
+        """
+        if not self.connected:
+            return 0
+        batch = self.backlog.batch(self.batch_buffer, self.encoder.node, time.ticks_ms())
+        if batch is None:
+            return 0
+        try:
+            self.client.publish(BATCH_TOPIC, batch)
+        except Exception as e:
+            self._lost(e)
+            return 0
+        return self.backlog.commit()
+    
+    def stats(self):
+        """Backlog and reconnection counters"""
+        stats = self.backlog.stats()
+        stats['connected'] = self.connected
+        stats['reconnects'] = self.reconnects
+        return stats
+    
+    def subscribe(self, topic, handler):
+        """Register a handler(topic, payload) for a topic (no wildcards)"""
+        self.handlers[topic] = handler
+        if self.connected:
+            self.client.subscribe(topic)
+    
+    def _dispatch(self, topic, payload):
+        handler = self.handlers.get(topic.decode() if isinstance(topic, bytes) else topic)
+        if handler:
+            handler(topic, payload)
+    
+    def check_msg(self):
+        """Deliver a pending message, if any (non-blocking)"""
+        if not self.connected:
+            return
+        try:
+            self.client.check_msg()
+        except Exception as e:
+            self._lost(e)
@@ -1,11 +1,12 @@
 ﻿"""
 Sensor management for ESP32 Helmet
-Handles all I2C sensors
+Handles all I2C sensors (burst-read drivers of sensor_drivers.py)
 """
 
 from machine import I2C, Pin, PWM
-import time
 from config import *
+from sensor_scheduler import Pca9548a, SensorScheduler
+from sensor_drivers import Aht21, Bme280, Bno055, Ens160
 
 class SensorManager:
     def __init__(self):
@@ -16,12 +17,22 @@ class SensorManager:
         self.fan = PWM(Pin(FAN_PIN), freq=FAN_PWM_FREQ)
         self.fan.duty(0)  # Start off
         
-        # Detect sensors
+        # Detect sensors, then load calibration / set modes once
         self.scan_sensors()
+        self.init_drivers()
     
     def scan_sensors(self):
-        \"\"\"Scan I2C bus for connected devices\"\"\"
+        """Scan I2C bus for connected devices (and the multiplexer channels in use)"""
         devices = self.i2c.scan()
+        self.has_pca9548a = PCA9548A_ADDR in devices
+        self.mux = Pca9548a(self.i2c, PCA9548A_ADDR) if self.has_pca9548a else None
+        
+        if self.mux:
+            channels = (BNO055_CHANNEL, BME280_CHANNEL, ENS160_CHANNEL, AHT21_CHANNEL, INA219_CHANNEL)
+            for channel in set(c for c in channels if c is not None):
+                self.mux.select(channel)
+                devices += self.i2c.scan()
+            self.mux.select(None)
         print('I2C devices found:', [hex(d) for d in devices])
         
         self.has_bno055 = BNO055_ADDR in devices
@@ -29,75 +40,65 @@ class SensorManager:
         self.has_ens160 = ENS160_ADDR in devices
         self.has_aht21 = AHT21_ADDR in devices
         self.has_ina219 = INA219_ADDR in devices
-        self.has_pca9548a = PCA9548A_ADDR in devices
     
-    def read_bno055(self):
-        \"\"\"Read orientation from BNO055\"\"\"
-        if not self.has_bno055:
+    def _driver(self, name, cls, address, channel, present):
+        """Driver of a detected sensor, None when absent or failing its init"""
+        if not present:
             return None
-        
-        # TODO: Implement BNO055 reading
-        # Simple example (you'll need proper BNO055 library)
+        if self.mux:
+            self.mux.select(channel)
         try:
-            # Placeholder
-            return {
-                'heading': 0.0,
-                'roll': 0.0,
-                'pitch': 0.0
-            }
+            return cls(self.i2c, address)
         except Exception as e:
-            print(f'Error reading BNO055: {e}')
+            print(f'Error initialising {name}: {e}')
+            return None
+    
+    def init_drivers(self):
+        """Create the burst-read drivers of the detected sensors"""
+        self.bno055 = self._driver('BNO055', Bno055, BNO055_ADDR, BNO055_CHANNEL, self.has_bno055)
+        self.bme280 = self._driver('BME280', Bme280, BME280_ADDR, BME280_CHANNEL, self.has_bme280)
+        self.ens160 = self._driver('ENS160', Ens160, ENS160_ADDR, ENS160_CHANNEL, self.has_ens160)
+        self.aht21 = self._driver('AHT21', Aht21, AHT21_ADDR, AHT21_CHANNEL, self.has_aht21)
+        if self.mux:
+            self.mux.select(None)
+        
+        self.has_bno055 = self.bno055 is not None
+        self.has_bme280 = self.bme280 is not None
+        self.has_ens160 = self.ens160 is not None
+        self.has_aht21 = self.aht21 is not None
+    
+    def read_bno055(self):
+        """Read orientation from BNO055 (Euler angles, one 6-byte burst)"""
+        if not self.has_bno055:
             return None
+        return self.bno055.read()
     
     def read_bme280(self):
-        \"\"\"Read temp/humidity/pressure from BME280\"\"\"
+        """Read temp/humidity/pressure from BME280 (one 8-byte burst)"""
         if not self.has_bme280:
             return None
-        
-        # TODO: Implement BME280 reading
-        try:
-            return {
-                'temperature': 25.0,
-                'humidity': 50.0,
-                'pressure': 1013.25
-            }
-        except Exception as e:
-            print(f'Error reading BME280: {e}')
-            return None
+        data = self.bme280.read()
+        if self.ens160:
+            self.ens160.ambient(data['temperature'], data['humidity'])
+        return data
     
     def read_ens160(self):
-        \"\"\"Read air quality from ENS160\"\"\"
+        """Read air quality from ENS160 (None until a new result is flagged)"""
         if not self.has_ens160:
             return None
-        
-        # TODO: Implement ENS160 reading
-        try:
-            return {
-                'aqi': 1,  # Air Quality Index
-                'tvoc': 0,  # Total VOC
-                'eco2': 400  # eCO2
-            }
-        except Exception as e:
-            print(f'Error reading ENS160: {e}')
-            return None
+        return self.ens160.read()
     
     def read_aht21(self):
-        \"\"\"Read temp/humidity from AHT21\"\"\"
+        """Read temp/humidity from AHT21 (conversion triggered by the previous read)"""
         if not self.has_aht21:
             return None
-        
-        # TODO: Implement AHT21 reading
-        try:
-            return {
-                'temperature': 25.0,
-                'humidity': 50.0
-            }
-        except Exception as e:
-            print(f'Error reading AHT21: {e}')
-            return None
+        data = self.aht21.read()
+        if data and self.ens160 and not self.bme280:
+            self.ens160.ambient(data['temperature'], data['humidity'])
+        return data
     
     def read_ina219(self):
-        \"\"\"Read power metrics from INA219\"\"\"
+        """Read power metrics from INA219"""
         if not self.has_ina219:
             return None
         
@@ -113,7 +114,7 @@ class SensorManager:
             return None
     
     def read_all(self):
-        \"\"\"Read all sensors\"\"\"
+        """Read all sensors"""
         return {
             'orientation': self.read_bno055(),
             'environment': self.read_bme280(),
@@ -122,13 +123,36 @@ class SensorManager:
             'power': self.read_ina219()
         }
     
+    def create_scheduler(self, on_ready, metrics=None):
+        """
+        Build the per-sensor scheduler (cadences and channels from config)
+        
+        Args:
+            on_ready: Callback(readings) called after each pass with new data
+            metrics: Metrics registry timing each sensor read (optional)
+        """
+        scheduler = SensorScheduler(on_ready, metrics=metrics)
+        sensors = (
+            ('orientation', self.read_bno055, BNO055_PERIOD_MS, self.has_bno055, BNO055_CHANNEL),
+            ('environment', self.read_bme280, BME280_PERIOD_MS, self.has_bme280, BME280_CHANNEL),
+            ('air_quality', self.read_ens160, ENS160_PERIOD_MS, self.has_ens160, ENS160_CHANNEL),
+            ('aht21', self.read_aht21, AHT21_PERIOD_MS, self.has_aht21, AHT21_CHANNEL),
+            ('power', self.read_ina219, INA219_PERIOD_MS, self.has_ina219, INA219_CHANNEL),
+        )
+        for key, read, period_ms, present, channel in sensors:
+            if not present:
+                continue
+            mux = self.mux if channel is not None else None
+            scheduler.add(key, read, period_ms, mux, channel)
+        return scheduler
+    
     def set_fan_speed(self, speed):
-        \"\"\"
+        """
         Set fan speed (0-100%)
         
         Args:
             speed: Integer 0-100
-        \"\"\"
+        """
         duty = int((speed / 100) * 1023)
         self.fan.duty(duty)
         print(f'Fan speed set to {speed}%')
@@ -4,24 +4,248 @@ Helmet Right Eye - Main entry point
 Manages HUD display, camera streaming, and MQTT communication
 """
 
+import asyncio
+import json
+import multiprocessing
 import sys
-import time
 from pathlib import Path
 
 # Add shared module to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'shared'))
 
-import yaml
+from node_config import startup, load_node_config, prefetch_imports, NUMBER
 from logger import setup_logger
 from mqtt_topics import *
+from constants import HUD_UPDATE_INTERVAL
+from mqtt_async import AsyncMQTTClient
+from frame_ring import FrameRing
+from frame_transport import FrameSender, EYE_RIGHT, frame_metadata
+from eye_camera import EyeCamera
+from hud_renderer import HudRenderer, StatusHud, SSD1306Bus, HudStats
+from power_budget import LEVEL_NAMES, budget_rate, parse_budget
+from hud_reprojection import OrientationHistory, Reprojector
+from motion_gate import MotionGate, GATE_SKIP, GATE_KEYFRAME
+from metrics import Metrics, now_us, report
 
 logger = setup_logger(__name__, 'logs/right_eye.log')
+startup.mark('imports')
+
+CONFIG_SCHEMA = {
+    'mqtt.broker': str, 'mqtt.port': int, 'mqtt.client_id': str, 'mqtt.keepalive': int,
+    'camera.resolution': list, 'camera.lores': list, 'camera.fps': NUMBER, 'camera.codec': str,
+    'camera.quality': int, 'camera.buffer_count': int,
+    'transport.server_host': str, 'transport.server_port': int, 'transport.ring_name': str,
+    'transport.ring_slots': int, 'transport.slot_size': int,
+    'display.i2c_address': int, 'display.i2c_bus': int, 'display.width': int, 'display.height': int,
+    'motion.enabled': bool, 'motion.step': int, 'motion.cell': int, 'motion.pixel_threshold': NUMBER,
+    'motion.threshold': NUMBER, 'motion.keyframe_interval': NUMBER, 'motion.roi_margin': int,
+    'motion.roi_max': NUMBER,
+    'reprojection.enabled': bool, 'reprojection.fov': list, 'reprojection.max_age': NUMBER,
+    'metrics.interval': NUMBER,
+}
 
 def load_config():
-    """Load configuration from YAML file"""
-    config_path = Path(__file__).parent / 'config.yaml'
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+    """Load configuration (config/example.yaml + config.yaml + config/local.yaml, validated, cached)"""
+    return load_node_config(Path(__file__).parent, CONFIG_SCHEMA)
+
+def run_sender(ring_name, host, port, stop_event):
+    """Sender process: streams frames from the shared ring to the Pi 5"""
+    ring = FrameRing.attach(ring_name)
+    try:
+        FrameSender(host, port, EYE_RIGHT).run(ring, stop_event)
+    finally:
+        ring.close()
+
+async def capture_loop(camera, gate, metrics):
+    """
+    Capture, gate on motion, hand the shipped frames to the hardware encoder
+    
+    Paced by the camera itself (FrameRate control): each capture
+    completes when the next frame is ready. The gate reads the lores
+    stream in place; frames it skips are never encoded. Encoded frames
+    reach the ring from the encoder's thread (see eye_camera.py).
+    """
+    loop = asyncio.get_running_loop()
+    frame_timing = metrics.histogram('frame_ms')
+    while True:
+        request = await loop.run_in_executor(None, camera.capture)
+        start = now_us()
+        try:
+            kind = GATE_KEYFRAME
+            if gate is not None:
+                with camera.lores_luma(request) as luma:
+                    kind, _ = gate.update(luma)
+            if kind != GATE_SKIP:
+                camera.encode(request, kind == GATE_KEYFRAME)
+        finally:
+            request.release()
+        frame_timing.since(start)
+
+async def hud_loop(renderer, hud, state, metrics, reprojector=None):
+    """
+    Redraw the HUD and flush only the changed bands, every state['hud_interval']
+    
+    The YOLO boxes are late-latched on the head orientation right before
+    drawing (see hud_reprojection.py).
+    """
+    loop = asyncio.get_running_loop()
+    hud_timing = metrics.histogram('hud_frame_ms')
+    while True:
+        start = loop.time()
+        started = now_us()
+        correction = None
+        if reprojector is not None:
+            correction = reprojector.correction(state['orientation'], state['boxes_ts'])
+        state['boxes'] = reprojector.apply(state['detections'], correction) if reprojector else state['detections']
+        hud.draw(state)
+        state['hud_stats'].record(renderer.flush(), correction)
+        hud_timing.since(started)
+        await asyncio.sleep(max(0.0, state['hud_interval'] - (loop.time() - start)))
+
+async def run(config, ring):
+    """Event-driven eye node"""
+    state = {'boxes': (), 'detections': (), 'boxes_ts': None, 'orientation': OrientationHistory(),
+             'command': None, 'hud_stats': HudStats(), 'hud_interval': HUD_UPDATE_INTERVAL}
+    
+    def on_yolo_results(topic, payload):
+        eye = json.loads(payload)['eyes'].get('right')
+        if eye is not None:
+            state['detections'] = [d['box'] for d in eye['detections']]
+            state['boxes_ts'] = eye.get('capture_ts')
+    
+    def on_orientation(topic, payload):
+        data = json.loads(payload)
+        state['orientation'].add(data['heading'], data['roll'], data['pitch'])
+    
+    def on_system_command(topic, payload):
+        state['command'] = payload
+    
+    def on_value(key, field='value'):
+        def handler(topic, payload):
+            state[key] = json.loads(payload).get(field)
+        return handler
+    
+    # MQTT client (frame metadata only, frames go through the TCP stream)
+    mqtt_config = config['mqtt']
+    metrics = Metrics(mqtt_config['client_id'])
+    client = AsyncMQTTClient(mqtt_config['client_id'], mqtt_config['broker'],
+                             mqtt_config['port'], mqtt_config['keepalive'], metrics=metrics)
+    client.subscribe(BACKPACK_YOLO_RESULTS, on_yolo_results)
+    client.subscribe(SYSTEM_COMMAND, on_system_command)
+    client.subscribe(HELMET_TEMP, on_value('temperature'))
+    client.subscribe(HELMET_HUMIDITY, on_value('humidity'))
+    client.subscribe(HELMET_AIR_QUALITY, on_value('aqi', 'aqi'))
+    client.subscribe(ENERGY_BATTERY_LEVEL, on_value('battery'))
+    client.subscribe(HELMET_ORIENTATION, on_orientation)
+    await client.start()
+    
+    camera_config = config['camera']
+    motion = config['motion']
+    gate = None
+    if motion['enabled']:
+        gate = MotionGate(motion['step'], motion['cell'], motion['pixel_threshold'], motion['threshold'],
+                          motion['keyframe_interval'], motion['roi_margin'], motion['roi_max'])
+    
+    # Camera: lores stream for the gate, main stream through the hardware encoder
+    loop = asyncio.get_running_loop()
+    
+    def on_frame(seq, timestamp, size, flags):
+        metadata = frame_metadata(EYE_RIGHT, seq, timestamp, size, flags, ring.stats()['dropped'],
+                                  None, gate.stats() if gate else None)
+        client.publish(HELMET_RIGHT_FRAME, metadata)
+    
+    camera = EyeCamera(ring, camera_config['resolution'], camera_config['lores'], camera_config['fps'],
+                       camera_config['codec'], camera_config['quality'], motion['keyframe_interval'],
+                       camera_config['buffer_count'],
+                       on_frame=lambda *frame: loop.call_soon_threadsafe(on_frame, *frame), metrics=metrics)
+    camera.open()
+    state['fps'] = camera_config['fps']
+    state['fps_rate'] = 1.0
+    
+    def on_power_budget(topic, payload):
+        # Lower camera FPS and HUD refresh as the battery drops (energy node)
+        level = parse_budget(payload)
+        if level is None or level == state.get('budget'):
+            return
+        rate = budget_rate(level)
+        state['budget'] = level
+        state['fps_rate'] = rate
+        state['hud_interval'] = HUD_UPDATE_INTERVAL / rate
+        camera.change(fps=state['fps'] * rate)
+        logger.info(f"Power budget {LEVEL_NAMES[level]}: {state['fps'] * rate:.1f} fps, "
+                    f"HUD every {state['hud_interval'] * 1000:.0f} ms")
+    
+    client.subscribe(ENERGY_POWER_BUDGET, on_power_budget)
+    
+    # HUD display (dirty-band renderer)
+    display = config['display']
+    bus = SSD1306Bus(display['i2c_bus'], display['i2c_address'], display['width'], display['height'])
+    renderer = HudRenderer(bus)
+    hud = StatusHud(renderer, camera_config['resolution'])
+    reprojection = config['reprojection']
+    reprojector = None
+    if reprojection['enabled']:
+        reprojector = Reprojector(camera_config['resolution'], reprojection['fov'], reprojection['max_age'])
+    
+    def on_camera_command(topic, payload):
+        # {"command": "camera", "eye": "right", "resolution": [w, h], "fps": 15, "quality": 60}
+        try:
+            command = json.loads(payload)
+            if not isinstance(command, dict) or command.get('command') != 'camera':
+                return
+            if command.get('eye', 'right') != 'right':
+                return
+            settings = {}
+            for key in ('resolution', 'lores'):
+                if key in command:
+                    width, height = (int(v) for v in command[key])
+                    settings[key] = (width, height)
+            if 'fps' in command:
+                settings['fps'] = float(command['fps'])
+            if 'quality' in command:
+                settings['quality'] = min(100, max(1, int(command['quality'])))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Invalid camera command {payload!r}: {e}")
+            return
+        if 'fps' in settings:
+            state['fps'] = settings['fps']
+            settings['fps'] *= state['fps_rate']
+        camera.change(**settings)
+        if 'resolution' in settings:
+            # YOLO boxes come in the coordinates of the new frames
+            hud.set_camera_resolution(settings['resolution'])
+            if reprojector is not None:
+                reprojector.set_camera_resolution(settings['resolution'])
+    
+    client.subscribe(SYSTEM_COMMAND, on_camera_command)
+    
+    def collect(metrics):
+        metrics.set_gauges('ring', ring.stats())
+        metrics.set_gauges('camera', camera.stats())
+        metrics.set_gauges('hud', state['hud_stats'].snapshot())
+        if gate is not None:
+            metrics.set_gauges('gate', gate.stats())
+    
+    metrics.collect(collect)
+    
+    startup.mark('ready')
+    logger.info(f"Startup: {startup.summary()}")
+    
+    try:
+        logger.info("Entering main loop...")
+        await asyncio.gather(
+            capture_loop(camera, gate, metrics),
+            hud_loop(renderer, hud, state, metrics, reprojector),
+            report(client.publish, SYSTEM_STATUS, metrics, config['metrics']['interval']),
+        )
+    finally:
+        logger.info(f"HUD stats: {state['hud_stats'].snapshot()}")
+        if gate is not None:
+            logger.info(f"Motion gate stats: {gate.stats()}")
+        logger.info(f"Camera stats: {camera.stats()}")
+        camera.close()
+        bus.close()
+        await client.stop()
 
 def main():
     """Main entry point"""
@@ -30,30 +254,34 @@ def main():
     logger.info("=" * 50)
     
     config = load_config()
+    startup.mark('config')
     logger.info(f"Configuration loaded: {config}")
     
-    # TODO: Initialize components
-    # - MQTT client
-    # - Camera handler
-    # - HUD display
+    transport = config['transport']
+    
+    # Frame ring shared with the sender process
+    ring = FrameRing.create(transport['ring_name'], transport['ring_slots'], transport['slot_size'])
+    stop_event = multiprocessing.Event()
+    sender = multiprocessing.Process(
+        target=run_sender,
+        args=(ring.name, transport['server_host'], transport['server_port'], stop_event),
+        daemon=True
+    )
+    sender.start()
+    # After the fork: picamera2 (libcamera) is the slowest import of the node
+    prefetch_imports('picamera2')
     
     try:
-        logger.info("Entering main loop...")
-        while True:
-            # TODO: Main loop logic
-            # - Capture frame
-            # - Send to MQTT
-            # - Update HUD
-            
-            time.sleep(0.1)
-            
+        asyncio.run(run(config, ring))
     except KeyboardInterrupt:
         logger.info("Shutdown requested by user")
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
     finally:
         logger.info("Cleaning up...")
-        # TODO: Cleanup resources
+        stop_event.set()
+        sender.join(timeout=2.0)
+        ring.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,393 @@
+"""
+Segmented MQTT bus log - recorder and reader of the Pi 5 bus traffic
+
+A session is a directory:
+    topics.txt       topic table, one topic per line (line n = topic id n)
+    seg-000001.log   records, append-only
+    seg-000001.idx   index of a closed segment (JSON)
+Record: ts f64 | topic id u16 | payload length u32 | payload
+
+Timestamps are the session start wall time plus the monotonic clock, so
+they never go backwards when NTP steps the clock. Writes are batched in
+memory and appended with one write() per flush.
+
+Each segment index holds a sparse time index (offset of the first record
+every index_interval seconds) and, per topic, its count and first / last
+time: seek() bisects the segments then the time index and only scans one
+interval of records; topic filters skip whole segments. A segment left
+without index (recorder killed) is indexed by one scan when the session
+is opened. Readers map segments with mmap: only the pages replayed are
+read from the SD card.
+"""
+
+import bisect
+import json
+import logging
+import mmap
+import shutil
+import struct
+import time
+from pathlib import Path
+
+from topic_trie import TopicTrie
+
+logger = logging.getLogger(__name__)
+
+RECORD_FORMAT = '<dHI'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+MAX_TOPICS = 0xFFFF
+TOPICS_FILE = 'topics.txt'
+SEGMENT_GLOB = 'seg-*.log'
+INDEX_SUFFIX = '.idx'
+
+
+def segment_name(number):
+    return f"seg-{number:06d}.log"
+
+
+class SegmentIndex:
+    """Time and topic index of one segment, built while appending"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.start = None
+        self.end = None
+        self.count = 0
+        self.time = []     # [(ts, offset)], one entry per interval
+        self.topics = {}   # topic -> [count, first ts, last ts]
+
+    def add(self, ts, topic, offset):
+        if self.start is None:
+            self.start = ts
+        if not self.time or ts >= self.time[-1][0] + self.interval:
+            self.time.append((ts, offset))
+        self.end = ts
+        self.count += 1
+        stats = self.topics.get(topic)
+        if stats is None:
+            self.topics[topic] = [1, ts, ts]
+        else:
+            stats[0] += 1
+            stats[2] = ts
+
+    def to_dict(self, size):
+        return {'start': self.start, 'end': self.end, 'count': self.count, 'bytes': size,
+                'interval': self.interval, 'time': self.time, 'topics': self.topics}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data['interval'])
+        index.start = data['start']
+        index.end = data['end']
+        index.count = data['count']
+        index.time = [tuple(entry) for entry in data['time']]
+        index.topics = data['topics']
+        return index
+
+
+class BusLogWriter:
+    """
+    Appends messages to a session directory
+
+    Args:
+        directory: Session directory (created)
+        segment_bytes: Segment rotation size
+        segment_seconds: Segment rotation age
+        index_interval: Seconds between time index entries
+        flush_bytes: Buffered bytes triggering a write
+        max_bytes: Size budget of all sessions next to this one (oldest
+            segments deleted at rotation, 0 = unlimited)
+    """
+
+    def __init__(self, directory, segment_bytes=64 << 20, segment_seconds=600.0, index_interval=0.5,
+                 flush_bytes=256 << 10, max_bytes=0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.index_interval = index_interval
+        self.flush_bytes = flush_bytes
+        self.max_bytes = max_bytes
+
+        self.topics = {}
+        self._new_topics = []
+        self.buffer = bytearray()
+        self.segment = 0
+        self.offset = 0
+        self._file = None
+        self._index = None
+        self._origin = time.time() - time.monotonic()
+
+        self.records = 0
+        self.written = 0
+        self.flushes = 0
+        self.dropped = 0
+        self._open_segment()
+
+    def now(self):
+        """Session clock: wall time at start + monotonic time"""
+        return self._origin + time.monotonic()
+
+    def _open_segment(self):
+        self.segment += 1
+        self._file = open(self.directory / segment_name(self.segment), 'ab', buffering=0)
+        self._index = SegmentIndex(self.index_interval)
+        self.offset = 0
+
+    def _close_segment(self):
+        self.flush()
+        self._file.close()
+        index_path = (self.directory / segment_name(self.segment)).with_suffix(INDEX_SUFFIX)
+        with open(index_path, 'w') as f:
+            json.dump(self._index.to_dict(self.offset), f)
+
+    def append(self, topic, payload, ts=None):
+        """Buffer one message (str payloads are UTF-8 encoded)"""
+        if isinstance(payload, str):
+            payload = payload.encode()
+        topic_id = self.topics.get(topic)
+        if topic_id is None:
+            if len(self.topics) >= MAX_TOPICS:
+                self.dropped += 1
+                return
+            topic_id = self.topics[topic] = len(self.topics)
+            self._new_topics.append(topic)
+        ts = self.now() if ts is None else ts
+
+        if self._index.count and (self.offset >= self.segment_bytes
+                                  or ts - self._index.start >= self.segment_seconds):
+            self.rotate()
+        self._index.add(ts, topic, self.offset)
+        self.buffer += struct.pack(RECORD_FORMAT, ts, topic_id, len(payload))
+        self.buffer += payload
+        self.offset += RECORD_SIZE + len(payload)
+        self.records += 1
+        if len(self.buffer) >= self.flush_bytes:
+            self.flush()
+
+    def on_message(self, topic, payload):
+        """MQTT handler"""
+        self.append(topic, payload)
+
+    def flush(self):
+        """Write the buffered records (topic table first)"""
+        if self._new_topics:
+            with open(self.directory / TOPICS_FILE, 'a', encoding='utf-8') as f:
+                f.write(''.join(topic + '\n' for topic in self._new_topics))
+            self._new_topics = []
+        if self.buffer:
+            self._file.write(self.buffer)
+            self.written += len(self.buffer)
+            self.flushes += 1
+            self.buffer = bytearray()
+
+    def rotate(self):
+        """Close the current segment (with its index) and start the next one"""
+        self._close_segment()
+        self._open_segment()
+        if self.max_bytes:
+            prune(self.directory.parent, self.max_bytes, keep=self.directory / segment_name(self.segment))
+
+    def close(self):
+        self._close_segment()
+
+    def stats(self):
+        return {
+            'segment': self.segment,
+            'records': self.records,
+            'written': self.written,
+            'buffered': len(self.buffer),
+            'flushes': self.flushes,
+            'topics': len(self.topics),
+            'dropped': self.dropped,
+        }
+
+
+def prune(root, max_bytes, keep=None):
+    """
+    Delete the oldest segments under root until it fits in max_bytes
+
+    Sessions sort by name (start time), segments by number; emptied
+    sessions are removed.
+
+    Returns:
+        Bytes freed
+    """
+    segments = sorted(Path(root).glob('*/' + SEGMENT_GLOB))
+    total = sum(path.stat().st_size for path in segments)
+    freed = 0
+    for path in segments:
+        if total - freed <= max_bytes:
+            break
+        if path == keep:
+            continue
+        freed += path.stat().st_size
+        path.unlink()
+        path.with_suffix(INDEX_SUFFIX).unlink(missing_ok=True)
+        session = path.parent
+        if not any(session.glob(SEGMENT_GLOB)):
+            shutil.rmtree(session, ignore_errors=True)
+    if freed:
+        logger.info(f"Recordings pruned: {freed / 1e6:.1f} MB freed")
+    return freed
+
+
+class _Segment:
+    __slots__ = ('path', 'index', 'map', 'size')
+
+    def __init__(self, path, index):
+        self.path = path
+        self.index = index
+        self.map = None
+        self.size = 0
+
+
+class BusLogReader:
+    """
+    Random access to a recorded session
+
+    Args:
+        directory: Session directory
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        with open(self.directory / TOPICS_FILE, encoding='utf-8') as f:
+            self.topics = f.read().splitlines()
+        self.segments = []
+        for path in sorted(self.directory.glob(SEGMENT_GLOB)):
+            index_path = path.with_suffix(INDEX_SUFFIX)
+            if index_path.exists():
+                with open(index_path) as f:
+                    index = SegmentIndex.from_dict(json.load(f))
+            else:
+                index = self._scan(path)
+            if index.count:
+                self.segments.append(_Segment(path, index))
+        self._ends = [segment.index.end for segment in self.segments]
+
+    @property
+    def start(self):
+        return self.segments[0].index.start if self.segments else None
+
+    @property
+    def end(self):
+        return self.segments[-1].index.end if self.segments else None
+
+    def __len__(self):
+        return sum(segment.index.count for segment in self.segments)
+
+    def _scan(self, path):
+        """Index a segment without .idx (still open, or recorder killed)"""
+        segment = _Segment(path, None)
+        index = SegmentIndex(0.5)
+        for ts, topic_id, offset, _ in self._records(segment, 0):
+            index.add(ts, self.topics[topic_id] if topic_id < len(self.topics) else str(topic_id), offset)
+        self._unmap(segment)
+        return index
+
+    def _map(self, segment):
+        if segment.map is None:
+            with open(segment.path, 'rb') as f:
+                segment.size = f.seek(0, 2)
+                if segment.size:
+                    segment.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return segment.map
+
+    def _unmap(self, segment):
+        if segment.map is not None:
+            segment.map.close()
+            segment.map = None
+
+    def _records(self, segment, offset):
+        """(ts, topic id, offset, payload offset) from offset; stops at a torn record"""
+        data = self._map(segment)
+        if data is None:
+            return
+        size = segment.size
+        while offset + RECORD_SIZE <= size:
+            ts, topic_id, length = struct.unpack_from(RECORD_FORMAT, data, offset)
+            if offset + RECORD_SIZE + length > size:
+                break
+            yield ts, topic_id, offset, offset + RECORD_SIZE
+            offset += RECORD_SIZE + length
+
+    def seek(self, ts):
+        """
+        Position of the first record at or after ts
+
+        Returns:
+            (segment number, byte offset), or None past the end
+        """
+        number = bisect.bisect_left(self._ends, ts)
+        if number >= len(self.segments):
+            return None
+        segment = self.segments[number]
+        entries = segment.index.time
+        i = bisect.bisect_right(entries, (ts, float('inf'))) - 1
+        offset = entries[max(0, i)][1]
+        for record_ts, _, record_offset, _ in self._records(segment, offset):
+            if record_ts >= ts:
+                return number, record_offset
+        return (number + 1, 0) if number + 1 < len(self.segments) else None
+
+    def _topic_filter(self, topics, exclude):
+        """Allowed topic ids, or None for all"""
+        if not topics and not exclude:
+            return None
+        include, reject = TopicTrie(), TopicTrie()
+        for topic_filter in topics or ('#',):
+            include.add(topic_filter, True)
+        for topic_filter in exclude or ():
+            reject.add(topic_filter, True)
+        return {i for i, topic in enumerate(self.topics) if include.match(topic) and not reject.match(topic)}
+
+    def read(self, start=None, end=None, topics=None, exclude=None):
+        """
+        Recorded messages in time order
+
+        Args:
+            start / end: Session timestamps (None = from start / to end)
+            topics: MQTT filters to keep (None = all)
+            exclude: MQTT filters to drop
+
+        Yields:
+            (ts, topic, payload bytes)
+        """
+        allowed = self._topic_filter(topics, exclude)
+        names = None if allowed is None else {self.topics[i] for i in allowed}
+        position = (0, 0) if start is None else self.seek(start)
+        if position is None:
+            return
+        first, offset = position
+        for number in range(first, len(self.segments)):
+            segment = self.segments[number]
+            if end is not None and segment.index.start > end:
+                break
+            if names is not None and names.isdisjoint(segment.index.topics):
+                continue
+            data = self._map(segment)
+            for ts, topic_id, _, payload in self._records(segment, offset if number == first else 0):
+                if end is not None and ts > end:
+                    return
+                if allowed is None or topic_id in allowed:
+                    length = struct.unpack_from('<I', data, payload - 4)[0]
+                    yield ts, self.topics[topic_id], data[payload:payload + length]
+            self._unmap(segment)
+
+    def topic_stats(self):
+        """Per topic: message count, first and last time"""
+        stats = {}
+        for segment in self.segments:
+            for topic, (count, first, last) in segment.index.topics.items():
+                current = stats.get(topic)
+                if current is None:
+                    stats[topic] = [count, first, last]
+                else:
+                    current[0] += count
+                    current[2] = last
+        return stats
+
+    def close(self):
+        for segment in self.segments:
+            self._unmap(segment)
@@ -0,0 +1,103 @@
+"""
+Deadband publish filter for the ESP32 nodes (MicroPython)
+
+A sensor block is only published when one of its fields moved by more
+than its deadband since the last value sent. Every heartbeat_ms the
+latest value of every block is sent anyway (full snapshot), so the Pi 5
+can hold the last value between updates and still tell a quiet sensor
+from a dead one.
+"""
+
+import time
+
+
+class DeadbandFilter:
+    """
+    Drops sensor blocks that did not change enough
+
+    Args:
+        deadbands: Dict {field: delta} or {'block.field': delta}; the
+                   block-specific entry wins
+        heartbeat_ms: Full snapshot period (0 = never)
+        default: Delta of fields not listed (0 = any change)
+    """
+
+    def __init__(self, deadbands, heartbeat_ms=15000, default=0):
+        self.deadbands = deadbands
+        self.heartbeat_ms = heartbeat_ms
+        self.default = default
+        self.sent = {}     # block -> values last published
+        self.latest = {}   # block -> latest reading
+        self.last_full = time.ticks_ms()
+        self.offered = 0
+        self.published = 0
+        self.suppressed = 0
+        self.heartbeats = 0
+        self._deltas = {}  # block -> tuple of (field, delta)
+
+    def _fields(self, key, data):
+        fields = self._deltas.get(key)
+        if fields is None:
+            fields = tuple(
+                (name, self.deadbands.get(key + '.' + name, self.deadbands.get(name, self.default)))
+                for name in data
+            )
+            self._deltas[key] = fields
+        return fields
+
+    def _changed(self, key, data):
+        last = self.sent.get(key)
+        if last is None:
+            return True
+        for name, delta in self._fields(key, data):
+            value = data[name]
+            if not isinstance(value, (int, float)):
+                continue
+            if abs(value - last.get(name, value)) > delta:
+                return True
+        return False
+
+    def filter(self, readings, now_ms=None):
+        """
+        Select the blocks to publish
+
+        Args:
+            readings: Dict {block: field dict} of the sensors just read
+            now_ms: time.ticks_ms() (defaults to now)
+
+        Returns:
+            Dict of blocks to publish (empty = nothing to send)
+        """
+        if now_ms is None:
+            now_ms = time.ticks_ms()
+        out = {}
+        for key, data in readings.items():
+            if not data:
+                continue
+            self.offered += 1
+            self.latest[key] = data
+            if self._changed(key, data):
+                out[key] = data
+            else:
+                self.suppressed += 1
+
+        if self.heartbeat_ms and time.ticks_diff(now_ms, self.last_full) >= self.heartbeat_ms:
+            self.last_full = now_ms
+            self.heartbeats += 1
+            for key, data in self.latest.items():
+                out[key] = data
+
+        for key, data in out.items():
+            self.sent[key] = dict(data)
+        self.published += len(out)
+        return out
+
+    def stats(self):
+        """Counters; ratio is the share of readings suppressed"""
+        return {
+            'offered': self.offered,
+            'published': self.published,
+            'suppressed': self.suppressed,
+            'heartbeats': self.heartbeats,
+            'ratio': round(self.suppressed / self.offered, 3) if self.offered else 0,
+        }
@@ -0,0 +1,328 @@
+"""
+Eye camera: picamera2 capture through the hardware encoders
+
+Software-encoding a 640x480 RGB frame takes most of a Pi Zero 2W core,
+which the HUD needs. Here the main stream is configured in YUV420 and
+its buffers, the camera's own DMA buffers, are queued as they are to
+the VideoCore V4L2 encoder: JPEG (MJPEGEncoder) or H.264 (H264Encoder).
+The CPU never reads their pixels. Only the encoded bitstream comes back
+to Python and is written into a slot of the frame ring (frame_ring.py).
+
+Every request also carries a low-resolution YUV420 stream (lores) for
+the motion gate and the HUD. Its luma plane is read in place through
+MappedArray, without a copy into an array of its own.
+
+The encoder is not attached to the camera (start_encoder() would encode
+every frame): encode() queues one request, only for the frames the
+motion gate ships. The encoder keeps its own reference on the request
+until the hardware is done with the buffer, so the caller releases the
+request right after encode().
+
+Settings changed at runtime (change()) are applied by the capture
+thread between two frames, with the camera left open:
+- fps: FrameRate control, encoder restarted for the new bitrate
+- quality: encoder restarted with the new bitrate
+- resolution / lores: the same Picamera2 is stopped, reconfigured and
+  restarted (a few frames lost), then the encoder is restarted
+
+Reported: capture -> encoded latency (sensor timestamp to the encoded
+frame handed back by the encoder), CPU share of the eye process and of
+the capture path alone (capture, gate, encode calls, encoded output).
+"""
+
+import collections
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from frame_transport import CODEC_JPEG, CODEC_H264, FLAG_KEYFRAME
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+CODECS = {'mjpeg': CODEC_JPEG, 'h264': CODEC_H264}
+
+# Bits per pixel at quality 0 and 100, linear in between
+BITS_PER_PIXEL = {'mjpeg': (0.2, 2.0), 'h264': (0.02, 0.2)}
+
+# Capture -> encoded latency buckets (ms): sensor readout + queueing + encode
+ENCODE_MS = (5, 10, 15, 20, 25, 30, 40, 50, 75, 100, 150, 250)
+
+SETTINGS = ('resolution', 'lores', 'fps', 'quality')
+
+
+def bitrate(codec, size, fps, quality):
+    """Encoder bitrate (bit/s) for a JPEG-like quality (1-100)"""
+    low, high = BITS_PER_PIXEL[codec]
+    return int(size[0] * size[1] * fps * (low + (high - low) * quality / 100))
+
+
+def _ring_output(camera):
+    """picamera2 encoder output handing encoded frames to camera, runs on the encoder's thread"""
+    # The encoder.output setter only takes picamera2.outputs.Output instances
+    from picamera2.outputs import Output
+
+    class _RingOutput(Output):
+        def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+            camera._on_encoded(frame, keyframe)
+
+    return _RingOutput()
+
+
+class EyeCamera:
+    """
+    picamera2 camera with a lores stream and a hardware-encoded main stream
+
+    capture(), the lores_luma() block and encode() are called in turn by
+    one capture loop. Encoded frames are committed to the ring from the
+    encoder's thread, then on_frame(seq, timestamp, size, flags) is
+    called there (hand it over to the event loop with
+    call_soon_threadsafe). FLAG_KEYFRAME is the encode() request for
+    JPEG frames, the IDR frames for H.264.
+
+    Args:
+        ring: FrameRing receiving the encoded frames
+        resolution: Main stream (width, height)
+        lores: Motion gate / HUD stream (width, height)
+        fps: Sensor frame rate
+        codec: 'mjpeg' or 'h264'
+        quality: 1-100, mapped to the encoder bitrate
+        keyframe_interval: Seconds between H.264 IDR frames
+        buffer_count: Camera buffers (the encoder holds one while encoding)
+        on_frame: Callback of every frame committed to the ring
+        metrics: Metrics registry for the encode_latency_ms histogram
+    """
+
+    def __init__(self, ring, resolution, lores, fps, codec='mjpeg', quality=80, keyframe_interval=2.0,
+                 buffer_count=4, on_frame=None, metrics=None):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec!r}, expected one of {sorted(CODECS)}")
+        self.ring = ring
+        self.resolution = tuple(resolution)
+        self.lores = tuple(lores)
+        self.fps = fps
+        self.codec = codec
+        self.quality = quality
+        self.keyframe_interval = keyframe_interval
+        self.buffer_count = buffer_count
+        self.on_frame = on_frame
+        self.latency = (metrics.histogram('encode_latency_ms', bounds=ENCODE_MS)
+                        if metrics is not None else Histogram(ENCODE_MS))
+
+        self.camera = None
+        self.encoder = None
+        self._mapped_array = None
+        self._output = None
+        self._inflight = collections.deque()  # (sensor ns, capture wall time, flags), encoder order
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        self.captured = 0
+        self.encoded = 0
+        self.bytes = 0
+        self.oversize = 0
+        self.restarts = 0
+        self.reconfigures = 0
+        # CPU seconds of the capture path, one accumulator per thread
+        self._cpu_capture = 0.0
+        self._cpu_encode = 0.0
+        self._cpu_output = 0.0
+        self._cpu_mark = None
+
+    # Camera and encoder
+
+    def open(self):
+        """Acquire, configure and start the camera and the encoder"""
+        from picamera2 import Picamera2, MappedArray
+
+        self._mapped_array = MappedArray
+        self.camera = Picamera2()
+        self._configure()
+        self.camera.start()
+        self._start_encoder()
+        self._cpu_mark = self._cpu_times()
+        logger.info(f"Camera {self.resolution[0]}x{self.resolution[1]} @ {self.fps} fps, "
+                    f"lores {self.lores[0]}x{self.lores[1]}, {self.codec} quality {self.quality}")
+
+    def close(self):
+        if self.camera is None:
+            return
+        self._stop_encoder()
+        self.camera.stop()
+        self.camera.close()
+        self.camera = None
+
+    def _configure(self):
+        camera = self.camera
+        camera.configure(camera.create_video_configuration(
+            main={'size': self.resolution, 'format': 'YUV420'},
+            lores={'size': self.lores, 'format': 'YUV420'},
+            controls={'FrameRate': self.fps},
+            buffer_count=self.buffer_count,
+        ))
+
+    def _start_encoder(self):
+        from picamera2.encoders import H264Encoder, MJPEGEncoder
+
+        rate = bitrate(self.codec, self.resolution, self.fps, self.quality)
+        if self.codec == 'h264':
+            # SPS / PPS repeated on every IDR: the receiver can join at any keyframe
+            encoder = H264Encoder(rate, repeat=True, iperiod=max(1, round(self.fps * self.keyframe_interval)))
+        else:
+            encoder = MJPEGEncoder(rate)
+        main = self.camera.camera_config['main']
+        encoder.width, encoder.height = main['size']
+        encoder.stride = main['stride']
+        encoder.format = main['format']
+        if self._output is None:
+            self._output = _ring_output(self)
+        encoder.output = self._output
+        self._inflight.clear()
+        encoder.start()
+        self.encoder = encoder
+
+    def _stop_encoder(self):
+        if self.encoder is not None:
+            self.encoder.stop()
+            self.encoder = None
+
+    # Runtime settings
+
+    def change(self, **settings):
+        """
+        Request new settings (resolution, lores, fps, quality)
+
+        Thread-safe; applied by the capture thread before its next frame.
+
+        Raises:
+            ValueError: unknown setting
+        """
+        unknown = set(settings) - set(SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown camera settings: {sorted(unknown)}")
+        with self._lock:
+            self._pending.update(settings)
+
+    def _apply(self, settings):
+        for key in ('resolution', 'lores'):
+            if key in settings:
+                settings[key] = tuple(settings[key])
+        changed = {key: value for key, value in settings.items() if getattr(self, key) != value}
+        if not changed:
+            return
+        for key, value in changed.items():
+            setattr(self, key, value)
+
+        self._stop_encoder()
+        if 'resolution' in changed or 'lores' in changed:
+            # Same Picamera2: no close / re-acquire of the sensor
+            self.camera.stop()
+            self._configure()
+            self.camera.start()
+            self.reconfigures += 1
+        elif 'fps' in changed:
+            self.camera.set_controls({'FrameRate': self.fps})
+        self._start_encoder()
+        self.restarts += 1
+        logger.info(f"Camera settings changed: {changed}")
+
+    # Capture loop
+
+    def capture(self):
+        """
+        Next completed request (blocks until the sensor delivers it)
+
+        Pending settings are applied first. Release the request once
+        gated / encoded.
+        """
+        start = time.thread_time()
+        with self._lock:
+            settings, self._pending = self._pending, {}
+        if settings:
+            self._apply(settings)
+        cpu = time.thread_time() - start
+        request = self.camera.capture_request()
+        start = time.thread_time()
+        self.captured += 1
+        self._cpu_capture += cpu + time.thread_time() - start
+        return request
+
+    @contextmanager
+    def lores_luma(self, request):
+        """Lores Y plane (height x width uint8) mapped in place, valid inside the block"""
+        start = time.thread_time()
+        width, height = self.lores
+        try:
+            with self._mapped_array(request, 'lores') as mapped:
+                yield mapped.array[:height, :width]
+        finally:
+            self._cpu_encode += time.thread_time() - start
+
+    def encode(self, request, keyframe=False):
+        """Queue the main stream buffer of a request to the hardware encoder (returns at once)"""
+        start = time.thread_time()
+        sensor_ns = request.get_metadata().get('SensorTimestamp')
+        now_ns = time.monotonic_ns()
+        if not sensor_ns:
+            sensor_ns = now_ns
+        # Wall clock time of the exposure, for the Pi 5 latency and the HUD reprojection
+        timestamp = time.time() - (now_ns - sensor_ns) / 1e9
+        self._inflight.append((sensor_ns, timestamp, FLAG_KEYFRAME if keyframe else 0))
+        self.encoder.encode(self.camera.stream_map['main'], request)
+        self._cpu_encode += time.thread_time() - start
+
+    def _on_encoded(self, frame, keyframe):
+        start = time.thread_time()
+        try:
+            sensor_ns, timestamp, flags = self._inflight.popleft()
+        except IndexError:
+            return  # queued before an encoder restart
+        self.latency.observe((time.monotonic_ns() - sensor_ns) / 1e6)
+        if self.codec == 'h264':
+            flags = FLAG_KEYFRAME if keyframe else 0
+        flags |= CODECS[self.codec]
+
+        size = len(frame)
+        if size > self.ring.slot_size:
+            self.oversize += 1
+            logger.warning(f"Encoded frame of {size} bytes exceeds the ring slot ({self.ring.slot_size}), dropped")
+            self._cpu_output += time.thread_time() - start
+            return
+        with self.ring.slot_buffer() as slot:
+            slot[:size] = frame
+        seq = self.ring.commit(size, timestamp, flags)
+        self.encoded += 1
+        self.bytes += size
+        self._cpu_output += time.thread_time() - start
+        if self.on_frame is not None:
+            self.on_frame(seq, timestamp, size, flags)
+
+    # Reporting
+
+    def _cpu_times(self):
+        return (time.monotonic(), time.process_time(),
+                self._cpu_capture + self._cpu_encode + self._cpu_output)
+
+    def stats(self):
+        """Counters, and CPU share (% of all cores) since the previous call"""
+        now, process, pipeline = self._cpu_times()
+        cpu_percent = pipeline_percent = 0.0
+        if self._cpu_mark is not None and now > self._cpu_mark[0]:
+            cores = (now - self._cpu_mark[0]) * (os.cpu_count() or 1)
+            cpu_percent = round(100 * (process - self._cpu_mark[1]) / cores, 1)
+            pipeline_percent = round(100 * (pipeline - self._cpu_mark[2]) / cores, 2)
+        self._cpu_mark = (now, process, pipeline)
+        count = self.latency.count
+        return {
+            'captured': self.captured,
+            'encoded': self.encoded,
+            'bytes': self.bytes,
+            'oversize': self.oversize,
+            'restarts': self.restarts,
+            'reconfigures': self.reconfigures,
+            'encode_latency_ms': round(self.latency.sum / count, 2) if count else 0.0,
+            'cpu_percent': cpu_percent,
+            'capture_cpu_percent': pipeline_percent,
+        }
@@ -0,0 +1,236 @@
+"""
+Shared-memory frame ring buffer
+Fixed slots, single producer (capture) / single consumer (sender)
+
+Layout of the shared memory block:
+    control : slots u32 | slot_size u32 | write_seq u64 | read_seq u64 | dropped u64
+    slots   : [marker u64 | timestamp f64 | length u32 | flags u32 | data...] * slots
+
+The writer never blocks: when the reader falls behind, the oldest
+unread frames are dropped. The reader gets a memoryview straight into
+the slot (no copy) and must release() it once sent.
+"""
+
+import struct
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+_CONTROL_FORMAT = '<IIQQQ'
+_CONTROL_SIZE = 64
+_SLOT_FORMAT = '<QdII'
+_SLOT_HEADER_SIZE = 32
+
+_WRITE_SEQ_OFFSET = 8
+_READ_SEQ_OFFSET = 16
+_DROPPED_OFFSET = 24
+
+Frame = namedtuple('Frame', 'seq timestamp flags data')
+
+
+class FrameRing:
+    """
+    Fixed-slot frame ring in POSIX shared memory
+
+    Use FrameRing.create() in the capture process and
+    FrameRing.attach() in the sender process.
+    """
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self._owner = owner
+        self._buf = shm.buf
+        self.slots, self.slot_size = struct.unpack_from('<II', self._buf, 0)
+        self._stride = _SLOT_HEADER_SIZE + self.slot_size
+        self._read_seq = self._get(_READ_SEQ_OFFSET)
+
+    @classmethod
+    def create(cls, name, slots=4, slot_size=640 * 480 * 3):
+        """
+        Create a new ring
+
+        Args:
+            name: Shared memory name (e.g. 'casque_left_eye')
+            slots: Number of frame slots (one is always reserved for the writer)
+            slot_size: Maximum frame size in bytes
+
+        Returns:
+            FrameRing owning the shared memory
+        """
+        if slots < 2:
+            raise ValueError('FrameRing needs at least 2 slots')
+
+        size = _CONTROL_SIZE + slots * (_SLOT_HEADER_SIZE + slot_size)
+        try:
+            # Stale block left by a crashed process
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        struct.pack_into(_CONTROL_FORMAT, shm.buf, 0, slots, slot_size, 0, 0, 0)
+        for i in range(slots):
+            struct.pack_into(_SLOT_FORMAT, shm.buf,
+                             _CONTROL_SIZE + i * (_SLOT_HEADER_SIZE + slot_size),
+                             0, 0.0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach to a ring created by another process
+
+        Meant for child processes of the owner: they share its resource
+        tracker, so the block is only unlinked by the owner.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def _get(self, offset):
+        return struct.unpack_from('<Q', self._buf, offset)[0]
+
+    def _set(self, offset, value):
+        struct.pack_into('<Q', self._buf, offset, value)
+
+    def _slot_offset(self, seq):
+        return _CONTROL_SIZE + (seq % self.slots) * self._stride
+
+    # Writer side
+
+    def slot_buffer(self):
+        """
+        Get the next slot's data area, to be filled in place
+
+        The slot is invalidated immediately so a reader can never see
+        a half-written frame. Call commit() once filled.
+
+        Returns:
+            Writable memoryview of slot_size bytes
+        """
+        offset = self._slot_offset(self._get(_WRITE_SEQ_OFFSET))
+        self._set(offset, 0)
+        start = offset + _SLOT_HEADER_SIZE
+        return self._buf[start:start + self.slot_size]
+
+    def commit(self, length, timestamp=None, flags=0):
+        """
+        Publish the slot returned by slot_buffer()
+
+        Args:
+            length: Number of bytes written
+            timestamp: Capture time (defaults to time.time())
+            flags: Free-form flags forwarded with the frame (codec...)
+
+        Returns:
+            Sequence number of the frame
+        """
+        if length > self.slot_size:
+            raise ValueError(f'Frame too large for slot: {length} > {self.slot_size}')
+
+        seq = self._get(_WRITE_SEQ_OFFSET)
+        offset = self._slot_offset(seq)
+        if timestamp is None:
+            timestamp = time.time()
+
+        struct.pack_into('<dII', self._buf, offset + 8, timestamp, length, flags)
+        self._set(offset, seq + 1)
+        self._set(_WRITE_SEQ_OFFSET, seq + 1)
+        return seq
+
+    def write(self, data, timestamp=None, flags=0):
+        """Copy a bytes-like frame into the ring (slot_buffer + commit)"""
+        data = memoryview(data).cast('B')
+        length = len(data)
+        if length > self.slot_size:
+            raise ValueError(f'Frame too large for slot: {length} > {self.slot_size}')
+        self.slot_buffer()[:length] = data
+        return self.commit(length, timestamp, flags)
+
+    # Reader side
+
+    def read(self):
+        """
+        Get the oldest unread frame without copying
+
+        Returns:
+            Frame (data is a memoryview into the slot) or None if empty
+        """
+        while True:
+            write_seq = self._get(_WRITE_SEQ_OFFSET)
+            seq = self._read_seq
+            if seq >= write_seq:
+                return None
+
+            # The slot after the newest frame may be in use by the writer
+            oldest = write_seq - (self.slots - 1)
+            if seq < oldest:
+                self._drop(oldest - seq)
+                seq = oldest
+
+            offset = self._slot_offset(seq)
+            marker, timestamp, length, flags = struct.unpack_from(_SLOT_FORMAT, self._buf, offset)
+            if marker != seq + 1:
+                # Overwritten between the two reads: skip it
+                self._drop(1)
+                self._advance(seq + 1)
+                continue
+
+            start = offset + _SLOT_HEADER_SIZE
+            return Frame(seq, timestamp, flags, self._buf[start:start + length])
+
+    def latest(self):
+        """Get the newest frame, dropping every older unread one"""
+        write_seq = self._get(_WRITE_SEQ_OFFSET)
+        if write_seq and self._read_seq < write_seq - 1:
+            self._drop(write_seq - 1 - self._read_seq)
+            self._advance(write_seq - 1)
+        return self.read()
+
+    def valid(self, frame):
+        """True while the writer has not started reusing the frame's slot"""
+        return self._get(self._slot_offset(frame.seq)) == frame.seq + 1
+
+    def release(self, frame):
+        """
+        Mark a frame as consumed
+
+        Returns:
+            True if the slot was not overwritten while in use
+        """
+        frame.data.release()
+        valid = self.valid(frame)
+        if not valid:
+            self._drop(1)
+        self._advance(frame.seq + 1)
+        return valid
+
+    def _advance(self, seq):
+        self._read_seq = seq
+        self._set(_READ_SEQ_OFFSET, seq)
+
+    def _drop(self, count):
+        self._set(_DROPPED_OFFSET, self._get(_DROPPED_OFFSET) + count)
+
+    def stats(self):
+        """Return ring counters"""
+        write_seq = self._get(_WRITE_SEQ_OFFSET)
+        read_seq = self._get(_READ_SEQ_OFFSET)
+        return {
+            'written': write_seq,
+            'read': read_seq,
+            'pending': write_seq - read_seq,
+            'dropped': self._get(_DROPPED_OFFSET),
+        }
+
+    def close(self):
+        """Detach from (and, for the owner, destroy) the shared memory"""
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
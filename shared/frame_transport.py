@@ -0,0 +1,339 @@
+"""
+Framed binary transport for camera frames (eye Pi Zeros -> Pi 5)
+
+Each frame travels on a plain TCP stream as a fixed header followed by
+the payload:
+    length u32 | version u8 | eye u8 | flags u16 | seq u64 | timestamp f64
+
+Flags: low byte = codec, high byte = FLAG_KEYFRAME / FLAG_ROI. A ROI
+frame's payload starts with a ROI header (see pack_roi()) followed by
+the encoded crop.
+
+MQTT only carries the frame metadata (see frame_metadata()).
+"""
+
+import logging
+import socket
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FRAME_PORT = 5600
+FRAME_VERSION = 1
+
+HEADER_FORMAT = '<IBBHQd'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Payload bytes copied out of the ring slot before the torn-frame check
+TAIL_SIZE = 64
+
+EYE_LEFT = 0
+EYE_RIGHT = 1
+EYE_NAMES = {EYE_LEFT: 'left', EYE_RIGHT: 'right'}
+
+# Frame flags (low byte = codec)
+CODEC_RAW = 0
+CODEC_JPEG = 1
+CODEC_H264 = 2
+CODEC_MASK = 0x00FF
+
+# Frame flags (high byte, see motion_gate.py)
+FLAG_KEYFRAME = 0x0100  # full frame forced by the eye's keyframe interval
+FLAG_ROI = 0x0200  # payload = ROI header + encoded crop
+
+# ROI header: crop x | y | width | height | full frame width | height
+ROI_FORMAT = '<HHHHHH'
+ROI_SIZE = struct.calcsize(ROI_FORMAT)
+
+
+def frame_metadata(eye, seq, timestamp, size, flags, dropped=0, roi=None, gate=None):
+    """
+    Build the JSON-able metadata published on helmet/<eye>/frame
+
+    Args:
+        roi: (x0, y0, x1, y1) of a ROI frame
+        gate: MotionGate.stats() of the eye, if it gates frames
+    """
+    metadata = {
+        'eye': EYE_NAMES.get(eye, eye),
+        'seq': seq,
+        'ts': timestamp,
+        'size': size,
+        'codec': flags & CODEC_MASK,
+        'keyframe': bool(flags & FLAG_KEYFRAME),
+        'roi': list(roi) if roi else None,
+        'dropped': dropped,
+    }
+    if gate is not None:
+        metadata['captured'] = gate['captured']
+        metadata['skipped'] = gate['skipped']
+    return metadata
+
+
+def pack_roi(box, frame_size):
+    """
+    ROI header for a crop of the frame
+
+    Args:
+        box: (x0, y0, x1, y1) crop in frame pixels
+        frame_size: (width, height) of the full frame
+    """
+    x0, y0, x1, y1 = box
+    return struct.pack(ROI_FORMAT, x0, y0, x1 - x0, y1 - y0, frame_size[0], frame_size[1])
+
+
+def split_roi(flags, data):
+    """
+    Separate the ROI header from the encoded payload
+
+    Returns:
+        (roi, payload): roi is (x, y, width, height, frame_width,
+        frame_height), or None for a full frame
+    """
+    if not flags & FLAG_ROI:
+        return None, data
+    return struct.unpack_from(ROI_FORMAT, data), memoryview(data)[ROI_SIZE:]
+
+
+class FrameSender:
+    """
+    Streams frames from a FrameRing to the Pi 5
+
+    Args:
+        host: Pi 5 address
+        port: Frame server port
+        eye: EYE_LEFT or EYE_RIGHT
+        reconnect_delay: Initial delay between reconnect attempts (doubles up to 5 s)
+    """
+
+    def __init__(self, host, port=FRAME_PORT, eye=EYE_LEFT, reconnect_delay=0.5):
+        self.host = host
+        self.port = port
+        self.eye = eye
+        self.reconnect_delay = reconnect_delay
+        self.sock = None
+        self._header = bytearray(HEADER_SIZE)
+        self.sent = 0
+        self.bytes_sent = 0
+        self.torn = 0
+
+    def connect(self):
+        """Open the TCP stream"""
+        sock = socket.create_connection((self.host, self.port), timeout=2.0)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(None)
+        self.sock = sock
+        logger.info(f"Frame stream connected to {self.host}:{self.port}")
+
+    def close(self):
+        """Close the TCP stream"""
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def send(self, frame, ring=None):
+        """
+        Send one ring Frame (header + payload with sendmsg, no copy)
+
+        With ring, the frame is checked against the writer: the last
+        TAIL_SIZE bytes are copied out of the slot, then the slot
+        marker is checked before they are sent. The writer invalidates
+        the marker before writing, so a valid marker means every byte
+        sent or copied so far is intact. A frame overwritten before the
+        header went out is skipped; one overwritten during the send is
+        never completed and the stream is closed, so the receiver drops
+        the partial frame (run() reconnects).
+
+        Args:
+            frame: Frame from ring.read()
+            ring: FrameRing the frame comes from (None = no check)
+
+        Returns:
+            True if sent, False if the frame was torn
+
+        Raises:
+            OSError: on connection loss
+        """
+        data = frame.data
+        length = len(data)
+        if ring is not None and not ring.valid(frame):
+            return False
+        struct.pack_into(HEADER_FORMAT, self._header, 0, length, FRAME_VERSION,
+                         self.eye, frame.flags, frame.seq, frame.timestamp)
+
+        if ring is None:
+            self._sendmsg([memoryview(self._header), data])
+        else:
+            split = max(0, length - TAIL_SIZE)
+            self._sendmsg([memoryview(self._header), data[:split]])
+            tail = bytes(data[split:])
+            if not ring.valid(frame):
+                logger.warning(f"Frame {frame.seq} overwritten while being sent, resyncing the stream")
+                self.close()
+                return False
+            self._sendmsg([tail])
+
+        self.sent += 1
+        self.bytes_sent += HEADER_SIZE + length
+        return True
+
+    def _sendmsg(self, pending):
+        while pending:
+            sent = self.sock.sendmsg(pending)
+            while pending and sent >= len(pending[0]):
+                sent -= len(pending[0])
+                pending.pop(0)
+            if pending and sent:
+                pending[0] = pending[0][sent:]
+
+    def run(self, ring, stop_event, poll_interval=0.002):
+        """
+        Sender loop: read frames from the ring and stream them
+
+        Frames pile up (and the oldest are dropped by the ring) while
+        the connection is down; the loop reconnects with backoff.
+        Frames the writer overwrote under the sender are counted in
+        torn and never delivered (see send()).
+
+        Args:
+            ring: FrameRing attached as reader
+            stop_event: threading/multiprocessing Event ending the loop
+            poll_interval: Sleep when the ring is empty
+        """
+        delay = self.reconnect_delay
+        while not stop_event.is_set():
+            if self.sock is None:
+                try:
+                    self.connect()
+                    delay = self.reconnect_delay
+                except OSError as e:
+                    logger.warning(f"Frame stream connect failed: {e}")
+                    stop_event.wait(delay)
+                    delay = min(delay * 2, 5.0)
+                    continue
+
+            frame = ring.read()
+            if frame is None:
+                time.sleep(poll_interval)
+                continue
+
+            try:
+                if not self.send(frame, ring):
+                    self.torn += 1
+            except OSError as e:
+                logger.warning(f"Frame stream lost: {e}")
+                self.close()
+            finally:
+                ring.release(frame)
+
+        self.close()
+
+
+def _recv_exact_into(sock, view):
+    """Fill a memoryview from the socket; returns False on EOF"""
+    while len(view):
+        n = sock.recv_into(view)
+        if n == 0:
+            return False
+        view = view[n:]
+    return True
+
+
+class FrameReceiver:
+    """
+    Pi 5 frame server: accepts one stream per eye
+
+    Args:
+        on_frame: Callable(eye, seq, timestamp, flags, data) for each frame
+        host: Listen address
+        port: Listen port
+        max_frame_size: Frames larger than this close the connection
+    """
+
+    def __init__(self, on_frame, host='0.0.0.0', port=FRAME_PORT, max_frame_size=4 * 1024 * 1024):
+        self.on_frame = on_frame
+        self.host = host
+        self.port = port
+        self.max_frame_size = max_frame_size
+        self._server = None
+        self._running = False
+        self._threads = []
+        self.received = {EYE_LEFT: 0, EYE_RIGHT: 0}
+        self.lost = {EYE_LEFT: 0, EYE_RIGHT: 0}
+        self._last_seq = {}
+
+    def start(self):
+        """Start listening in a background thread"""
+        self._server = socket.create_server((self.host, self.port), reuse_port=False)
+        self._running = True
+        thread = threading.Thread(target=self._accept_loop, name='frame-accept', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        logger.info(f"Frame server listening on {self.host}:{self.port}")
+
+    def stop(self):
+        """Stop the server"""
+        self._running = False
+        if self._server:
+            try:
+                self._server.close()
+            except OSError:
+                pass
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, addr = self._server.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            thread = threading.Thread(target=self._connection_loop, args=(conn, addr),
+                                      name=f'frame-{addr[0]}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _connection_loop(self, conn, addr):
+        logger.info(f"Frame stream from {addr[0]}")
+        header = bytearray(HEADER_SIZE)
+        header_view = memoryview(header)
+        try:
+            while self._running:
+                if not _recv_exact_into(conn, header_view):
+                    break
+                length, version, eye, flags, seq, timestamp = struct.unpack(HEADER_FORMAT, header)
+                # Unknown eye: not one of ours, or out of sync with the frame boundaries
+                if version != FRAME_VERSION or length > self.max_frame_size or eye not in EYE_NAMES:
+                    logger.error(f"Bad frame header from {addr[0]} (v{version}, eye {eye}, {length} bytes)")
+                    break
+
+                # Fresh buffer per frame: consumers may keep it while the next one arrives
+                data = bytearray(length)
+                if not _recv_exact_into(conn, memoryview(data)):
+                    break
+
+                self._track(eye, seq)
+                self.on_frame(eye, seq, timestamp, flags, data)
+        except OSError as e:
+            logger.warning(f"Frame stream from {addr[0]} failed: {e}")
+        finally:
+            conn.close()
+            logger.info(f"Frame stream from {addr[0]} closed")
+
+    def _track(self, eye, seq):
+        last = self._last_seq.get(eye)
+        if last is not None and seq > last + 1:
+            self.lost[eye] = self.lost.get(eye, 0) + seq - last - 1
+        self._last_seq[eye] = seq
+        self.received[eye] = self.received.get(eye, 0) + 1
+
+    def stats(self):
+        """Return per-eye counters"""
+        return {
+            EYE_NAMES.get(eye, eye): {'received': count, 'lost': self.lost.get(eye, 0)}
+            for eye, count in self.received.items()
+        }
@@ -0,0 +1,236 @@
+"""
+MQ-2 / MQ-7 gas sensors on the ESP32 ADC (MicroPython)
+
+A single ESP32 ADC read is too noisy for the alert thresholds. Each
+read takes a burst of samples into an array allocated once, keeps the
+burst median (rejects the ADC spikes) and smooths the medians with an
+integer EMA.
+
+The conversion to ppm is a lookup table built per sensor whenever R0
+changes: ADC code -> Rs / R0 -> ppm through the datasheet power law
+ppm = a * (Rs / R0) ** b. The table has one entry every 16 ADC codes
+and is interpolated linearly, so reads do no pow / log.
+
+R0 (sensor resistance in clean air) is calibrated on demand, averaged
+over a number of reads in clean air, and kept in a small JSON file in
+flash (load_r0 / save_r0).
+
+The MQ-7 needs its heater cycled: 60 s at 5 V (burns off the
+adsorbed gases) then 90 s at 1.4 V, CO being read at the end of the
+low phase. Mq7Heater drives the heater PWM and tells when the sensor
+is in its measurement window.
+
+Keep this file MicroPython compatible: no typing, no dataclasses.
+"""
+
+import json
+import time
+from array import array
+
+# (a, b, Rs/R0 in clean air): ppm = a * (Rs / R0) ** b, fitted on the datasheet curves
+MQ2_SMOKE = (3616.1, -2.675, 9.83)
+MQ7_CO = (99.042, -1.518, 27.5)
+
+ADC_BITS = 12
+LUT_SHIFT = 4            # one table entry every 16 ADC codes
+EMA_SCALE_SHIFT = 4      # EMA kept in 1/16 ADC code
+PPM_SCALE = 10           # table values in 0.1 ppm
+PPM_MAX = 0xFFFF
+
+
+class MqSensor:
+    """
+    One MQ sensor: burst sampling, median + EMA filter, ppm lookup table
+
+    Args:
+        adc: machine.ADC (11 dB attenuation)
+        curve: (a, b, clean air ratio), MQ2_SMOKE or MQ7_CO
+        r0: Sensor resistance in clean air (kOhm)
+        samples: ADC samples per read (burst)
+        ema_shift: EMA weight of a new median = 1 / 2**ema_shift
+        rl: Load resistor of the module (kOhm)
+        vc: Circuit (heater / load) voltage
+        full_scale: ADC input voltage at the top code
+        divider: Sensor output volts per ADC input volt (resistor divider)
+    """
+
+    def __init__(self, adc, curve, r0, samples=16, ema_shift=2, rl=10.0, vc=5.0, full_scale=3.3, divider=1.0):
+        self.adc = adc
+        self.curve = curve
+        self.samples = array('H', [0] * samples)
+        self.ema_shift = ema_shift
+        self.rl = rl
+        self.vc = vc
+        self.full_scale = full_scale
+        self.divider = divider
+        self.lut = array('H', [0] * ((1 << (ADC_BITS - LUT_SHIFT)) + 1))
+        self.ema = -1
+        self.reads = 0
+        self._calibrate = 0
+        self._rs_sum = 0.0
+        self._rs_count = 0
+        self.set_r0(r0)
+
+    def volts(self, code):
+        """Sensor output voltage of an ADC code"""
+        return code * self.full_scale / ((1 << ADC_BITS) - 1) * self.divider
+
+    def resistance(self, code):
+        """Rs (kOhm) of an ADC code, None at the rails"""
+        vout = self.volts(code)
+        if vout <= 0 or vout >= self.vc:
+            return None
+        return self.rl * (self.vc - vout) / vout
+
+    def set_r0(self, r0):
+        """Set R0 and rebuild the ppm table (the only pow calls)"""
+        self.r0 = r0
+        a, b, _ = self.curve
+        lut = self.lut
+        top = (1 << ADC_BITS) - 1
+        for i in range(len(lut)):
+            rs = self.resistance(min(i << LUT_SHIFT, top))
+            if rs is None:
+                # 0 V: no reading; at the supply rail: saturated
+                ppm = 0 if i == 0 else PPM_MAX
+            else:
+                ppm = int(a * (rs / r0) ** b * PPM_SCALE)
+            lut[i] = ppm if ppm < PPM_MAX else PPM_MAX
+
+    def reset(self):
+        """Restart the EMA from the next burst"""
+        self.ema = -1
+
+    def sample(self):
+        """
+        Burst of ADC samples, median, EMA
+
+        Returns:
+            Filtered ADC code in 1/16 code
+        """
+        buf = self.samples
+        read = self.adc.read
+        n = len(buf)
+        for i in range(n):
+            buf[i] = read()
+        # Insertion sort in place (16 samples, no allocation)
+        for i in range(1, n):
+            value = buf[i]
+            j = i - 1
+            while j >= 0 and buf[j] > value:
+                buf[j + 1] = buf[j]
+                j -= 1
+            buf[j + 1] = value
+        median = buf[n >> 1] << EMA_SCALE_SHIFT
+        if self.ema < 0:
+            self.ema = median
+        else:
+            self.ema += (median - self.ema) >> self.ema_shift
+        self.reads += 1
+        return self.ema
+
+    def ppm10(self, ema):
+        """Table lookup with linear interpolation (0.1 ppm units)"""
+        shift = LUT_SHIFT + EMA_SCALE_SHIFT
+        i = ema >> shift
+        lut = self.lut
+        if i >= len(lut) - 1:
+            return lut[-1]
+        low = lut[i]
+        return low + (((lut[i + 1] - low) * (ema & ((1 << shift) - 1))) >> shift)
+
+    def read(self):
+        """
+        Sample and convert
+
+        Returns:
+            (filtered ADC code, ppm)
+        """
+        ema = self.sample()
+        if self._calibrate:
+            self._calibration_step(ema)
+        return ema >> EMA_SCALE_SHIFT, self.ppm10(ema) / PPM_SCALE
+
+    # R0 calibration (clean air)
+
+    def calibrate(self, reads):
+        """Average Rs over the next reads and derive R0 from the clean air ratio"""
+        self._calibrate = reads
+        self._rs_sum = 0.0
+        self._rs_count = 0
+
+    @property
+    def calibrating(self):
+        return self._calibrate > 0
+
+    def _calibration_step(self, ema):
+        rs = self.resistance(ema >> EMA_SCALE_SHIFT)
+        if rs is not None:
+            self._rs_sum += rs
+            self._rs_count += 1
+        self._calibrate -= 1
+        if not self._calibrate and self._rs_count:
+            self.set_r0(self._rs_sum / self._rs_count / self.curve[2])
+            print('Gas sensor R0 calibrated: %.2f kOhm' % self.r0)
+
+
+class Mq7Heater:
+    """
+    MQ-7 heater cycle on a PWM pin (logic-level MOSFET)
+
+    Args:
+        pwm: machine.PWM of the heater
+        high_ms: Cleaning phase at full voltage
+        low_ms: Measurement phase at the low duty
+        low_duty: PWM duty (0-1023) giving ~1.4 V average
+        window_ms: End of the low phase where CO is read
+    """
+
+    def __init__(self, pwm, high_ms=60000, low_ms=90000, low_duty=286, window_ms=5000):
+        self.pwm = pwm
+        self.high_ms = high_ms
+        self.low_ms = low_ms
+        self.low_duty = low_duty
+        self.window_ms = window_ms
+        self.high = True
+        self.since = time.ticks_ms()
+        self.cycles = 0
+        self.pwm.duty(1023)
+
+    def poll(self):
+        """
+        Switch phase when due
+
+        Returns:
+            True while in the measurement window
+        """
+        elapsed = time.ticks_diff(time.ticks_ms(), self.since)
+        if self.high and elapsed >= self.high_ms:
+            self.high = False
+            self.since = time.ticks_add(self.since, self.high_ms)
+            self.pwm.duty(self.low_duty)
+            elapsed -= self.high_ms
+        elif not self.high and elapsed >= self.low_ms:
+            self.high = True
+            self.since = time.ticks_add(self.since, self.low_ms)
+            self.pwm.duty(1023)
+            self.cycles += 1
+            return False
+        return not self.high and elapsed >= self.low_ms - self.window_ms
+
+    def stats(self):
+        return {'high': self.high, 'cycles': self.cycles}
+
+
+def load_r0(path):
+    """Calibrated R0 per sensor key, {} when never calibrated"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_r0(path, values):
+    with open(path, 'w') as f:
+        json.dump(values, f)
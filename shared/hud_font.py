@@ -0,0 +1,146 @@
+"""
+Pre-rasterized glyph / icon atlas for the 128x64 HUD OLEDs
+
+Glyphs are stored in SSD1306 page format: one byte per column, bit 0 at
+the top, so a glyph drawn on a page boundary is a plain byte copy.
+"""
+
+import numpy as np
+
+GLYPH_WIDTH = 5
+GLYPH_SPACING = 1
+CELL_WIDTH = GLYPH_WIDTH + GLYPH_SPACING
+
+# Classic 5x7 font, HUD subset (lowercase is drawn as uppercase)
+FONT_5X7 = {
+    ' ': (0x00, 0x00, 0x00, 0x00, 0x00),
+    '!': (0x00, 0x00, 0x5F, 0x00, 0x00),
+    '%': (0x23, 0x13, 0x08, 0x64, 0x62),
+    '(': (0x00, 0x1C, 0x22, 0x41, 0x00),
+    ')': (0x00, 0x41, 0x22, 0x1C, 0x00),
+    '+': (0x08, 0x08, 0x3E, 0x08, 0x08),
+    ',': (0x00, 0x50, 0x30, 0x00, 0x00),
+    '-': (0x08, 0x08, 0x08, 0x08, 0x08),
+    '.': (0x00, 0x60, 0x60, 0x00, 0x00),
+    '/': (0x20, 0x10, 0x08, 0x04, 0x02),
+    '0': (0x3E, 0x51, 0x49, 0x45, 0x3E),
+    '1': (0x00, 0x42, 0x7F, 0x40, 0x00),
+    '2': (0x42, 0x61, 0x51, 0x49, 0x46),
+    '3': (0x21, 0x41, 0x45, 0x4B, 0x31),
+    '4': (0x18, 0x14, 0x12, 0x7F, 0x10),
+    '5': (0x27, 0x45, 0x45, 0x45, 0x39),
+    '6': (0x3C, 0x4A, 0x49, 0x49, 0x30),
+    '7': (0x01, 0x71, 0x09, 0x05, 0x03),
+    '8': (0x36, 0x49, 0x49, 0x49, 0x36),
+    '9': (0x06, 0x49, 0x49, 0x29, 0x1E),
+    ':': (0x00, 0x36, 0x36, 0x00, 0x00),
+    '<': (0x08, 0x14, 0x22, 0x41, 0x00),
+    '=': (0x14, 0x14, 0x14, 0x14, 0x14),
+    '>': (0x00, 0x41, 0x22, 0x14, 0x08),
+    '?': (0x02, 0x01, 0x51, 0x09, 0x06),
+    'A': (0x7E, 0x11, 0x11, 0x11, 0x7E),
+    'B': (0x7F, 0x49, 0x49, 0x49, 0x36),
+    'C': (0x3E, 0x41, 0x41, 0x41, 0x22),
+    'D': (0x7F, 0x41, 0x41, 0x22, 0x1C),
+    'E': (0x7F, 0x49, 0x49, 0x49, 0x41),
+    'F': (0x7F, 0x09, 0x09, 0x09, 0x01),
+    'G': (0x3E, 0x41, 0x49, 0x49, 0x7A),
+    'H': (0x7F, 0x08, 0x08, 0x08, 0x7F),
+    'I': (0x00, 0x41, 0x7F, 0x41, 0x00),
+    'J': (0x20, 0x40, 0x41, 0x3F, 0x01),
+    'K': (0x7F, 0x08, 0x14, 0x22, 0x41),
+    'L': (0x7F, 0x40, 0x40, 0x40, 0x40),
+    'M': (0x7F, 0x02, 0x0C, 0x02, 0x7F),
+    'N': (0x7F, 0x04, 0x08, 0x10, 0x7F),
+    'O': (0x3E, 0x41, 0x41, 0x41, 0x3E),
+    'P': (0x7F, 0x09, 0x09, 0x09, 0x06),
+    'Q': (0x3E, 0x41, 0x51, 0x21, 0x5E),
+    'R': (0x7F, 0x09, 0x19, 0x29, 0x46),
+    'S': (0x46, 0x49, 0x49, 0x49, 0x31),
+    'T': (0x01, 0x01, 0x7F, 0x01, 0x01),
+    'U': (0x3F, 0x40, 0x40, 0x40, 0x3F),
+    'V': (0x1F, 0x20, 0x40, 0x20, 0x1F),
+    'W': (0x3F, 0x40, 0x38, 0x40, 0x3F),
+    'X': (0x63, 0x14, 0x08, 0x14, 0x63),
+    'Y': (0x07, 0x08, 0x70, 0x08, 0x07),
+    'Z': (0x61, 0x51, 0x49, 0x45, 0x43),
+    '°': (0x00, 0x06, 0x09, 0x09, 0x06),
+}
+
+# 8x8 icons, same column format
+ICONS = {
+    'temp': (0x00, 0x00, 0xE0, 0xFF, 0xFF, 0xE0, 0x00, 0x00),
+    'humidity': (0x00, 0x30, 0x7C, 0xFE, 0xFE, 0x7C, 0x30, 0x00),
+    'air': (0x24, 0x24, 0x12, 0x12, 0x24, 0x24, 0x12, 0x12),
+    'battery': (0x7E, 0x42, 0x42, 0x42, 0x42, 0x42, 0x7E, 0x18),
+    'battery_full': (0x7E, 0x7E, 0x7E, 0x7E, 0x7E, 0x7E, 0x7E, 0x18),
+    'warning': (0xC0, 0xB0, 0x8C, 0xBF, 0x8C, 0xB0, 0xC0, 0x00),
+    'target': (0x3C, 0x42, 0x81, 0x99, 0x99, 0x81, 0x42, 0x3C),
+}
+
+
+class GlyphAtlas:
+    """
+    Glyph cells packed in one (n, cell_width) uint8 array
+
+    Text is converted to atlas indices once per distinct string, then
+    blitted with a single fancy-indexing copy.
+    """
+
+    def __init__(self, glyphs, cell_width=CELL_WIDTH, pages=1):
+        self.cell_width = cell_width
+        self.pages = pages
+        self.index = {}
+        cells = np.zeros((len(glyphs) + 1, pages, cell_width), dtype=np.uint8)
+        for i, (char, columns) in enumerate(glyphs.items(), start=1):
+            self.index[char] = i
+            column_array = np.asarray(columns, dtype=np.uint8).reshape(pages, -1)
+            cells[i, :, :column_array.shape[1]] = column_array
+        self.cells = cells
+        self._strings = {}
+
+    def encode(self, text):
+        """Atlas indices of a string (cached; unknown characters are blank)"""
+        codes = self._strings.get(text)
+        if codes is None:
+            if len(self._strings) > 512:
+                self._strings.clear()
+            codes = np.fromiter((self.index.get(c, self.index.get(c.upper(), 0)) for c in text),
+                                dtype=np.intp, count=len(text))
+            self._strings[text] = codes
+        return codes
+
+    def render(self, text):
+        """Pre-rendered strip of a string: (pages, len(text) * cell_width)"""
+        codes = self.encode(text)
+        strip = self.cells[codes]  # (n, pages, cell)
+        return strip.transpose(1, 0, 2).reshape(self.pages, -1)
+
+    @classmethod
+    def from_font(cls, path, size, chars=None):
+        """
+        Rasterize a TrueType/bitmap font with Pillow (done once at startup)
+
+        Args:
+            path: Font file
+            size: Pixel size
+            chars: Characters to include (default: FONT_5X7 keys)
+        """
+        from PIL import Image, ImageDraw, ImageFont
+
+        font = ImageFont.truetype(str(path), size)
+        chars = chars or ''.join(FONT_5X7)
+        width = max(int(font.getlength(c)) for c in chars) + 1
+        pages = (size + 7) // 8
+        glyphs = {}
+        for char in chars:
+            image = Image.new('1', (width, pages * 8))
+            ImageDraw.Draw(image).text((0, 0), char, font=font, fill=1)
+            bits = np.array(image, dtype=np.uint8).reshape(pages, 8, width)
+            weights = (1 << np.arange(8, dtype=np.uint16)).reshape(1, 8, 1)
+            glyphs[char] = (bits * weights).sum(axis=1).astype(np.uint8).ravel()
+        return cls(glyphs, cell_width=width, pages=pages)
+
+
+DEFAULT_ATLAS = GlyphAtlas(FONT_5X7)
+ICON_ATLAS = GlyphAtlas(ICONS, cell_width=8)
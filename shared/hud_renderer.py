@@ -0,0 +1,318 @@
+"""
+Dirty-region HUD renderer for the 128x64 SSD1306 eye displays
+
+The framebuffer is kept in the controller's native page layout
+(8 pages x 128 columns, one byte = 8 vertical pixels). flush() diffs it
+against a shadow copy of what the panel shows and only pushes the
+changed column bands of each page over I2C.
+"""
+
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from constants import OLED_WIDTH, OLED_HEIGHT, OLED_I2C_ADDRESS
+from hud_font import DEFAULT_ATLAS, ICON_ATLAS
+
+# Per-transaction cost of a band: I2C address byte + control byte +
+# column/page address commands (0x21 a b, 0x22 c d) in their own transaction
+BAND_OVERHEAD = 1 + 1 + 6 + 1 + 1
+
+
+class SSD1306Bus:
+    """
+    Raw SSD1306 access over I2C (smbus2)
+
+    Args:
+        bus: I2C bus number (1 on Raspberry Pi)
+        address: Display address
+        width, height: Panel size
+    """
+
+    INIT_SEQUENCE = (
+        0xAE,             # display off
+        0xD5, 0x80,       # clock divide
+        0xA8, 0x3F,       # multiplex 64
+        0xD3, 0x00,       # display offset
+        0x40,             # start line 0
+        0x8D, 0x14,       # charge pump on
+        0x20, 0x00,       # horizontal addressing (needed for window writes)
+        0xA1, 0xC8,       # segment remap / COM scan direction
+        0xDA, 0x12,       # COM pins
+        0x81, 0xCF,       # contrast
+        0xD9, 0xF1,       # precharge
+        0xDB, 0x40,       # VCOM detect
+        0xA4, 0xA6,       # resume RAM content, normal (not inverted)
+        0xAF,             # display on
+    )
+
+    def __init__(self, bus=1, address=OLED_I2C_ADDRESS, width=OLED_WIDTH, height=OLED_HEIGHT):
+        from smbus2 import SMBus, i2c_msg
+
+        self._i2c_msg = i2c_msg
+        self.bus = SMBus(bus)
+        self.address = address
+        self.width = width
+        self.height = height
+        self.bytes_sent = 0
+        self.transactions = 0
+        self.command(*self.INIT_SEQUENCE)
+
+    def command(self, *cmd):
+        self._write(bytes((0x00,) + cmd))
+
+    def data(self, buf):
+        self._write(b'\x40' + bytes(buf))
+
+    def set_window(self, col0, col1, page0, page1):
+        self.command(0x21, col0, col1, 0x22, page0, page1)
+
+    def _write(self, payload):
+        self.bus.i2c_rdwr(self._i2c_msg.write(self.address, payload))
+        self.bytes_sent += len(payload) + 1
+        self.transactions += 1
+
+    def close(self):
+        self.command(0xAE)
+        self.bus.close()
+
+
+class CountingBus:
+    """Bus stand-in that only counts traffic (benchmarks, dev boxes)"""
+
+    def __init__(self, width=OLED_WIDTH, height=OLED_HEIGHT):
+        self.width = width
+        self.height = height
+        self.bytes_sent = 0
+        self.transactions = 0
+
+    def command(self, *cmd):
+        self.bytes_sent += len(cmd) + 2
+        self.transactions += 1
+
+    def data(self, buf):
+        self.bytes_sent += len(buf) + 2
+        self.transactions += 1
+
+    def set_window(self, col0, col1, page0, page1):
+        self.command(0x21, col0, col1, 0x22, page0, page1)
+
+    def close(self):
+        pass
+
+
+class HudRenderer:
+    """
+    1-bit page framebuffer with dirty-band flushing
+
+    Args:
+        bus: SSD1306Bus (or CountingBus)
+        atlas: GlyphAtlas for text
+        merge_gap: Unchanged columns bridged inside one band (cheaper than
+                   a new window command when smaller than BAND_OVERHEAD)
+    """
+
+    def __init__(self, bus, atlas=DEFAULT_ATLAS, icons=ICON_ATLAS, merge_gap=BAND_OVERHEAD):
+        self.bus = bus
+        self.width = bus.width
+        self.pages = bus.height // 8
+        self.atlas = atlas
+        self.icons = icons
+        self.merge_gap = merge_gap
+        self.fb = np.zeros((self.pages, self.width), dtype=np.uint8)
+        # Unknown panel content at start: force a full first flush
+        self.shadow = np.full_like(self.fb, 0xFF)
+        self._row_bits = (1 << np.arange(8, dtype=np.uint16)).astype(np.uint8)
+        self.frames = 0
+        self.bands = 0
+
+    # Drawing
+
+    def clear(self):
+        self.fb.fill(0)
+
+    def clear_region(self, page, x, width, pages=1):
+        self.fb[page:page + pages, x:x + width] = 0
+
+    def draw_text(self, page, x, text, invert=False):
+        """Blit a string from the atlas at a page-aligned row"""
+        strip = self.atlas.render(text)
+        h, w = strip.shape
+        w = min(w, self.width - x)
+        if w <= 0 or page >= self.pages:
+            return 0
+        target = self.fb[page:page + h, x:x + w]
+        target[:] = ~strip[:target.shape[0], :w] if invert else strip[:target.shape[0], :w]
+        return w
+
+    def draw_icon(self, page, x, name):
+        cell = self.icons.cells[self.icons.index[name]]
+        w = min(cell.shape[1], self.width - x)
+        self.fb[page:page + cell.shape[0], x:x + w] = cell[:self.pages - page, :w]
+        return w
+
+    def set_pixel(self, x, y, on=True):
+        if 0 <= x < self.width and 0 <= y < self.pages * 8:
+            if on:
+                self.fb[y >> 3, x] |= self._row_bits[y & 7]
+            else:
+                self.fb[y >> 3, x] &= ~self._row_bits[y & 7]
+
+    def hline(self, x0, x1, y):
+        if not 0 <= y < self.pages * 8:
+            return
+        x0, x1 = max(0, min(x0, x1)), min(self.width - 1, max(x0, x1))
+        self.fb[y >> 3, x0:x1 + 1] |= self._row_bits[y & 7]
+
+    def vline(self, x, y0, y1):
+        if not 0 <= x < self.width:
+            return
+        y0, y1 = max(0, min(y0, y1)), min(self.pages * 8 - 1, max(y0, y1))
+        for page in range(y0 >> 3, (y1 >> 3) + 1):
+            top = max(y0 - page * 8, 0)
+            bottom = min(y1 - page * 8, 7)
+            self.fb[page, x] |= ((0xFF << top) & (0xFF >> (7 - bottom))) & 0xFF
+
+    def rect(self, x0, y0, x1, y1):
+        self.hline(x0, x1, y0)
+        self.hline(x0, x1, y1)
+        self.vline(x0, y0, y1)
+        self.vline(x1, y0, y1)
+
+    # Output
+
+    def dirty_bands(self):
+        """
+        Changed regions as (page, col0, col1) inclusive, with nearby
+        runs merged when bridging them is cheaper than a new window
+        """
+        changed = self.fb != self.shadow
+        bands = []
+        for page in np.flatnonzero(changed.any(axis=1)):
+            cols = np.flatnonzero(changed[page])
+            breaks = np.flatnonzero(np.diff(cols) > self.merge_gap)
+            starts = np.concatenate(([cols[0]], cols[breaks + 1]))
+            ends = np.concatenate((cols[breaks], [cols[-1]]))
+            bands.extend((int(page), int(s), int(e)) for s, e in zip(starts, ends))
+        return bands
+
+    def flush(self):
+        """
+        Push changed bands to the panel
+
+        Returns:
+            Number of bytes put on the bus
+        """
+        before = self.bus.bytes_sent
+        bands = self.dirty_bands()
+        for page, col0, col1 in bands:
+            self.bus.set_window(col0, col1, page, page)
+            self.bus.data(self.fb[page, col0:col1 + 1].tobytes())
+        if bands:
+            self.shadow[:] = self.fb
+        self.frames += 1
+        self.bands += len(bands)
+        return self.bus.bytes_sent - before
+
+    def flush_full(self):
+        """Push the whole framebuffer (after a panel reset)"""
+        before = self.bus.bytes_sent
+        self.bus.set_window(0, self.width - 1, 0, self.pages - 1)
+        self.bus.data(self.fb.tobytes())
+        self.shadow[:] = self.fb
+        return self.bus.bytes_sent - before
+
+    def full_frame_bytes(self):
+        """Bus cost of a full refresh, for comparison"""
+        return self.pages * self.width + BAND_OVERHEAD
+
+
+class StatusHud:
+    """
+    Standard eye HUD layout
+
+    page 0    : temperature / humidity / air quality
+    pages 1-6 : YOLO boxes (camera coordinates scaled to the panel)
+    page 7    : battery / detection count
+    """
+
+    def __init__(self, renderer, camera_resolution=(640, 480)):
+        self.r = renderer
+        self.set_camera_resolution(camera_resolution)
+        self._last_text = {}
+
+    def set_camera_resolution(self, camera_resolution):
+        """Coordinate space of the YOLO boxes (camera resized at runtime)"""
+        self.sx = self.r.width / camera_resolution[0]
+        self.sy = self.r.pages * 8 / camera_resolution[1]
+
+    def _text(self, key, page, x, text, width):
+        # Only touch the framebuffer when the string changed
+        if self._last_text.get(key) != text:
+            self.r.clear_region(page, x, width)
+            self.r.draw_text(page, x, text)
+            self._last_text[key] = text
+
+    def draw(self, state):
+        r = self.r
+        if not self._last_text:
+            r.draw_icon(0, 0, 'temp')
+            r.draw_icon(0, 44, 'humidity')
+            r.draw_icon(0, 88, 'air')
+            r.draw_icon(7, 0, 'battery')
+            r.draw_icon(7, 88, 'target')
+
+        temp = state.get('temperature')
+        humidity = state.get('humidity')
+        aqi = state.get('aqi')
+        battery = state.get('battery')
+        self._text('temp', 0, 10, '--' if temp is None else f'{temp:.1f}°', 32)
+        self._text('hum', 0, 54, '--' if humidity is None else f'{humidity:.0f}%', 30)
+        self._text('aqi', 0, 98, '--' if aqi is None else f'AQ{aqi}', 30)
+        self._text('bat', 7, 10, '--' if battery is None else f'{battery:.0f}%', 30)
+
+        # Detection area is redrawn every frame, flush() sends only what moved
+        r.clear_region(1, 0, r.width, r.pages - 2)
+        boxes = state.get('boxes') or ()
+        top, bottom = 8, (r.pages - 1) * 8 - 1
+        for x0, y0, x1, y1 in boxes:
+            r.rect(int(x0 * self.sx), max(top, int(y0 * self.sy)),
+                   int(x1 * self.sx), min(bottom, int(y1 * self.sy)))
+        self._text('count', 7, 98, str(len(boxes)), 30)
+
+
+class HudStats:
+    """Bytes on bus, achieved FPS and overlay correction over a sliding window"""
+
+    def __init__(self, window=100):
+        self.times = deque(maxlen=window)
+        self.bytes = deque(maxlen=window)
+        self.corrections = deque(maxlen=window)
+
+    def record(self, nbytes, correction=None):
+        """
+        Args:
+            nbytes: Bytes flushed this frame
+            correction: Reprojector.correction() applied this frame (None = none)
+        """
+        self.times.append(time.monotonic())
+        self.bytes.append(nbytes)
+        self.corrections.append(correction)
+
+    def snapshot(self):
+        if len(self.times) < 2:
+            return {'fps': 0.0, 'bytes_per_frame': 0.0}
+        span = self.times[-1] - self.times[0]
+        snapshot = {
+            'fps': round((len(self.times) - 1) / span, 1) if span > 0 else 0.0,
+            'bytes_per_frame': round(sum(self.bytes) / len(self.bytes), 1),
+        }
+        applied = [c for c in self.corrections if c]
+        if applied:
+            snapshot['corrected'] = round(len(applied) / len(self.corrections), 2)
+            snapshot['shift_px'] = round(sum(math.hypot(c['dx'], c['dy']) for c in applied) / len(applied), 1)
+            snapshot['max_shift_px'] = round(max(math.hypot(c['dx'], c['dy']) for c in applied), 1)
+            snapshot['overlay_age_ms'] = round(sum(c['age_ms'] for c in applied) / len(applied), 1)
+        return snapshot
@@ -0,0 +1,144 @@
+"""
+Late-latching of the HUD overlay on head orientation
+
+YOLO boxes come back from the Pi 5 100+ ms after their frame was
+captured; meanwhile the head kept turning. Right before each OLED
+flush the boxes are shifted (yaw, pitch) and rotated (roll) by the head
+rotation between the frame capture and now, so the overlay lag is the
+HUD loop period, not the inference round trip.
+
+Orientation samples (BNO055 via helmet/orientation) are stamped with the
+eye's receive time, like the frame capture timestamps, so the transport
+delay cancels out.
+"""
+
+import math
+import time
+from collections import deque
+
+# Raspberry Pi camera module v2 field of view (degrees)
+DEFAULT_FOV = (62.2, 48.8)
+
+
+def angle_delta(a, b):
+    """b - a in degrees, wrapped to [-180, 180)"""
+    return (b - a + 180.0) % 360.0 - 180.0
+
+
+class OrientationHistory:
+    """
+    Recent (ts, heading, roll, pitch) samples
+
+    Args:
+        span: Seconds of history kept
+    """
+
+    def __init__(self, span=2.0):
+        self.span = span
+        self.samples = deque()
+
+    def add(self, heading, roll, pitch, ts=None):
+        ts = time.time() if ts is None else ts
+        self.samples.append((ts, heading, roll, pitch))
+        while self.samples and ts - self.samples[0][0] > self.span:
+            self.samples.popleft()
+
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def at(self, ts):
+        """
+        Orientation at a past time, linearly interpolated
+
+        Returns:
+            (heading, roll, pitch), or None if ts is outside the history
+        """
+        samples = self.samples
+        if not samples or ts < samples[0][0]:
+            return None
+        for i in range(len(samples) - 1, -1, -1):
+            t0, h0, r0, p0 = samples[i]
+            if t0 <= ts:
+                if i == len(samples) - 1:
+                    return h0, r0, p0
+                t1, h1, r1, p1 = samples[i + 1]
+                k = (ts - t0) / (t1 - t0) if t1 > t0 else 0.0
+                return ((h0 + k * angle_delta(h0, h1)) % 360.0,
+                        r0 + k * (r1 - r0),
+                        p0 + k * (p1 - p0))
+        return None
+
+
+class Reprojector:
+    """
+    Moves camera-space boxes by the head rotation since their capture
+
+    Args:
+        camera_resolution: (width, height) of the boxes' coordinate space
+        fov: Camera (horizontal, vertical) field of view in degrees
+        max_age: Boxes older than this (seconds) are not corrected
+    """
+
+    def __init__(self, camera_resolution, fov=DEFAULT_FOV, max_age=1.0):
+        self.fov = fov
+        self.set_camera_resolution(camera_resolution)
+        self.max_age = max_age
+        self.last = None
+
+    def set_camera_resolution(self, camera_resolution):
+        """Coordinate space of the boxes (camera resized at runtime)"""
+        self.width, self.height = camera_resolution
+        self.px_per_deg_x = self.width / self.fov[0]
+        self.px_per_deg_y = self.height / self.fov[1]
+
+    def correction(self, history, capture_ts, now=None):
+        """
+        Shift to apply to boxes captured at capture_ts
+
+        Returns:
+            Dict dx / dy (camera pixels), droll (degrees), age_ms,
+            or None when no correction applies
+        """
+        now = time.time() if now is None else now
+        latest = history.latest()
+        then = history.at(capture_ts) if capture_ts is not None else None
+        if latest is None or then is None or now - capture_ts > self.max_age:
+            self.last = None
+            return None
+
+        _, heading, roll, pitch = latest
+        yaw = angle_delta(then[0], heading)
+        # Turning right / looking up moves the scene left / down in the view
+        self.last = {
+            'dx': -yaw * self.px_per_deg_x,
+            'dy': (pitch - then[2]) * self.px_per_deg_y,
+            'droll': roll - then[1],
+            'age_ms': (now - capture_ts) * 1000.0,
+        }
+        return self.last
+
+    def apply(self, boxes, correction):
+        """
+        Corrected copies of (x0, y0, x1, y1) boxes
+
+        Roll rotates each box centre around the image centre; boxes stay
+        axis-aligned (the panel is too small for rotated outlines).
+        """
+        if not correction or not boxes:
+            return list(boxes or ())
+        cx, cy = self.width / 2.0, self.height / 2.0
+        angle = math.radians(-correction['droll'])
+        cos, sin = math.cos(angle), math.sin(angle)
+        dx, dy = correction['dx'], correction['dy']
+
+        out = []
+        for x0, y0, x1, y1 in boxes:
+            bx, by = (x0 + x1) / 2.0 - cx, (y0 + y1) / 2.0 - cy
+            nx = cx + bx * cos - by * sin + dx
+            ny = cy + bx * sin + by * cos + dy
+            hw, hh = (x1 - x0) / 2.0, (y1 - y0) / 2.0
+            if nx + hw < 0 or nx - hw >= self.width or ny + hh < 0 or ny - hh >= self.height:
+                continue  # rotated out of view
+            out.append((max(0.0, nx - hw), max(0.0, ny - hh),
+                        min(self.width - 1.0, nx + hw), min(self.height - 1.0, ny + hh)))
+        return out
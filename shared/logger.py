@@ -1,50 +1,311 @@
 ﻿"""
 Centralized logging configuration
+
+By default every record goes through a bounded in-memory queue: the
+calling thread (capture loop, HUD loop...) only enqueues, a background
+listener thread formats and writes. Files are rotated by size (or by
+time) and can be written as text, compact JSON lines or packed binary
+records. Repeated messages from the same call site are rate limited
+before they are even queued.
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import multiprocessing.util
+import os
+import queue
+import struct
 import sys
+import time
 from pathlib import Path
 
-def setup_logger(name: str, log_file: str = None, level=logging.INFO):
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Binary record: payload length u32 | created f64 | levelno u8 | name length u16 | name | message
+BINARY_HEADER = '<IdBH'
+BINARY_HEADER_SIZE = struct.calcsize(BINARY_HEADER)
+
+_listeners = []
+_handlers = []
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One compact JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'lvl': record.levelname,
+            'name': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), ensure_ascii=False)
+
+
+class BinaryFormatter(logging.Formatter):
+    """Packed binary records (see BINARY_HEADER), read back with read_binary_log()"""
+
+    def format(self, record):
+        name = record.name.encode('utf-8')
+        message = record.getMessage()
+        if record.exc_info:
+            message += '\n' + self.formatException(record.exc_info)
+        message = message.encode('utf-8')
+        length = BINARY_HEADER_SIZE - 4 + len(name) + len(message)
+        return struct.pack(BINARY_HEADER, length, record.created, record.levelno, len(name)) + name + message
+
+
+class _BinaryFileMixin:
+    """Byte-oriented stream for BinaryFormatter output"""
+
+    def _open(self):
+        return open(self.baseFilename, 'ab')
+
+    def emit(self, record):
+        try:
+            data = self.format(record)
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(data)
+        except Exception:
+            self.handleError(record)
+
+
+class BinaryRotatingFileHandler(_BinaryFileMixin, logging.handlers.RotatingFileHandler):
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        if self.maxBytes <= 0:
+            return False
+        pos = self.stream.tell()
+        return pos > 0 and pos + len(self.format(record)) >= self.maxBytes
+
+
+class BinaryTimedRotatingFileHandler(_BinaryFileMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+def read_binary_log(path):
+    """
+    Iterate over the records of a binary log file
+
+    Yields:
+        Dictionaries with ts, levelno, level, name, msg
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + BINARY_HEADER_SIZE <= len(data):
+        length, created, levelno, name_len = struct.unpack_from(BINARY_HEADER, data, offset)
+        start = offset + BINARY_HEADER_SIZE
+        end = offset + 4 + length
+        if end > len(data):
+            break  # truncated last record (crash while writing)
+        yield {
+            'ts': created,
+            'levelno': levelno,
+            'level': logging.getLevelName(levelno),
+            'name': data[start:start + name_len].decode('utf-8', 'replace'),
+            'msg': data[start + name_len:end].decode('utf-8', 'replace'),
+        }
+        offset = end
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limit records per call site (file + line)
+
+    A failing sensor logged on every loop iteration produces `burst`
+    records per `interval`; the rest are counted and the count is
+    appended to the next record that passes.
+
+    Args:
+        interval: Window length in seconds
+        burst: Records allowed per call site and window
+    """
+
+    def __init__(self, interval=10.0, burst=5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.suppressed = 0
+        self._sites = {}
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        site = self._sites.get(key)
+        if site is None or now - site[0] >= self.interval:
+            skipped = site[2] if site else 0
+            self._sites[key] = [now, 1, 0]
+            if skipped:
+                record.msg = f"{record.msg} [{skipped} similar suppressed]"
+            return True
+        if site[1] < self.burst:
+            site[1] += 1
+            return True
+        site[2] += 1
+        self.suppressed += 1
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller
+
+    Records are queued as-is (formatting happens in the listener thread);
+    when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _make_file_handler(log_file, fmt, max_bytes, backup_count, when):
+    log_path = Path(log_file)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if fmt == 'binary':
+        if when:
+            handler = BinaryTimedRotatingFileHandler(log_file, when=when, backupCount=backup_count, delay=True)
+        else:
+            handler = BinaryRotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+        handler.setFormatter(BinaryFormatter())
+        return handler
+
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(log_file, when=when, backupCount=backup_count,
+                                                            encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                                       encoding='utf-8')
+    handler.setFormatter(JsonLineFormatter() if fmt == 'jsonl' else logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+    return handler
+
+
+def _restart_listeners():
+    # A forked child (e.g. the eye frame sender) has no listener thread
+    for entry in _listeners:
+        entry['handler'].queue = queue.Queue(entry['queue_size'])
+        entry['listener'] = logging.handlers.QueueListener(entry['handler'].queue, *entry['targets'],
+                                                           respect_handler_level=True)
+        entry['listener'].start()
+
+
+def _flush_at_process_exit(handler):
+    # multiprocessing children leave through os._exit(): atexit does not run
+    multiprocessing.util.Finalize(None, _stop_listeners, exitpriority=0)
+
+
+def _stop_listeners():
+    for entry in _listeners:
+        if entry['listener']._thread is None:
+            continue  # already stopped
+        entry['listener'].stop()
+        for target in entry['targets']:
+            target.flush()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listeners)
+atexit.register(_stop_listeners)
+
+
+def setup_logger(name: str, log_file: str = None, level=logging.INFO, fmt: str = 'text',
+                 max_bytes: int = 1024 * 1024, backup_count: int = 3, when: str = None,
+                 queued: bool = True, queue_size: int = 10000, rate_limit: float = 10.0,
+                 burst: int = 5):
     """
     Configure logger with console and file handlers
-    
+
+    The handlers are also installed on the root logger (if it has none),
+    so module loggers (logging.getLogger(__name__)) share them. The
+    named logger does not propagate to root.
+
     Args:
         name: Logger name (usually __name__)
         log_file: Optional log file path
         level: Logging level
-    
+        fmt: File format: 'text', 'jsonl' or 'binary'
+        max_bytes: Size rotation threshold (0 = no size rotation)
+        backup_count: Rotated files kept
+        when: Time rotation instead of size ('midnight', 'H', ...)
+        queued: Write from a background thread (False = synchronous)
+        queue_size: Records buffered before new ones are dropped
+        rate_limit: Rate-limit window per call site in seconds (0 = off)
+        burst: Records allowed per call site and window
+
     Returns:
         Configured logger instance
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # Avoid duplicate handlers
     if logger.handlers:
         return logger
-    
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
-    
-    # Format
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler (optional)
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+    targets = [console_handler]
+
+    # File handler (optional, rotated)
     if log_file:
-        log_path = Path(log_file)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        file_handler = logging.FileHandler(log_file)
+        file_handler = _make_file_handler(log_file, fmt, max_bytes, backup_count, when)
         file_handler.setLevel(level)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+        targets.append(file_handler)
+
+    if queued:
+        handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+        listener = logging.handlers.QueueListener(handler.queue, *targets, respect_handler_level=True)
+        listener.start()
+        _listeners.append({'handler': handler, 'listener': listener, 'targets': targets,
+                           'queue_size': queue_size})
+        multiprocessing.util.register_after_fork(handler, _flush_at_process_exit)
+        handlers = [handler]
+    else:
+        handlers = targets
+
+    for handler in handlers:
+        if rate_limit:
+            handler.addFilter(RateLimitFilter(rate_limit, burst))
+        logger.addHandler(handler)
+        _handlers.append(handler)
+
+    # Own handlers: records must not reach root too (printed twice, or
+    # written into the file of the logger that configured root)
+    logger.propagate = False
+    root = logging.getLogger()
+    if not root.handlers:
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+
     return logger
+
+
+def logging_stats():
+    """Dropped (queue full) and suppressed (rate limit) record counts"""
+    return {
+        'dropped': sum(getattr(h, 'dropped', 0) for h in _handlers),
+        'suppressed': sum(getattr(f, 'suppressed', 0) for h in _handlers for f in h.filters),
+    }
@@ -0,0 +1,198 @@
+"""
+Node instrumentation: counters, gauges and fixed-bucket histograms
+
+Cheap enough for the hot paths (sensor pass, 20 FPS HUD frame, YOLO
+batch): an observation is a scan of a dozen bucket bounds and two
+additions, without allocation. Counts kept elsewhere (stats() dicts of
+the backlog, MQTT client, frame ring...) are read by collectors, only
+when a snapshot is taken.
+
+Every node keeps one Metrics registry and publishes its snapshot() on
+system/status every few seconds; the Pi 5 aggregates the snapshots into
+a Prometheus text endpoint (backpack/pi5_server/metrics_exporter.py).
+Snapshot (compact JSON, metric names may carry Prometheus labels):
+    {"node": "helmet", "up": 812.4,
+     "c": {"mqtt_published": 1650},
+     "g": {"backlog_frames": 0},
+     "h": {"i2c_read_ms{sensor=\"orientation\"}": [[bounds], [counts], sum]}}
+A histogram has one count per bound (value <= bound, not cumulative)
+plus a last count above the last bound.
+
+Keep this file MicroPython compatible: no typing, no dataclasses.
+"""
+
+import time
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    def ticks_us():
+        return time.perf_counter_ns() // 1000
+
+    def ticks_diff(new, old):
+        return new - old
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+_clock = getattr(time, 'monotonic', time.time)
+
+# Bucket upper bounds (milliseconds) for durations from an I2C read to a YOLO batch
+LATENCY_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def now_us():
+    """Start mark for Histogram.since()"""
+    return ticks_us()
+
+
+def metric_key(name, labels=None):
+    """'name{key="value",...}' (labels sorted), or name alone"""
+    if not labels:
+        return name
+    return name + '{' + ','.join('%s="%s"' % (key, labels[key]) for key in sorted(labels)) + '}'
+
+
+class Counter:
+    """Monotonic count"""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def set(self, total):
+        """Total counted elsewhere (collectors)"""
+        self.value = total
+
+
+class Gauge:
+    """Last value"""
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    """
+    Fixed-bucket distribution
+
+    Args:
+        bounds: Increasing bucket upper bounds
+    """
+
+    def __init__(self, bounds=LATENCY_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+
+    def since(self, start_us):
+        """
+        Observe the milliseconds elapsed since a now_us() mark
+
+        Returns:
+            The elapsed milliseconds
+        """
+        ms = ticks_diff(ticks_us(), start_us) / 1000
+        self.observe(ms)
+        return ms
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class Metrics:
+    """
+    Metric registry of one node
+
+    Args:
+        node: Node name (label of every metric on the Pi 5)
+    """
+
+    def __init__(self, node):
+        self.node = node
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.collectors = []
+        self.started = _clock()
+
+    def counter(self, name, labels=None):
+        key = metric_key(name, labels)
+        metric = self.counters.get(key)
+        if metric is None:
+            metric = self.counters[key] = Counter()
+        return metric
+
+    def gauge(self, name, labels=None):
+        key = metric_key(name, labels)
+        metric = self.gauges.get(key)
+        if metric is None:
+            metric = self.gauges[key] = Gauge()
+        return metric
+
+    def histogram(self, name, labels=None, bounds=LATENCY_MS):
+        key = metric_key(name, labels)
+        metric = self.histograms.get(key)
+        if metric is None:
+            metric = self.histograms[key] = Histogram(bounds)
+        return metric
+
+    def collect(self, collector):
+        """Register a collector(metrics) run before every snapshot"""
+        self.collectors.append(collector)
+
+    def set_gauges(self, prefix, stats, labels=None):
+        """Numeric values of a flat stats() dict as '<prefix>_<key>' gauges"""
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                self.gauge(prefix + '_' + key, labels).set(value)
+
+    def snapshot(self):
+        """Compact dict published on system/status"""
+        for collector in self.collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                print('Metrics collector failed:', e)
+        return {
+            'node': self.node,
+            'up': round(_clock() - self.started, 1),
+            'c': {key: metric.value for key, metric in self.counters.items()},
+            'g': {key: metric.value for key, metric in self.gauges.items()},
+            'h': {key: [list(metric.bounds), list(metric.counts), round(metric.sum, 3)]
+                  for key, metric in self.histograms.items()},
+        }
+
+
+async def report(publish, topic, metrics, interval):
+    """
+    Publish a snapshot every interval seconds (never returns)
+
+    Args:
+        publish: publish(topic, dict) of the node's MQTT client
+        topic: system/status
+        metrics: Metrics registry
+        interval: Seconds between snapshots
+    """
+    while True:
+        await asyncio.sleep(interval)
+        publish(topic, metrics.snapshot())
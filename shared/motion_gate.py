@@ -0,0 +1,134 @@
+"""
+Motion gate for the eye cameras
+
+A standing trooper sees near-identical frames most of the time; each
+one still costs WiFi airtime and a Pi 5 inference. Before encoding, the
+eye compares a cheap thumbnail of the frame (green channel, strided
+then block-averaged) with the thumbnail of what the Pi 5 last received,
+and decides to:
+- skip the frame (the Pi 5 keeps its detections),
+- ship only the changed region (ROI crop, see frame_transport.pack_roi),
+- ship the full frame (large change, or a forced keyframe).
+
+Keyframes bound how long a missed change (e.g. a ROI frame replaced on
+the Pi 5 before inference) can go unseen.
+"""
+
+import time
+
+import numpy as np
+
+GATE_SKIP = 'skip'
+GATE_KEYFRAME = 'key'
+GATE_FULL = 'full'
+GATE_ROI = 'roi'
+
+
+class MotionGate:
+    """
+    Per-frame ship / skip decision from a thumbnail difference
+
+    Args:
+        step: Pixel stride of the first subsampling
+        cell: Subsampled pixels averaged per thumbnail cell (side)
+        pixel_threshold: Mean level change (0-255) making a cell "changed"
+        threshold: Fraction of changed cells needed to ship a frame
+        keyframe_interval: Seconds between forced full frames
+        roi_margin: Cells added around the changed region
+        roi_max: Above this fraction of the frame, ship the full frame
+    """
+
+    def __init__(self, step=4, cell=4, pixel_threshold=18, threshold=0.01,
+                 keyframe_interval=2.0, roi_margin=1, roi_max=0.5):
+        self.step = step
+        self.cell = cell
+        self.pixel_threshold = pixel_threshold
+        self.threshold = threshold
+        self.keyframe_interval = keyframe_interval
+        self.roi_margin = roi_margin
+        self.roi_max = roi_max
+
+        self.reference = None
+        self.last_keyframe = None
+        self.last_change = 0.0
+        self.counts = {GATE_SKIP: 0, GATE_KEYFRAME: 0, GATE_FULL: 0, GATE_ROI: 0}
+        self.captured_pixels = 0
+        self.shipped_pixels = 0
+
+    def thumbnail(self, frame):
+        """Green (or luma) channel, strided then averaged over cell x cell blocks"""
+        plane = frame[::self.step, ::self.step, 1] if frame.ndim == 3 else frame[::self.step, ::self.step]
+        rows = plane.shape[0] // self.cell
+        cols = plane.shape[1] // self.cell
+        blocks = plane[:rows * self.cell, :cols * self.cell].reshape(rows, self.cell, cols, self.cell)
+        return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+    def update(self, frame, now=None):
+        """
+        Decide what to ship for a captured frame
+
+        Args:
+            frame: HxWxC (or HxW luma) uint8 array
+            now: Monotonic time (defaults to time.monotonic())
+
+        Returns:
+            (kind, box): kind is GATE_SKIP / GATE_KEYFRAME / GATE_FULL /
+            GATE_ROI, box is (x0, y0, x1, y1) in frame pixels for
+            GATE_ROI and None otherwise
+        """
+        now = time.monotonic() if now is None else now
+        height, width = frame.shape[:2]
+        thumb = self.thumbnail(frame)
+        self.captured_pixels += width * height
+
+        if (self.reference is None or self.reference.shape != thumb.shape
+                or now - self.last_keyframe >= self.keyframe_interval):
+            self.reference = thumb
+            self.last_keyframe = now
+            return self._ship(GATE_KEYFRAME, None, width * height)
+
+        changed = np.abs(thumb - self.reference) > self.pixel_threshold
+        self.last_change = float(np.count_nonzero(changed) / changed.size)
+        if self.last_change < self.threshold:
+            return self._ship(GATE_SKIP, None, 0)
+
+        # Bounding box of the changed cells, plus margin
+        n_rows, n_cols = changed.shape
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        r0 = max(0, rows[0] - self.roi_margin)
+        r1 = min(n_rows, rows[-1] + 1 + self.roi_margin)
+        c0 = max(0, cols[0] - self.roi_margin)
+        c1 = min(n_cols, cols[-1] + 1 + self.roi_margin)
+        if (r1 - r0) * (c1 - c0) > self.roi_max * changed.size:
+            self.reference = thumb
+            return self._ship(GATE_FULL, None, width * height)
+
+        # The Pi 5 only learns about the region it receives
+        self.reference[r0:r1, c0:c1] = thumb[r0:r1, c0:c1]
+        size = self.step * self.cell
+        # Edge cells also cover the pixels trimmed off the thumbnail
+        box = (int(c0 * size), int(r0 * size),
+               width if c1 == n_cols else int(c1 * size),
+               height if r1 == n_rows else int(r1 * size))
+        return self._ship(GATE_ROI, box, (box[2] - box[0]) * (box[3] - box[1]))
+
+    def _ship(self, kind, box, pixels):
+        self.counts[kind] += 1
+        self.shipped_pixels += pixels
+        return kind, box
+
+    def stats(self):
+        """Frames captured / shipped per kind, and what was saved"""
+        captured = sum(self.counts.values())
+        return {
+            'captured': captured,
+            'shipped': captured - self.counts[GATE_SKIP],
+            'skipped': self.counts[GATE_SKIP],
+            'keyframes': self.counts[GATE_KEYFRAME],
+            'full': self.counts[GATE_FULL],
+            'roi': self.counts[GATE_ROI],
+            'saved': round(self.counts[GATE_SKIP] / captured, 3) if captured else 0.0,
+            'pixel_ratio': round(self.shipped_pixels / self.captured_pixels, 3) if self.captured_pixels else 0.0,
+            'last_change': round(self.last_change, 4),
+        }
@@ -0,0 +1,298 @@
+"""
+asyncio MQTT client shared by every Pi node
+paho-mqtt driven by the asyncio event loop (no network thread)
+
+Features:
+- auto-reconnect with exponential backoff + jitter
+- subscriptions dispatched through a TopicTrie (+ / # wildcards)
+- publish_latest(): per-topic coalescing, flushed as one batch per tick
+- publish_threadsafe() for worker threads (inference, frame receiver...)
+- optional Metrics: publish and handler times, connection counters
+"""
+
+import asyncio
+import json
+import logging
+import random
+import socket
+
+import paho.mqtt.client as mqtt
+
+from topic_trie import TopicTrie
+from metrics import now_us
+
+logger = logging.getLogger(__name__)
+
+
+def encode_payload(payload):
+    """dict / list -> JSON string, everything else untouched"""
+    if isinstance(payload, (dict, list)):
+        return json.dumps(payload)
+    return payload
+
+
+class AsyncMQTTClient:
+    """
+    Event-loop driven MQTT client
+
+    Args:
+        client_id: MQTT client id
+        host: Broker address
+        port: Broker port
+        keepalive: Keepalive in seconds
+        min_backoff: First reconnect delay (seconds)
+        max_backoff: Reconnect delay cap (seconds)
+        coalesce_interval: Flush period of publish_latest() (seconds)
+        metrics: Metrics registry of the node (optional)
+    """
+
+    def __init__(self, client_id, host, port=1883, keepalive=60,
+                 min_backoff=0.5, max_backoff=30.0, coalesce_interval=0.05, metrics=None):
+        self.client_id = client_id
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.coalesce_interval = coalesce_interval
+
+        self.trie = TopicTrie()
+        self._qos = {}
+        self._pending = {}
+        self._loop = None
+        self._tasks = []
+        self._running = False
+        self._sock = None
+        self._disconnected = None
+        self.connected = asyncio.Event()
+
+        self._client = mqtt.Client(client_id=client_id)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.on_message = self._on_message
+
+        self.stats = {
+            'connects': 0,
+            'received': 0,
+            'published': 0,
+            'coalesced': 0,
+            'handler_errors': 0,
+        }
+        self.publish_timing = None
+        self.handler_timing = None
+        if metrics is not None:
+            self.publish_timing = metrics.histogram('mqtt_publish_ms')
+            self.handler_timing = metrics.histogram('mqtt_handler_ms')
+            metrics.collect(self._collect)
+
+    # Subscriptions
+
+    def subscribe(self, topic_filter, handler, qos=0):
+        """
+        Register a handler(topic, payload) for a filter
+
+        The handler may be a plain function or a coroutine function.
+        Can be called before start(); subscriptions survive reconnects.
+        """
+        first = topic_filter not in self.trie.filters()
+        self.trie.add(topic_filter, handler)
+        self._qos[topic_filter] = max(qos, self._qos.get(topic_filter, 0))
+        if first and self.connected.is_set():
+            self._client.subscribe(topic_filter, self._qos[topic_filter])
+
+    def unsubscribe(self, topic_filter, handler=None):
+        """Remove a handler (or all handlers) of a filter"""
+        if self.trie.remove(topic_filter, handler):
+            self._qos.pop(topic_filter, None)
+            if self.connected.is_set():
+                self._client.unsubscribe(topic_filter)
+
+    # Publishing
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        """
+        Publish now (dict / list payloads are JSON encoded)
+
+        While offline the message is kept as the latest value of its
+        topic and sent after reconnection.
+        """
+        if not self.connected.is_set():
+            self.publish_latest(topic, payload, qos, retain)
+            return False
+        start = now_us()
+        self._client.publish(topic, encode_payload(payload), qos, retain)
+        if self.publish_timing is not None:
+            self.publish_timing.since(start)
+        self.stats['published'] += 1
+        return True
+
+    def publish_latest(self, topic, payload, qos=0, retain=False):
+        """
+        Coalesced publish: only the last value per topic is sent at the
+        next flush tick (HUD state, sensor values...)
+        """
+        if topic in self._pending:
+            self.stats['coalesced'] += 1
+        self._pending[topic] = (payload, qos, retain)
+
+    def publish_threadsafe(self, topic, payload, qos=0, retain=False):
+        """publish() callable from any thread"""
+        self._loop.call_soon_threadsafe(self.publish, topic, payload, qos, retain)
+
+    def _flush_pending(self):
+        if not self._pending or not self.connected.is_set():
+            return
+        pending, self._pending = self._pending, {}
+        for topic, (payload, qos, retain) in pending.items():
+            self._client.publish(topic, encode_payload(payload), qos, retain)
+        self.stats['published'] += len(pending)
+
+    # Lifecycle
+
+    async def start(self):
+        """Start the connection manager (returns immediately)"""
+        self._loop = asyncio.get_running_loop()
+        self._running = True
+        self._disconnected = asyncio.Event()
+        self._disconnected.set()
+        self._client.on_socket_open = self._on_socket_open
+        self._client.on_socket_close = self._on_socket_close
+        self._client.on_socket_register_write = self._on_socket_register_write
+        self._client.on_socket_unregister_write = self._on_socket_unregister_write
+        self._tasks = [
+            asyncio.create_task(self._connection_loop(), name='mqtt-connect'),
+            asyncio.create_task(self._misc_loop(), name='mqtt-misc'),
+            asyncio.create_task(self._flush_loop(), name='mqtt-flush'),
+        ]
+
+    async def stop(self):
+        """Flush pending messages and disconnect"""
+        self._flush_pending()
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.connected.is_set():
+            self._client.disconnect()
+            # Let the DISCONNECT packet out
+            self._client.loop_write()
+        self._remove_socket()
+
+    async def wait_connected(self, timeout=None):
+        await asyncio.wait_for(self.connected.wait(), timeout)
+
+    async def _connection_loop(self):
+        delay = self.min_backoff
+        while self._running:
+            await self._disconnected.wait()
+            try:
+                await self._loop.run_in_executor(None, self._client.connect,
+                                                 self.host, self.port, self.keepalive)
+                self._add_socket()
+                self._disconnected.clear()
+                delay = self.min_backoff
+            except (OSError, socket.timeout) as e:
+                wait = delay * random.uniform(0.8, 1.2)
+                logger.warning(f"MQTT connect to {self.host}:{self.port} failed ({e}), retry in {wait:.1f}s")
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, self.max_backoff)
+
+    async def _misc_loop(self):
+        while self._running:
+            await asyncio.sleep(1.0)
+            if self._sock is not None:
+                self._client.loop_misc()
+
+    async def _flush_loop(self):
+        while self._running:
+            await asyncio.sleep(self.coalesce_interval)
+            self._flush_pending()
+
+    # Socket integration
+
+    def _add_socket(self):
+        # connect() ran in a worker thread: register the socket from the loop
+        sock = self._client.socket()
+        if sock is None:
+            raise OSError('MQTT socket not available after connect')
+        self._sock = sock
+        self._loop.add_reader(sock, self._on_readable)
+        if self._client.want_write():
+            self._loop.add_writer(sock, self._on_writable)
+
+    def _remove_socket(self):
+        if self._sock is not None:
+            self._loop.remove_reader(self._sock)
+            self._loop.remove_writer(self._sock)
+            self._sock = None
+
+    def _on_readable(self):
+        rc = self._client.loop_read()
+        if rc != mqtt.MQTT_ERR_SUCCESS:
+            self._lost(rc)
+
+    def _on_writable(self):
+        rc = self._client.loop_write()
+        if rc != mqtt.MQTT_ERR_SUCCESS:
+            self._lost(rc)
+
+    def _on_socket_open(self, client, userdata, sock):
+        # Socket registration happens in _add_socket (loop thread)
+        pass
+
+    def _on_socket_close(self, client, userdata, sock):
+        if self._loop is not None and sock is self._sock:
+            self._remove_socket()
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        if self._sock is not None:
+            self._loop.add_writer(sock, self._on_writable)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        if self._sock is not None:
+            self._loop.remove_writer(sock)
+
+    def _lost(self, rc):
+        if not self._disconnected.is_set():
+            logger.warning(f"MQTT connection lost (rc={rc})")
+        self._remove_socket()
+        self.connected.clear()
+        self._disconnected.set()
+
+    # paho callbacks (run on the event loop thread)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            logger.error(f"MQTT connection refused (rc={rc})")
+            self._lost(rc)
+            return
+        self.stats['connects'] += 1
+        logger.info(f"MQTT connected to {self.host}:{self.port}")
+        filters = [(f, self._qos.get(f, 0)) for f in self.trie.filters()]
+        if filters:
+            client.subscribe(filters)
+        self.connected.set()
+        self._flush_pending()
+
+    def _on_disconnect(self, client, userdata, rc):
+        if self._running:
+            self._lost(rc)
+
+    def _on_message(self, client, userdata, msg):
+        self.stats['received'] += 1
+        start = now_us()
+        for handler in self.trie.match(msg.topic):
+            try:
+                result = handler(msg.topic, msg.payload)
+                if asyncio.iscoroutine(result):
+                    self._loop.create_task(result)
+            except Exception as e:
+                self.stats['handler_errors'] += 1
+                logger.error(f"Handler error on {msg.topic}: {e}", exc_info=True)
+        if self.handler_timing is not None:
+            self.handler_timing.since(start)
+
+    def _collect(self, metrics):
+        metrics.set_gauges('mqtt', self.stats)
+        metrics.gauge('mqtt_connected').set(int(self.connected.is_set()))
+        metrics.gauge('mqtt_coalesce_pending').set(len(self._pending))
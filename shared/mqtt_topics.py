@@ -11,15 +11,26 @@ HELMET_LEFT_FRAME = "helmet/left/frame"
 HELMET_LEFT_TEMP = "helmet/left/temp"
 HELMET_ORIENTATION = "helmet/orientation"
 HELMET_AIR_QUALITY = "helmet/air_quality"
+HELMET_TEMP = "helmet/temp"
+HELMET_HUMIDITY = "helmet/humidity"
+HELMET_PRESSURE = "helmet/pressure"
+HELMET_POWER = "helmet/power"
+HELMET_TELEMETRY = "helmet/telemetry"  # Packed frame (see telemetry_schema.py)
+HELMET_TELEMETRY_BATCH = "helmet/telemetry/batch"  # Offline backlog (see store_forward.py)
 
 # Backpack topics  
 BACKPACK_YOLO_RESULTS = "backpack/yolo/results"
+BACKPACK_YOLO_STATS = "backpack/yolo/stats"
 BACKPACK_TEMP_INT = "backpack/temp/interior"
 BACKPACK_TEMP_EXT = "backpack/temp/exterior"
 BACKPACK_GAS_CO_INT = "backpack/gas/co/interior"
 BACKPACK_GAS_CO_EXT = "backpack/gas/co/exterior"
 BACKPACK_GAS_SMOKE_INT = "backpack/gas/smoke/interior"
 BACKPACK_GAS_SMOKE_EXT = "backpack/gas/smoke/exterior"
+BACKPACK_TELEMETRY = "backpack/telemetry"  # Packed frame (see telemetry_schema.py)
+BACKPACK_TELEMETRY_BATCH = "backpack/telemetry/batch"  # Offline backlog (see store_forward.py)
+BACKPACK_HISTORY_REQUEST = "backpack/history/request"
+BACKPACK_HISTORY_RESPONSE = "backpack/history/response"  # + /<request id>
 
 # Arm display topics
 ARM_COMMAND = "arm/command"
@@ -30,7 +41,9 @@ ENERGY_BATTERY_LEVEL = "energy/battery/level"
 ENERGY_BATTERY_VOLTAGE = "energy/battery/voltage"
 ENERGY_BATTERY_CURRENT = "energy/battery/current"
 ENERGY_POWER_CONSUMPTION = "energy/power/consumption"
+ENERGY_POWER_BUDGET = "energy/power/budget"  # Retained, see power_budget.py
 
 # System topics
 SYSTEM_STATUS = "system/status"
 SYSTEM_COMMAND = "system/command"
+SYSTEM_ALERTS = "system/alerts"
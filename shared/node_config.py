@@ -0,0 +1,224 @@
+"""
+Node configuration and startup helpers for the Pi nodes
+
+Every Pi entry point loads the same layered configuration:
+    config/example.yaml  (armor-wide defaults)
+    <node>/config.yaml   (node settings)
+    config/local.yaml    (site overrides, optional)
+The merged dict is validated against the node's schema once, then
+pickled under <node>/__pycache__ keyed on the source files' mtimes and
+sizes: later boots skip YAML (and its import) entirely.
+
+Import this module right after the sys.path setup: `startup` starts
+timing there, and prefetch_imports() overlaps slow imports (picamera2,
+torch...) with the rest of the boot.
+"""
+
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BASE_CONFIG = REPO_ROOT / 'config' / 'example.yaml'
+LOCAL_CONFIG = REPO_ROOT / 'config' / 'local.yaml'
+CACHE_NAME = 'config.cache'
+CACHE_VERSION = 1
+
+NUMBER = (int, float)
+
+
+class ConfigError(ValueError):
+    """Invalid node configuration (every problem found is listed)"""
+
+
+class StartupTimer:
+    """
+    Boot phases of a node, reported once it is ready
+
+    The interpreter phase (process creation to this module's import)
+    comes from /proc and is only known on Linux.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.interpreter = _process_age()
+        self.marks = []
+        self.notes = {}
+
+    def mark(self, phase, note=None):
+        """End of a boot phase (measured from the previous mark)"""
+        self.marks.append((phase, time.perf_counter()))
+        if note:
+            self.notes[phase] = note
+
+    def report(self):
+        """Phase durations in ms, with the total since process creation"""
+        phases = {}
+        if self.interpreter is not None:
+            phases['interpreter'] = round(self.interpreter * 1000, 1)
+        last = self.start
+        for phase, at in self.marks:
+            phases[phase] = round((at - last) * 1000, 1)
+            last = at
+        phases['total'] = round((last - self.start + (self.interpreter or 0.0)) * 1000, 1)
+        return phases
+
+    def summary(self):
+        return ', '.join(f"{phase} {ms:.0f} ms" + (f" ({self.notes[phase]})" if phase in self.notes else '')
+                         for phase, ms in self.report().items())
+
+
+def _process_age():
+    """Seconds since this process was created (Linux), or None"""
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+startup = StartupTimer()
+
+
+def prefetch_imports(*names):
+    """
+    Import modules in a background thread
+
+    A later `import name` in the main thread waits for the running
+    import instead of starting over, so slow imports overlap with the
+    MQTT connection and the other boot work.
+
+    Returns:
+        The daemon thread
+    """
+    def run():
+        for name in names:
+            start = time.perf_counter()
+            try:
+                __import__(name)
+                logger.debug(f"Prefetched {name} in {(time.perf_counter() - start) * 1000:.0f} ms")
+            except ImportError as e:
+                logger.debug(f"Prefetch of {name} failed: {e}")
+
+    thread = threading.Thread(target=run, name='prefetch', daemon=True)
+    thread.start()
+    return thread
+
+
+def deep_merge(base, override):
+    """Recursive dict merge, override wins (lists and values are replaced)"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def validate(config, schema):
+    """
+    Check required keys and their types
+
+    Args:
+        config: Merged configuration
+        schema: Dict 'section.key' -> type or tuple of types (bool is
+            never accepted for int / float)
+
+    Raises:
+        ConfigError: listing every missing or mistyped key
+    """
+    problems = []
+    for path, expected in schema.items():
+        node = config
+        for part in path.split('.'):
+            if not isinstance(node, dict) or part not in node:
+                problems.append(f"{path}: missing")
+                break
+            node = node[part]
+        else:
+            types = expected if isinstance(expected, tuple) else (expected,)
+            if not isinstance(node, types) or (isinstance(node, bool) and bool not in types):
+                names = ' or '.join(t.__name__ for t in types)
+                problems.append(f"{path}: expected {names}, got {type(node).__name__} {node!r}")
+    if problems:
+        raise ConfigError('Invalid configuration:\n  ' + '\n  '.join(problems))
+
+
+def _read_yaml(path):
+    """YAML file -> dict, with the C loader when libyaml is available"""
+    import yaml
+
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return yaml.load(f, Loader=loader) or {}
+
+
+def _source_key(paths, schema):
+    key = [CACHE_VERSION, sys.version_info[:2], repr(sorted((k, repr(v)) for k, v in (schema or {}).items()))]
+    for path in paths:
+        try:
+            st = path.stat()
+            key.append((str(path), st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            key.append((str(path), None))
+    return tuple(key)
+
+
+def load_node_config(node_dir, schema=None, cache=True):
+    """
+    Merged, validated configuration of a node
+
+    Args:
+        node_dir: Directory holding the node's config.yaml
+        schema: Required keys (see validate())
+        cache: Use / refresh the compiled cache
+
+    Returns:
+        Configuration dict
+
+    Raises:
+        ConfigError: the merged configuration does not match the schema
+    """
+    node_dir = Path(node_dir)
+    sources = [BASE_CONFIG, node_dir / 'config.yaml', LOCAL_CONFIG]
+    key = _source_key(sources, schema)
+    cache_path = node_dir / '__pycache__' / CACHE_NAME
+
+    if cache:
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('key') == key:
+                startup.notes['config'] = 'cached'
+                return cached['config']
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            pass
+
+    config = {}
+    for path in sources:
+        if path.exists():
+            config = deep_merge(config, _read_yaml(path))
+    if schema:
+        validate(config, schema)
+    startup.notes['config'] = 'parsed'
+
+    if cache:
+        try:
+            cache_path.parent.mkdir(exist_ok=True)
+            tmp = cache_path.with_suffix('.tmp')
+            with open(tmp, 'wb') as f:
+                pickle.dump({'key': key, 'config': config}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        except OSError as e:
+            logger.warning(f"Config cache not written: {e}")
+    return config
@@ -0,0 +1,80 @@
+"""
+Power budget levels (MicroPython compatible)
+
+The energy node turns the battery state of charge into a budget level
+and publishes it (retained) on ENERGY_POWER_BUDGET. Every node scales
+its nominal rates by LEVEL_RATE[level]: eye FPS and HUD refresh, Pi 5
+inference rate, ESP32 sensor reads. Throughput is traded for runtime
+step by step instead of browning out at the end of the battery.
+"""
+
+import json
+
+BUDGET_FULL = 0
+BUDGET_ECO = 1
+BUDGET_LOW = 2
+BUDGET_CRITICAL = 3
+
+LEVEL_NAMES = ('full', 'eco', 'low', 'critical')
+
+# Fraction of the nominal rate allowed at each level
+LEVEL_RATE = (1.0, 0.7, 0.4, 0.2)
+
+# State of charge (%) under which eco, low and critical start
+LEVEL_SOC = (50, 30, 15)
+
+# Charge (%) to regain before moving back to a better level
+HYSTERESIS = 3
+
+
+def level_for_soc(soc, current=BUDGET_FULL):
+    """
+    Budget level for a state of charge, with hysteresis
+
+    Args:
+        soc: State of charge in %
+        current: Level in force (sets the direction of the hysteresis)
+
+    Returns:
+        Level (BUDGET_FULL .. BUDGET_CRITICAL)
+    """
+    level = BUDGET_FULL
+    for i, threshold in enumerate(LEVEL_SOC):
+        # Staying at (or below) a level requires climbing past threshold + HYSTERESIS
+        if soc < threshold or (current > i and soc < threshold + HYSTERESIS):
+            level = i + 1
+    return level
+
+
+def budget_rate(level):
+    """Rate factor of a level (unknown levels count as critical)"""
+    if level is None:
+        return LEVEL_RATE[BUDGET_FULL]
+    return LEVEL_RATE[min(max(level, 0), len(LEVEL_RATE) - 1)]
+
+
+def encode_budget(level, soc, runtime_s):
+    """Budget message dictionary"""
+    return {
+        'level': level,
+        'name': LEVEL_NAMES[level],
+        'rate': LEVEL_RATE[level],
+        'soc': round(soc, 1),
+        'runtime_s': None if runtime_s is None else int(runtime_s),
+    }
+
+
+def parse_budget(payload):
+    """
+    Level of a budget message
+
+    Returns:
+        Level, or None if the payload is not a budget message
+    """
+    try:
+        level = json.loads(payload)['level']
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(level, int) or not 0 <= level < len(LEVEL_NAMES):
+        return None
+    return level
@@ -0,0 +1,309 @@
+"""
+Burst-read I2C drivers for the environment and orientation sensors (MicroPython)
+
+Each read is one I2C transaction of the sensor's whole data block into
+a bytearray allocated once (readfrom_mem_into / readfrom_into), then
+decoded with shifts on that buffer: no per-register reads, no temporary
+bytes objects. Calibration coefficients are read once at init and the
+compensation runs in integer math (Bosch / Aosong reference formulas),
+only the final values are turned into floats.
+
+Nothing sleeps on the read path: the BME280 and ENS160 run in their
+continuous modes and the AHT21 conversion is triggered at the end of a
+read and collected by the next one, one period later. Sleeps are left
+to init (mode changes, power-on calibration).
+
+A driver raises OSError when the bus or the device fails, so the
+sensor scheduler counts the error and retries at the next period.
+
+Keep this file MicroPython compatible: no typing, no dataclasses.
+"""
+
+import struct
+import time
+
+
+def _crc8_table():
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x31) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table[i] = crc
+    return table
+
+
+# CRC-8 poly 0x31 (AHT21), one lookup per byte
+_CRC8 = _crc8_table()
+
+
+def _s16(buf, i):
+    """Little-endian signed 16-bit value at buf[i]"""
+    value = buf[i] | (buf[i + 1] << 8)
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class Bme280:
+    """
+    BME280 temperature / humidity / pressure, normal mode
+
+    Args:
+        i2c: machine.I2C bus
+        address: 0x76 or 0x77
+        standby: config register t_sb code (3 = 250 ms between conversions)
+    """
+
+    CHIP_ID = 0x60
+
+    def __init__(self, i2c, address=0x76, standby=3):
+        self.i2c = i2c
+        self.address = address
+        self.buf = bytearray(8)
+
+        chip = i2c.readfrom_mem(address, 0xD0, 1)[0]
+        if chip != self.CHIP_ID:
+            raise OSError(f'BME280 expected at 0x{address:02x}, chip id 0x{chip:02x}')
+
+        # Calibration, read once: 0x88..0xA1 then 0xE1..0xE7
+        (self.t1, self.t2, self.t3, self.p1, self.p2, self.p3, self.p4, self.p5, self.p6,
+         self.p7, self.p8, self.p9, self.h1) = struct.unpack('<HhhHhhhhhhhhxB', i2c.readfrom_mem(address, 0x88, 26))
+        cal = i2c.readfrom_mem(address, 0xE1, 7)
+        self.h2 = _s16(cal, 0)
+        self.h3 = cal[2]
+        e4 = cal[3] - 256 if cal[3] & 0x80 else cal[3]
+        e6 = cal[5] - 256 if cal[5] & 0x80 else cal[5]
+        self.h4 = (e4 << 4) | (cal[4] & 0x0F)
+        self.h5 = (e6 << 4) | (cal[4] >> 4)
+        self.h6 = cal[6] - 256 if cal[6] & 0x80 else cal[6]
+
+        # ctrl_hum only takes effect on the next ctrl_meas write
+        i2c.writeto_mem(address, 0xF2, b'\x01')                  # humidity x1
+        i2c.writeto_mem(address, 0xF5, bytes((standby << 5,)))   # standby, filter off
+        i2c.writeto_mem(address, 0xF4, b'\x27')                  # T x1, P x1, normal mode
+
+    def read_raw(self):
+        """
+        Burst read of the data registers (0xF7..0xFE)
+
+        Returns:
+            (centi-degrees C, pascals, %RH in Q22.10)
+        """
+        buf = self.buf
+        self.i2c.readfrom_mem_into(self.address, 0xF7, buf)
+        adc_p = (buf[0] << 12) | (buf[1] << 4) | (buf[2] >> 4)
+        adc_t = (buf[3] << 12) | (buf[4] << 4) | (buf[5] >> 4)
+        adc_h = (buf[6] << 8) | buf[7]
+
+        # Temperature (datasheet 4.2.3, int32)
+        t1 = self.t1
+        var1 = ((((adc_t >> 3) - (t1 << 1))) * self.t2) >> 11
+        var2 = (((((adc_t >> 4) - t1) * ((adc_t >> 4) - t1)) >> 12) * self.t3) >> 14
+        t_fine = var1 + var2
+        temperature = (t_fine * 5 + 128) >> 8
+
+        # Pressure (int32 variant, 1 Pa resolution)
+        var1 = (t_fine >> 1) - 64000
+        var2 = (((var1 >> 2) * (var1 >> 2)) >> 11) * self.p6
+        var2 = var2 + ((var1 * self.p5) << 1)
+        var2 = (var2 >> 2) + (self.p4 << 16)
+        var1 = (((self.p3 * (((var1 >> 2) * (var1 >> 2)) >> 13)) >> 3) + ((self.p2 * var1) >> 1)) >> 18
+        var1 = ((32768 + var1) * self.p1) >> 15
+        if var1 == 0:
+            pressure = 0
+        else:
+            p = (((1048576 - adc_p) - (var2 >> 12)) * 3125) & 0xFFFFFFFF
+            p = (p << 1) // var1 if p < 0x80000000 else (p // var1) * 2
+            var1 = (self.p9 * (((p >> 3) * (p >> 3)) >> 13)) >> 12
+            var2 = ((p >> 2) * self.p8) >> 13
+            pressure = p + ((var1 + var2 + self.p7) >> 4)
+
+        # Humidity (Q22.10)
+        v = t_fine - 76800
+        v = ((((adc_h << 14) - (self.h4 << 20) - (self.h5 * v)) + 16384) >> 15) * (
+            ((((((v * self.h6) >> 10) * (((v * self.h3) >> 11) + 32768)) >> 10) + 2097152)
+             * self.h2 + 8192) >> 14)
+        v = v - (((((v >> 15) * (v >> 15)) >> 7) * self.h1) >> 4)
+        v = 0 if v < 0 else 419430400 if v > 419430400 else v
+        return temperature, pressure, v >> 12
+
+    def read(self):
+        temperature, pressure, humidity = self.read_raw()
+        return {
+            'temperature': temperature / 100,
+            'humidity': humidity / 1024,
+            'pressure': pressure / 100,
+        }
+
+
+class Ens160:
+    """
+    ENS160 air quality (AQI-UBA, TVOC, eCO2), standard mode
+
+    The sensor computes a result every second on its own; read() takes
+    the status and the three outputs in one 6-byte burst and returns
+    None when no new result is flagged or the output is invalid.
+    ambient() feeds the temperature / humidity compensation, written
+    with the next read only when it changed.
+
+    Args:
+        i2c: machine.I2C bus
+        address: 0x52 or 0x53
+    """
+
+    PART_ID = 0x0160
+
+    def __init__(self, i2c, address=0x53):
+        self.i2c = i2c
+        self.address = address
+        self.buf = bytearray(6)
+        self.comp = bytearray(4)
+        self._comp_pending = False
+        self.stale = 0
+
+        part_id = i2c.readfrom_mem(address, 0x00, 2)
+        part = part_id[0] | (part_id[1] << 8)
+        if part != self.PART_ID:
+            raise OSError(f'ENS160 expected at 0x{address:02x}, part id 0x{part:04x}')
+        i2c.writeto_mem(address, 0x10, b'\x02')  # OPMODE standard
+        time.sleep_ms(10)
+
+    def ambient(self, temperature, humidity):
+        """Compensation from the BME280 / AHT21 (°C, %RH)"""
+        t_in = int((temperature + 273.15) * 64) & 0xFFFF
+        rh_in = int(humidity * 512) & 0xFFFF
+        comp = self.comp
+        if (comp[0] | (comp[1] << 8)) == t_in and (comp[2] | (comp[3] << 8)) == rh_in:
+            return
+        comp[0], comp[1], comp[2], comp[3] = t_in & 0xFF, t_in >> 8, rh_in & 0xFF, rh_in >> 8
+        self._comp_pending = True
+
+    def read(self):
+        if self._comp_pending:
+            # TEMP_IN and RH_IN are contiguous: one write
+            self.i2c.writeto_mem(self.address, 0x13, self.comp)
+            self._comp_pending = False
+        buf = self.buf
+        self.i2c.readfrom_mem_into(self.address, 0x20, buf)
+        status = buf[0]
+        if not status & 0x02 or (status >> 2) & 0x03 == 3:
+            # No new data since the last read, or invalid output
+            self.stale += 1
+            return None
+        return {
+            'aqi': buf[1] & 0x07,
+            'tvoc': buf[2] | (buf[3] << 8),
+            'eco2': buf[4] | (buf[5] << 8),
+        }
+
+
+class Aht21:
+    """
+    AHT21 temperature / humidity, conversion overlapped with the read period
+
+    The AHT21 has no register map: a conversion is triggered by a
+    command and takes ~80 ms. read() collects the conversion triggered
+    by the previous call and immediately triggers the next one, so the
+    value returned is one read period old and the bus is never held
+    waiting. The first call only triggers and returns None.
+
+    Args:
+        i2c: machine.I2C bus
+        address: 0x38 (0x39 on the backpack exterior board)
+    """
+
+    TRIGGER = b'\xac\x33\x00'
+
+    def __init__(self, i2c, address=0x38):
+        self.i2c = i2c
+        self.address = address
+        self.buf = bytearray(7)
+        self.triggered = False
+        self.busy = 0
+        self.crc_errors = 0
+
+        status = bytearray(1)
+        i2c.readfrom_into(address, status)
+        if not status[0] & 0x08:
+            # Not calibrated since power-on
+            i2c.writeto(address, b'\xbe\x08\x00')
+            time.sleep_ms(10)
+
+    def trigger(self):
+        self.i2c.writeto(self.address, self.TRIGGER)
+        self.triggered = True
+
+    @staticmethod
+    def crc8(buf, n):
+        crc = 0xFF
+        for i in range(n):
+            crc = _CRC8[crc ^ buf[i]]
+        return crc
+
+    def read_raw(self):
+        """
+        Collect the pending conversion and trigger the next one
+
+        Returns:
+            (centi-degrees C, centi-%RH), or None when no conversion was ready
+        """
+        if not self.triggered:
+            self.trigger()
+            return None
+        buf = self.buf
+        self.i2c.readfrom_into(self.address, buf)
+        if buf[0] & 0x80:
+            # Still converting (period shorter than the conversion)
+            self.busy += 1
+            return None
+        valid = self.crc8(buf, 6) == buf[6]
+        self.trigger()
+        if not valid:
+            self.crc_errors += 1
+            return None
+        raw_h = (buf[1] << 12) | (buf[2] << 4) | (buf[3] >> 4)
+        raw_t = ((buf[3] & 0x0F) << 16) | (buf[4] << 8) | buf[5]
+        return ((raw_t * 625) >> 15) - 5000, (raw_h * 625) >> 16
+
+    def read(self):
+        raw = self.read_raw()
+        if raw is None:
+            return None
+        return {'temperature': raw[0] / 100, 'humidity': raw[1] / 100}
+
+
+class Bno055:
+    """
+    BNO055 absolute orientation (NDOF fusion), Euler angles in degrees
+
+    Args:
+        i2c: machine.I2C bus
+        address: 0x28 or 0x29
+    """
+
+    CHIP_ID = 0xA0
+
+    def __init__(self, i2c, address=0x28):
+        self.i2c = i2c
+        self.address = address
+        self.buf = bytearray(6)
+
+        chip = i2c.readfrom_mem(address, 0x00, 1)[0]
+        if chip != self.CHIP_ID:
+            raise OSError(f'BNO055 expected at 0x{address:02x}, chip id 0x{chip:02x}')
+        i2c.writeto_mem(address, 0x3D, b'\x00')  # OPR_MODE config
+        time.sleep_ms(20)
+        i2c.writeto_mem(address, 0x3E, b'\x00')  # PWR_MODE normal
+        i2c.writeto_mem(address, 0x07, b'\x00')  # PAGE_ID 0
+        i2c.writeto_mem(address, 0x3B, b'\x00')  # UNIT_SEL degrees, Celsius
+        i2c.writeto_mem(address, 0x3D, b'\x0c')  # OPR_MODE NDOF
+        time.sleep_ms(10)
+
+    def read_raw(self):
+        """Heading, roll, pitch in 1/16 degree (EUL_DATA 0x1A..0x1F, one burst)"""
+        buf = self.buf
+        self.i2c.readfrom_mem_into(self.address, 0x1A, buf)
+        return _s16(buf, 0), _s16(buf, 2), _s16(buf, 4)
+
+    def read(self):
+        heading, roll, pitch = self.read_raw()
+        return {'heading': heading / 16, 'roll': roll / 16, 'pitch': pitch / 16}
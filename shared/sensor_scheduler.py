@@ -0,0 +1,228 @@
+"""
+Cooperative per-sensor scheduler for the ESP32 nodes (MicroPython)
+
+Each sensor has its own period. A single uasyncio task owns the I2C bus:
+at every wake-up it reads the sensors that are due, ordered so that the
+PCA9548A multiplexers switch channel as rarely as possible, hands the
+readings to a callback right away, then sleeps until the next deadline.
+With a Metrics registry, every read is timed per sensor (i2c_read_ms)
+and every pass, callback included (sensor_pass_ms).
+"""
+
+import time
+
+from metrics import now_us
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+class Pca9548a:
+    """
+    PCA9548A I2C multiplexer with cached channel selection
+
+    Args:
+        i2c: machine.I2C bus
+        address: Multiplexer address
+    """
+
+    def __init__(self, i2c, address):
+        self.i2c = i2c
+        self.address = address
+        self.current = None
+        self.switches = 0
+        self._byte = bytearray(1)
+
+    def select(self, channel):
+        """
+        Route the bus to a channel (None = all channels off)
+
+        Returns:
+            True if a bus write was needed
+        """
+        if channel == self.current:
+            return False
+        self._byte[0] = 0 if channel is None else 1 << channel
+        self.i2c.writeto(self.address, self._byte)
+        self.current = channel
+        self.switches += 1
+        return True
+
+
+class _SensorTask:
+    def __init__(self, key, read, period_ms, mux, channel, scalable, timing):
+        self.key = key
+        self.read = read
+        self.period_ms = period_ms
+        self.base_period_ms = period_ms
+        self.scalable = scalable
+        self.mux = mux
+        self.channel = channel
+        self.next_due = time.ticks_ms()
+        self.reads = 0
+        self.errors = 0
+        self.late = 0
+        self.timing = timing
+
+
+class SensorScheduler:
+    """
+    Runs sensor reads at independent cadences
+
+    Args:
+        on_ready: Callback(readings) called after every pass with the
+                  dict {key: value} of the sensors read in that pass
+        slack_ms: A sensor due within slack_ms is read early when its
+                  channel is already selected (saves a switch later)
+        metrics: Metrics registry timing the reads and passes (optional)
+    """
+
+    def __init__(self, on_ready, slack_ms=20, metrics=None):
+        self.on_ready = on_ready
+        self.slack_ms = slack_ms
+        self.metrics = metrics
+        self.pass_timing = metrics.histogram('sensor_pass_ms') if metrics else None
+        self.tasks = []
+        self.muxes = []
+        self.passes = 0
+        self.rate = 1.0
+
+    def add(self, key, read, period_ms, mux=None, channel=None, scalable=True):
+        """
+        Register a sensor
+
+        Args:
+            key: Reading key (telemetry schema block name)
+            read: Function returning a dict or None
+            period_ms: Read period in milliseconds
+            mux: Pca9548a the sensor sits behind (None = main bus)
+            channel: Multiplexer channel
+            scalable: False keeps the period whatever the power budget
+                      (safety sensors)
+        """
+        timing = self.metrics.histogram('i2c_read_ms', {'sensor': key}) if self.metrics else None
+        self.tasks.append(_SensorTask(key, read, period_ms, mux, channel, scalable, timing))
+        if mux is not None and mux not in self.muxes:
+            self.muxes.append(mux)
+
+    def _select(self, task):
+        if task.mux is None:
+            # Main bus devices answer whatever the multiplexers route
+            return
+        for mux in self.muxes:
+            if mux is not task.mux:
+                mux.select(None)
+        task.mux.select(task.channel)
+
+    def _rank(self, task):
+        # Main bus first, then the channel already routed, then grouped
+        if task.mux is None:
+            return (0, 0, 0)
+        if task.mux.current == task.channel:
+            return (1, 0, 0)
+        return (2, task.mux.address, task.channel)
+
+    def _collect(self, now):
+        due = []
+        groups = set()
+        for task in self.tasks:
+            if time.ticks_diff(task.next_due, now) <= 0:
+                due.append(task)
+                if task.mux is not None:
+                    groups.add((task.mux.address, task.channel))
+        for mux in self.muxes:
+            if mux.current is not None:
+                groups.add((mux.address, mux.current))
+
+        # Pull forward sensors sharing a channel that gets routed anyway
+        for task in self.tasks:
+            if task.mux is None or task in due:
+                continue
+            if ((task.mux.address, task.channel) in groups
+                    and time.ticks_diff(task.next_due, now) <= self.slack_ms):
+                due.append(task)
+
+        due.sort(key=self._rank)
+        return due
+
+    def run_once(self):
+        """
+        Read every due sensor once
+
+        Returns:
+            Milliseconds until the next deadline
+        """
+        now = time.ticks_ms()
+        started = now_us()
+        readings = {}
+        for task in self._collect(now):
+            self._select(task)
+            start = now_us()
+            try:
+                value = task.read()
+            except Exception as e:
+                print(f'Error reading {task.key}: {e}')
+                value = None
+                task.errors += 1
+            if task.timing is not None:
+                task.timing.since(start)
+            if value is not None:
+                readings[task.key] = value
+                task.reads += 1
+
+            next_due = time.ticks_add(task.next_due, task.period_ms)
+            if time.ticks_diff(next_due, now) <= 0:
+                # Overrun: skip the missed slots instead of bursting
+                task.late += 1
+                next_due = time.ticks_add(now, task.period_ms)
+            task.next_due = next_due
+
+        if readings:
+            self.passes += 1
+            self.on_ready(readings)
+            if self.pass_timing is not None:
+                self.pass_timing.since(started)
+
+        now = time.ticks_ms()
+        wait = min(time.ticks_diff(t.next_due, now) for t in self.tasks)
+        return max(0, wait)
+
+    def set_rate(self, rate):
+        """
+        Scale the read rate of every scalable sensor
+
+        Args:
+            rate: Fraction of the nominal rate (power budget), 1.0 = config periods
+        """
+        self.rate = rate
+        now = time.ticks_ms()
+        for task in self.tasks:
+            if not task.scalable:
+                continue
+            period_ms = int(task.base_period_ms / rate)
+            # Reschedule from the last read with the new period
+            last = time.ticks_add(task.next_due, -task.period_ms)
+            task.period_ms = period_ms
+            task.next_due = time.ticks_add(last, period_ms)
+            if time.ticks_diff(task.next_due, now) < 0:
+                task.next_due = now
+
+    async def run(self):
+        """Scheduler task (never returns)"""
+        while True:
+            wait = self.run_once() if self.tasks else 1000
+            await asyncio.sleep(wait / 1000)
+
+    def stats(self):
+        """Per-sensor read counts and multiplexer switches"""
+        return {
+            'passes': self.passes,
+            'rate': self.rate,
+            'switches': sum(m.switches for m in self.muxes),
+            'sensors': {
+                t.key: {'reads': t.reads, 'errors': t.errors, 'late': t.late}
+                for t in self.tasks
+            },
+        }
@@ -0,0 +1,258 @@
+"""
+Store-and-forward backlog for the ESP32 nodes (MicroPython)
+
+While the broker is unreachable (backpack AP down, Pi 5 rebooting), the
+packed telemetry frames are kept as length-prefixed records in a RAM
+ring allocated once; each frame keeps its capture ts_ms. When the ring
+is full, its oldest half is spilled to a flash file (optional, bounded);
+once flash is full too, the oldest RAM records are dropped and counted.
+Flash then holds the start of the outage and RAM the latest readings.
+
+On reconnect, batch() packs the oldest records (flash first) into one
+bulk message (telemetry_schema batch format) and commit() releases them
+once it was published: a failed flush loses nothing.
+
+Keep this file MicroPython compatible: no typing, no dataclasses.
+"""
+
+import os
+import struct
+
+from telemetry_schema import (
+    BATCH_HEADER_SIZE, RECORD_HEADER_FORMAT, RECORD_HEADER_SIZE, pack_batch_header,
+)
+
+
+class FrameBacklog:
+    """
+    Bounded FIFO of packed frames: RAM ring + optional flash spill
+
+    Args:
+        capacity: RAM ring size in bytes
+        spill_path: Flash file receiving the overflow (None = RAM only)
+        spill_max: Flash file size limit in bytes
+    """
+
+    def __init__(self, capacity, spill_path=None, spill_max=0):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.head = 0      # offset of the oldest RAM record
+        self.used = 0      # bytes held in RAM
+        self.records = 0   # records held in RAM
+
+        self.spill_path = spill_path if spill_max else None
+        self.spill_max = spill_max
+        self.spill_read = 0     # bytes of the file already sent
+        self.spill_size = 0     # bytes written to the file
+        self.spill_records = 0  # records of the file not sent yet
+
+        self._length = bytearray(RECORD_HEADER_SIZE)
+        self._length_view = memoryview(self._length)
+        self._pending = None
+
+        self.stored = 0
+        self.sent = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.peak = 0
+
+        # Timestamps of a previous boot (ticks_ms) cannot be dated any more
+        if self.spill_path:
+            self._remove_spill()
+
+    def __len__(self):
+        return self.records + self.spill_records
+
+    # RAM ring
+
+    def _put(self, data):
+        n = len(data)
+        tail = (self.head + self.used) % self.capacity
+        first = min(n, self.capacity - tail)
+        self.view[tail:tail + first] = data[:first]
+        if first < n:
+            self.view[:n - first] = data[first:]
+        self.used += n
+
+    def _copy(self, offset, out, n):
+        """Copy n bytes, starting offset bytes after the oldest record, into out"""
+        start = (self.head + offset) % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.view[start:start + first]
+        if first < n:
+            out[first:n] = self.view[:n - first]
+
+    def _record_size(self, offset):
+        self._copy(offset, self._length_view, RECORD_HEADER_SIZE)
+        return RECORD_HEADER_SIZE + struct.unpack_from(RECORD_HEADER_FORMAT, self._length, 0)[0]
+
+    def _release(self, n, records):
+        self.head = (self.head + n) % self.capacity
+        self.used -= n
+        self.records -= records
+
+    def push(self, frame):
+        """
+        Store one packed frame (oldest data makes room when full)
+
+        Returns:
+            False if the frame is larger than the whole ring
+        """
+        size = RECORD_HEADER_SIZE + len(frame)
+        if size > self.capacity:
+            self.dropped += 1
+            return False
+        while self.capacity - self.used < size:
+            # Records of a pending batch may move: it is sent again
+            self._pending = None
+            if not self._spill():
+                self._release(self._record_size(0), 1)
+                self.dropped += 1
+        struct.pack_into(RECORD_HEADER_FORMAT, self._length, 0, len(frame))
+        self._put(self._length)
+        self._put(frame)
+        self.records += 1
+        self.stored += 1
+        if self.used > self.peak:
+            self.peak = self.used
+        return True
+
+    # Flash spill
+
+    def _spill(self):
+        """Move the oldest half of the ring to flash (False if not possible)"""
+        if not self.spill_path:
+            return False
+        n = records = 0
+        while records < self.records:
+            size = self._record_size(n)
+            if records and n + size > self.capacity // 2:
+                break
+            n += size
+            records += 1
+        if self.spill_size + n > self.spill_max:
+            return False
+        start = self.head
+        first = min(n, self.capacity - start)
+        try:
+            with open(self.spill_path, 'ab') as f:
+                f.write(self.view[start:start + first])
+                if first < n:
+                    f.write(self.view[:n - first])
+        except OSError as e:
+            print('Backlog spill disabled:', e)
+            self.spill_path = None
+            return False
+        self.spill_size += n
+        self.spill_records += records
+        self.spilled += records
+        self._release(n, records)
+        return True
+
+    def _remove_spill(self):
+        try:
+            os.remove(self.spill_path)
+        except OSError:
+            pass
+        self.spill_read = 0
+        self.spill_size = 0
+        self.spill_records = 0
+
+    def _batch_spill(self, out, offset):
+        """Oldest flash records into out; returns (bytes, records, new offset)"""
+        start = offset
+        n = records = 0
+        try:
+            with open(self.spill_path, 'rb') as f:
+                f.seek(self.spill_read)
+                while records < self.spill_records:
+                    if f.readinto(self._length_view) != RECORD_HEADER_SIZE:
+                        raise OSError('truncated spill file')
+                    size = RECORD_HEADER_SIZE + struct.unpack_from(RECORD_HEADER_FORMAT, self._length, 0)[0]
+                    if offset + size > len(out):
+                        break
+                    out[offset:offset + RECORD_HEADER_SIZE] = self._length_view
+                    f.readinto(out[offset + RECORD_HEADER_SIZE:offset + size])
+                    offset += size
+                    n += size
+                    records += 1
+        except OSError as e:
+            # Unreadable spill: count it as dropped rather than retry forever
+            print('Backlog spill lost:', e)
+            self.dropped += self.spill_records
+            self._remove_spill()
+            return 0, 0, start
+        return n, records, offset
+
+    # Flush
+
+    def batch(self, out, node, now_ms):
+        """
+        Pack the oldest records into one batch message
+
+        Args:
+            out: bytearray receiving the batch (its size bounds the batch)
+            node: Node identifier of the frames
+            now_ms: Current time.ticks_ms()
+
+        Returns:
+            memoryview over out, or None when there is nothing to send
+        """
+        view = memoryview(out)
+        offset = BATCH_HEADER_SIZE
+        spill_bytes = spill_records = 0
+        if self.spill_records:
+            spill_bytes, spill_records, offset = self._batch_spill(view, offset)
+
+        ram = ram_records = 0
+        # RAM records are newer: only once flash is drained
+        if spill_records == self.spill_records:
+            while ram_records < self.records:
+                size = self._record_size(ram)
+                if offset + size > len(out):
+                    break
+                self._copy(ram, view[offset:], size)
+                offset += size
+                ram += size
+                ram_records += 1
+
+        count = spill_records + ram_records
+        if not count:
+            return None
+        pack_batch_header(out, node, count, now_ms, self.dropped)
+        self._pending = (spill_bytes, spill_records, ram, ram_records)
+        return view[:offset]
+
+    def commit(self):
+        """
+        Release the records of the last batch() (call once it is published)
+
+        Returns:
+            Number of frames released
+        """
+        if self._pending is None:
+            return 0
+        spill_bytes, spill_records, ram, ram_records = self._pending
+        self._pending = None
+        if spill_records:
+            self.spill_read += spill_bytes
+            self.spill_records -= spill_records
+            if not self.spill_records:
+                self._remove_spill()
+        self._release(ram, ram_records)
+        self.sent += spill_records + ram_records
+        return spill_records + ram_records
+
+    def stats(self):
+        """Backlog counters"""
+        return {
+            'pending': len(self),
+            'ram_bytes': self.used,
+            'spill_bytes': self.spill_size - self.spill_read,
+            'stored': self.stored,
+            'sent': self.sent,
+            'spilled': self.spilled,
+            'dropped': self.dropped,
+            'peak': self.peak,
+        }
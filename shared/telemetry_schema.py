@@ -0,0 +1,358 @@
+"""
+Packed telemetry frame schema registry
+Shared by the ESP32 nodes (MicroPython) and the Pi 5 decoder (CPython)
+
+Frame layout (little-endian):
+    header : magic 'CT' | version u8 | node u8 | seq u16 | ts_ms u32 | mask u16
+    blocks : one struct-packed block per bit set in mask, in registry order
+
+Values are stored as scaled integers (e.g. temperature * 100 in an int16),
+so a full backpack frame fits in ~60 bytes instead of ~8 JSON documents.
+
+Keep this file MicroPython compatible: no typing, no dataclasses.
+"""
+
+import struct
+
+FRAME_MAGIC = b'CT'
+FRAME_VERSION = 1
+
+HEADER_FORMAT = '<2sBBHIH'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Backlog batch (store_forward.py): frames recorded while offline, sent in bulk
+#   header  : magic 'CB' | version u8 | node u8 | count u16 | now_ms u32 | dropped u32
+#   records : length u16 | packed frame, count times
+# now_ms is the sender clock at send time: the receiver dates each frame
+# from (now_ms - frame ts_ms), which survives the ESP32 having no wall clock.
+BATCH_MAGIC = b'CB'
+BATCH_VERSION = 1
+BATCH_HEADER_FORMAT = '<2sBBHII'
+BATCH_HEADER_SIZE = struct.calcsize(BATCH_HEADER_FORMAT)
+RECORD_HEADER_FORMAT = '<H'
+RECORD_HEADER_SIZE = struct.calcsize(RECORD_HEADER_FORMAT)
+
+# ts_ms / now_ms are MicroPython ticks_ms() values: they wrap at 2**30
+TICKS_PERIOD = 1 << 30
+TICKS_MASK = TICKS_PERIOD - 1
+
+# Node identifiers
+NODE_HELMET = 1
+NODE_BACKPACK = 2
+
+# Integer range per struct format char (used to clamp before packing)
+_LIMITS = {
+    'b': (-128, 127),
+    'B': (0, 255),
+    'h': (-32768, 32767),
+    'H': (0, 65535),
+    'i': (-2147483648, 2147483647),
+    'I': (0, 4294967295),
+}
+
+# Block definition:
+#   (key, fields, fanout)
+#   fields : tuple of (name, format char, scale)
+#   fanout : tuple of (legacy topic, field, extra)
+#            field None -> publish the whole block (+ extra keys)
+#            field name -> publish {'value': block[field]}
+
+_BME280_FIELDS = (
+    ('temperature', 'h', 100),
+    ('humidity', 'H', 100),
+    ('pressure', 'I', 100),
+)
+_ENS160_FIELDS = (
+    ('aqi', 'B', 1),
+    ('tvoc', 'H', 1),
+    ('eco2', 'H', 1),
+)
+_MQ2_FIELDS = (
+    ('raw', 'H', 1),
+    ('ppm', 'H', 10),
+)
+_MQ7_FIELDS = (
+    ('raw', 'H', 1),
+    ('co_ppm', 'H', 10),
+)
+
+_INTERIOR = {'location': 'interior'}
+_EXTERIOR = {'location': 'exterior'}
+
+SCHEMAS = {
+    (NODE_HELMET, 1): (
+        ('orientation', (
+            ('heading', 'H', 100),
+            ('roll', 'h', 100),
+            ('pitch', 'h', 100),
+        ), (
+            ('helmet/orientation', None, None),
+        )),
+        ('environment', _BME280_FIELDS, (
+            ('helmet/temp', 'temperature', None),
+            ('helmet/humidity', 'humidity', None),
+            ('helmet/pressure', 'pressure', None),
+        )),
+        ('air_quality', _ENS160_FIELDS, (
+            ('helmet/air_quality', None, None),
+        )),
+        ('power', (
+            ('voltage', 'H', 1000),
+            ('current', 'h', 1000),
+            ('power', 'H', 1000),
+        ), (
+            ('helmet/power', None, None),
+        )),
+    ),
+    (NODE_BACKPACK, 1): (
+        ('bme280_int', _BME280_FIELDS, (
+            ('backpack/temp/interior', None, _INTERIOR),
+        )),
+        ('bme280_ext', _BME280_FIELDS, (
+            ('backpack/temp/exterior', None, _EXTERIOR),
+        )),
+        ('ens160_int', _ENS160_FIELDS, (
+            ('backpack/air_quality/interior', None, _INTERIOR),
+        )),
+        ('ens160_ext', _ENS160_FIELDS, (
+            ('backpack/air_quality/exterior', None, _EXTERIOR),
+        )),
+        ('mq2_int', _MQ2_FIELDS, (
+            ('backpack/gas/smoke/interior', None, _INTERIOR),
+        )),
+        ('mq2_ext', _MQ2_FIELDS, (
+            ('backpack/gas/smoke/exterior', None, _EXTERIOR),
+        )),
+        ('mq7_int', _MQ7_FIELDS, (
+            ('backpack/gas/co/interior', None, _INTERIOR),
+        )),
+        ('mq7_ext', _MQ7_FIELDS, (
+            ('backpack/gas/co/exterior', None, _EXTERIOR),
+        )),
+    ),
+}
+
+
+class _CompiledBlock:
+    """Precomputed struct format and scaling for one schema block"""
+
+    def __init__(self, bit, key, fields, fanout):
+        self.bit = bit
+        self.key = key
+        self.names = tuple(f[0] for f in fields)
+        self.scales = tuple(f[2] for f in fields)
+        self.limits = tuple(_LIMITS[f[1]] for f in fields)
+        self.format = '<' + ''.join(f[1] for f in fields)
+        self.size = struct.calcsize(self.format)
+        self.fanout = fanout
+
+
+def compile_schema(node, version=FRAME_VERSION):
+    """
+    Compile a registry entry into packing helpers
+
+    Args:
+        node: Node identifier (NODE_HELMET, NODE_BACKPACK)
+        version: Frame version
+
+    Returns:
+        Tuple of _CompiledBlock, in frame order
+    """
+    blocks = SCHEMAS[(node, version)]
+    return tuple(
+        _CompiledBlock(1 << i, key, fields, fanout)
+        for i, (key, fields, fanout) in enumerate(blocks)
+    )
+
+
+def max_frame_size(node, version=FRAME_VERSION):
+    """Size in bytes of a frame with every block present"""
+    return HEADER_SIZE + sum(b.size for b in compile_schema(node, version))
+
+
+class FrameEncoder:
+    """
+    Packs a read_all() dictionary into one binary frame
+
+    The output buffer is allocated once; encode() returns a memoryview
+    over it, valid until the next call.
+    """
+
+    def __init__(self, node, version=FRAME_VERSION):
+        self.node = node
+        self.version = version
+        self.blocks = compile_schema(node, version)
+        self.buffer = bytearray(max_frame_size(node, version))
+        self.view = memoryview(self.buffer)
+        self.seq = 0
+
+    def encode(self, sensor_data, ts_ms):
+        """
+        Encode sensor data
+
+        Args:
+            sensor_data: Dictionary of sensor blocks (None = missing)
+            ts_ms: Capture timestamp, ticks_ms() (wraps at 2**30)
+
+        Returns:
+            memoryview of the packed frame
+        """
+        buf = self.buffer
+        offset = HEADER_SIZE
+        mask = 0
+
+        for block in self.blocks:
+            data = sensor_data.get(block.key)
+            if not data:
+                continue
+            values = []
+            for name, scale, (lo, hi) in zip(block.names, block.scales, block.limits):
+                v = int(round(data[name] * scale))
+                if v < lo:
+                    v = lo
+                elif v > hi:
+                    v = hi
+                values.append(v)
+            struct.pack_into(block.format, buf, offset, *values)
+            offset += block.size
+            mask |= block.bit
+
+        struct.pack_into(HEADER_FORMAT, buf, 0, FRAME_MAGIC, self.version,
+                         self.node, self.seq, ts_ms & TICKS_MASK, mask)
+        self.seq = (self.seq + 1) & 0xFFFF
+        return self.view[:offset]
+
+
+def pack_batch_header(buf, node, count, now_ms, dropped):
+    """Write a batch header at the start of buf"""
+    struct.pack_into(BATCH_HEADER_FORMAT, buf, 0, BATCH_MAGIC, BATCH_VERSION, node,
+                     count, now_ms & TICKS_MASK, dropped & 0xFFFFFFFF)
+
+
+def ticks_diff_ms(new, old):
+    """Signed difference of two ticks_ms() values (MicroPython ticks_diff)"""
+    diff = (new - old) & TICKS_MASK
+    return diff - TICKS_PERIOD if diff & (TICKS_PERIOD >> 1) else diff
+
+
+def decode_batch(payload):
+    """
+    Split a backlog batch into its frames
+
+    Args:
+        payload: bytes-like batch message
+
+    Returns:
+        (header dict, list of frame memoryviews for decode_frame())
+
+    Raises:
+        ValueError: bad magic or truncated batch
+    """
+    if len(payload) < BATCH_HEADER_SIZE:
+        raise ValueError('Truncated batch header')
+    magic, version, node, count, now_ms, dropped = struct.unpack_from(BATCH_HEADER_FORMAT, payload, 0)
+    if magic != BATCH_MAGIC:
+        raise ValueError('Bad batch magic')
+
+    view = memoryview(payload)
+    frames = []
+    offset = BATCH_HEADER_SIZE
+    for _ in range(count):
+        if offset + RECORD_HEADER_SIZE > len(payload):
+            raise ValueError('Truncated batch record')
+        size = struct.unpack_from(RECORD_HEADER_FORMAT, payload, offset)[0]
+        offset += RECORD_HEADER_SIZE
+        if offset + size > len(payload):
+            raise ValueError('Truncated batch record')
+        frames.append(view[offset:offset + size])
+        offset += size
+
+    header = {
+        'version': version,
+        'node': node,
+        'count': count,
+        'now_ms': now_ms,
+        'dropped': dropped,
+    }
+    return header, frames
+
+
+_decoder_cache = {}
+
+
+def decode_frame(payload):
+    """
+    Decode a packed frame
+
+    Args:
+        payload: bytes-like frame
+
+    Returns:
+        (header dict, sensor data dict)
+
+    Raises:
+        ValueError: bad magic, unknown schema or truncated frame
+    """
+    if len(payload) < HEADER_SIZE:
+        raise ValueError('Truncated frame header')
+
+    magic, version, node, seq, ts_ms, mask = struct.unpack_from(HEADER_FORMAT, payload, 0)
+    if magic != FRAME_MAGIC:
+        raise ValueError('Bad frame magic')
+
+    blocks = _decoder_cache.get((node, version))
+    if blocks is None:
+        if (node, version) not in SCHEMAS:
+            raise ValueError('Unknown schema node=%d version=%d' % (node, version))
+        blocks = compile_schema(node, version)
+        _decoder_cache[(node, version)] = blocks
+
+    offset = HEADER_SIZE
+    data = {}
+    for block in blocks:
+        if not mask & block.bit:
+            continue
+        if offset + block.size > len(payload):
+            raise ValueError('Truncated frame block ' + block.key)
+        raw = struct.unpack_from(block.format, payload, offset)
+        offset += block.size
+        data[block.key] = {
+            name: (v / scale if scale != 1 else v)
+            for name, scale, v in zip(block.names, block.scales, raw)
+        }
+
+    header = {
+        'version': version,
+        'node': node,
+        'seq': seq,
+        'ts_ms': ts_ms,
+        'mask': mask,
+    }
+    return header, data
+
+
+def fanout(header, data):
+    """
+    Expand decoded frame data into legacy per-sensor messages
+
+    Args:
+        header: Header returned by decode_frame()
+        data: Sensor data returned by decode_frame()
+
+    Returns:
+        List of (topic, payload dict), same shape as the old JSON publishes
+    """
+    messages = []
+    for block in _decoder_cache.get((header['node'], header['version']), ()):
+        values = data.get(block.key)
+        if values is None:
+            continue
+        for topic, field, extra in block.fanout:
+            if field is None:
+                payload = dict(values)
+                if extra:
+                    payload.update(extra)
+            else:
+                payload = {'value': values[field]}
+            messages.append((topic, payload))
+    return messages
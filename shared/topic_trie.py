@@ -0,0 +1,139 @@
+"""
+MQTT topic trie
+Maps topic filters (with + and # wildcards) to handlers
+
+Lookup walks one trie level per topic level, so the cost depends on the
+topic depth and not on the number of subscriptions. Results are cached
+per concrete topic until the subscriptions change.
+"""
+
+
+class _Node:
+    __slots__ = ('children', 'handlers')
+
+    def __init__(self):
+        self.children = {}
+        self.handlers = []
+
+
+def validate_filter(topic_filter):
+    """
+    Check a subscription filter
+
+    Raises:
+        ValueError: misplaced wildcard
+    """
+    levels = topic_filter.split('/')
+    for i, level in enumerate(levels):
+        if level == '#' and i != len(levels) - 1:
+            raise ValueError(f"'#' must be the last level: {topic_filter}")
+        if level not in ('+', '#') and ('+' in level or '#' in level):
+            raise ValueError(f"Wildcard must occupy a whole level: {topic_filter}")
+    return levels
+
+
+class TopicTrie:
+    """Subscription filter -> handlers, with O(topic depth) matching"""
+
+    def __init__(self, cache_size=1024):
+        self._root = _Node()
+        self._cache = {}
+        self._cache_size = cache_size
+        self._filters = {}
+
+    def __len__(self):
+        return sum(len(handlers) for handlers in self._filters.values())
+
+    def filters(self):
+        """Subscribed filters"""
+        return list(self._filters)
+
+    def add(self, topic_filter, handler):
+        """Register a handler for a filter"""
+        node = self._root
+        for level in validate_filter(topic_filter):
+            node = node.children.setdefault(level, _Node())
+        if handler not in node.handlers:
+            node.handlers.append(handler)
+        self._filters[topic_filter] = node.handlers
+        self._cache.clear()
+
+    def remove(self, topic_filter, handler=None):
+        """
+        Unregister a handler (or every handler) of a filter
+
+        Returns:
+            True if the filter has no handler left
+        """
+        path = [self._root]
+        for level in topic_filter.split('/'):
+            node = path[-1].children.get(level)
+            if node is None:
+                return True
+            path.append(node)
+
+        node = path[-1]
+        if handler is None:
+            node.handlers.clear()
+        elif handler in node.handlers:
+            node.handlers.remove(handler)
+
+        empty = not node.handlers
+        if empty:
+            self._filters.pop(topic_filter, None)
+            # Prune dead branches
+            levels = topic_filter.split('/')
+            for i in range(len(levels), 0, -1):
+                child = path[i]
+                if child.handlers or child.children:
+                    break
+                del path[i - 1].children[levels[i - 1]]
+        self._cache.clear()
+        return empty
+
+    def match(self, topic):
+        """
+        Handlers whose filter matches a concrete topic
+
+        Returns:
+            Tuple of handlers (each at most once, in subscription order per filter)
+        """
+        handlers = self._cache.get(topic)
+        if handlers is not None:
+            return handlers
+
+        levels = topic.split('/')
+        found = []
+        # '$SYS/...' topics are not matched by a leading wildcard
+        system = topic.startswith('$')
+        nodes = [self._root]
+        for depth, level in enumerate(levels):
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                if not (system and depth == 0):
+                    wildcard = children.get('#')
+                    if wildcard is not None:
+                        found.extend(wildcard.handlers)
+                    plus = children.get('+')
+                    if plus is not None:
+                        next_nodes.append(plus)
+                exact = children.get(level)
+                if exact is not None:
+                    next_nodes.append(exact)
+            nodes = next_nodes
+            if not nodes:
+                break
+
+        for node in nodes:
+            found.extend(node.handlers)
+            # 'a/#' also matches 'a'
+            wildcard = node.children.get('#')
+            if wildcard is not None:
+                found.extend(wildcard.handlers)
+
+        handlers = tuple(dict.fromkeys(found))
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[topic] = handlers
+        return handlers
@@ -0,0 +1,91 @@
+"""
+Hardware simulation for dev boxes
+
+Fake MicroPython modules (machine, network, umqtt.simple, uasyncio) and
+Pi peripherals (picamera2, smbus2) backed by synthetic sensor and camera
+generators, so the node programs run unmodified under CPython.
+
+    python -m sim.run helmet/esp32_helmet --broker 127.0.0.1:1883
+    python -m sim.run helmet/pi_zero_left_eye --broker 127.0.0.1 --server 127.0.0.1
+    python -m sim.loadgen --broker 127.0.0.1 --armors 1,4,16,64
+"""
+
+import sys
+import time
+from pathlib import Path
+
+SIM_DIR = Path(__file__).parent
+MICROPYTHON_DIR = SIM_DIR / 'micropython'
+PI_DIR = SIM_DIR / 'pi'
+
+# Broker the fake umqtt client connects to (None = address given by the code)
+settings = {
+    'broker': None,
+    'seed': 0,
+}
+
+
+def _ticks_ms():
+    return int(time.monotonic() * 1000) & 0x3FFFFFFF
+
+
+def _ticks_us():
+    return int(time.monotonic() * 1000000) & 0x3FFFFFFF
+
+
+def _ticks_add(ticks, delta):
+    return (ticks + delta) & 0x3FFFFFFF
+
+
+def _ticks_diff(a, b):
+    # Signed difference on the 30-bit MicroPython ticks ring
+    diff = (a - b) & 0x3FFFFFFF
+    return diff - 0x40000000 if diff & 0x20000000 else diff
+
+
+def _sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def _sleep_us(us):
+    time.sleep(us / 1000000)
+
+
+def install_micropython(broker=None, seed=0):
+    """
+    Make the MicroPython-only modules importable
+
+    Adds the fake machine / network / umqtt / uasyncio modules to
+    sys.path and the ticks_* / sleep_ms helpers to the time module.
+
+    Args:
+        broker: 'host[:port]' overriding the broker used by umqtt
+        seed: Seed of the synthetic sensor generators
+    """
+    settings['broker'] = broker
+    settings['seed'] = seed
+    for name, func in (('ticks_ms', _ticks_ms), ('ticks_us', _ticks_us),
+                       ('ticks_add', _ticks_add), ('ticks_diff', _ticks_diff),
+                       ('sleep_ms', _sleep_ms), ('sleep_us', _sleep_us)):
+        if not hasattr(time, name):
+            setattr(time, name, func)
+    if str(MICROPYTHON_DIR) not in sys.path:
+        sys.path.insert(0, str(MICROPYTHON_DIR))
+
+
+def install_pi(seed=0):
+    """Make picamera2 / smbus2 importable on a machine without them"""
+    settings['seed'] = seed
+    if str(PI_DIR) not in sys.path:
+        sys.path.insert(0, str(PI_DIR))
+
+
+def broker_address(host, port):
+    """Apply the broker override to an address used by the node code"""
+    override = settings['broker']
+    if not override:
+        return host, port
+    if ':' in override:
+        host, port = override.rsplit(':', 1)
+        return host, int(port)
+    return override, port
@@ -0,0 +1,316 @@
+"""
+Simulated I2C buses and devices
+
+A SimBus holds the devices of one ESP32 I2C bus, optionally behind
+PCA9548A multiplexers, and models the wire time of each transaction
+(9 clock cycles per byte, address included) so driver timing can be
+compared between 100 kHz and 400 kHz.
+
+The BME280, ENS160, AHT21 and BNO055 models expose the real register
+maps (chip ids, calibration, status bits, conversion delays) with their
+values taken from a SensorWorld, so the drivers of
+shared/sensor_drivers.py run unchanged against them.
+"""
+
+import struct
+import time
+
+
+class RegisterDevice:
+    """
+    I2C device with a 256-byte register file
+
+    Writes set the register pointer (first byte) then store data;
+    reads return registers from the pointer on.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.registers = bytearray(256)
+        self.pointer = 0
+
+    def refresh(self):
+        """Hook to update registers from the world before a read"""
+
+    def write(self, data):
+        if not data:
+            return
+        self.pointer = data[0]
+        for i, byte in enumerate(data[1:]):
+            self.registers[(self.pointer + i) & 0xFF] = byte
+
+    def read(self, nbytes):
+        self.refresh()
+        start = self.pointer
+        return bytes(self.registers[(start + i) & 0xFF] for i in range(nbytes))
+
+
+class Bme280Device(RegisterDevice):
+    """
+    BME280 with typical factory calibration
+
+    The raw ADC values are found by bisection against the datasheet
+    floating-point compensation, so the driver reads back the world
+    values within the sensor resolution.
+    """
+
+    # T1..T3, P1..P9, H1..H6
+    CALIBRATION = (27504, 26435, -1000, 36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000,
+                   75, 362, 0, 313, 50, 30)
+
+    def __init__(self, name, world, location='interior'):
+        super().__init__(name)
+        self.world = world
+        self.location = location
+        (self.t1, self.t2, self.t3, self.p1, self.p2, self.p3, self.p4, self.p5, self.p6, self.p7,
+         self.p8, self.p9, self.h1, self.h2, self.h3, self.h4, self.h5, self.h6) = self.CALIBRATION
+        regs = self.registers
+        regs[0xD0] = 0x60
+        struct.pack_into('<HhhHhhhhhhhh', regs, 0x88, *self.CALIBRATION[:12])
+        regs[0xA1] = self.h1
+        struct.pack_into('<hB', regs, 0xE1, self.h2, self.h3)
+        regs[0xE4] = (self.h4 >> 4) & 0xFF
+        regs[0xE5] = (self.h4 & 0x0F) | ((self.h5 & 0x0F) << 4)
+        regs[0xE6] = (self.h5 >> 4) & 0xFF
+        regs[0xE7] = self.h6 & 0xFF
+
+    def _t_fine(self, adc_t):
+        var1 = (adc_t / 16384.0 - self.t1 / 1024.0) * self.t2
+        var2 = (adc_t / 131072.0 - self.t1 / 8192.0) ** 2 * self.t3
+        return var1 + var2
+
+    def _pressure(self, adc_p, t_fine):
+        var1 = t_fine / 2.0 - 64000.0
+        var2 = var1 * var1 * self.p6 / 32768.0 + var1 * self.p5 * 2.0
+        var2 = var2 / 4.0 + self.p4 * 65536.0
+        var1 = (self.p3 * var1 * var1 / 524288.0 + self.p2 * var1) / 524288.0
+        var1 = (1.0 + var1 / 32768.0) * self.p1
+        p = (1048576.0 - adc_p - var2 / 4096.0) * 6250.0 / var1
+        return p + (self.p9 * p * p / 2147483648.0 + p * self.p8 / 32768.0 + self.p7) / 16.0
+
+    def _humidity(self, adc_h, t_fine):
+        h = t_fine - 76800.0
+        h = (adc_h - (self.h4 * 64.0 + self.h5 / 16384.0 * h)) * (
+            self.h2 / 65536.0 * (1.0 + self.h6 / 67108864.0 * h * (1.0 + self.h3 / 67108864.0 * h)))
+        return h * (1.0 - self.h1 * h / 524288.0)
+
+    @staticmethod
+    def _solve(func, target, hi, increasing=True):
+        lo = 0
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if (func(mid) < target) == increasing:
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def refresh(self):
+        if self.pointer < 0xF7:
+            return
+        env = self.world.environment(self.location)
+        adc_t = self._solve(lambda v: self._t_fine(v) / 5120.0, env['temperature'], 1 << 20)
+        t_fine = self._t_fine(adc_t)
+        adc_p = self._solve(lambda v: self._pressure(v, t_fine), env['pressure'] * 100, 1 << 20, False)
+        adc_h = self._solve(lambda v: self._humidity(v, t_fine), env['humidity'], 1 << 16)
+        regs = self.registers
+        regs[0xF7:0xFA] = bytes((adc_p >> 12, (adc_p >> 4) & 0xFF, (adc_p & 0x0F) << 4))
+        regs[0xFA:0xFD] = bytes((adc_t >> 12, (adc_t >> 4) & 0xFF, (adc_t & 0x0F) << 4))
+        regs[0xFD:0xFF] = bytes((adc_h >> 8, adc_h & 0xFF))
+
+
+class Ens160Device(RegisterDevice):
+    """ENS160: a new result every second in standard mode, NEWDAT cleared by the data read"""
+
+    def __init__(self, name, world):
+        super().__init__(name)
+        self.world = world
+        self.registers[0x00:0x02] = b'\x60\x01'
+        self.result_at = None
+
+    def refresh(self):
+        if self.pointer != 0x20 or self.registers[0x10] != 0x02:
+            return
+        now = self.world.clock()
+        if self.result_at is None or now - self.result_at >= 1.0:
+            self.result_at = now
+            air = self.world.air_quality()
+            struct.pack_into('<BBHH', self.registers, 0x20, 0x02, air['aqi'], air['tvoc'], air['eco2'])
+
+    def read(self, nbytes):
+        data = super().read(nbytes)
+        if self.pointer == 0x20:
+            self.registers[0x20] &= ~0x02
+        return data
+
+
+class Aht21Device:
+    """AHT21: command-triggered conversion (80 ms busy), 7-byte status + data + CRC8 read"""
+
+    CONVERSION = 0.08
+
+    def __init__(self, name, world, location='interior'):
+        self.name = name
+        self.world = world
+        self.location = location
+        self.calibrated = False
+        self.ready_at = None
+        self.data = bytearray(6)
+
+    def write(self, data):
+        if data[:1] == b'\xbe':
+            self.calibrated = True
+        elif data[:1] == b'\xac':
+            env = self.world.environment(self.location)
+            raw_h = int(max(0.0, min(100.0, env['humidity'])) / 100 * (1 << 20)) & 0xFFFFF
+            raw_t = int((env['temperature'] + 50) / 200 * (1 << 20)) & 0xFFFFF
+            self.data[1:6] = bytes((raw_h >> 12, (raw_h >> 4) & 0xFF, ((raw_h & 0x0F) << 4) | (raw_t >> 16),
+                                    (raw_t >> 8) & 0xFF, raw_t & 0xFF))
+            self.ready_at = self.world.clock() + self.CONVERSION
+
+    def read(self, nbytes):
+        busy = self.ready_at is not None and self.world.clock() < self.ready_at
+        self.data[0] = (0x80 if busy else 0) | (0x08 if self.calibrated else 0) | 0x10
+        crc = 0xFF
+        for byte in self.data:
+            crc ^= byte
+            for _ in range(8):
+                crc = ((crc << 1) ^ 0x31) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        return bytes(self.data + bytes((crc,)))[:nbytes]
+
+
+class Bno055Device(RegisterDevice):
+    """BNO055: Euler angles (1/16 degree) from the world once in NDOF mode"""
+
+    def __init__(self, name, world):
+        super().__init__(name)
+        self.world = world
+        self.registers[0x00] = 0xA0
+
+    def refresh(self):
+        if self.pointer != 0x1A or self.registers[0x3D] != 0x0C:
+            return
+        o = self.world.orientation()
+        struct.pack_into('<Hhh', self.registers, 0x1A, int(o['heading'] * 16) % 5760,
+                         int(o['roll'] * 16), int(o['pitch'] * 16))
+
+
+class Pca9548aDevice:
+    """PCA9548A multiplexer: one control byte, bit n enables channel n"""
+
+    name = 'PCA9548A'
+
+    def __init__(self):
+        self.mask = 0
+        self.writes = 0
+
+    def write(self, data):
+        if data:
+            self.mask = data[-1]
+            self.writes += 1
+
+    def read(self, nbytes):
+        return bytes((self.mask,)) * nbytes
+
+
+class SimBus:
+    """
+    Devices of one bus
+
+    Args:
+        freq: Bus clock (Hz), used for the wire-time model
+        timing: Sleep for the modelled wire time of each transaction
+    """
+
+    def __init__(self, freq=100000, timing=True):
+        self.freq = freq
+        self.timing = timing
+        self.devices = []  # (address, device, mux address, channel)
+        self.transactions = 0
+        self.bytes = 0
+        self.wire_time = 0.0
+
+    def add(self, address, device, mux=None, channel=None):
+        self.devices.append((address, device, mux, channel))
+        return device
+
+    def _muxes(self):
+        return {addr: dev for addr, dev, mux, _ in self.devices if isinstance(dev, Pca9548aDevice) and mux is None}
+
+    def visible(self):
+        """Devices answering on the bus with the current multiplexer state"""
+        muxes = self._muxes()
+        found = {}
+        for address, device, mux, channel in self.devices:
+            if mux is None or (mux in muxes and muxes[mux].mask & (1 << channel)):
+                found.setdefault(address, device)
+        return found
+
+    def device(self, address):
+        device = self.visible().get(address)
+        if device is None:
+            self._account(1)
+            raise OSError(19, 'ENODEV')  # MicroPython raises OSError on NACK
+        return device
+
+    def _account(self, nbytes):
+        self.transactions += 1
+        self.bytes += nbytes
+        # START + (address + data) * 9 bits + STOP
+        duration = (nbytes * 9 + 2) / self.freq
+        self.wire_time += duration
+        if self.timing:
+            time.sleep(duration)
+
+    def write(self, address, data):
+        device = self.device(address)
+        self._account(1 + len(data))
+        device.write(bytes(data))
+
+    def read(self, address, nbytes):
+        device = self.device(address)
+        self._account(1 + nbytes)
+        return device.read(nbytes)
+
+    def stats(self):
+        return {
+            'transactions': self.transactions,
+            'bytes': self.bytes,
+            'wire_time_ms': round(self.wire_time * 1000, 3),
+        }
+
+
+def helmet_bus(config, world, freq=None):
+    """Bus of the helmet ESP32, built from its config module (dict)"""
+    bus = SimBus(freq or config['I2C_FREQ'])
+    bus.add(config['PCA9548A_ADDR'], Pca9548aDevice())
+    devices = {
+        'BNO055': Bno055Device('BNO055', world),
+        'BME280': Bme280Device('BME280', world),
+        'ENS160': Ens160Device('ENS160', world),
+        'AHT21': Aht21Device('AHT21', world),
+        'INA219': RegisterDevice('INA219'),
+    }
+    for name, device in devices.items():
+        channel = config.get(f'{name}_CHANNEL')
+        mux = config['PCA9548A_ADDR'] if channel is not None else None
+        bus.add(config[f'{name}_ADDR'], device, mux, channel)
+    return bus
+
+
+def backpack_bus(config, world, freq=None):
+    """Bus of the backpack ESP32: interior on the main bus, exterior behind the ext mux"""
+    bus = SimBus(freq or config['I2C_FREQ'])
+    ext = config['PCA9548A_EXT_ADDR']
+    bus.add(config['PCA9548A_INT_ADDR'], Pca9548aDevice())
+    bus.add(ext, Pca9548aDevice())
+    bus.add(config['BME280_INT_ADDR'], Bme280Device('BME280_INT', world, 'interior'))
+    bus.add(config['ENS160_INT_ADDR'], Ens160Device('ENS160_INT', world))
+    bus.add(config['AHT21_INT_ADDR'], Aht21Device('AHT21_INT', world, 'interior'))
+    bus.add(config['BME280_EXT_ADDR'], Bme280Device('BME280_EXT', world, 'exterior'),
+            ext, config.get('BME280_EXT_CHANNEL', 0))
+    bus.add(config['ENS160_EXT_ADDR'], Ens160Device('ENS160_EXT', world), ext, config.get('ENS160_EXT_CHANNEL', 1))
+    bus.add(config['AHT21_EXT_ADDR'], Aht21Device('AHT21_EXT', world, 'exterior'),
+            ext, config.get('ENS160_EXT_CHANNEL', 1))
+    bus.add(config['INA219_ADDR'], RegisterDevice('INA219'))
+    return bus
@@ -0,0 +1,351 @@
+"""
+Multi-armor load generator for the Pi 5 server
+
+Each simulated armor is a helmet and a backpack ESP32 (per-sensor
+cadences taken from their config.py, packed telemetry frames built with
+the real encoder and scheduler) plus, optionally, two eye frame streams
+to the TCP frame port. The number of armors is stepped up and, at each
+level, the generator measures:
+
+- telemetry fan-out delivered by the server vs. expected
+- history request round-trip time (server responsiveness under load)
+- the generator's own CPU use (to make sure it is not the bottleneck)
+
+The scaling limit is the first level where delivery drops below
+--min-delivery or the p95 round trip exceeds --max-rtt.
+
+Usage:
+    python -m sim.loadgen --broker 127.0.0.1 --armors 1,4,16,64 --duration 10
+    python -m sim.loadgen --armors 1,2,4 --fps 10 --frames-host 127.0.0.1 --json report.json
+"""
+
+import argparse
+import asyncio
+import json
+import runpy
+import struct
+import sys
+import time
+from pathlib import Path
+
+import sim
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'shared'))
+
+from mqtt_async import AsyncMQTTClient
+from sensor_scheduler import SensorScheduler
+from deadband import DeadbandFilter
+from telemetry_schema import FrameEncoder, SCHEMAS, FRAME_VERSION, NODE_HELMET, NODE_BACKPACK
+from frame_transport import HEADER_FORMAT, FRAME_VERSION as STREAM_VERSION, FRAME_PORT, EYE_LEFT, EYE_RIGHT, CODEC_JPEG
+from mqtt_topics import HELMET_TELEMETRY, BACKPACK_TELEMETRY, BACKPACK_HISTORY_REQUEST
+from sim.world import SensorWorld, SyntheticScene, encode_jpeg
+
+PROBE_TOPIC = 'sim/loadgen/history'
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def fanout_counts(node):
+    """Legacy messages published by the server per telemetry block"""
+    return {key: len(fanout) for key, _, fanout in SCHEMAS[(node, FRAME_VERSION)]}
+
+
+def fanout_topics():
+    topics = set()
+    for blocks in SCHEMAS.values():
+        for _, _, fanout in blocks:
+            topics.update(topic for topic, _, _ in fanout)
+    return sorted(topics)
+
+
+def mq_reading(world, name, full_scale_ppm):
+    volts = world.gas_voltage(name)
+    raw = int(max(0.0, min(3.3, volts)) / 3.3 * 4095)
+    return raw, raw / 4095 * full_scale_ppm
+
+
+class Counters:
+    def __init__(self):
+        self.frames = 0
+        self.expected = 0
+        self.received = 0
+        self.eye_frames = 0
+        self.eye_bytes = 0
+        self.rtt = []
+        self.probe_timeouts = 0
+
+    def reset(self):
+        self.__init__()
+
+
+class SimArmor:
+    """
+    One simulated armor
+
+    Args:
+        index: Armor number (client id suffix, random seed)
+        args: Parsed command line
+        helmet_config / backpack_config: ESP32 config.py globals
+        counters: Shared Counters
+        jpeg_pool: Pre-encoded frames for the eye streams (None = no eyes)
+    """
+
+    def __init__(self, index, args, helmet_config, backpack_config, counters, jpeg_pool=None):
+        self.index = index
+        self.args = args
+        self.counters = counters
+        self.jpeg_pool = jpeg_pool
+        self.world = world = SensorWorld(seed=args.seed + index)
+        self.tasks = []
+        self.clients = []
+
+        self.helmet = self._node('esp32_helmet', NODE_HELMET, HELMET_TELEMETRY, helmet_config)
+        self.helmet_scheduler = SensorScheduler(self.helmet)
+        hc = helmet_config
+        self.helmet_scheduler.add('orientation', world.orientation, hc['BNO055_PERIOD_MS'])
+        self.helmet_scheduler.add('environment', world.environment, hc['BME280_PERIOD_MS'])
+        self.helmet_scheduler.add('air_quality', world.air_quality, hc['ENS160_PERIOD_MS'])
+        self.helmet_scheduler.add('power', world.power, hc['INA219_PERIOD_MS'])
+
+        self.backpack = self._node('esp32_backpack', NODE_BACKPACK, BACKPACK_TELEMETRY, backpack_config)
+        self.backpack_scheduler = SensorScheduler(self.backpack)
+        bc = backpack_config
+        for location in ('interior', 'exterior'):
+            suffix = location[:3]
+            self.backpack_scheduler.add(f'bme280_{suffix}', lambda l=location: world.environment(l), bc['BME280_PERIOD_MS'])
+            self.backpack_scheduler.add(f'ens160_{suffix}', world.air_quality, bc['ENS160_PERIOD_MS'])
+            self.backpack_scheduler.add(f'mq2_{suffix}', lambda l=location: self._mq2(l), bc['MQ_PERIOD_MS'])
+            self.backpack_scheduler.add(f'mq7_{suffix}', lambda l=location: self._mq7(l), bc['MQ_PERIOD_MS'])
+
+    def _mq2(self, location):
+        raw, ppm = mq_reading(self.world, f'mq2/{location}', 1000)
+        return {'raw': raw, 'ppm': ppm}
+
+    def _mq7(self, location):
+        raw, ppm = mq_reading(self.world, f'mq7/{location}', 200)
+        return {'raw': raw, 'co_ppm': ppm}
+
+    def _node(self, name, node, topic, config):
+        client = AsyncMQTTClient(f'sim{self.index}_{name}', self.args.host, self.args.port)
+        self.clients.append(client)
+        encoder = FrameEncoder(node)
+        counts = fanout_counts(node)
+        counters = self.counters
+        deadband = None if self.args.no_deadband else DeadbandFilter(config['DEADBANDS'], config['HEARTBEAT_MS'])
+
+        def on_ready(readings):
+            if deadband is not None:
+                readings = deadband.filter(readings)
+                if not readings:
+                    return
+            frame = encoder.encode(readings, time.ticks_ms())
+            if client.publish(topic, bytes(frame)):
+                counters.frames += 1
+                counters.expected += sum(counts[key] for key in readings)
+
+        return on_ready
+
+    async def start(self):
+        for client in self.clients:
+            await client.start()
+        for client in self.clients:
+            await client.wait_connected(10.0)
+        self.tasks.append(asyncio.create_task(self.helmet_scheduler.run()))
+        self.tasks.append(asyncio.create_task(self.backpack_scheduler.run()))
+        if self.jpeg_pool:
+            for eye in (EYE_LEFT, EYE_RIGHT):
+                self.tasks.append(asyncio.create_task(self._eye_stream(eye)))
+
+    async def _eye_stream(self, eye):
+        """Synthetic eye: pre-encoded JPEGs at --fps over the frame TCP port"""
+        reader, writer = await asyncio.open_connection(self.args.frames_host, self.args.frames_port)
+        interval = 1.0 / self.args.fps
+        header = bytearray(struct.calcsize(HEADER_FORMAT))
+        seq = 0
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        try:
+            while True:
+                data = self.jpeg_pool[(seq + self.index) % len(self.jpeg_pool)]
+                struct.pack_into(HEADER_FORMAT, header, 0, len(data), STREAM_VERSION, eye,
+                                 CODEC_JPEG, seq, time.time())
+                writer.write(bytes(header))
+                writer.write(data)
+                await writer.drain()
+                self.counters.eye_frames += 1
+                self.counters.eye_bytes += len(header) + len(data)
+                seq += 1
+                next_time = max(next_time + interval, loop.time())
+                await asyncio.sleep(next_time - loop.time())
+        finally:
+            writer.close()
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        for client in self.clients:
+            await client.stop()
+
+
+class Monitor:
+    """Counts the server fan-out and probes the history service"""
+
+    def __init__(self, args, counters):
+        self.args = args
+        self.counters = counters
+        self.client = AsyncMQTTClient('sim_loadgen_monitor', args.host, args.port)
+        self._pending = {}
+        self._probe_id = 0
+        for topic in fanout_topics():
+            self.client.subscribe(topic, self._on_fanout)
+        self.client.subscribe(PROBE_TOPIC, self._on_probe)
+
+    def _on_fanout(self, topic, payload):
+        self.counters.received += 1
+
+    def _on_probe(self, topic, payload):
+        try:
+            probe_id = json.loads(payload).get('id')
+        except ValueError:
+            return
+        sent = self._pending.pop(probe_id, None)
+        if sent is not None:
+            self.counters.rtt.append((time.perf_counter() - sent) * 1000)
+
+    async def start(self):
+        await self.client.start()
+        await self.client.wait_connected(10.0)
+
+    async def probe_loop(self):
+        while True:
+            await asyncio.sleep(self.args.probe_interval)
+            now = time.perf_counter()
+            for probe_id, sent in list(self._pending.items()):
+                if now - sent > self.args.probe_timeout:
+                    del self._pending[probe_id]
+                    self.counters.probe_timeouts += 1
+            self._probe_id += 1
+            self._pending[self._probe_id] = now
+            self.client.publish(BACKPACK_HISTORY_REQUEST, {
+                'id': self._probe_id, 'topic': 'helmet/temp', 'window': 10, 'reply_to': PROBE_TOPIC,
+            })
+
+    async def stop(self):
+        await self.client.stop()
+
+
+def make_jpeg_pool(count=30, quality=80):
+    scene = SyntheticScene()
+    return [encode_jpeg(scene.render(i / 10.0), quality) for i in range(count)]
+
+
+async def run(args):
+    sim.install_micropython()  # ticks_ms / ticks_diff for the scheduler and encoder
+    helmet_config = runpy.run_path(str(REPO_ROOT / 'helmet' / 'esp32_helmet' / 'config.py'))
+    backpack_config = runpy.run_path(str(REPO_ROOT / 'backpack' / 'esp32_backpack' / 'config.py'))
+    jpeg_pool = make_jpeg_pool() if args.fps > 0 else None
+
+    counters = Counters()
+    monitor = Monitor(args, counters)
+    await monitor.start()
+    probe_task = asyncio.create_task(monitor.probe_loop())
+
+    armors = []
+    results = []
+    limit = None
+    try:
+        for level in args.armors:
+            while len(armors) < level:
+                armor = SimArmor(len(armors), args, helmet_config, backpack_config, counters, jpeg_pool)
+                await armor.start()
+                armors.append(armor)
+
+            await asyncio.sleep(args.warmup)
+            counters.reset()
+            wall, cpu = time.perf_counter(), time.process_time()
+            await asyncio.sleep(args.duration)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+            delivery = counters.received / counters.expected if counters.expected else 0.0
+            result = {
+                'armors': level,
+                'frames_per_s': round(counters.frames / wall, 1),
+                'fanout_expected_per_s': round(counters.expected / wall, 1),
+                'fanout_received_per_s': round(counters.received / wall, 1),
+                'delivery': round(delivery, 4),
+                'rtt_p50_ms': percentile(counters.rtt, 50),
+                'rtt_p95_ms': percentile(counters.rtt, 95),
+                'rtt_p99_ms': percentile(counters.rtt, 99),
+                'probe_timeouts': counters.probe_timeouts,
+                'eye_fps': round(counters.eye_frames / wall, 1),
+                'eye_mbps': round(counters.eye_bytes * 8 / wall / 1e6, 2),
+                'generator_cpu': round(cpu / wall, 2),
+            }
+            results.append(result)
+            print_row(result)
+
+            p95 = result['rtt_p95_ms']
+            if delivery < args.min_delivery or p95 is None or p95 > args.max_rtt:
+                limit = level
+                break
+    finally:
+        probe_task.cancel()
+        for armor in armors:
+            await armor.stop()
+        await monitor.stop()
+
+    if limit is None:
+        print(f"\nNo limit reached up to {args.armors[-1]} armors")
+    else:
+        print(f"\nScaling limit: {limit} armors (delivery < {args.min_delivery} or p95 RTT > {args.max_rtt} ms)")
+    return {'results': results, 'limit': limit}
+
+
+def print_row(result):
+    if result['armors'] == print_row.first:
+        print(f"{'armors':>6} {'frames/s':>9} {'fanout exp/s':>13} {'recv/s':>9} {'delivery':>9} "
+              f"{'rtt p50':>8} {'p95':>8} {'p99':>8} {'eye fps':>8} {'gen cpu':>8}")
+    fmt = lambda v: '-' if v is None else f'{v:.1f}'
+    print(f"{result['armors']:>6} {result['frames_per_s']:>9} {result['fanout_expected_per_s']:>13} "
+          f"{result['fanout_received_per_s']:>9} {result['delivery']:>9.3f} {fmt(result['rtt_p50_ms']):>8} "
+          f"{fmt(result['rtt_p95_ms']):>8} {fmt(result['rtt_p99_ms']):>8} {result['eye_fps']:>8} "
+          f"{result['generator_cpu']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--broker', default='127.0.0.1:1883', help='MQTT broker host[:port]')
+    parser.add_argument('--armors', default='1,2,4,8,16,32,64', help='Comma-separated armor counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='Measurement window per level (s)')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Settle time after adding armors (s)')
+    parser.add_argument('--fps', type=float, default=0.0, help='Eye frame rate per eye (0 = no frames)')
+    parser.add_argument('--frames-host', default='127.0.0.1', help='Pi 5 frame server host')
+    parser.add_argument('--frames-port', type=int, default=FRAME_PORT)
+    parser.add_argument('--probe-interval', type=float, default=0.2, help='History RTT probe period (s)')
+    parser.add_argument('--probe-timeout', type=float, default=2.0)
+    parser.add_argument('--min-delivery', type=float, default=0.99)
+    parser.add_argument('--max-rtt', type=float, default=100.0, help='p95 history RTT limit (ms)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-deadband', action='store_true', help='Publish every reading (no deadband filter)')
+    parser.add_argument('--json', type=Path, help='Write the report to this file')
+    args = parser.parse_args()
+
+    host, _, port = args.broker.partition(':')
+    args.host, args.port = host, int(port or 1883)
+    args.armors = sorted(int(n) for n in args.armors.split(','))
+    print_row.first = args.armors[0]
+
+    report = asyncio.run(run(args))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
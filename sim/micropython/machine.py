@@ -0,0 +1,162 @@
+"""
+Fake MicroPython machine module (Pin, PWM, ADC, I2C)
+
+I2C traffic goes to the SimBus in sim.settings['i2c_bus'], ADC pins read
+the voltage sources in sim.settings['adc'] (pin -> callable returning volts).
+"""
+
+import random
+import time
+
+import sim
+from sim.devices import SimBus
+
+_rng = random.Random(sim.settings['seed'])
+
+
+def freq(hz=None):
+    return 240000000
+
+
+def unique_id():
+    return b'\x24\x0a\xc4\x00\x00\x01'
+
+
+def reset():
+    raise SystemExit('machine.reset()')
+
+
+def idle():
+    time.sleep(0)
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        self._value = value or 0
+
+    def value(self, x=None):
+        if x is None:
+            return self._value
+        self._value = 1 if x else 0
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def __repr__(self):
+        return f'Pin({self.id})'
+
+
+class PWM:
+    def __init__(self, pin, freq=5000, duty=0):
+        self.pin = pin
+        self._freq = freq
+        self._duty = duty
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = max(0, min(1023, int(value)))
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty * 64
+        self._duty = max(0, min(65535, int(value))) >> 6
+
+    def deinit(self):
+        self._duty = 0
+
+
+class ADC:
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    WIDTH_9BIT = 0
+    WIDTH_10BIT = 1
+    WIDTH_11BIT = 2
+    WIDTH_12BIT = 3
+
+    # Full-scale voltage per attenuation (ESP32)
+    _FULL_SCALE = {ATTN_0DB: 1.1, ATTN_2_5DB: 1.5, ATTN_6DB: 2.2, ATTN_11DB: 3.3}
+
+    def __init__(self, pin, atten=ATTN_0DB):
+        self.pin = pin
+        self._atten = atten
+        self._bits = 12
+        self.samples = 0
+
+    def atten(self, value):
+        self._atten = value
+
+    def width(self, value):
+        self._bits = 9 + value
+
+    def _volts(self):
+        source = sim.settings.get('adc', {}).get(self.pin.id)
+        volts = source() if source else 0.1
+        # ~10 mV of conversion noise, like the real ESP32 ADC
+        return volts + _rng.gauss(0.0, 0.01)
+
+    def read_uv(self):
+        self.samples += 1
+        return int(max(0.0, min(self._FULL_SCALE[self._atten], self._volts())) * 1000000)
+
+    def read(self):
+        full = self._FULL_SCALE[self._atten]
+        top = (1 << self._bits) - 1
+        return int(round(self.read_uv() / 1000000 / full * top))
+
+    def read_u16(self):
+        return self.read() << (16 - self._bits)
+
+
+class I2C:
+    def __init__(self, id=0, scl=None, sda=None, freq=400000, timeout=50000):
+        bus = sim.settings.get('i2c_bus')
+        if bus is None:
+            bus = sim.settings['i2c_bus'] = SimBus(freq)
+        bus.freq = freq
+        self.bus = bus
+
+    def init(self, scl=None, sda=None, freq=400000):
+        self.bus.freq = freq
+
+    def scan(self):
+        return sorted(self.bus.visible())
+
+    def writeto(self, addr, buf, stop=True):
+        self.bus.write(addr, buf)
+        return 1
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return self.bus.read(addr, nbytes)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self.bus.read(addr, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        self.bus.write(addr, bytes((memaddr,)) + bytes(buf))
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        self.bus.write(addr, bytes((memaddr,)))
+        return self.bus.read(addr, nbytes)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        self.bus.write(addr, bytes((memaddr,)))
+        buf[:] = self.bus.read(addr, len(buf))
@@ -0,0 +1,61 @@
+"""
+Fake MicroPython network module (WLAN)
+
+The link is up as soon as connect() is called; set_link(False)
+simulates losing the access point. As on the board, every
+WLAN(interface) object drives the same interface.
+"""
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+
+_link = {'up': True}
+_interfaces = {}
+
+
+def set_link(up):
+    """Simulate the access point going away / coming back"""
+    _link['up'] = bool(up)
+
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._state = _interfaces.setdefault(interface, {'active': False, 'ssid': None})
+
+    def active(self, value=None):
+        if value is None:
+            return self._state['active']
+        self._state['active'] = bool(value)
+
+    def connect(self, ssid=None, key=None):
+        self._state['ssid'] = ssid
+
+    def disconnect(self):
+        self._state['ssid'] = None
+
+    def isconnected(self):
+        return self._state['active'] and self._state['ssid'] is not None and _link['up']
+
+    def status(self, param=None):
+        if param == 'rssi':
+            return -55
+        return STAT_GOT_IP if self.isconnected() else STAT_IDLE
+
+    def ifconfig(self, config=None):
+        return ('127.0.0.1', '255.255.255.0', '127.0.0.1', '127.0.0.1')
+
+    def config(self, *args, **kwargs):
+        if args == ('essid',):
+            return self._state['ssid']
+        if args == ('mac',):
+            return b'\x24\x0a\xc4\x00\x00\x01'
+        return None
+
+    def scan(self):
+        # (ssid, bssid, channel, RSSI, security, hidden)
+        return [(b'CloneTrooper-HUD', b'\x00\x11\x22\x33\x44\x55', 6, -55, 3, False)]
@@ -0,0 +1,10 @@
+"""
+uasyncio on CPython: asyncio plus the MicroPython-only helpers
+"""
+
+from asyncio import *  # noqa: F401,F403
+from asyncio import sleep
+
+
+async def sleep_ms(ms):
+    await sleep(ms / 1000)
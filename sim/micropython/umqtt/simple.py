@@ -0,0 +1,98 @@
+"""
+Fake umqtt.simple on top of paho-mqtt
+
+Same blocking API as the MicroPython client: connect() waits for the
+CONNACK, publish() is fire-and-forget for QoS 0, incoming messages are
+queued and delivered by check_msg() / wait_msg().
+"""
+
+import queue
+import threading
+
+import paho.mqtt.client as mqtt
+
+import sim
+
+
+class MQTTException(Exception):
+    pass
+
+
+def _str(value):
+    return value.decode() if isinstance(value, (bytes, bytearray)) else value
+
+
+class MQTTClient:
+    def __init__(self, client_id, server, port=0, user=None, password=None,
+                 keepalive=0, ssl=False, ssl_params=None):
+        self.client_id = _str(client_id)
+        self.server, self.port = sim.broker_address(_str(server), port or 1883)
+        self.keepalive = keepalive or 60
+        self.cb = None
+        self._messages = queue.Queue()
+        self._connack = threading.Event()
+        self._rc = None
+        self._client = mqtt.Client(client_id=self.client_id)
+        if user is not None:
+            self._client.username_pw_set(_str(user), _str(password))
+        self._client.on_connect = self._on_connect
+        self._client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, rc):
+        self._rc = rc
+        self._connack.set()
+
+    def _on_message(self, client, userdata, msg):
+        self._messages.put((msg.topic.encode(), msg.payload))
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def set_last_will(self, topic, msg, retain=False, qos=0):
+        self._client.will_set(_str(topic), msg, qos, retain)
+
+    def connect(self, clean_session=True, timeout=None):
+        self._connack.clear()
+        if timeout is not None and timeout != self._client.connect_timeout:
+            self._client.connect_timeout = timeout
+        self._client.connect(self.server, self.port, self.keepalive)
+        self._client.loop_start()
+        if not self._connack.wait(timeout or 10.0):
+            self._client.loop_stop()
+            raise OSError(110, 'ETIMEDOUT')
+        if self._rc != 0:
+            self._client.loop_stop()
+            raise MQTTException(self._rc)
+        return 0
+
+    def disconnect(self):
+        self._client.disconnect()
+        self._client.loop_stop()
+
+    def ping(self):
+        pass
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        if not self._client.is_connected():
+            raise OSError(104, 'ECONNRESET')
+        if isinstance(msg, memoryview):
+            msg = bytes(msg)
+        info = self._client.publish(_str(topic), msg, qos, retain)
+        if qos:
+            info.wait_for_publish(5.0)
+
+    def subscribe(self, topic, qos=0):
+        self._client.subscribe(_str(topic), qos)
+
+    def _deliver(self, message):
+        if self.cb is not None:
+            self.cb(*message)
+
+    def wait_msg(self):
+        self._deliver(self._messages.get())
+
+    def check_msg(self):
+        try:
+            self._deliver(self._messages.get_nowait())
+        except queue.Empty:
+            return None
@@ -0,0 +1,217 @@
+"""
+Fake picamera2 for the eye nodes
+
+Frames come from sim.world.SyntheticScene and are paced by the
+FrameRate control, like the real sensor. Streams are delivered in
+their configured format: RGB888 / BGR888 (height x width x 3) or
+YUV420 (I420 planes, (height * 3 / 2) x stride, stride aligned to 64
+like the ISP output). encoders.py fakes the V4L2 hardware encoders,
+outputs.py the Output base class they accept.
+"""
+
+import time
+
+import sim
+from sim.world import SyntheticScene, encode_jpeg
+
+STRIDE_ALIGN = 64
+
+
+def _stride(width, fmt):
+    if fmt == 'YUV420':
+        return -(-width // STRIDE_ALIGN) * STRIDE_ALIGN
+    return width * 3
+
+
+def _yuv420(rgb, stride):
+    """I420 buffer of an RGB frame (BT.601, 2x2 chroma subsampling)"""
+    import numpy as np
+
+    height, width = rgb.shape[:2]
+    out = np.zeros((height * 3 // 2, stride), dtype=np.uint8)
+    r, g, b = (rgb[:, :, i].astype(np.int32) for i in range(3))
+    out[:height, :width] = (77 * r + 150 * g + 29 * b) >> 8
+    r, g, b = r[::2, ::2], g[::2, ::2], b[::2, ::2]
+    u = ((-43 * r - 85 * g + 128 * b) >> 8) + 128
+    v = ((128 * r - 107 * g - 21 * b) >> 8) + 128
+    # U then V planes below the luma, half width / height / stride each
+    flat = out.reshape(-1)
+    luma, chroma = height * stride, height // 2 * (stride // 2)
+    flat[luma:luma + chroma].reshape(height // 2, stride // 2)[:, :width // 2] = u
+    flat[luma + chroma:luma + 2 * chroma].reshape(height // 2, stride // 2)[:, :width // 2] = v
+    return out
+
+
+class _CompletedRequest:
+    """One synthetic frame, like picamera2's CompletedRequest"""
+
+    def __init__(self, camera, frame, metadata):
+        self.camera = camera
+        self.frame = frame
+        self.metadata = metadata
+        self.arrays = {}
+        self.refs = 1
+
+    def acquire(self):
+        self.refs += 1
+
+    def make_array(self, name='main'):
+        array = self.arrays.get(name)
+        if array is None:
+            array = self.arrays[name] = self.camera._stream_array(self.frame, name)
+        return array
+
+    def make_image(self, name='main'):
+        from PIL import Image
+        return Image.fromarray(self.rgb(name))
+
+    def rgb(self, name='main'):
+        """Rendered RGB frame of a stream (the fake JPEG encoder's input)"""
+        return self.camera._scaled(self.frame, name)
+
+    def save(self, name, file_output, format=None):
+        data = encode_jpeg(self.rgb(name), self.camera.options.get('quality', 90))
+        if isinstance(file_output, str):
+            with open(file_output, 'wb') as f:
+                f.write(data)
+        else:
+            file_output.write(data)
+
+    def get_metadata(self):
+        return self.metadata
+
+    def release(self):
+        self.refs -= 1
+        if self.refs <= 0:
+            self.frame = None
+            self.arrays = {}
+
+
+class MappedArray:
+    """Buffer of one stream of a request, as an array, inside a with block"""
+
+    def __init__(self, request, stream, reshape=True, write=True):
+        self.request = request
+        self.stream = stream
+        self.array = None
+
+    def __enter__(self):
+        self.array = self.request.make_array(self.stream)
+        return self
+
+    def __exit__(self, *exc):
+        self.array = None
+
+
+class Picamera2:
+    def __init__(self, camera_num=0):
+        self.camera_num = camera_num
+        self.options = {'quality': 90}
+        self.controls = {'FrameRate': 30.0}
+        self.camera_controls = {'FrameRate': (1.0, 120.0, 30.0)}
+        self.config = None
+        self.camera_config = None
+        self.stream_map = {}
+        self.scene = None
+        self.started = False
+        self.frames = 0
+        self._next = 0.0
+
+    def _configuration(self, main=None, lores=None, controls=None, **kwargs):
+        config = {
+            'main': dict({'size': (640, 480), 'format': 'RGB888'}, **(main or {})),
+            'lores': dict(lores) if lores else None,
+            'controls': dict(controls or {}),
+        }
+        config.update(kwargs)
+        return config
+
+    create_video_configuration = _configuration
+    create_preview_configuration = _configuration
+    create_still_configuration = _configuration
+
+    def configure(self, config):
+        if self.started:
+            raise RuntimeError('Camera must be stopped before configuring')
+        self.config = config
+        self.controls.update(config.get('controls') or {})
+        # Like picamera2: camera_config gets the strides of the streams
+        self.camera_config = dict(config)
+        self.stream_map = {}
+        for name in ('main', 'lores'):
+            stream = config.get(name)
+            if stream:
+                stream = self.camera_config[name] = dict(stream)
+                stream.setdefault('format', 'YUV420' if name == 'lores' else 'RGB888')
+                stream['stride'] = _stride(stream['size'][0], stream['format'])
+                self.stream_map[name] = name
+        width, height = config['main']['size']
+        self.scene = SyntheticScene(width, height, seed=sim.settings['seed'] + self.camera_num)
+
+    def set_controls(self, controls):
+        self.controls.update(controls)
+
+    def start(self, config=None, show_preview=False):
+        if config is not None:
+            self.configure(config)
+        if self.scene is None:
+            self.configure(self.create_video_configuration())
+        self.started = True
+        self._next = time.monotonic()
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        self.stop()
+
+    def _wait_frame(self):
+        # Block until the next sensor frame, like a real capture request
+        interval = 1.0 / float(self.controls.get('FrameRate', 30.0))
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(self._next + interval, time.monotonic())
+        self.frames += 1
+
+    def _scaled(self, frame, name):
+        if name == 'lores' and self.camera_config.get('lores'):
+            width, height = self.camera_config['lores']['size']
+            step_y = max(1, frame.shape[0] // height)
+            step_x = max(1, frame.shape[1] // width)
+            return frame[::step_y, ::step_x][:height, :width]
+        return frame
+
+    def _stream_array(self, frame, name):
+        stream = self.camera_config[name]
+        rgb = self._scaled(frame, name)
+        if stream['format'] == 'YUV420':
+            return _yuv420(rgb, stream['stride'])
+        if stream['format'] in ('BGR888', 'XBGR8888'):
+            return rgb[:, :, ::-1].copy()
+        return rgb.copy()
+
+    def capture_array(self, name='main'):
+        self._wait_frame()
+        return self._stream_array(self.scene.render(), name)
+
+    def capture_request(self, wait=None, flush=None):
+        if not self.started:
+            raise RuntimeError('Camera is not running')
+        self._wait_frame()
+        metadata = self.capture_metadata()
+        return _CompletedRequest(self, self.scene.render().copy(), metadata)
+
+    def capture_file(self, file_output, name='main', format=None, wait=None):
+        self._wait_frame()
+        data = encode_jpeg(self._scaled(self.scene.render(), name), self.options.get('quality', 90))
+        if isinstance(file_output, str):
+            with open(file_output, 'wb') as f:
+                f.write(data)
+        else:
+            file_output.write(data)
+        return {'SensorTimestamp': time.monotonic_ns()}
+
+    def capture_metadata(self):
+        return {'SensorTimestamp': time.monotonic_ns(),
+                'FrameDuration': int(1e6 / float(self.controls.get('FrameRate', 30.0)))}
@@ -0,0 +1,125 @@
+"""
+Fake picamera2 V4L2 hardware encoders
+
+Like the real ones, encode() only queues the request (kept acquired
+until encoded) and returns; an encoder thread hands each encoded frame
+to the outputs' outputframe(frame, keyframe, timestamp). The hardware
+encode time is modelled as a sleep proportional to the frame size.
+
+MJPEGEncoder produces real JPEG (needs Pillow or OpenCV, see
+sim.world.encode_jpeg). No H.264 codec is assumed to be installed:
+H264Encoder emits Annex B NAL units of the size the bitrate allows,
+with a synthetic payload.
+"""
+
+import queue
+import threading
+import time
+
+from sim.world import encode_jpeg
+from .outputs import Output
+
+# Modelled VideoCore throughput (pixels per second)
+HARDWARE_RATE = 60e6
+ASSUMED_FPS = 30.0
+
+
+class Encoder:
+    def __init__(self, bitrate=None):
+        self.bitrate = bitrate
+        self.width = self.height = self.stride = None
+        self.format = None
+        self._output = []
+        self._queue = None
+        self._thread = None
+        self.frames = 0
+
+    @property
+    def output(self):
+        return self._output
+
+    @output.setter
+    def output(self, value):
+        # Same check as picamera2: duck-typed outputs are refused
+        outputs = value if isinstance(value, list) else [value]
+        if not all(isinstance(output, Output) for output in outputs):
+            raise RuntimeError('Must pass Output')
+        self._output = outputs
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @size.setter
+    def size(self, value):
+        self.width, self.height = value
+
+    def start(self, quality=None):
+        if self._thread is not None:
+            raise RuntimeError('Encoder already running')
+        for output in self._output:
+            output.start()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='encoder', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        for output in self._output:
+            output.stop()
+
+    def encode(self, stream, request):
+        if self._thread is None:
+            raise RuntimeError('Encoder not started')
+        request.acquire()
+        self._queue.put((stream, request, request.get_metadata()['SensorTimestamp'] // 1000))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            stream, request, timestamp = item
+            try:
+                time.sleep(self.width * self.height / HARDWARE_RATE)
+                frame, keyframe = self._encode(stream, request)
+            finally:
+                request.release()
+            self.frames += 1
+            for output in self._output:
+                output.outputframe(frame, keyframe, timestamp)
+
+    def _encode(self, stream, request):
+        raise NotImplementedError
+
+
+class MJPEGEncoder(Encoder):
+    def _encode(self, stream, request):
+        # Bitrate -> JPEG quality, roughly (2 bits per pixel ~ quality 95)
+        quality = 80
+        if self.bitrate:
+            bpp = self.bitrate / (self.width * self.height * ASSUMED_FPS)
+            quality = max(10, min(95, int(bpp * 45 + 5)))
+        return encode_jpeg(request.rgb(stream), quality), True
+
+
+class H264Encoder(Encoder):
+    def __init__(self, bitrate=None, repeat=False, iperiod=None, framerate=None, qp=None):
+        super().__init__(bitrate)
+        self.repeat = repeat
+        self.iperiod = iperiod or 60
+
+    def _encode(self, stream, request):
+        keyframe = self.frames % self.iperiod == 0
+        size = (self.bitrate or 1000000) // 8 // int(ASSUMED_FPS)
+        nals = []
+        if keyframe:
+            size *= 4
+            if self.repeat or not self.frames:
+                nals += [b'\x00\x00\x00\x01\x67' + bytes(12), b'\x00\x00\x00\x01\x68' + bytes(4)]
+        nals.append((b'\x00\x00\x00\x01\x65' if keyframe else b'\x00\x00\x00\x01\x41') + bytes(size))
+        return b''.join(nals), keyframe
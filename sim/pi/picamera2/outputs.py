@@ -0,0 +1,17 @@
+"""
+Fake picamera2.outputs: the Output base class the encoders accept
+"""
+
+
+class Output:
+    def __init__(self, pts=None):
+        self.recording = False
+
+    def start(self):
+        self.recording = True
+
+    def stop(self):
+        self.recording = False
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+        pass
@@ -0,0 +1,191 @@
+"""
+Fake smbus2 for the Pi nodes
+
+Every bus answers with a simulated SSD1306 at 0x3C that decodes the
+command stream into a framebuffer (ascii() shows what the HUD draws),
+and an INA219 at 0x40 measuring the SensorWorld battery.
+"""
+
+import sim
+
+# Command -> number of argument bytes (SSD1306 datasheet)
+_ARGS = {0x20: 1, 0x21: 2, 0x22: 2, 0x81: 1, 0x8D: 1, 0xA8: 1, 0xD3: 1,
+         0xD5: 1, 0xD9: 1, 0xDA: 1, 0xDB: 1}
+
+
+class Ssd1306Device:
+    """128x64 SSD1306 in horizontal addressing mode"""
+
+    def __init__(self, width=128, height=64):
+        self.width = width
+        self.pages = height // 8
+        self.ram = bytearray(self.pages * width)
+        self.window = (0, width - 1, 0, self.pages - 1)
+        self.column = 0
+        self.page = 0
+        self.on = False
+        self.bytes = 0
+        self._pending = []
+
+    def write(self, data):
+        self.bytes += len(data) + 1
+        control, payload = data[0], data[1:]
+        if control & 0x40:
+            self._data(payload)
+        else:
+            for byte in payload:
+                self._command(byte)
+
+    def read(self, nbytes):
+        return bytes(nbytes)
+
+    def _command(self, byte):
+        if self._pending:
+            self._pending[1].append(byte)
+            if len(self._pending[1]) == _ARGS[self._pending[0]]:
+                cmd, args = self._pending
+                self._pending = []
+                self._apply(cmd, args)
+            return
+        if byte in _ARGS:
+            self._pending = [byte, []]
+        elif byte in (0xAE, 0xAF):
+            self.on = byte == 0xAF
+
+    def _apply(self, cmd, args):
+        col0, col1, page0, page1 = self.window
+        if cmd == 0x21:
+            col0, col1 = args
+            self.column = col0
+        elif cmd == 0x22:
+            page0, page1 = args
+            self.page = page0
+        self.window = (col0, col1, page0, page1)
+
+    def _data(self, payload):
+        col0, col1, page0, page1 = self.window
+        for byte in payload:
+            self.ram[self.page * self.width + self.column] = byte
+            self.column += 1
+            if self.column > col1:
+                self.column = col0
+                self.page = page0 if self.page >= page1 else self.page + 1
+
+    def ascii(self):
+        """Panel content as text ('#' = lit pixel)"""
+        rows = []
+        for y in range(self.pages * 8):
+            page, bit = divmod(y, 8)
+            line = self.ram[page * self.width:(page + 1) * self.width]
+            rows.append(''.join('#' if b >> bit & 1 else '.' for b in line))
+        return '\n'.join(rows)
+
+
+class Ina219Device:
+    """INA219 with a 0.1 ohm shunt on the battery of a SensorWorld"""
+
+    SHUNT_OHMS = 0.1
+
+    def __init__(self, world):
+        self.world = world
+        self.pointer = 0
+        self.config = 0x399F
+
+    def write(self, data):
+        self.pointer = data[0]
+        if self.pointer == 0 and len(data) >= 3:
+            self.config = data[1] << 8 | data[2]
+
+    def read(self, nbytes):
+        if self.pointer == 0x01:
+            power = self.world.power()
+            value = int(round(power['current'] * self.SHUNT_OHMS / 10e-6)) & 0xFFFF
+        elif self.pointer == 0x02:
+            power = self.world.power()
+            value = int(power['voltage'] / 4e-3) << 3 | 0x2  # conversion ready
+        elif self.pointer == 0x00:
+            value = self.config
+        else:
+            value = 0
+        return bytes((value >> 8, value & 0xFF))[:nbytes]
+
+
+DEVICES = {}
+
+
+def devices(bus):
+    """Devices of a bus number (created on first use)"""
+    if bus not in DEVICES:
+        world = sim.settings.get('world')
+        if world is None:
+            from sim.world import SensorWorld
+            world = sim.settings['world'] = SensorWorld(sim.settings.get('seed', 0))
+        DEVICES[bus] = {0x3C: Ssd1306Device(), 0x40: Ina219Device(world)}
+    return DEVICES[bus]
+
+
+class _Message:
+    def __init__(self, addr, flags, buf):
+        self.addr = addr
+        self.flags = flags
+        self.buf = buf
+        self.len = len(buf)
+
+    def __bytes__(self):
+        return bytes(self.buf)
+
+    def __iter__(self):
+        return iter(self.buf)
+
+
+class i2c_msg:
+    @staticmethod
+    def write(address, buf):
+        return _Message(address, 0, bytes(buf))
+
+    @staticmethod
+    def read(address, length):
+        return _Message(address, 1, bytearray(length))
+
+
+class SMBus:
+    def __init__(self, bus=None, force=False):
+        self.bus = bus
+        self.devices = devices(bus)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _device(self, address):
+        device = self.devices.get(address)
+        if device is None:
+            raise OSError(121, 'Remote I/O error')
+        return device
+
+    def i2c_rdwr(self, *messages):
+        for msg in messages:
+            device = self._device(msg.addr)
+            if msg.flags & 1:
+                msg.buf[:] = device.read(msg.len)
+            else:
+                device.write(msg.buf)
+
+    def write_i2c_block_data(self, address, register, data):
+        self._device(address).write(bytes((register,)) + bytes(data))
+
+    def write_byte_data(self, address, register, value):
+        self._device(address).write(bytes((register, value)))
+
+    def read_i2c_block_data(self, address, register, length):
+        device = self._device(address)
+        device.write(bytes((register,)))
+        return list(device.read(length))
+
+    def read_byte_data(self, address, register):
+        return self.read_i2c_block_data(address, register, 1)[0]
+
+    def close(self):
+        pass
@@ -0,0 +1,164 @@
+"""
+Replay a bus recording of the Pi 5 onto an MQTT broker
+
+Publishes the messages of a recorded session (shared/bus_log.py) with
+their original spacing, N times faster, or as fast as the broker takes
+them. --start / --end seek through the segment indexes: replaying the
+last minutes of a long session does not read the rest of it.
+
+With --inputs-only, what the Pi 5 server publishes itself (telemetry
+fan-out, YOLO results, history responses, alerts) is left out so a
+server running against the broker recomputes it from the node inputs.
+
+Usage:
+    python -m sim.replay data/recordings --info
+    python -m sim.replay data/recordings/20260118-143000 --broker 127.0.0.1:1883 --speed 1
+    python -m sim.replay data/recordings --speed 10 --start +120 --end +180 --inputs-only
+    python -m sim.replay data/recordings --speed max --topics 'helmet/#'
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'shared'))
+
+from bus_log import BusLogReader, TOPICS_FILE
+from mqtt_async import AsyncMQTTClient
+from telemetry_schema import SCHEMAS
+from mqtt_topics import BACKPACK_YOLO_RESULTS, BACKPACK_YOLO_STATS, BACKPACK_HISTORY_RESPONSE, SYSTEM_ALERTS
+
+YIELD_EVERY = 256  # messages published between two event loop turns at max speed
+
+
+def server_topics():
+    """Topics published by the Pi 5 server (left out by --inputs-only)"""
+    topics = {BACKPACK_YOLO_RESULTS, BACKPACK_YOLO_STATS, BACKPACK_HISTORY_RESPONSE, SYSTEM_ALERTS}
+    for blocks in SCHEMAS.values():
+        for _, _, fanout in blocks:
+            topics.update(topic for topic, _, _ in fanout)
+    return sorted(topics)
+
+
+def find_session(path):
+    """A session directory, or the latest session of a recordings directory"""
+    path = Path(path)
+    if (path / TOPICS_FILE).exists():
+        return path
+    sessions = sorted(p for p in path.iterdir() if (p / TOPICS_FILE).exists())
+    if not sessions:
+        raise SystemExit(f"No recording in {path}")
+    return sessions[-1]
+
+
+def parse_time(value, reader):
+    """'+S' (seconds from the session start), epoch seconds or ISO date"""
+    if value is None:
+        return None
+    if value.startswith('+'):
+        return reader.start + float(value[1:])
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def print_info(reader):
+    print(f"Session {reader.directory.name}: {len(reader)} messages, {len(reader.segments)} segments, "
+          f"{reader.end - reader.start:.1f} s from {datetime.fromtimestamp(reader.start):%Y-%m-%d %H:%M:%S}")
+    print(f"{'topic':<40} {'messages':>9} {'rate/s':>8}")
+    for topic, (count, first, last) in sorted(reader.topic_stats().items()):
+        rate = (count - 1) / (last - first) if last > first else 0.0
+        print(f"{topic:<40} {count:>9} {rate:>8.1f}")
+
+
+async def replay(reader, client, args, start, end, exclude):
+    """One pass over the selection; returns (messages, lateness list in ms, wall time)"""
+    speed = None if args.speed == 'max' else float(args.speed)
+    lateness = []
+    count = 0
+    origin = None
+    began = time.perf_counter()
+    for ts, topic, payload in reader.read(start, end, args.topics, exclude):
+        if speed is None:
+            if count % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        else:
+            if origin is None:
+                origin = ts
+            due = began + (ts - origin) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lateness.append((time.perf_counter() - due) * 1000)
+        client.publish(topic, payload)
+        count += 1
+    await asyncio.sleep(0)
+    return count, lateness, time.perf_counter() - began
+
+
+async def run(args):
+    reader = BusLogReader(find_session(args.session))
+    if not len(reader):
+        raise SystemExit(f"Empty recording: {reader.directory}")
+    if args.info:
+        print_info(reader)
+        return
+    start, end = parse_time(args.start, reader), parse_time(args.end, reader)
+    exclude = list(args.exclude or [])
+    if args.inputs_only:
+        exclude += server_topics()
+
+    client = AsyncMQTTClient(f"replay-{int(time.time())}", args.host, args.port)
+    await client.start()
+    await client.wait_connected(10)
+    try:
+        while True:
+            count, lateness, wall = await replay(reader, client, args, start, end, exclude)
+            p50, p95 = percentile(lateness, 50), percentile(lateness, 95)
+            late = '' if p50 is None else f", lateness p50 {p50:.1f} ms / p95 {p95:.1f} ms"
+            print(f"Replayed {count} messages in {wall:.2f} s ({count / max(wall, 1e-9):.0f} msg/s){late}")
+            if not args.loop:
+                break
+    finally:
+        await client.stop()
+        reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('session', help='Session directory, or recordings directory (latest session)')
+    parser.add_argument('--broker', default='127.0.0.1:1883', help='MQTT broker host[:port]')
+    parser.add_argument('--speed', default='1', help="Time factor (1 = real time, 10...) or 'max'")
+    parser.add_argument('--start', help="'+seconds' from the session start, epoch seconds or ISO date")
+    parser.add_argument('--end', help='Same formats as --start')
+    parser.add_argument('--topics', nargs='+', help='MQTT filters to replay (default: all)')
+    parser.add_argument('--exclude', nargs='+', help='MQTT filters left out')
+    parser.add_argument('--inputs-only', action='store_true', help='Leave out the topics the Pi 5 server publishes')
+    parser.add_argument('--loop', action='store_true', help='Replay again until interrupted')
+    parser.add_argument('--info', action='store_true', help='Print the session topics and exit')
+    args = parser.parse_args()
+
+    if args.speed != 'max' and float(args.speed) <= 0:
+        parser.error("--speed must be > 0 or 'max'")
+    host, _, port = args.broker.partition(':')
+    args.host, args.port = host, int(port or 1883)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Run a node program unmodified on a dev box
+
+ESP32 nodes (directory with boot.py) get the fake MicroPython modules
+and a simulated I2C bus / ADC wired to a SensorWorld; boot.py then
+main.py run like on the board. Pi nodes get the fake picamera2 /
+smbus2 and their load_config() is wrapped to point at a local broker.
+
+Usage:
+    python -m sim.run helmet/esp32_helmet --broker 127.0.0.1:1883
+    python -m sim.run backpack/esp32_backpack --broker 127.0.0.1:1883
+    python -m sim.run helmet/pi_zero_left_eye --broker 127.0.0.1 --server 127.0.0.1
+"""
+
+import argparse
+import importlib.util
+import runpy
+import sys
+from pathlib import Path
+
+import sim
+from sim.devices import helmet_bus, backpack_bus
+from sim.world import SensorWorld
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_DIR = REPO_ROOT / 'shared'
+
+# Backpack MQ wiring: config pin name -> world gas source
+MQ_PINS = {
+    'MQ2_INT_PIN': 'mq2/interior',
+    'MQ2_EXT_PIN': 'mq2/exterior',
+    'MQ7_INT_PIN': 'mq7/interior',
+    'MQ7_EXT_PIN': 'mq7/exterior',
+}
+
+
+def prepare_esp32(node_dir, broker, seed, i2c_freq=None):
+    """
+    Install the fake MicroPython modules and wire the simulated hardware
+
+    Returns:
+        (config globals, SensorWorld)
+    """
+    sim.install_micropython(broker, seed)
+    config = runpy.run_path(str(node_dir / 'config.py'))
+    world = SensorWorld(seed)
+    sim.settings['world'] = world
+
+    if 'PCA9548A_EXT_ADDR' in config:
+        sim.settings['i2c_bus'] = backpack_bus(config, world, i2c_freq)
+        sim.settings['adc'] = {
+            config[pin]: (lambda name=name: world.gas_voltage(name))
+            for pin, name in MQ_PINS.items()
+        }
+    else:
+        sim.settings['i2c_bus'] = helmet_bus(config, world, i2c_freq)
+
+    # Flat module namespace, like the board filesystem
+    sys.path[:0] = [str(node_dir), str(SHARED_DIR)]
+    return config, world
+
+
+def run_esp32(node_dir, broker, seed, i2c_freq=None):
+    """Run boot.py then main.py of an ESP32 node"""
+    prepare_esp32(node_dir, broker, seed, i2c_freq)
+    runpy.run_path(str(node_dir / 'boot.py'), run_name='boot')
+    runpy.run_path(str(node_dir / 'main.py'), run_name='__main__')
+
+
+def run_pi(node_dir, broker, server, seed):
+    """Run a Pi node main() with its broker / frame server redirected"""
+    sim.install_pi(seed)
+    # Local modules next to main.py, as with "python main.py"
+    sys.path.insert(0, str(node_dir))
+    spec = importlib.util.spec_from_file_location('sim_node_main', node_dir / 'main.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+
+    load_config = module.load_config
+
+    def patched_config():
+        config = load_config()
+        if broker:
+            host, _, port = broker.partition(':')
+            config['mqtt']['broker'] = host
+            if port:
+                config['mqtt']['port'] = int(port)
+        if server and 'transport' in config:
+            config['transport']['server_host'] = server
+        return config
+
+    module.load_config = patched_config
+    module.main()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('node', type=Path, help='Node directory (e.g. helmet/esp32_helmet)')
+    parser.add_argument('--broker', default='127.0.0.1:1883', help='MQTT broker host[:port]')
+    parser.add_argument('--server', default='127.0.0.1', help='Pi 5 frame server host (eye nodes)')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic data seed')
+    parser.add_argument('--i2c-freq', type=int, default=None, help='Override the ESP32 I2C clock (Hz)')
+    args = parser.parse_args()
+
+    node_dir = args.node.resolve()
+    if (node_dir / 'boot.py').exists():
+        run_esp32(node_dir, args.broker, args.seed, args.i2c_freq)
+    else:
+        run_pi(node_dir, args.broker, args.server, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Synthetic sensor and camera generators
+
+Values evolve with wall-clock time (mean-reverting random walks,
+a slow head sweep, occasional gas events) and are deterministic for
+a given seed, so two runs of a benchmark see the same signals.
+"""
+
+import io
+import math
+import random
+import time
+
+
+class Drift:
+    """
+    Mean-reverting random walk (Ornstein-Uhlenbeck), sampled on demand
+
+    Args:
+        rng: random.Random instance
+        mean: Long-term mean
+        sigma: Stationary standard deviation
+        tau: Reversion time constant (seconds)
+        lo, hi: Optional clamp
+    """
+
+    def __init__(self, rng, mean, sigma, tau=30.0, lo=None, hi=None):
+        self.rng = rng
+        self.mean = mean
+        self.sigma = sigma
+        self.tau = tau
+        self.lo = lo
+        self.hi = hi
+        self.value = mean
+        self.t = None
+
+    def sample(self, now):
+        if self.t is not None:
+            dt = max(0.0, now - self.t)
+            decay = math.exp(-dt / self.tau)
+            noise = self.sigma * math.sqrt(1.0 - decay * decay)
+            self.value = self.mean + (self.value - self.mean) * decay + noise * self.rng.gauss(0.0, 1.0)
+            if self.lo is not None and self.value < self.lo:
+                self.value = self.lo
+            if self.hi is not None and self.value > self.hi:
+                self.value = self.hi
+        self.t = now
+        return self.value
+
+
+class GasEvent:
+    """
+    Poisson gas events on top of a drifting baseline
+
+    Args:
+        rng: random.Random instance
+        baseline: Drift of the sensor output (volts)
+        rate_per_hour: Mean number of events per hour
+        peak: Extra volts at the top of an event
+        duration: Event length (seconds)
+    """
+
+    def __init__(self, rng, baseline, rate_per_hour=2.0, peak=1.5, duration=60.0):
+        self.rng = rng
+        self.baseline = baseline
+        self.rate = rate_per_hour / 3600.0
+        self.peak = peak
+        self.duration = duration
+        self.start = None
+        self.t = None
+
+    def sample(self, now):
+        if self.t is not None and self.start is None:
+            dt = now - self.t
+            if self.rng.random() < 1.0 - math.exp(-self.rate * dt):
+                self.start = now
+        self.t = now
+        value = self.baseline.sample(now)
+        if self.start is not None:
+            phase = (now - self.start) / self.duration
+            if phase >= 1.0:
+                self.start = None
+            else:
+                # Fast rise, slow decay
+                value += self.peak * math.sin(math.pi * phase) ** 2
+        return value
+
+
+class SensorWorld:
+    """
+    Environment shared by every simulated sensor of one armor
+
+    Args:
+        seed: Random seed
+        clock: Time source (default time.monotonic)
+    """
+
+    def __init__(self, seed=0, clock=time.monotonic):
+        self.rng = rng = random.Random(seed)
+        self.clock = clock
+        self.t0 = clock()
+        self.heading_speed = rng.uniform(5.0, 20.0)  # deg/s head sweep
+        self.drifts = {
+            'temperature/interior': Drift(rng, 31.0, 1.5, 120.0),
+            'temperature/exterior': Drift(rng, 22.0, 3.0, 300.0),
+            'humidity/interior': Drift(rng, 55.0, 5.0, 120.0, 0.0, 100.0),
+            'humidity/exterior': Drift(rng, 45.0, 8.0, 300.0, 0.0, 100.0),
+            'pressure': Drift(rng, 1013.25, 2.0, 600.0),
+            'tvoc': Drift(rng, 120.0, 60.0, 60.0, 0.0),
+            'eco2': Drift(rng, 600.0, 150.0, 60.0, 400.0),
+            'current': Drift(rng, 0.6, 0.15, 10.0, 0.0),
+            'roll': Drift(rng, 0.0, 4.0, 2.0, -45.0, 45.0),
+            'pitch': Drift(rng, 0.0, 6.0, 2.0, -60.0, 60.0),
+        }
+        self.gas = {}
+        for name in ('mq2/interior', 'mq2/exterior', 'mq7/interior', 'mq7/exterior'):
+            self.gas[name] = GasEvent(rng, Drift(rng, 0.4, 0.05, 30.0, 0.0, 3.3))
+        self.battery_capacity = 5.0  # Ah
+        self.battery_used = 0.0
+        self._battery_t = None
+
+    def now(self):
+        return self.clock() - self.t0
+
+    def value(self, name):
+        return self.drifts[name].sample(self.now())
+
+    def orientation(self):
+        t = self.now()
+        heading = (t * self.heading_speed + 30.0 * math.sin(t / 7.0)) % 360.0
+        return {
+            'heading': heading,
+            'roll': self.value('roll'),
+            'pitch': self.value('pitch'),
+        }
+
+    def environment(self, location='interior'):
+        return {
+            'temperature': self.value(f'temperature/{location}'),
+            'humidity': self.value(f'humidity/{location}'),
+            'pressure': self.value('pressure'),
+        }
+
+    def air_quality(self):
+        eco2 = self.value('eco2')
+        return {
+            'aqi': min(5, 1 + int(max(0.0, eco2 - 400.0) // 400)),
+            'tvoc': int(self.value('tvoc')),
+            'eco2': int(eco2),
+        }
+
+    def gas_voltage(self, name):
+        """MQ sensor output voltage ('mq2/interior', 'mq7/exterior', ...)"""
+        return self.gas[name].sample(self.now())
+
+    def power(self):
+        t = self.now()
+        current = self.value('current')
+        if self._battery_t is not None:
+            self.battery_used += current * (t - self._battery_t) / 3600.0
+        self._battery_t = t
+        soc = max(0.0, 1.0 - self.battery_used / self.battery_capacity)
+        voltage = 3.3 + 0.9 * soc - 0.05 * current
+        return {'voltage': voltage, 'current': current, 'power': voltage * current}
+
+
+class SyntheticScene:
+    """
+    Moving boxes over a gradient, as seen by an eye camera
+
+    Args:
+        width, height: Frame size
+        objects: Number of moving boxes
+        seed: Random seed
+    """
+
+    def __init__(self, width=640, height=480, objects=3, seed=0):
+        import numpy as np
+
+        self.width = width
+        self.height = height
+        rng = random.Random(seed)
+        self.objects = [
+            {
+                'pos': [rng.uniform(0, width), rng.uniform(0, height)],
+                'vel': [rng.uniform(-80, 80), rng.uniform(-50, 50)],
+                'size': (rng.randint(40, 160), rng.randint(60, 200)),
+                'color': tuple(rng.randint(30, 255) for _ in range(3)),
+            }
+            for _ in range(objects)
+        ]
+        gradient = np.linspace(40, 160, width, dtype=np.float32)
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[:] = gradient[None, :, None].astype(np.uint8)
+        self.frame = np.empty_like(self.background)
+        self.t0 = time.monotonic()
+
+    def render(self, t=None):
+        """RGB frame at time t (seconds since start), reused buffer"""
+        t = time.monotonic() - self.t0 if t is None else t
+        frame = self.frame
+        frame[:] = self.background
+        for obj in self.objects:
+            w, h = obj['size']
+            # Bounce inside the frame
+            x = _bounce(obj['pos'][0] + obj['vel'][0] * t, self.width - w)
+            y = _bounce(obj['pos'][1] + obj['vel'][1] * t, self.height - h)
+            frame[int(y):int(y) + h, int(x):int(x) + w] = obj['color']
+        return frame
+
+    def boxes(self, t=None):
+        """Ground-truth boxes (x0, y0, x1, y1) at time t"""
+        t = time.monotonic() - self.t0 if t is None else t
+        boxes = []
+        for obj in self.objects:
+            w, h = obj['size']
+            x = int(_bounce(obj['pos'][0] + obj['vel'][0] * t, self.width - w))
+            y = int(_bounce(obj['pos'][1] + obj['vel'][1] * t, self.height - h))
+            boxes.append((x, y, x + w, y + h))
+        return boxes
+
+
+def _bounce(value, limit):
+    if limit <= 0:
+        return 0.0
+    period = 2 * limit
+    value %= period
+    return period - value if value > limit else value
+
+
+def encode_jpeg(frame, quality=80):
+    """
+    JPEG-encode an RGB frame with whatever encoder is installed
+
+    Raises:
+        ImportError: neither OpenCV nor Pillow is available
+    """
+    try:
+        import cv2
+
+        ok, data = cv2.imencode('.jpg', frame[:, :, ::-1], [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError('JPEG encoding failed')
+        return data.tobytes()
+    except ImportError:
+        pass
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError('Synthetic JPEG frames need opencv-python or Pillow') from None
+    buffer = io.BytesIO()
+    Image.fromarray(frame).save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()